@@ -139,6 +139,14 @@ export function useListingGenerator({
       if (promptDirty) lform.append("prompt_override", promptInput.trim());
       if (garmentType) lform.append("garment_type_override", garmentType);
       if (title) lform.append("title", title);
+      if (descEnabled) {
+        // Lets the backend write the description alongside classification; /describe then reuses it.
+        lform.append("describe", "true");
+        if (desc.brand) lform.append("brand", desc.brand);
+        if (desc.productModel) lform.append("model_name", desc.productModel);
+        if (desc.size) lform.append("size", desc.size);
+        if (productCondition) lform.append("condition", productCondition);
+      }
 
       const toastId = toast.loading("Creating listing…");
       const lres = await fetch(`${baseUrl}/listing`, {
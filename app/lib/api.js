@@ -8,3 +8,35 @@ export function withUserId(headers = {}, userId) {
   return h;
 }
 
+// Follow next_cursor until the last page; for admin lists that must show the whole library.
+export async function fetchAllPages(url, init = {}) {
+  const items = [];
+  let cursor = null;
+  do {
+    const pageUrl = new URL(url, globalThis.location?.href);
+    pageUrl.searchParams.set("limit", "200");
+    if (cursor) pageUrl.searchParams.set("cursor", cursor);
+    const res = await fetch(pageUrl, init);
+    if (!res.ok) throw new Error(await res.text());
+    const data = await res.json();
+    if (!Array.isArray(data?.items)) break;
+    items.push(...data.items);
+    cursor = data.next_cursor || null;
+  } while (cursor);
+  return items;
+}
+
+// POST /pose/describe only queues the work; poll its job until every pose is done or failed.
+export async function describePosesAndWait(baseUrl = getApiBase(), { intervalMs = 2000 } = {}) {
+  const res = await fetch(`${baseUrl}/pose/describe`, { method: "POST" });
+  if (!res.ok) throw new Error(await res.text());
+  const job = await res.json();
+  if (!job?.job_id) return { done: 0, failed: 0, total: 0 };
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    const statusRes = await fetch(`${baseUrl}/pose/describe/${job.job_id}`);
+    if (!statusRes.ok) throw new Error(await statusRes.text());
+    const status = await statusRes.json();
+    if (status?.state !== "running") return status;
+  }
+}
@@ -1,7 +1,9 @@
 "use client";
 
 // Lightweight, browser-side image preprocessing tuned for mobile uploads.
-// - Converts HEIC/HEIF to JPEG (dynamic import) for cross-browser previews
+// - Passes HEIC/HEIF through untouched; the backend decodes and downscales them.
+//   Their preview is a small JPEG when the browser can decode HEIC natively
+//   (Safari), otherwise a placeholder image
 // - Compresses large images to ~1600px max side using browser-image-compression
 // - Returns a File you can append to FormData and a preview URL derived
 //   from the processed blob to ensure correct orientation in previews.
@@ -24,6 +26,31 @@ function toFile(blob, filename, type) {
   }
 }
 
+const HEIC_PREVIEW_MAX_SIDE = 800;
+
+// Most browsers cannot render a HEIC object URL in <img>, so decode one preview
+// frame where the platform supports it and fall back to a placeholder otherwise.
+async function heicPreviewUrl(file) {
+  try {
+    const bitmap = await createImageBitmap(file);
+    const scale = Math.min(1, HEIC_PREVIEW_MAX_SIDE / Math.max(bitmap.width, bitmap.height));
+    const canvas = document.createElement("canvas");
+    canvas.width = Math.round(bitmap.width * scale);
+    canvas.height = Math.round(bitmap.height * scale);
+    canvas.getContext("2d").drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close?.();
+    const blob = await new Promise((resolve) => canvas.toBlob(resolve, "image/jpeg", 0.8));
+    if (blob) return URL.createObjectURL(blob);
+  } catch {}
+  const svg =
+    '<svg xmlns="http://www.w3.org/2000/svg" width="400" height="500" viewBox="0 0 400 500">' +
+    '<rect width="400" height="500" fill="#e5e7eb"/>' +
+    '<text x="200" y="240" font-family="sans-serif" font-size="22" text-anchor="middle" fill="#4b5563">HEIC photo</text>' +
+    '<text x="200" y="272" font-family="sans-serif" font-size="14" text-anchor="middle" fill="#6b7280">Preview unavailable in this browser</text>' +
+    "</svg>";
+  return URL.createObjectURL(new Blob([svg], { type: "image/svg+xml" }));
+}
+
 // Returns { file: File|Blob, previewUrl: string }
 export async function preprocessImage(inputFile) {
   if (!inputFile || !(inputFile instanceof Blob)) {
@@ -33,15 +60,13 @@ export async function preprocessImage(inputFile) {
   let working = inputFile;
   let baseName = (inputFile.name || "photo").replace(/\.[^.]+$/, "");
 
-  try {
-    // Convert HEIC/HEIF to JPEG for wider browser compatibility
-    if (isHeicLike(inputFile.type)) {
-      const { default: heic2any } = await import("heic2any");
-      const converted = await heic2any({ blob: inputFile, toType: "image/jpeg", quality: 0.92 });
-      const convBlob = Array.isArray(converted) ? converted[0] : converted;
-      working = toFile(convBlob, `${baseName}.jpg`, "image/jpeg");
-    }
+  // HEIC/HEIF decoding in the browser is slow on mobile; upload the original and
+  // let the server decode it on its normalization pool instead.
+  if (isHeicLike(inputFile.type)) {
+    return { file: inputFile, previewUrl: await heicPreviewUrl(inputFile) };
+  }
 
+  try {
     // Compress and normalize orientation
     const opts = {
       maxWidthOrHeight: 1600, // Keep uploads snappy on mobile
@@ -16,8 +16,12 @@ export default function ListingsPage() {
   const [listings, setListings] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const fetchInFlightRef = useRef(false);
   const fingerprintRef = useRef(null);
+  // True once "Load more" appended rows beyond the first page.
+  const pagedRef = useRef(false);
 
   const fetchListings = useCallback(async (isBackground = false) => {
     if (!userId) return;
@@ -36,7 +40,19 @@ export default function ListingsPage() {
         .join("|");
       if (fingerprintRef.current !== fingerprint) {
         fingerprintRef.current = fingerprint;
-        setListings(items);
+        if (isBackground && pagedRef.current) {
+          // Refresh page 1 in place: rows loaded with "Load more" and the last page's cursor stay.
+          const ids = new Set(items.map((item) => item?.id));
+          const oldest = items.length ? new Date(items[items.length - 1]?.created_at || 0) : null;
+          setListings((prev) => [
+            ...items,
+            ...prev.filter((item) => !ids.has(item?.id) && (!oldest || new Date(item?.created_at || 0) <= oldest)),
+          ]);
+        } else {
+          pagedRef.current = false;
+          setListings(items);
+          setNextCursor(data?.next_cursor || null);
+        }
       }
       if (!isBackground) setError(null);
     } catch (err) {
@@ -51,6 +67,29 @@ export default function ListingsPage() {
     }
   }, [userId]);
 
+  const loadMore = useCallback(async () => {
+    if (!userId || !nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    const baseUrl = getApiBase();
+    try {
+      const params = new URLSearchParams({ cursor: nextCursor });
+      const res = await fetch(`${baseUrl}/listings?${params}`, { headers: withUserId({}, userId), cache: "no-store" });
+      if (!res.ok) throw new Error(await res.text());
+      const data = await res.json();
+      const items = Array.isArray(data?.items) ? data.items : [];
+      setListings((prev) => {
+        const seen = new Set(prev.map((item) => item?.id));
+        return [...prev, ...items.filter((item) => !seen.has(item?.id))];
+      });
+      pagedRef.current = true;
+      setNextCursor(data?.next_cursor || null);
+    } catch (err) {
+      setError(err?.message || "Failed to load listings");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [userId, nextCursor, loadingMore]);
+
   useEffect(() => {
     if (!userId) {
       setLoading(false);
@@ -62,7 +101,9 @@ export default function ListingsPage() {
   useEffect(() => {
     if (!userId) {
       fingerprintRef.current = null;
+      pagedRef.current = false;
       setListings([]);
+      setNextCursor(null);
       return undefined;
     }
 
@@ -164,6 +205,19 @@ export default function ListingsPage() {
         </div>
       )}
 
+      {userId && !loading && !error && nextCursor && (
+        <div className="flex justify-center">
+          <button
+            type="button"
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="inline-flex h-9 items-center justify-center rounded-lg border border-foreground/20 px-4 text-xs font-semibold text-foreground disabled:opacity-50"
+          >
+            {loadingMore ? "Loading…" : "Load more"}
+          </button>
+        </div>
+      )}
+
       {isAdmin && (
         <p className="text-center text-[11px] text-foreground/40">Admin? Use the init tools on the Create page to seed defaults.</p>
       )}
@@ -247,14 +247,13 @@ export default function Home() {
     (async () => {
       try {
         const baseUrl = getApiBase();
-        const res = await fetch(`${baseUrl}/pose/descriptions`);
+        // The server samples from the whole library, so only a few texts are downloaded.
+        const res = await fetch(`${baseUrl}/pose/descriptions/random?n=8`);
         const data = await res.json();
-        if (data?.items && Array.isArray(data.items)) {
-          setPoseDescs(data.items);
-          if (data.items.length > 0) {
-            const pick = data.items[Math.floor(Math.random() * data.items.length)];
-            setRandomPosePick(pick);
-          }
+        const items = Array.isArray(data?.items) ? data.items : [];
+        setPoseDescs(items);
+        if (items.length > 0) {
+          setRandomPosePick(items[Math.floor(Math.random() * items.length)]);
         }
       } catch {}
     })();
@@ -6,7 +6,7 @@ import Link from "next/link";
 import { useCallback, useEffect, useState } from "react";
 
 import { authClient } from "@/app/lib/auth-client";
-import { getApiBase } from "@/app/lib/api";
+import { describePosesAndWait, fetchAllPages, getApiBase } from "@/app/lib/api";
 import { getSessionBasics } from "@/app/lib/session";
 
 export default function StudioAdminPage() {
@@ -63,9 +63,7 @@ function EnvAdmin() {
   const refresh = useCallback(async () => {
     try {
       const base = getApiBase();
-      const res = await fetch(`${base}/env/sources`);
-      const data = await res.json();
-      setSources(data?.items || []);
+      setSources(await fetchAllPages(`${base}/env/sources`));
     } catch {}
   }, []);
   useEffect(() => { refresh(); }, [refresh]);
@@ -123,9 +121,7 @@ function ModelSourcesAdmin() {
   const refresh = useCallback(async () => {
     try {
       const base = getApiBase();
-      const res = await fetch(`${base}/model/sources?gender=${gender}`);
-      const data = await res.json();
-      setItems(data?.items || []);
+      setItems(await fetchAllPages(`${base}/model/sources?gender=${gender}`));
     } catch {}
   }, [gender]);
   useEffect(() => { refresh(); }, [refresh]);
@@ -183,9 +179,7 @@ function PoseAdmin() {
   const refresh = useCallback(async () => {
     try {
       const base = getApiBase();
-      const res = await fetch(`${base}/pose/sources`);
-      const data = await res.json();
-      setItems(data?.items || []);
+      setItems(await fetchAllPages(`${base}/pose/sources`));
     } catch {}
   }, []);
   useEffect(() => { refresh(); }, [refresh]);
@@ -212,7 +206,8 @@ function PoseAdmin() {
     setDescBusy(true);
     try {
       const base = getApiBase();
-      await fetch(`${base}/pose/describe`, { method: "POST" });
+      const status = await describePosesAndWait(base);
+      if (status.failed) alert(`${status.failed} pose description(s) failed`);
       await refresh();
     } catch (e) {
       alert("Describe poses failed");
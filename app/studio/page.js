@@ -7,7 +7,7 @@ import { toast } from "react-hot-toast";
 import { CheckCircle2, MinusCircle, PlusCircle, Trash2 } from "lucide-react";
 
 import { authClient } from "@/app/lib/auth-client";
-import { getApiBase, withUserId } from "@/app/lib/api";
+import { describePosesAndWait, fetchAllPages, getApiBase, withUserId } from "@/app/lib/api";
 import { getSessionBasics } from "@/app/lib/session";
 import { VB_STUDIO_ACTIVE_TAB, VB_STUDIO_MODEL_GENDER } from "@/app/lib/storage-keys";
 import { useSubscription } from "@/app/components/subscription-provider";
@@ -215,16 +215,14 @@ export default function StudioPage() {
   async function refreshSources() {
     try {
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/env/sources`);
-      const data = await res.json();
-      if (data?.items) setSources(data.items);
+      setSources(await fetchAllPages(`${baseUrl}/env/sources`));
     } catch {}
   }
 
   async function refreshGenerated() {
     try {
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/env/generated`, { headers: withUserId({}, userId) });
+      const res = await fetch(`${baseUrl}/env/generated?limit=200`, { headers: withUserId({}, userId) });
       const data = await res.json();
       if (data?.items) setGenerated(data.items);
     } catch {}
@@ -299,7 +297,7 @@ export default function StudioPage() {
   async function refreshModelGenerated() {
     try {
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/model/generated`, { headers: withUserId({}, userId) });
+      const res = await fetch(`${baseUrl}/model/generated?limit=200`, { headers: withUserId({}, userId) });
       const data = await res.json();
       if (data?.items) setModelGenerated(data.items);
     } catch {}
@@ -308,10 +306,10 @@ export default function StudioPage() {
   async function refreshModelSources() {
     try {
       const baseUrl = getApiBase();
-      let res = await fetch(`${baseUrl}/model/sources?gender=man`);
+      let res = await fetch(`${baseUrl}/model/sources?gender=man&limit=1`);
       let data = await res.json();
       setMalePersisted(data?.items && data.items.length > 0 ? data.items[0] : null);
-      res = await fetch(`${baseUrl}/model/sources?gender=woman`);
+      res = await fetch(`${baseUrl}/model/sources?gender=woman&limit=1`);
       data = await res.json();
       setFemalePersisted(data?.items && data.items.length > 0 ? data.items[0] : null);
     } catch {}
@@ -402,18 +400,14 @@ export default function StudioPage() {
   async function refreshPoseSources() {
     try {
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/pose/sources`);
-      const data = await res.json();
-      if (data?.items) setPoseSources(data.items);
+      setPoseSources(await fetchAllPages(`${baseUrl}/pose/sources`));
     } catch {}
   }
 
   async function refreshPoseDescriptions() {
     try {
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/pose/descriptions`);
-      const data = await res.json();
-      if (data?.items) setPoseDescs(data.items);
+      setPoseDescs(await fetchAllPages(`${baseUrl}/pose/descriptions`));
     } catch {}
   }
 
@@ -445,10 +439,13 @@ export default function StudioPage() {
     try {
       setIsPoseDescribing(true);
       const baseUrl = getApiBase();
-      const res = await fetch(`${baseUrl}/pose/describe`, { method: "POST" });
-      if (!res.ok) throw new Error(await res.text());
+      const status = await describePosesAndWait(baseUrl);
       await refreshPoseDescriptions();
-      alert("Pose descriptions generated.");
+      alert(
+        status.failed
+          ? `Pose descriptions generated: ${status.done} done, ${status.failed} failed.`
+          : "Pose descriptions generated."
+      );
     } catch (err) {
       console.error(err);
       alert("Pose description generation failed.");
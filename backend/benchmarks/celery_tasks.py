@@ -0,0 +1,196 @@
+"""Compare Celery task throughput with ``asyncio.run`` per task and with the worker runtime.
+
+Run with ``python -m backend.benchmarks.celery_tasks``. A local TCP server plays
+the database: every new connection waits ``--connect-ms`` before it is ready,
+the way a Postgres connection pays for TCP, TLS and auth, and every query takes
+``--query-ms``. Each task opens or borrows a connection, runs two queries (the
+existence check and the insert in ``generate_pose_description``) and awaits
+``--work-ms`` for the GenAI call.
+
+- ``asyncio.run`` is the old ``describe_pose_task``. Each task gets a new loop, so
+  connections cannot outlive it and every task connects again. The report also
+  shows what happens when a pooled connection is reused on the next task's loop.
+- ``runtime`` submits the same coroutine to :class:`WorkerRuntime`. Connections
+  stay in a pool on the long-lived loop.
+
+``--concurrency`` runs tasks from that many threads, as ``celery worker -P
+threads`` does.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.worker_runtime import WorkerRuntime
+
+
+class _FakeDatabase:
+    """Line-based TCP server with a connect handshake delay, on its own thread."""
+
+    def __init__(self, connect_ms: float, query_ms: float) -> None:
+        self.connect_s = connect_ms / 1000
+        self.query_s = query_ms / 1000
+        self.connections = 0
+        self.port = 0
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._serve, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def _serve(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.connect_s)
+        writer.write(b"ready\n")
+        try:
+            while await reader.readline():
+                await asyncio.sleep(self.query_s)
+                writer.write(b"ok\n")
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader, self.writer = reader, writer
+
+    @classmethod
+    async def open(cls, port: int) -> "_Connection":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await reader.readline()
+        return cls(reader, writer)
+
+    async def query(self) -> None:
+        self.writer.write(b"q\n")
+        await self.writer.drain()
+        if not await self.reader.readline():
+            raise ConnectionError("connection closed")
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class _Pool:
+    """Connections kept on whichever loop first used them, like SQLAlchemy's async pool."""
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self._idle: list[_Connection] = []
+
+    async def acquire(self) -> _Connection:
+        return self._idle.pop() if self._idle else await _Connection.open(self.port)
+
+    def release(self, conn: _Connection) -> None:
+        self._idle.append(conn)
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._idle.pop().close()
+
+
+async def _task_fresh_connection(port: int, work_s: float) -> None:
+    conn = await _Connection.open(port)
+    try:
+        await conn.query()
+        await asyncio.sleep(work_s)
+        await conn.query()
+    finally:
+        await conn.close()
+
+
+async def _task_pooled(pool: _Pool, work_s: float) -> None:
+    conn = await pool.acquire()
+    try:
+        await conn.query()
+        await asyncio.sleep(work_s)
+        await conn.query()
+    finally:
+        pool.release(conn)
+
+
+def _stale_pool_reuse(port: int) -> str:
+    """What the old task hit: a pooled connection reused on the next ``asyncio.run`` loop."""
+
+    pool = _Pool(port)
+    asyncio.run(_task_pooled(pool, 0))
+    try:
+        asyncio.run(_task_pooled(pool, 0))
+    except Exception as exc:
+        # asyncio's message starts with the whole task repr; keep the part that names the problem.
+        return f"{type(exc).__name__}: {str(exc).rsplit(' got ', 1)[-1]}"
+    return "no error"
+
+
+def _run(label: str, task, tasks: int, concurrency: int, db: _FakeDatabase) -> float:
+    before = db.connections
+    latencies: list[float] = []
+
+    def one(_: int) -> None:
+        start = time.perf_counter()
+        task()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(tasks)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<12} {tasks / elapsed:8.1f} tasks/s  "
+        f"p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.1f} ms  "
+        f"connections {db.connections - before}"
+    )
+    return tasks / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--connect-ms", type=float, default=15.0)
+    parser.add_argument("--query-ms", type=float, default=1.0)
+    parser.add_argument("--work-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    db = _FakeDatabase(args.connect_ms, args.query_ms)
+    work_s = args.work_ms / 1000
+    print(f"stale pooled connection on a new loop: {_stale_pool_reuse(db.port)}")
+
+    before = _run(
+        "asyncio.run",
+        lambda: asyncio.run(_task_fresh_connection(db.port, work_s)),
+        args.tasks,
+        args.concurrency,
+        db,
+    )
+    runtime = WorkerRuntime()
+    pool = _Pool(db.port)
+    try:
+        after = _run(
+            "runtime",
+            lambda: runtime.run(_task_pooled(pool, work_s)),
+            args.tasks,
+            args.concurrency,
+            db,
+        )
+        runtime.run(pool.close())
+    finally:
+        runtime.stop()
+    print(f"speed-up     {after / before:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
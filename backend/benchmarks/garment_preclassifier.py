@@ -0,0 +1,149 @@
+"""Train and evaluate the CPU garment-type pre-classifier.
+
+Run with ``python -m backend.benchmarks.garment_preclassifier``. Without
+``--fixtures`` a labeled fixture set of synthetic flat-lay silhouettes is drawn
+with a fixed seed: t-shirts, long sleeves, tanks, trousers, shorts, skirts,
+dresses and jumpsuits on plain backgrounds, with noise, tilt and random
+proportions. ``--fixtures DIR`` reads ``DIR/<top|bottom|full>/*`` instead. Fill
+such a directory from production labels with ``--export-listings DIR``, which
+downloads listing source images whose ``settings_json["garment_type"]`` is set.
+The garment cache keys on image hashes, so it holds labels but not images.
+
+The report lists accuracy over all images, then coverage and accuracy at the
+confidence threshold (the share answered locally, and how often those answers
+are right), and the latency of ``preclassify`` on full-size encoded PNGs.
+``--write-model`` stores the trained weights for ``GARMENT_PRECLASSIFY``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+
+from backend.services import garment_precheck
+from backend.services.garment_precheck import DEFAULT_MODEL_PATH, LABELS, extract_features, train_model
+from backend.benchmarks.synthetic_garments import synthetic_fixtures
+
+
+def load_fixtures(root: Path) -> list[tuple[bytes, str]]:
+    samples = []
+    for label in LABELS:
+        for path in sorted((root / label).glob("*")):
+            if path.is_file():
+                samples.append((path.read_bytes(), label))
+    return samples
+
+
+async def export_listings(target: Path, limit: int) -> int:
+    """Download labeled listing source images into ``target/<label>/``."""
+
+    from sqlalchemy import select
+
+    from backend.db import Listing, db_session
+    from backend.storage import get_object_bytes
+
+    async with db_session() as session:
+        res = await session.execute(
+            select(Listing.id, Listing.source_s3_key, Listing.settings_json).order_by(Listing.created_at.desc()).limit(limit)
+        )
+        rows = res.all()
+    written = 0
+    for listing_id, key, settings in rows:
+        label = (settings or {}).get("garment_type")
+        if label not in LABELS or not key:
+            continue
+        data, _ = await asyncio.to_thread(get_object_bytes, key)
+        (target / label).mkdir(parents=True, exist_ok=True)
+        (target / label / f"{listing_id}{Path(key).suffix or '.png'}").write_bytes(data)
+        written += 1
+    return written
+
+
+def _featurize(samples: list[tuple[bytes, str]]) -> tuple[list[tuple[list[float], str]], int]:
+    featurized = []
+    rejected = 0
+    for data, label in samples:
+        features = extract_features(data)
+        if features is None:
+            rejected += 1
+        else:
+            featurized.append((features, label))
+    return featurized, rejected
+
+
+def _evaluate(model, samples: list[tuple[bytes, str]], threshold: float) -> None:
+    correct = answered = answered_correct = 0
+    confusion = {actual: {predicted: 0 for predicted in LABELS} for actual in LABELS}
+    latencies: list[float] = []
+    for data, label in samples:
+        start = time.perf_counter()
+        features = extract_features(data)
+        prediction = model.predict(features) if features is not None else None
+        latencies.append(time.perf_counter() - start)
+        if prediction is None:
+            continue
+        predicted, confidence = prediction
+        confusion[label][predicted] += 1
+        correct += predicted == label
+        if confidence >= threshold:
+            answered += 1
+            answered_correct += predicted == label
+    total = len(samples)
+    latencies.sort()
+    print(f"  accuracy (all images)      {correct / total:6.1%}  ({correct}/{total})")
+    print(f"  coverage at >= {threshold:.2f}        {answered / total:6.1%}  ({answered}/{total} answered locally)")
+    if answered:
+        print(f"  accuracy when answered     {answered_correct / answered:6.1%}")
+    print(
+        f"  latency per image          p50={statistics.median(latencies) * 1000:.1f} ms  "
+        f"p95={latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms"
+    )
+    print("  confusion (rows=actual)    " + "  ".join(f"{label:>6}" for label in LABELS))
+    for actual in LABELS:
+        print(f"    {actual:<24}" + "  ".join(f"{confusion[actual][p]:>6}" for p in LABELS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, help="directory with top/, bottom/ and full/ subfolders")
+    parser.add_argument("--per-label", type=int, default=80, help="synthetic images per label and split")
+    parser.add_argument("--holdout", type=float, default=0.4, help="share of --fixtures kept for evaluation")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--write-model", action="store_true", help=f"save weights to {DEFAULT_MODEL_PATH.name}")
+    parser.add_argument("--export-listings", type=Path, metavar="DIR")
+    parser.add_argument("--limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.export_listings:
+        written = asyncio.run(export_listings(args.export_listings, args.limit))
+        print(f"exported {written} labeled listing images to {args.export_listings}")
+        return
+
+    if args.fixtures:
+        samples = load_fixtures(args.fixtures)
+        random.Random(0).shuffle(samples)
+        cut = int(len(samples) * (1 - args.holdout))
+        train, test = samples[:cut], samples[cut:]
+        source = str(args.fixtures)
+    else:
+        train = synthetic_fixtures(args.per_label, seed=1)
+        test = synthetic_fixtures(args.per_label, seed=2)
+        source = "synthetic silhouettes"
+
+    featurized, rejected = _featurize(train)
+    start = time.perf_counter()
+    model = train_model(featurized)
+    print(f"trained on {len(featurized)} images from {source} ({rejected} not segmentable) in {time.perf_counter() - start:.1f} s")
+    print(f"held-out set: {len(test)} images")
+    _evaluate(model, test, args.threshold)
+    if args.write_model:
+        DEFAULT_MODEL_PATH.write_text(model.to_json() + "\n")
+        garment_precheck.load_model.cache_clear()
+        print(f"wrote {DEFAULT_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare server-side normalization cost for JPEG and HEIC uploads.
+
+Run with ``python -m backend.benchmarks.image_normalization``. Sources are
+synthetic phone-sized photos so results are reproducible without fixtures.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from backend.services.imaging import (
+    HEIF_SUPPORTED,
+    normalize_image_to_png,
+    normalize_image_to_png_async,
+)
+
+
+def _synthetic_photo(size: tuple[int, int]) -> Image.Image:
+    img = Image.new("RGB", size, color=(205, 200, 190))
+    draw = ImageDraw.Draw(img)
+    width, height = size
+    for i in range(0, width, max(1, width // 40)):
+        draw.line([(i, 0), (width - i, height)], fill=(i % 255, 80, 160), width=6)
+    draw.ellipse([width // 4, height // 4, 3 * width // 4, 3 * height // 4], fill=(30, 60, 120))
+    return img
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def _time_sync(data: bytes, max_px: int, rounds: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        normalize_image_to_png(data, max_px=max_px)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def _time_pool(data: bytes, max_px: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(normalize_image_to_png_async(data, max_px=max_px) for _ in range(concurrency))
+    )
+    return time.perf_counter() - start
+
+
+def _report(label: str, size_bytes: int, samples: list[float], pool_elapsed: float, concurrency: int) -> None:
+    print(
+        f"{label:<5} input={size_bytes / 1024:8.1f} KiB  "
+        f"median={statistics.median(samples) * 1000:7.1f} ms  "
+        f"p95={sorted(samples)[int(0.95 * (len(samples) - 1))] * 1000:7.1f} ms  "
+        f"pool x{concurrency}={pool_elapsed * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--max-px", type=int, default=2048)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    photo = _synthetic_photo((args.width, args.height))
+    formats = ["JPEG"] + (["HEIF"] if HEIF_SUPPORTED else [])
+    print(f"source {args.width}x{args.height} -> max {args.max_px}px, {args.rounds} rounds")
+    for fmt in formats:
+        data = _encode(photo, fmt)
+        samples = _time_sync(data, args.max_px, args.rounds)
+        pool_elapsed = asyncio.run(_time_pool(data, args.max_px, args.concurrency))
+        _report(fmt, len(data), samples, pool_elapsed, args.concurrency)
+    if not HEIF_SUPPORTED:
+        print("HEIF skipped: pillow-heif not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Synthetic flat-lay garment silhouettes for the garment-type pre-classifier.
+
+:mod:`backend.benchmarks.garment_preclassifier` trains and evaluates on these
+when no labeled fixture directory is given, and the pre-classifier tests reuse
+them. Each image is a top, bottom or full-length garment with random
+proportions, colours, tilt, blur and noise on a plain background.
+"""
+from __future__ import annotations
+
+from io import BytesIO
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from backend.services.garment_precheck import LABELS
+
+_CANVAS = (576, 768)
+
+
+def _tilted(img: Image.Image, rng: random.Random, background: tuple[int, int, int]) -> Image.Image:
+    return img.rotate(rng.uniform(-6, 6), resample=Image.BILINEAR, fillcolor=background)
+
+
+def _draw_top(draw: ImageDraw.ImageDraw, rng: random.Random, cx: float, cy: float, s: float, fill) -> None:
+    torso_w, torso_h = s * rng.uniform(0.55, 0.7), s * rng.uniform(0.65, 0.85)
+    x0, y0 = cx - torso_w / 2, cy - torso_h / 2
+    draw.rectangle([x0, y0, x0 + torso_w, y0 + torso_h], fill=fill)
+    style = rng.choice(("short", "long", "tank"))
+    if style == "tank":
+        strap = torso_w * 0.18
+        draw.rectangle([x0 + strap * 0.6, y0 - s * 0.12, x0 + strap * 1.6, y0], fill=fill)
+        draw.rectangle([x0 + torso_w - strap * 1.6, y0 - s * 0.12, x0 + torso_w - strap * 0.6, y0], fill=fill)
+        return
+    length = s * (rng.uniform(0.22, 0.32) if style == "short" else rng.uniform(0.6, 0.75))
+    drop = rng.uniform(0.3, 0.9)
+    for side in (-1, 1):
+        shoulder = (cx + side * torso_w / 2, y0)
+        armpit = (cx + side * torso_w / 2, y0 + torso_h * 0.3)
+        tip = (shoulder[0] + side * length, y0 + length * drop)
+        draw.polygon([shoulder, (tip[0], tip[1] - s * 0.12), (tip[0], tip[1] + s * 0.02), armpit], fill=fill)
+
+
+def _draw_legs(draw, rng, cx, y0, waist_w, length, s, fill) -> None:
+    draw.rectangle([cx - waist_w / 2, y0, cx + waist_w / 2, y0 + s * 0.12], fill=fill)
+    gap = waist_w * rng.uniform(0.06, 0.14)
+    flare = waist_w * rng.uniform(-0.05, 0.1)
+    for side in (-1, 1):
+        inner = cx + side * gap / 2
+        outer = cx + side * waist_w / 2
+        draw.polygon(
+            [
+                (outer, y0),
+                (cx, y0),
+                (cx, y0 + s * 0.2),
+                (inner, y0 + length),
+                (outer + side * flare, y0 + length),
+            ],
+            fill=fill,
+        )
+
+
+def _draw_bottom(draw, rng, cx, cy, s, fill) -> None:
+    waist_w = s * rng.uniform(0.45, 0.6)
+    style = rng.choice(("trousers", "shorts", "skirt"))
+    if style == "skirt":
+        length = s * rng.uniform(0.4, 0.8)
+        hem = waist_w * rng.uniform(1.1, 1.5)
+        y0 = cy - length / 2
+        draw.polygon(
+            [(cx - waist_w / 2, y0), (cx + waist_w / 2, y0), (cx + hem / 2, y0 + length), (cx - hem / 2, y0 + length)],
+            fill=fill,
+        )
+        return
+    length = s * (rng.uniform(1.1, 1.5) if style == "trousers" else rng.uniform(0.45, 0.6))
+    _draw_legs(draw, rng, cx, cy - length / 2, waist_w, length, s, fill)
+
+
+def _draw_full(draw, rng, cx, cy, s, fill) -> None:
+    bodice_w = s * rng.uniform(0.4, 0.55)
+    style = rng.choice(("dress", "dress", "jumpsuit"))
+    total = s * rng.uniform(1.4, 1.8)
+    y0 = cy - total / 2
+    bodice_h = total * rng.uniform(0.3, 0.4)
+    if rng.random() < 0.5:
+        for side in (-1, 1):
+            shoulder = (cx + side * bodice_w / 2, y0)
+            tip = (shoulder[0] + side * s * rng.uniform(0.15, 0.5), y0 + s * rng.uniform(0.2, 0.45))
+            draw.polygon([shoulder, tip, (tip[0], tip[1] + s * 0.1), (shoulder[0], y0 + s * 0.2)], fill=fill)
+    draw.rectangle([cx - bodice_w / 2, y0, cx + bodice_w / 2, y0 + bodice_h], fill=fill)
+    if style == "jumpsuit":
+        _draw_legs(draw, rng, cx, y0 + bodice_h, bodice_w * 1.05, total - bodice_h, s, fill)
+        return
+    hem = bodice_w * rng.uniform(1.3, 2.2)
+    draw.polygon(
+        [
+            (cx - bodice_w / 2, y0 + bodice_h),
+            (cx + bodice_w / 2, y0 + bodice_h),
+            (cx + hem / 2, y0 + total),
+            (cx - hem / 2, y0 + total),
+        ],
+        fill=fill,
+    )
+
+
+def synthetic_garment(label: str, rng: random.Random) -> bytes:
+    """Draw one flat-lay garment of class ``label`` and return it as PNG bytes."""
+
+    background = tuple(rng.randint(200, 250) for _ in range(3))
+    fill = tuple(rng.randint(10, 150) for _ in range(3))
+    img = Image.new("RGB", _CANVAS, color=background)
+    draw = ImageDraw.Draw(img)
+    cx = _CANVAS[0] / 2 + rng.uniform(-30, 30)
+    cy = _CANVAS[1] / 2 + rng.uniform(-30, 30)
+    scale = rng.uniform(220, 310)
+    {"top": _draw_top, "bottom": _draw_bottom, "full": _draw_full}[label](draw, rng, cx, cy, scale, fill)
+    img = _tilted(img, rng, background).filter(ImageFilter.BoxBlur(rng.uniform(0, 1.5)))
+    noise = Image.effect_noise((_CANVAS[0] // 4, _CANVAS[1] // 4), rng.uniform(20, 60)).resize(_CANVAS).convert("RGB")
+    img = Image.blend(img, noise, 0.08)
+    buf = BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def synthetic_fixtures(per_label: int, seed: int) -> list[tuple[bytes, str]]:
+    """``per_label`` labeled garments of every class, drawn reproducibly from ``seed``."""
+
+    rng = random.Random(seed)
+    return [(synthetic_garment(label, rng), label) for label in LABELS for _ in range(per_label)]
@@ -0,0 +1,97 @@
+"""Compare the admin usage overview before and after set-based summaries.
+
+Run with ``python -m backend.benchmarks.usage_summaries``. Users, subscriptions
+and counters are seeded into in-memory SQLite. Each Polar meter call is simulated
+with a fixed latency: the per-user loop made one inline call per user, while
+the bulk path reads the snapshot cache.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from backend.db import Subscription, SubscriptionPlan, UsageCounter
+from backend.services import meter_cache, usage
+from backend.services.meter_cache import MeterSnapshot
+from backend.tests.querycount import QueryRecorder
+
+
+def _seed(recorder: QueryRecorder, users: int) -> list[str]:
+    now = datetime.utcnow()
+    rows: list[object] = [SubscriptionPlan(id="plan-pro", name="Pro", allowance=100)]
+    user_ids = [f"user-{idx}" for idx in range(users)]
+    for idx, user_id in enumerate(user_ids):
+        start = now - timedelta(days=idx % 28)
+        rows.append(
+            Subscription(
+                id=f"sub-{idx}",
+                user_id=user_id,
+                status="active",
+                plan_id="plan-pro",
+                current_period_start=start,
+                current_period_end=start + timedelta(days=30),
+            )
+        )
+        rows.append(UsageCounter(user_id=user_id, period_start=start, period_end=start + timedelta(days=30), used=idx % 100))
+    recorder.seed(*rows)
+    return user_ids
+
+
+async def _per_user(user_ids: list[str], polar_latency: float) -> None:
+    # The implementation this benchmark replaced: three queries and one Polar call per user.
+    async with usage.db_session() as session:
+        for user_id in user_ids:
+            subscription = await usage._select_subscription(session, user_id)
+            plan = await session.get(SubscriptionPlan, subscription.plan_id) if subscription and subscription.plan_id else None
+            counter = await usage._ensure_usage_record(session, user_id, subscription)
+            usage._build_summary(user_id, subscription, plan, counter.used if counter else 0)
+            await asyncio.sleep(polar_latency)
+
+
+async def _measure(recorder: QueryRecorder, fn) -> tuple[float, int]:
+    with recorder.recording() as statements:
+        start = time.perf_counter()
+        await fn()
+        elapsed = time.perf_counter() - start
+    return elapsed, len(statements)
+
+
+async def _run(users: int, polar_latency: float, skip_per_user: bool) -> None:
+    recorder = QueryRecorder()
+    user_ids = _seed(recorder, users)
+    now = time.time()
+    with recorder.patched(usage), patch.object(meter_cache, "_schedule_refresh", lambda user_id: None):
+        meter_cache._local.clear()
+        cold = await _measure(recorder, lambda: usage.get_usage_summaries(user_ids))
+        for user_id in user_ids:
+            meter_cache._local[user_id] = MeterSnapshot(consumed=1, credited=100, balance=99, fetched_at=now)
+        warm = await _measure(recorder, lambda: usage.get_usage_summaries(user_ids))
+        legacy = None if skip_per_user else await _measure(recorder, lambda: _per_user(user_ids, polar_latency))
+    recorder.dispose()
+
+    def fmt(label: str, result: tuple[float, int] | None) -> str:
+        if result is None:
+            return f"{label:<12} skipped"
+        return f"{label:<12} {result[0] * 1000:10.1f} ms  {result[1]:6d} queries"
+
+    print(f"{users} users (Polar latency {polar_latency * 1000:.0f} ms per call)")
+    print("  " + fmt("per-user", legacy))
+    print("  " + fmt("bulk, cold", cold))
+    print("  " + fmt("bulk, cached", warm))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--polar-latency-ms", type=float, default=5.0)
+    parser.add_argument("--skip-per-user", action="store_true", help="only time the bulk path")
+    args = parser.parse_args()
+    for users in args.users:
+        asyncio.run(_run(users, args.polar_latency_ms / 1000, args.skip_per_user))
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,8 @@ def create_celery_app() -> Celery:
         enable_utc=True,
         result_expires=int(os.getenv("CELERY_RESULT_EXPIRES", "3600")),
         task_always_eager=_env_bool("CELERY_TASK_ALWAYS_EAGER"),
+        # Lets the pose job status endpoint tell running tasks from queued ones.
+        task_track_started=True,
         task_eager_propagates=True,
     )
 
@@ -23,17 +23,46 @@ def _env_float(name: str, default: float) -> float:
 
 
 MODEL = os.getenv("GENAI_MODEL", "gemini-2.5-flash-image-preview")
+# Text-only calls that need structured JSON output (the image model does not support it).
+GENAI_TEXT_MODEL = os.getenv("GENAI_TEXT_MODEL", "gemini-2.5-flash").strip() or "gemini-2.5-flash"
 API_KEY = os.getenv("GOOGLE_API_KEY", "")
 GARMENT_TYPE_CLASSIFY = os.getenv("GARMENT_TYPE_CLASSIFY", "1").strip().lower() not in ("0", "false", "no")
+GARMENT_PRECLASSIFY = os.getenv("GARMENT_PRECLASSIFY", "0").strip().lower() in ("1", "true", "yes")
+GARMENT_PRECLASSIFY_THRESHOLD = min(1.0, max(0.34, _env_float("GARMENT_PRECLASSIFY_THRESHOLD", 0.9)))
+GARMENT_PRECLASSIFY_MODEL = os.getenv("GARMENT_PRECLASSIFY_MODEL", "").strip()
+# Max differing bits between perceptual hashes still treated as the same photo; -1 disables.
+GARMENT_PHASH_MAX_DISTANCE = min(16, max(-1, _env_int("GARMENT_PHASH_MAX_DISTANCE", 10)))
+# Descriptions state details a look-alike photo can get wrong, so reuse needs a much closer match; -1 disables.
+DESCRIPTION_REUSE_MAX_DISTANCE = min(4, max(-1, _env_int("DESCRIPTION_REUSE_MAX_DISTANCE", 2)))
 GARMENT_TYPE_TTL_SECONDS = _env_int("GARMENT_TYPE_TTL_SECONDS", 86400)
 REDIS_URL = os.getenv("REDIS_URL", "").strip()
 GARMENT_TYPE_CACHE_VERSION = os.getenv("GARMENT_TYPE_CACHE_VERSION", "v1").strip() or "v1"
 GARMENT_TYPE_CACHE_PREFIX = os.getenv("GARMENT_TYPE_CACHE_PREFIX", "garment_type").strip() or "garment_type"
+GARMENT_TYPE_CACHE_MAX_ENTRIES = max(1, _env_int("GARMENT_TYPE_CACHE_MAX_ENTRIES", 10_000))
 GARMENT_TYPE_LOCK_TTL_SECONDS = max(1, _env_int("GARMENT_TYPE_LOCK_TTL_SECONDS", 30))
 GARMENT_TYPE_LOCK_WAIT_SECONDS = max(0.5, _env_float("GARMENT_TYPE_LOCK_WAIT_SECONDS", 5.0))
+GARMENT_TYPE_THUMBNAIL_PX = max(0, _env_int("GARMENT_TYPE_THUMBNAIL_PX", 384))
+GARMENT_TYPE_THUMBNAIL_QUALITY = min(95, max(30, _env_int("GARMENT_TYPE_THUMBNAIL_QUALITY", 85)))
 REDIS_OP_TIMEOUT_SECONDS = max(0.1, _env_float("REDIS_OP_TIMEOUT_SECONDS", 0.5))
 REDIS_OPERATION_RETRIES = max(0, _env_int("REDIS_OPERATION_RETRIES", 1))
 REDIS_RETRY_BACKOFF_SECONDS = max(5.0, _env_float("REDIS_RETRY_BACKOFF_SECONDS", 60.0))
+IMAGE_NORMALIZE_WORKERS = max(1, _env_int("IMAGE_NORMALIZE_WORKERS", min(4, os.cpu_count() or 1)))
+IMAGE_MAX_PIXELS = max(1, _env_int("IMAGE_MAX_PIXELS", 50_000_000))
+IMAGE_MAX_ASPECT_RATIO = max(1.0, _env_float("IMAGE_MAX_ASPECT_RATIO", 10.0))
+IMAGE_MAX_FRAMES = max(1, _env_int("IMAGE_MAX_FRAMES", 16))
+ENV_POOL_SIZE = max(0, _env_int("ENV_POOL_SIZE", 0))
+ENV_POOL_LOW_WATERMARK = min(ENV_POOL_SIZE, max(0, _env_int("ENV_POOL_LOW_WATERMARK", ENV_POOL_SIZE // 2)))
+ENV_POOL_REFILL_INTERVAL_SECONDS = max(5, _env_int("ENV_POOL_REFILL_INTERVAL_SECONDS", 300))
+ENV_SOURCE_CACHE_TTL_SECONDS = max(1, _env_int("ENV_SOURCE_CACHE_TTL_SECONDS", 300))
+ENV_SOURCE_NO_REPEAT = max(0, _env_int("ENV_SOURCE_NO_REPEAT", 3))
+LISTING_EAGER_CLASSIFY = os.getenv("LISTING_EAGER_CLASSIFY", "1").strip().lower() not in ("0", "false", "no")
+LIST_PAGE_SIZE_MAX = max(1, _env_int("LIST_PAGE_SIZE_MAX", 200))
+LIST_PAGE_SIZE_DEFAULT = min(LIST_PAGE_SIZE_MAX, max(1, _env_int("LIST_PAGE_SIZE_DEFAULT", 50)))
+QUOTA_RESERVATION_TTL_SECONDS = max(30, _env_int("QUOTA_RESERVATION_TTL_SECONDS", 600))
+USAGE_OUTBOX_BATCH_SIZE = max(1, _env_int("USAGE_OUTBOX_BATCH_SIZE", 100))
+USAGE_OUTBOX_FLUSH_INTERVAL_SECONDS = max(0.5, _env_float("USAGE_OUTBOX_FLUSH_INTERVAL_SECONDS", 5.0))
+WEBHOOK_INBOX_BATCH_SIZE = max(1, _env_int("WEBHOOK_INBOX_BATCH_SIZE", 50))
+WEBHOOK_INBOX_POLL_INTERVAL_SECONDS = max(0.1, _env_float("WEBHOOK_INBOX_POLL_INTERVAL_SECONDS", 1.0))
 
 _POLAR_API_BASE_RAW = os.getenv("POLAR_API_BASE", "https://api.polar.sh/v1").strip()
 POLAR_API_BASE = _POLAR_API_BASE_RAW.rstrip("/") or "https://api.polar.sh/v1"
@@ -42,6 +71,9 @@ POLAR_ORG_ID = os.getenv("POLAR_ORG_ID", "").strip()
 POLAR_WEBHOOK_SECRET = os.getenv("POLAR_WEBHOOK_SECRET", "").strip()
 POLAR_USAGE_EVENT_NAME = os.getenv("POLAR_USAGE_EVENT_NAME", "app.usage").strip()
 POLAR_USAGE_METER_ID = os.getenv("POLAR_USAGE_METER_ID", "").strip()
+POLAR_METER_CACHE_TTL_SECONDS = max(1, _env_int("POLAR_METER_CACHE_TTL_SECONDS", 30))
+POLAR_METER_STALE_SECONDS = max(POLAR_METER_CACHE_TTL_SECONDS, _env_int("POLAR_METER_STALE_SECONDS", 600))
+POLAR_PLAN_CACHE_TTL_SECONDS = max(10, _env_int("POLAR_PLAN_CACHE_TTL_SECONDS", 300))
 
 _env_origins = os.getenv("CORS_ALLOW_ORIGINS", "*")
 CORS_ALLOW_ORIGINS: List[str] = [o.strip() for o in _env_origins.split(",") if o.strip()]
@@ -51,22 +83,51 @@ LOGGER = logging.getLogger("uvicorn.error")
 __all__ = [
     "API_KEY",
     "CORS_ALLOW_ORIGINS",
+    "DESCRIPTION_REUSE_MAX_DISTANCE",
+    "ENV_POOL_LOW_WATERMARK",
+    "ENV_POOL_REFILL_INTERVAL_SECONDS",
+    "ENV_POOL_SIZE",
+    "ENV_SOURCE_CACHE_TTL_SECONDS",
+    "ENV_SOURCE_NO_REPEAT",
+    "GARMENT_PHASH_MAX_DISTANCE",
+    "GARMENT_PRECLASSIFY",
+    "GARMENT_PRECLASSIFY_MODEL",
+    "GARMENT_PRECLASSIFY_THRESHOLD",
+    "GARMENT_TYPE_CACHE_MAX_ENTRIES",
     "GARMENT_TYPE_CACHE_PREFIX",
     "GARMENT_TYPE_CACHE_VERSION",
     "GARMENT_TYPE_CLASSIFY",
     "GARMENT_TYPE_LOCK_TTL_SECONDS",
     "GARMENT_TYPE_LOCK_WAIT_SECONDS",
+    "GARMENT_TYPE_THUMBNAIL_PX",
+    "GARMENT_TYPE_THUMBNAIL_QUALITY",
     "GARMENT_TYPE_TTL_SECONDS",
+    "GENAI_TEXT_MODEL",
+    "IMAGE_MAX_ASPECT_RATIO",
+    "IMAGE_MAX_FRAMES",
+    "IMAGE_MAX_PIXELS",
+    "IMAGE_NORMALIZE_WORKERS",
+    "LISTING_EAGER_CLASSIFY",
+    "LIST_PAGE_SIZE_DEFAULT",
+    "LIST_PAGE_SIZE_MAX",
     "LOGGER",
     "MODEL",
     "POLAR_API_BASE",
+    "POLAR_METER_CACHE_TTL_SECONDS",
+    "POLAR_METER_STALE_SECONDS",
     "POLAR_OAT",
     "POLAR_ORG_ID",
+    "POLAR_PLAN_CACHE_TTL_SECONDS",
     "POLAR_WEBHOOK_SECRET",
     "POLAR_USAGE_EVENT_NAME",
     "POLAR_USAGE_METER_ID",
+    "QUOTA_RESERVATION_TTL_SECONDS",
     "REDIS_OP_TIMEOUT_SECONDS",
     "REDIS_OPERATION_RETRIES",
     "REDIS_RETRY_BACKOFF_SECONDS",
     "REDIS_URL",
+    "USAGE_OUTBOX_BATCH_SIZE",
+    "USAGE_OUTBOX_FLUSH_INTERVAL_SECONDS",
+    "WEBHOOK_INBOX_BATCH_SIZE",
+    "WEBHOOK_INBOX_POLL_INTERVAL_SECONDS",
 ]
@@ -68,6 +68,24 @@ async def get_redis_client() -> Any | None:
         return _redis_client
 
 
+async def redis_execute(fn):
+    """Run ``fn()`` with the configured per-operation timeout and retries."""
+
+    attempts = max(1, REDIS_OPERATION_RETRIES + 1)
+    last_exc: Exception | None = None
+    for attempt in range(attempts):
+        try:
+            return await asyncio.wait_for(fn(), timeout=REDIS_OP_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, Exception) as exc:
+            last_exc = exc
+            if attempt >= attempts - 1:
+                raise
+            await asyncio.sleep(min(0.2, 0.05 * (attempt + 1)))
+    if last_exc is not None:
+        raise last_exc
+    return None
+
+
 async def record_redis_failure(exc: Exception) -> None:
     """Invalidate the active Redis client following an operational error."""
 
@@ -97,4 +115,10 @@ async def close_redis_client() -> None:
             pass
 
 
-__all__ = ["close_redis_client", "get_redis_client", "record_redis_failure", "redis_asyncio"]
+__all__ = [
+    "close_redis_client",
+    "get_redis_client",
+    "record_redis_failure",
+    "redis_asyncio",
+    "redis_execute",
+]
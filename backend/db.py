@@ -4,7 +4,7 @@ from typing import AsyncIterator
 
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Boolean, JSON, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy import Boolean, JSON, Index, Integer, String, Text, DateTime, UniqueConstraint, text
 from datetime import datetime
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -27,9 +27,16 @@ class Generation(Base):
     pose: Mapped[str] = mapped_column(String(64), nullable=False)
     prompt: Mapped[str] = mapped_column(Text, nullable=False)
     options_json: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Denormalized from options_json["user_id"] so per-user grids can use an index.
+    user_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     model: Mapped[str] = mapped_column(String(128), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("ix_generations_user_pose_created_id", "user_id", "pose", "created_at", "id"),
+        Index("ix_generations_pose_created", "pose", "created_at"),
+    )
+
 
 class EnvSource(Base):
     __tablename__ = "env_sources"
@@ -38,6 +45,22 @@ class EnvSource(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
 
+# Ready-made environment images generated ahead of demand for /env/random.
+class EnvPoolImage(Base):
+    __tablename__ = "env_pool_images"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    style: Mapped[str] = mapped_column(String(64), nullable=False)
+    s3_key: Mapped[str] = mapped_column(String(512), nullable=False, unique=True)
+    source_s3_key: Mapped[str] = mapped_column(String(512), nullable=False)
+    prompt: Mapped[str] = mapped_column(Text, nullable=False)
+    model: Mapped[str] = mapped_column(String(128), nullable=False)
+    claimed_by: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_env_pool_images_available", "style", "claimed_at", "created_at"),)
+
+
 class ModelDefault(Base):
     __tablename__ = "model_defaults"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -77,6 +100,21 @@ class PoseDescription(Base):
     description: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (Index("ix_pose_descriptions_created_id", "created_at", "id"),)
+
+
+class PoseDescriptionJob(Base):
+    """A ``/pose/describe`` batch; per-key progress is read from Celery and ``pose_descriptions``."""
+
+    __tablename__ = "pose_description_jobs"
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    s3_keys: Mapped[list] = mapped_column(JSON, nullable=False)
+    # Celery task id per S3 key; null when the batch runs inline on an API worker.
+    task_ids: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_pose_description_jobs_created", "created_at"),)
+
 
 class ProductDescription(Base):
     __tablename__ = "product_descriptions"
@@ -89,6 +127,8 @@ class ProductDescription(Base):
     size: Mapped[str] = mapped_column(String(64), nullable=True)
     condition: Mapped[str] = mapped_column(String(256), nullable=True)
     description: Mapped[str] = mapped_column(Text, nullable=False)
+    # Hex ImageSignature of the source, for reusing the text on near-identical uploads.
+    image_signature: Mapped[str] = mapped_column(String(128), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
 
@@ -114,6 +154,9 @@ class Listing(Base):
     cover_s3_key: Mapped[str | None] = mapped_column(String(512), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
+    # Serves keyset pagination of a user's listings on (created_at, id).
+    __table_args__ = (Index("ix_listings_user_created_id", "user_id", "created_at", "id"),)
+
 
 class ListingImage(Base):
     __tablename__ = "listing_images"
@@ -180,6 +223,83 @@ class UsageCounter(Base):
     __table_args__ = (UniqueConstraint("user_id", "period_start", name="uq_usage_counters_period"),)
 
 
+class UsageEvent(Base):
+    """Append-only ledger of quota charges; ``usage_counters`` holds the per-period totals."""
+
+    __tablename__ = "usage_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    action: Mapped[str] = mapped_column(String(64), nullable=False)
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    generation_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    period_start: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_usage_events_user_created", "user_id", "created_at"),
+        Index("ix_usage_events_created_action", "created_at", "action"),
+    )
+
+
+class UsageReservation(Base):
+    """Quota held by an in-flight generation when Redis is unavailable."""
+
+    __tablename__ = "usage_reservations"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_usage_reservations_user_expires", "user_id", "expires_at"),)
+
+
+class UsageEventOutbox(Base):
+    """Polar usage event written with the quota charge and sent by the outbox flusher."""
+
+    __tablename__ = "usage_event_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Sent to Polar in the event metadata so a redelivered batch can be deduplicated.
+    event_id: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    payload_json: Mapped[dict] = mapped_column(JSON, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Earliest time the row may be (re)sent; pushed forward as a lease while a flusher holds it.
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_usage_event_outbox_pending", "sent_at", "next_attempt_at", "id"),)
+
+
+class WebhookInbox(Base):
+    """Verified Polar webhook waiting for (or done with) background processing."""
+
+    __tablename__ = "webhook_inbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # ``webhook-id`` header; Polar reuses it on redelivery, so duplicates are dropped on insert.
+    webhook_id: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+    event_type: Mapped[str] = mapped_column(String(64), nullable=False)
+    # Events for one subscription are applied in arrival order.
+    subscription_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    payload_json: Mapped[dict] = mapped_column(JSON, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_webhook_inbox_pending", "processed_at", "next_attempt_at", "id"),
+        Index("ix_webhook_inbox_subscription", "subscription_id", "id"),
+    )
+
+
 _engine: AsyncEngine | None = None
 _SessionFactory: sessionmaker | None = None
 
@@ -200,6 +320,25 @@ def get_sessionmaker() -> sessionmaker:
     return _SessionFactory
 
 
+def reset_engine() -> None:
+    """Forget an engine inherited across ``fork`` without closing the parent's connections."""
+
+    global _engine, _SessionFactory
+    if _engine is not None:
+        _engine.sync_engine.dispose(close=False)
+    _engine = None
+    _SessionFactory = None
+
+
+async def dispose_engine() -> None:
+    """Close pooled connections; must run on the event loop that opened them."""
+
+    global _engine, _SessionFactory
+    engine, _engine, _SessionFactory = _engine, None, None
+    if engine is not None:
+        await engine.dispose()
+
+
 @asynccontextmanager
 async def db_session() -> AsyncIterator[AsyncSession]:
     session = get_sessionmaker()()
@@ -213,7 +352,93 @@ async def db_session() -> AsyncIterator[AsyncSession]:
         await session.close()
 
 
+# Postgres advisory lock ids, kept in one place so they cannot collide. The
+# single-key ids guard jobs that only one worker should run at a time. Per-user
+# locks take the two-key form (USAGE_LOCK_CLASS, hashtext(user_id)); Postgres
+# keeps one-key and two-key locks in separate key spaces.
+BACKFILL_LOCK_ID = 0x6765_6E75  # "genu": generations.user_id backfill
+ENV_POOL_FILL_LOCK_ID = 0x656E_7670  # "envp": env pool refill
+INDEX_BUILD_LOCK_ID = 0x6964_7872  # "idxr": concurrent index builds
+USAGE_LOCK_CLASS = 0x7573_6167  # "usag": per-user quota holds
+
+
+@asynccontextmanager
+async def try_advisory_lock(lock_id: int) -> AsyncIterator[bool]:
+    """Hold a Postgres session-level advisory lock for the duration of the block.
+
+    Yields ``False`` without waiting when another session holds the lock, so
+    callers can skip work another worker is already doing. Other dialects have
+    no cross-process lock and always yield ``True``.
+    """
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    async with engine.connect() as conn:
+        acquired = bool((await conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id})).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+
+
+# create_all only creates missing tables (with their indexes), so columns and
+# indexes added to existing tables are applied here. Every statement is idempotent.
+_POSTGRES_UPGRADES: tuple[str, ...] = (
+    "ALTER TABLE generations ADD COLUMN IF NOT EXISTS user_id VARCHAR(128)",
+    "ALTER TABLE product_descriptions ADD COLUMN IF NOT EXISTS image_signature VARCHAR(128)",
+)
+# CONCURRENTLY cannot run inside a transaction; it avoids blocking writes on large tables.
+_POSTGRES_CONCURRENT_INDEXES: tuple[tuple[str, str], ...] = (
+    ("ix_generations_user_pose_created_id", "generations (user_id, pose, created_at, id)"),
+    ("ix_generations_pose_created", "generations (pose, created_at)"),
+    ("ix_listings_user_created_id", "listings (user_id, created_at, id)"),
+    ("ix_pose_descriptions_created_id", "pose_descriptions (created_at, id)"),
+)
+# Superseded by an index above; dropped once the replacement is built.
+_POSTGRES_REPLACED_INDEXES: tuple[str, ...] = ("ix_generations_user_pose_created",)
+
+
+async def _build_concurrent_indexes() -> None:
+    """Create missing indexes and rebuild ones a failed ``CONCURRENTLY`` build left invalid.
+
+    Indexes listed in ``_POSTGRES_REPLACED_INDEXES`` are dropped afterwards.
+    Workers that start while another one holds the lock skip the build.
+    """
+
+    async with try_advisory_lock(INDEX_BUILD_LOCK_ID) as acquired:
+        if not acquired:
+            return
+        async with get_engine().connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for name, target in _POSTGRES_CONCURRENT_INDEXES:
+                valid = (
+                    await conn.execute(
+                        text(
+                            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                            "WHERE c.relname = :name"
+                        ),
+                        {"name": name},
+                    )
+                ).scalar()
+                if valid:
+                    continue
+                if valid is not None:
+                    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}"))
+            for name in _POSTGRES_REPLACED_INDEXES:
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
 async def init_db() -> None:
     engine = get_engine()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.begin() as conn:
+        for statement in _POSTGRES_UPGRADES:
+            await conn.execute(text(statement))
+    await _build_concurrent_indexes()
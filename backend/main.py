@@ -1,16 +1,30 @@
 """FastAPI application entrypoint."""
 from __future__ import annotations
 
+import asyncio
 import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.config import CORS_ALLOW_ORIGINS, LOGGER, POLAR_OAT, POLAR_WEBHOOK_SECRET, REDIS_URL
+from backend.config import (
+    CORS_ALLOW_ORIGINS,
+    ENV_POOL_SIZE,
+    LOGGER,
+    POLAR_OAT,
+    POLAR_WEBHOOK_SECRET,
+    REDIS_URL,
+)
 from backend.core.redis import close_redis_client, get_redis_client, redis_asyncio
 from backend.db import init_db
 from backend.routes import router as api_router
+from backend.services.env_pool import run_env_pool_filler
+from backend.services.garment import stop_result_listener
+from backend.services.generations import backfill_generation_user_ids
+from backend.services.imaging import shutdown_image_pool
 from backend.services.polar import close_polar_client
+from backend.services.usage_outbox import run_usage_outbox_flusher
+from backend.services.webhook_inbox import run_webhook_consumer
 
 app = FastAPI(title="VintedBoost Backend", version="0.1.0")
 app.add_middleware(
@@ -22,19 +36,43 @@ app.add_middleware(
 )
 app.include_router(api_router)
 
+_background_tasks: set[asyncio.Task] = set()
+_env_pool_task: asyncio.Task | None = None
+_usage_outbox_task: asyncio.Task | None = None
+_webhook_consumer_task: asyncio.Task | None = None
+
+
+async def _backfill_generation_user_ids() -> None:
+    try:
+        await backfill_generation_user_ids()
+    except Exception:
+        LOGGER.exception("generations user_id backfill failed")
+
 
 @app.on_event("startup")
 async def on_startup() -> None:
+    global _env_pool_task, _usage_outbox_task, _webhook_consumer_task
     try:
         await init_db()
         LOGGER.info("DB initialized")
     except Exception:
         LOGGER.exception("Failed to initialize DB (startup)")
         raise
+    # Runs in the background so startup is not delayed on large tables.
+    task = asyncio.create_task(_backfill_generation_user_ids())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    if ENV_POOL_SIZE > 0:
+        _env_pool_task = asyncio.create_task(run_env_pool_filler())
+        LOGGER.info("env pool filler started", extra={"target": ENV_POOL_SIZE})
     if not POLAR_OAT:
         LOGGER.warning("POLAR_OAT not configured; billing endpoints disabled")
+    else:
+        _usage_outbox_task = asyncio.create_task(run_usage_outbox_flusher())
     if not POLAR_WEBHOOK_SECRET:
         LOGGER.warning("POLAR_WEBHOOK_SECRET not configured; webhook verification disabled")
+    else:
+        _webhook_consumer_task = asyncio.create_task(run_webhook_consumer())
     if REDIS_URL and redis_asyncio is not None:
         try:
             client = await get_redis_client()
@@ -46,8 +84,13 @@ async def on_startup() -> None:
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    for task in (_env_pool_task, _usage_outbox_task, _webhook_consumer_task):
+        if task is not None:
+            task.cancel()
+    await stop_result_listener()
     await close_redis_client()
     await close_polar_client()
+    shutdown_image_pool()
 
 
 if __name__ == "__main__":
@@ -169,3 +169,93 @@ def seq_step2_concise(
     lines.append(f"Pose: {pose_line}. Garment unobstructed.")
     lines.append("Output: one photorealistic PNG; PG-13; no text/watermarks.")
     return "\n".join(lines)
+
+
+def build_env_prompt(user_prompt: Optional[str] = None) -> str:
+    """Build the Studio Environment generation instruction."""
+
+    def q(text: Optional[str]) -> str:
+        return (text or "").strip()
+
+    lines: list[str] = []
+    lines.append("TASK")
+    lines.append(
+        "Generate a new photorealistic mirror environment image for future garment try-ons. "
+        "Use the attached environment image as the reference: keep the MIRROR and its placement consistent, "
+        "but redesign the surrounding scene with tasteful variation."
+    )
+    lines.append("")
+    lines.append("HARD CONSTRAINTS")
+    lines.append("- Keep mirror frame, size, and placement consistent; do not remove it.")
+    lines.append("- Preserve basic room geometry (walls, floor) and perspective from the source image.")
+    lines.append("- Lighting must remain plausible and consistent with reflections.")
+    lines.append("- Avoid people, animals, or text overlays.")
+    lines.append("- Maintain PG-13 content.")
+    lines.append("")
+    lines.append("STYLE & CAMERA")
+    lines.append("- Mirror selfie aesthetic; natural smartphone camera vibe.")
+    lines.append("- Keep camera angle close to the source reference; minor tweaks allowed but no drastic angle changes.")
+    lines.append("- Lighting should feel realistic; soft bokeh acceptable.")
+    lines.append("")
+    lines.append("VARIATIONS")
+    lines.append(
+        "- Refresh decor, wall colors, props, and ambiance; keep mirror region recognizable."
+    )
+    lines.append("- Ensure the mirror reflection still shows a plausible empty room ready for try-ons.")
+    if q(user_prompt):
+        lines.append("")
+        lines.append("USER WISHES")
+        lines.append(f"\"{q(user_prompt)}\"")
+        lines.append("Apply only if consistent with realism and constraints above.")
+    lines.append("")
+    lines.append("NEGATIVE GUIDANCE")
+    lines.append("AI artifacts, warped mirrors, text overlays, people, over-saturated neon lighting, cluttered mess")
+    return "\n".join(lines)
+
+
+_DESCRIPTION_FORMAT = (
+    "Title: <search-optimized; use brand, item, size, color, material, 1-2 key features; MAX 100 characters>\n\n"
+    "Description:\n"
+    "- Aim for 200–400 words (MIN 50 words; keep total under 3,000 characters).\n"
+    "- Use short paragraphs and hyphen bullets for measurements and unique features.\n"
+    "- Include brand, item type, size, color, material, fit, style keywords, unique features, and any visible flaws (be honest).\n"
+    "- Include measurements ONLY if clearly inferable; otherwise omit.\n\n"
+    "Condition: <one short line; use provided condition if present>\n"
+    "Extras: <one short line like 'Open to offers; bundle discounts' or leave empty>\n\n"
+    "Rules:\n"
+    "- Plain text only; no emojis; no markdown other than hyphen bullets; no price or shipping info.\n"
+    "- Keep PG-13.\n"
+)
+
+
+def _known_fields(meta_lines: list[str]) -> str:
+    if not meta_lines:
+        return ""
+    return "\nKNOWN FIELDS (apply faithfully if present)\n" + "\n".join(meta_lines) + "\n"
+
+
+def build_description_prompt(meta_lines: list[str]) -> str:
+    """Plain-text Vinted listing description instruction."""
+
+    return (
+        "You are a helpful assistant that writes high-quality Vinted product listings from a product photo.\n"
+        "Output format EXACTLY as sections (plain text):\n"
+        + _DESCRIPTION_FORMAT
+        + _known_fields(meta_lines)
+    )
+
+
+def build_listing_profile_prompt(meta_lines: list[str]) -> str:
+    """Structured instruction returning coverage, description and attributes in one JSON object."""
+
+    return (
+        "You are a helpful assistant that prepares Vinted product listings from a product photo.\n"
+        "Return ONE JSON object with these fields:\n"
+        "- coverage: top (upper body), bottom (lower body), or full (one piece covering upper+lower like dress/jumpsuit/romper/overalls).\n"
+        "- category: short item type, e.g. jeans, t-shirt, midi dress.\n"
+        "- colors: main visible colors, most dominant first.\n"
+        "- brand: brand visible on the garment or given below; empty string if unknown.\n"
+        "- description: the full listing text, formatted EXACTLY as these plain-text sections:\n"
+        + _DESCRIPTION_FORMAT
+        + _known_fields(meta_lines)
+    )
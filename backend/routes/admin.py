@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import os
+from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Header, HTTPException, status
 from pydantic import BaseModel, Field
@@ -9,7 +10,13 @@ from sqlalchemy import func, select
 
 from backend.config import LOGGER, MODEL
 from backend.db import UsageCounter, db_session, init_db
-from backend.services.usage import get_usage_costs_mapping, get_usage_summaries, set_usage_costs
+from backend.services.env_pool import get_env_pool_status
+from backend.services.garment import get_garment_cache_stats
+from backend.services.garment_profile import get_description_reuse_stats
+from backend.services.generations import backfill_generation_user_ids
+from backend.services.usage import get_usage_costs_mapping, get_usage_report, get_usage_summaries, set_usage_costs
+from backend.services.usage_outbox import get_usage_outbox_status
+from backend.services.webhook_inbox import get_webhook_inbox_status
 
 router = APIRouter()
 
@@ -45,6 +52,51 @@ async def admin_init_db(authorization: str | None = Header(default=None, alias="
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+@router.post("/admin/backfill/generation-user-ids")
+async def admin_backfill_generation_user_ids(authorization: str | None = Header(default=None, alias="Authorization")):
+    """Admin-only endpoint to copy legacy ``options_json`` user ids onto ``generations.user_id``."""
+
+    _require_admin(authorization)
+    try:
+        updated = await backfill_generation_user_ids()
+        return {"ok": True, "updated": updated}
+    except Exception as exc:  # pragma: no cover - defensive logging
+        LOGGER.exception("Admin generation user_id backfill failed")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@router.get("/admin/env-pool")
+async def admin_env_pool(authorization: str | None = Header(default=None, alias="Authorization")):
+    """Pool depth and this worker's fill/claim metrics for pre-generated environments."""
+
+    _require_admin(authorization)
+    return {"ok": True, **(await get_env_pool_status())}
+
+
+@router.get("/admin/garment-cache")
+async def admin_garment_cache(authorization: str | None = Header(default=None, alias="Authorization")):
+    """Size and hit/miss/eviction counters of this worker's garment-type cache and description reuse."""
+
+    _require_admin(authorization)
+    return {"ok": True, **get_garment_cache_stats(), "description_reuse": get_description_reuse_stats()}
+
+
+@router.get("/admin/usage-outbox")
+async def admin_usage_outbox(authorization: str | None = Header(default=None, alias="Authorization")):
+    """Polar usage events still waiting in the outbox."""
+
+    _require_admin(authorization)
+    return {"ok": True, **(await get_usage_outbox_status())}
+
+
+@router.get("/admin/webhook-inbox")
+async def admin_webhook_inbox(authorization: str | None = Header(default=None, alias="Authorization")):
+    """Polar webhook backlog, processing lag and throughput."""
+
+    _require_admin(authorization)
+    return {"ok": True, **(await get_webhook_inbox_status())}
+
+
 class UsageCostPayload(BaseModel):
     costs: dict[str, int] = Field(..., description="Map of usage cost identifiers to integer values")
 
@@ -94,6 +146,25 @@ async def admin_usage_overview(authorization: str | None = Header(default=None,
     }
 
 
+@router.get("/admin/usage/report")
+async def admin_usage_report(
+    days: int = 30,
+    authorization: str | None = Header(default=None, alias="Authorization"),
+):
+    """Units charged per action over the last ``days`` days, from the usage ledger."""
+
+    _require_admin(authorization)
+    since = datetime.utcnow() - timedelta(days=min(max(days, 1), 366))
+    items = await get_usage_report(since)
+    return {
+        "ok": True,
+        "since": since.isoformat(),
+        "items": items,
+        "total_units": sum(item["units"] for item in items),
+        "costs": get_usage_costs_mapping(),
+    }
+
+
 @router.get("/admin/usage/costs")
 async def admin_get_usage_costs(authorization: str | None = Header(default=None, alias="Authorization")):
     _require_admin(authorization)
@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import base64
-from datetime import datetime
 from typing import Any
 
 from fastapi import APIRouter, Header, HTTPException, Request
@@ -11,7 +10,6 @@ from pydantic import BaseModel, Field
 from standardwebhooks import Webhook, WebhookVerificationError
 
 from backend.config import LOGGER, POLAR_WEBHOOK_SECRET
-from backend.db import Subscription, db_session
 from backend.services.polar import (
     PolarAPIError,
     PolarConfigurationError,
@@ -19,9 +17,9 @@ from backend.services.polar import (
     create_customer_portal_session,
     list_cached_plans,
     refresh_plan_cache,
-    upsert_plan_from_payload,
 )
 from backend.services.usage import get_usage_costs_mapping, get_usage_summary
+from backend.services.webhook_inbox import enqueue_webhook
 
 router = APIRouter()
 
@@ -37,17 +35,6 @@ class PortalRequest(BaseModel):
     return_url: str | None = Field(None, description="Optional URL to navigate to after closing the portal")
 
 
-def _parse_datetime(value: str | None) -> datetime | None:
-    if not value:
-        return None
-    try:
-        if value.endswith("Z"):
-            value = value[:-1] + "+00:00"
-        return datetime.fromisoformat(value)
-    except ValueError:
-        return None
-
-
 async def _verify_webhook(request: Request) -> dict[str, Any]:
     secret = POLAR_WEBHOOK_SECRET.strip() if POLAR_WEBHOOK_SECRET else ""
     if not secret:
@@ -78,49 +65,6 @@ async def _verify_webhook(request: Request) -> dict[str, Any]:
     raise HTTPException(status_code=400, detail="invalid signature") from last_error
 
 
-async def _handle_subscription_event(data: dict[str, Any]) -> None:
-    subscription_id = data.get("id")
-    if not subscription_id:
-        LOGGER.warning("Subscription event missing id: %s", data)
-        return
-
-    customer = data.get("customer") or {}
-    user_id = customer.get("external_id") or (data.get("metadata") or {}).get("user_id")
-    if not user_id:
-        LOGGER.warning("Subscription event missing external user id", extra={"id": subscription_id})
-        return
-
-    plan = data.get("product") or {}
-    await upsert_plan_from_payload(plan)
-
-    plan_id = data.get("product_id") or plan.get("id")
-    prices = data.get("prices") or []
-    price_id = prices[0].get("id") if prices else None
-
-    async with db_session() as session:
-        record = await session.get(Subscription, subscription_id)
-        fields = {
-            "user_id": user_id,
-            "status": data.get("status") or "unknown",
-            "plan_id": plan_id,
-            "product_id": plan_id,
-            "price_id": price_id,
-            "cancel_at_period_end": bool(data.get("cancel_at_period_end")),
-            "current_period_start": _parse_datetime(data.get("current_period_start")),
-            "current_period_end": _parse_datetime(data.get("current_period_end")),
-            "customer_id": data.get("customer_id") or customer.get("id"),
-            "customer_external_id": user_id,
-            "raw_product_json": plan,
-            "raw_subscription_json": data,
-        }
-        if record is None:
-            record = Subscription(id=subscription_id, **fields)
-            session.add(record)
-        else:
-            for key, value in fields.items():
-                setattr(record, key, value)
-
-
 @router.post("/billing/checkout")
 async def create_checkout_endpoint(request: CheckoutRequest, x_user_id: str | None = Header(default=None, alias="X-User-Id")):
     if not x_user_id:
@@ -183,16 +127,18 @@ async def usage_endpoint(x_user_id: str | None = Header(default=None, alias="X-U
 
 @router.post("/billing/webhook")
 async def webhook_endpoint(request: Request):
+    """Verify and store the webhook; ``webhook_inbox`` applies it in the background."""
+
     payload = await _verify_webhook(request)
-    event_type = payload.get("type")
-    data = payload.get("data") or {}
+    webhook_id = request.headers.get("webhook-id")
+    if not webhook_id:
+        return JSONResponse({"error": "missing webhook id"}, status_code=400)
 
     try:
-        if event_type and event_type.startswith("subscription."):
-            await _handle_subscription_event(data)
-        return {"ok": True}
+        stored = await enqueue_webhook(webhook_id, payload)
+        return {"ok": True, "duplicate": not stored}
     except Exception:  # pragma: no cover - defensive logging
-        LOGGER.exception("Failed to process Polar webhook", extra={"event_type": event_type})
+        LOGGER.exception("Failed to store Polar webhook", extra={"event_type": payload.get("type")})
         return JSONResponse({"error": "internal error"}, status_code=500)
 
 
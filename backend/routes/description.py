@@ -1,24 +1,93 @@
 """Product description endpoints."""
 from __future__ import annotations
 
-import asyncio
-from io import BytesIO
-from typing import Optional
-
 from fastapi import APIRouter, File, Form, Header, UploadFile
 from fastapi.responses import JSONResponse
-from PIL import Image
-from sqlalchemy import text
-
-from backend.config import LOGGER, MODEL
-from backend.db import ProductDescription, db_session
-from backend.services.genai import get_client, types as genai_types
+from sqlalchemy import select, text
+
+from backend.config import LOGGER
+from backend.db import Listing, ProductDescription, db_session
+from backend.prompts import build_description_prompt
+from backend.services.garment_profile import (
+    DescriptionFields,
+    GarmentProfile,
+    description_signature,
+    find_similar_description,
+    generate_garment_profile,
+)
+from backend.services.genai import first_text, genai_generate_with_retries, types as genai_types
+from backend.services.imaging import (
+    ImageDecodeError,
+    ImageLimitError,
+    SOURCE_IMAGE_MAX_PX,
+    normalize_image_to_png_async,
+    probe_upload,
+)
+from backend.services.listing_garment import apply_profile, store_description, wait_for_listing
 from backend.storage import get_object_bytes, upload_product_source_image
-from backend.utils.normalization import normalize_gender
 
 router = APIRouter()
 
 
+async def _describe(
+    image_bytes: bytes,
+    mime_type: str,
+    fields: DescriptionFields,
+    prompt_override: str | None = None,
+) -> tuple[str | None, GarmentProfile | None]:
+    """Description text, from the combined profile call unless a custom prompt is given."""
+
+    if not prompt_override:
+        profile = await generate_garment_profile(image_bytes, fields, mime_type=mime_type)
+        if profile is not None:
+            return profile.description, profile
+    instruction = prompt_override or build_description_prompt(fields.meta_lines())
+    parts = [
+        genai_types.Part.from_text(text=instruction),
+        genai_types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+    ]
+    resp = await genai_generate_with_retries(parts, attempts=1)
+    return first_text(resp), None
+
+
+async def _save_to_listing(
+    session,
+    listing_id: str,
+    user_id: str,
+    description: str,
+    profile: GarmentProfile | None,
+    fields: DescriptionFields,
+    *,
+    custom_prompt: bool = False,
+) -> None:
+    res = await session.execute(
+        select(Listing).where(Listing.id == listing_id, Listing.user_id == user_id).with_for_update()
+    )
+    listing = res.scalars().first()
+    if listing is None:
+        return
+    if profile is not None:
+        apply_profile(listing, profile, fields)
+    else:
+        store_description(listing, description, None if custom_prompt else fields.meta_lines())
+
+
+async def _stored_description(listing_id: str, user_id: str, fields: DescriptionFields) -> str | None:
+    """The listing's description if it was written for exactly these seller fields."""
+
+    async with db_session() as session:
+        res = await session.execute(
+            select(Listing.user_id, Listing.description_text, Listing.settings_json).where(Listing.id == listing_id)
+        )
+        row = res.first()
+    if not row or row[0] != user_id or not row[1]:
+        return None
+    settings = row[2] or {}
+    if settings.get("description_meta") != fields.meta_lines():
+        return None
+    return row[1]
+
+
 @router.post("/describe")
 async def generate_product_description(
     image: UploadFile = File(...),
@@ -29,117 +98,79 @@ async def generate_product_description(
     condition: str = Form(""),
     prompt_override: str | None = Form(None),
     listing_id: str | None = Form(None),
+    force: str | None = Form(None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
     try:
         if not image or not image.filename:
             return JSONResponse({"error": "image file required"}, status_code=400)
-        raw_bytes = await image.read()
-        if len(raw_bytes) > 10 * 1024 * 1024:
-            return JSONResponse({"error": "image too large (max ~10MB)"}, status_code=413)
+        fields = DescriptionFields.from_form(
+            gender=gender, brand=brand, model_name=model_name, size=size, condition=condition
+        )
+        custom_prompt = (prompt_override or "").strip() or None
+        # force=true regenerates instead of returning a stored or matching description.
+        reuse = not custom_prompt and str(force or "").lower() != "true"
+        if listing_id and x_user_id and reuse:
+            # The listing's eager task may already have written this description.
+            await wait_for_listing(listing_id)
+            stored = await _stored_description(listing_id, x_user_id, fields)
+            if stored:
+                return {"ok": True, "description": stored, "reused": True}
+
         try:
-            src = Image.open(BytesIO(raw_bytes))
-        except Exception:
+            await probe_upload(image, max_bytes=10 * 1024 * 1024)
+        except ImageLimitError as exc:
+            return JSONResponse({"error": str(exc)}, status_code=413)
+        except ImageDecodeError:
             return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
-        buf = BytesIO()
         try:
-            src.convert("RGBA").save(buf, format="PNG")
-        finally:
-            try:
-                src.close()
-            except Exception:
-                pass
-        buf.seek(0)
+            src_png = await normalize_image_to_png_async(image.file, max_px=SOURCE_IMAGE_MAX_PX)
+        except ImageLimitError as exc:
+            return JSONResponse({"error": str(exc)}, status_code=413)
+        except ImageDecodeError:
+            return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
 
         try:
-            _, src_key = upload_product_source_image(buf.getvalue(), mime="image/png")
+            _, src_key = upload_product_source_image(src_png, mime="image/png")
         except Exception:
             src_key = None
 
-        def norm(value: Optional[str]) -> str:
-            return (value or "").strip()
-
-        meta_lines = []
-        if norm(brand):
-            meta_lines.append(f"Brand: {norm(brand)}")
-        if norm(model_name):
-            meta_lines.append(f"Model: {norm(model_name)}")
-        if norm(size):
-            meta_lines.append(f"Size: {norm(size)}")
-        if norm(condition):
-            meta_lines.append(f"Condition: {norm(condition)}")
-        if norm(gender):
-            meta_lines.append(f"Gender: {norm(gender)}")
-
-        if prompt_override and prompt_override.strip():
-            instruction = prompt_override.strip()
+        signature = await description_signature(src_png)
+        reused = None
+        if signature is not None and x_user_id and reuse:
+            # Same photo re-uploaded (recompressed, resized, new EXIF) with the same fields.
+            reused = await find_similar_description(x_user_id, signature, fields)
+        if reused:
+            description_text, profile = reused, None
         else:
-            instruction = (
-                "You are a helpful assistant that writes high-quality Vinted product listings from a product photo.\n"
-                "Output format EXACTLY as sections (plain text):\n"
-                "Title: <search-optimized; use brand, item, size, color, material, 1-2 key features; MAX 100 characters>\n\n"
-                "Description:\n"
-                "- Aim for 200–400 words (MIN 50 words; keep total under 3,000 characters).\n"
-                "- Use short paragraphs and hyphen bullets for measurements and unique features.\n"
-                "- Include brand, item type, size, color, material, fit, style keywords, unique features, and any visible flaws (be honest).\n"
-                "- Include measurements ONLY if clearly inferable; otherwise omit.\n\n"
-                "Condition: <one short line; use provided condition if present>\n"
-                "Extras: <one short line like 'Open to offers; bundle discounts' or leave empty>\n\n"
-                "Rules:\n"
-                "- Plain text only; no emojis; no markdown other than hyphen bullets; no price or shipping info.\n"
-                "- Keep PG-13.\n"
-            )
-            if meta_lines:
-                instruction += "\nKNOWN FIELDS (apply faithfully if present)\n" + "\n".join(meta_lines) + "\n"
-
-        parts = [
-            genai_types.Part.from_text(text=instruction),
-            genai_types.Part.from_bytes(data=buf.getvalue(), mime_type="image/png"),
-        ]
-        client = get_client()
-        resp = await asyncio.to_thread(
-            client.models.generate_content,
-            model=MODEL,
-            contents=genai_types.Content(role="user", parts=parts),
-        )
-        description_text = None
-        for candidate in getattr(resp, "candidates", []) or []:
-            content = getattr(candidate, "content", None)
-            parts_iter = getattr(content, "parts", None) if content is not None else None
-            if parts_iter:
-                for part in parts_iter:
-                    if getattr(part, "text", None):
-                        description_text = part.text
-                        break
-            if description_text:
-                break
+            description_text, profile = await _describe(src_png, "image/png", fields, custom_prompt)
         if not description_text:
             return JSONResponse({"error": "no description from model"}, status_code=502)
+        description_text = description_text.strip()
 
         async with db_session() as session:
             session.add(
                 ProductDescription(
                     user_id=x_user_id,
                     s3_key=src_key or "",
-                    gender=normalize_gender(gender) if gender else None,
-                    brand=norm(brand) or None,
-                    model=norm(model_name) or None,
-                    size=norm(size) or None,
-                    condition=norm(condition) or None,
-                    description=description_text.strip(),
+                    description=description_text,
+                    image_signature=signature.to_hex() if signature else None,
+                    **fields.record_values(),
                 )
             )
             if listing_id and x_user_id:
-                owns = await session.execute(
-                    text("SELECT 1 FROM listings WHERE id = :id AND user_id = :uid"),
-                    {"id": listing_id, "uid": x_user_id},
+                await _save_to_listing(
+                    session,
+                    listing_id,
+                    x_user_id,
+                    description_text,
+                    profile,
+                    fields,
+                    custom_prompt=bool(custom_prompt),
                 )
-                if owns.first():
-                    await session.execute(
-                        text("UPDATE listings SET description_text = :d WHERE id = :id"),
-                        {"d": description_text.strip(), "id": listing_id},
-                    )
 
+        if reused:
+            return {"ok": True, "description": description_text, "reused": True}
         return {"ok": True, "description": description_text}
     except Exception as exc:
         LOGGER.exception("description generation failed")
@@ -175,81 +206,31 @@ async def describe_from_listing(
         except Exception as exc:
             return JSONResponse({"error": f"failed to load source image: {exc}"}, status_code=500)
 
-        def norm(value: Optional[str]) -> str:
-            return (value or "").strip()
-
-        gg = norm(gender) or norm(settings.get("gender"))
-        meta_lines = []
-        if norm(brand):
-            meta_lines.append(f"Brand: {norm(brand)}")
-        if norm(model_name):
-            meta_lines.append(f"Model: {norm(model_name)}")
-        if norm(size):
-            meta_lines.append(f"Size: {norm(size)}")
-        if norm(condition):
-            meta_lines.append(f"Condition: {norm(condition)}")
-        if gg:
-            meta_lines.append(f"Gender: {gg}")
-
-        instruction = (
-            "You are a helpful assistant that writes high-quality Vinted product listings from a product photo.\n"
-            "Output format EXACTLY as sections (plain text):\n"
-            "Title: <search-optimized; use brand, item, size, color, material, 1-2 key features; MAX 100 characters>\n\n"
-            "Description:\n"
-            "- Aim for 200–400 words (MIN 50 words; keep total under 3,000 characters).\n"
-            "- Use short paragraphs and hyphen bullets for measurements and unique features.\n"
-            "- Include brand, item type, size, color, material, fit, style keywords, unique features, and any visible flaws (be honest).\n"
-            "- Include measurements ONLY if clearly inferable; otherwise omit.\n\n"
-            "Condition: <one short line; use provided condition if present>\n"
-            "Extras: <one short line like 'Open to offers; bundle discounts' or leave empty>\n\n"
-            "Rules:\n"
-            "- Plain text only; no emojis; no markdown other than hyphen bullets; no price or shipping info.\n"
-            "- Keep PG-13.\n"
-        )
-        if meta_lines:
-            instruction += "\nKNOWN FIELDS (apply faithfully if present)\n" + "\n".join(meta_lines) + "\n"
-
-        parts = [
-            genai_types.Part.from_text(text=instruction),
-            genai_types.Part.from_bytes(data=src_bytes, mime_type=mime or "image/png"),
-        ]
-        client = get_client()
-        resp = await asyncio.to_thread(
-            client.models.generate_content,
-            model=MODEL,
-            contents=genai_types.Content(role="user", parts=parts),
+        fields = DescriptionFields.from_form(
+            gender=(gender or "").strip() or settings.get("gender"),
+            brand=brand,
+            model_name=model_name,
+            size=size,
+            condition=condition,
         )
-        description_text = None
-        for candidate in getattr(resp, "candidates", []) or []:
-            content = getattr(candidate, "content", None)
-            parts_iter = getattr(content, "parts", None) if content is not None else None
-            if parts_iter:
-                for part in parts_iter:
-                    if getattr(part, "text", None):
-                        description_text = part.text
-                        break
-            if description_text:
-                break
+        # An explicit request always regenerates, even when the stored text matches these fields.
+        description_text, profile = await _describe(src_bytes, mime or "image/png", fields)
         if not description_text:
             return JSONResponse({"error": "no description from model"}, status_code=502)
+        description_text = description_text.strip()
+        signature = await description_signature(src_bytes)
 
         async with db_session() as session:
             session.add(
                 ProductDescription(
                     user_id=x_user_id,
                     s3_key=src_key or "",
-                    gender=normalize_gender(gg) if gg else None,
-                    brand=norm(brand) or None,
-                    model=norm(model_name) or None,
-                    size=norm(size) or None,
-                    condition=norm(condition) or None,
-                    description=description_text.strip(),
+                    description=description_text,
+                    image_signature=signature.to_hex() if signature else None,
+                    **fields.record_values(),
                 )
             )
-            await session.execute(
-                text("UPDATE listings SET description_text = :d WHERE id = :id"),
-                {"d": description_text.strip(), "id": lid},
-            )
+            await _save_to_listing(session, lid, x_user_id, description_text, profile, fields)
 
         return {"ok": True, "description": description_text}
     except Exception as exc:
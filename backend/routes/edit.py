@@ -2,10 +2,9 @@
 from __future__ import annotations
 
 import asyncio
-from io import BytesIO
 
 from fastapi import APIRouter, File, Form, Header, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response
 from google.genai import errors as genai_errors
 
 from backend.config import LOGGER, MODEL
@@ -22,18 +21,22 @@ from backend.services.editing import (
     EditingError,
     load_garment_source,
     normalize_edit_inputs,
-    normalize_to_png_limited,
+    normalize_to_png_limited_async,
+    probe_image_upload,
     persist_generation_result,
     resolve_listing_context,
 )
 from backend.services.garment import classify_garment_type
+from backend.services.listing_garment import resolve_garment_type
 from backend.services.genai import first_inline_image_bytes, genai_generate_with_retries, types as genai_types
 from backend.storage import generate_presigned_get_url, get_object_bytes, upload_image
 from backend.services.usage import (
     QuotaError,
+    QuotaReservation,
     UsageSummary,
-    ensure_can_consume,
     get_usage_cost,
+    release_reservation,
+    reserve_quota,
 )
 from backend.utils.normalization import normalize_choice
 
@@ -46,7 +49,7 @@ def _quota_json(exc: QuotaError) -> JSONResponse:
     return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
 
 
-def _attach_usage_headers(response: StreamingResponse, summary: UsageSummary) -> None:
+def _attach_usage_headers(response: Response, summary: UsageSummary) -> None:
     response.headers["X-Usage-Allowance"] = str(summary.allowance)
     response.headers["X-Usage-Used"] = str(summary.used)
     response.headers["X-Usage-Remaining"] = str(summary.remaining)
@@ -70,20 +73,22 @@ async def edit(
     garment_type_override: str | None = Form(None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
+    reservation: QuotaReservation | None = None
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(IMAGE_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(IMAGE_USAGE_COST, 0), action="listing_image")
         except QuotaError as exc:
             return _quota_json(exc)
         if not image or not image.filename:
             return JSONResponse({"error": "image file required"}, status_code=400)
-        raw_bytes = await image.read()
-        if len(raw_bytes) > 20 * 1024 * 1024:
-            return JSONResponse({"error": "image too large (max ~20MB)"}, status_code=413)
         try:
-            png_bytes = normalize_to_png_limited(raw_bytes, max_px=2048)
+            await probe_image_upload(image, max_upload_bytes=20 * 1024 * 1024)
+        except EditingError as exc:
+            return JSONResponse({"error": exc.message}, status_code=exc.status_code)
+        try:
+            png_bytes = await normalize_to_png_limited_async(image.file, max_px=2048)
         except EditingError as exc:
             return JSONResponse({"error": exc.message}, status_code=exc.status_code)
 
@@ -171,13 +176,12 @@ async def edit(
                     prompt=prompt_text,
                     options=dict(base_options, prompt_variant=prompt_variant),
                     model_name=MODEL,
-                    usage_user_id=x_user_id,
-                    usage_amount=max(IMAGE_USAGE_COST, 0),
+                    reservation=reservation,
                 )
             except QuotaError as exc:
                 LOGGER.warning("quota exceeded after edit generation", extra={"s3_key": key})
                 return _quota_json(exc)
-            response = StreamingResponse(BytesIO(png_bytes_out), media_type="image/png")
+            response = Response(content=png_bytes_out, media_type="image/png")
             if usage:
                 _attach_usage_headers(response, usage)
             return response
@@ -206,13 +210,12 @@ async def edit(
                             prompt=prompt_text,
                             options=dict(base_options, prompt_variant=prompt_variant),
                             model_name=MODEL,
-                            usage_user_id=x_user_id,
-                            usage_amount=max(IMAGE_USAGE_COST, 0),
+                            reservation=reservation,
                         )
                     except QuotaError as exc:
                         LOGGER.warning("quota exceeded after edit retry", extra={"s3_key": key})
                         return _quota_json(exc)
-                    response = StreamingResponse(BytesIO(png_bytes2), media_type="image/png")
+                    response = Response(content=png_bytes2, media_type="image/png")
                     if usage:
                         _attach_usage_headers(response, usage)
                     return response
@@ -236,6 +239,8 @@ async def edit(
     except Exception as exc:
         LOGGER.exception("Unhandled error on /edit")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
 
 
 @router.post("/edit/json")
@@ -253,11 +258,12 @@ async def edit_json(
     garment_type_override: str | None = Form(None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
+    reservation: QuotaReservation | None = None
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(IMAGE_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(IMAGE_USAGE_COST, 0), action="listing_image")
         except QuotaError as exc:
             return _quota_json(exc)
         listing_ctx = await resolve_listing_context(
@@ -273,7 +279,7 @@ async def edit_json(
             default_pose=None,
         )
 
-        garment_type = await classify_garment_type(source.png_bytes, garment_type_override)
+        garment_type = await resolve_garment_type(source, garment_type_override)
 
         use_env_image = bool(env_default_s3_key)
         use_person_image = bool(model_default_s3_key)
@@ -367,8 +373,7 @@ async def edit_json(
                     update_listing_settings=True,
                     garment_type=garment_type,
                     garment_type_override=garment_type_override,
-                    usage_user_id=x_user_id,
-                    usage_amount=max(IMAGE_USAGE_COST, 0),
+                    reservation=reservation,
                 )
             except QuotaError as exc:
                 LOGGER.warning("quota exceeded after edit/json generation", extra={"s3_key": key})
@@ -419,8 +424,7 @@ async def edit_json(
                             update_listing_settings=True,
                             garment_type=garment_type,
                             garment_type_override=garment_type_override,
-                            usage_user_id=x_user_id,
-                            usage_amount=max(IMAGE_USAGE_COST, 0),
+                            reservation=reservation,
                         )
                     except QuotaError as exc:
                         LOGGER.warning(
@@ -452,6 +456,8 @@ async def edit_json(
     except Exception as exc:
         LOGGER.exception("Unhandled error on /edit/json")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
 
 
 @router.post("/edit/sequential/json")
@@ -470,11 +476,12 @@ async def edit_sequential_json(
     garment_type_override: str | None = Form(None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
+    reservation: QuotaReservation | None = None
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(IMAGE_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(IMAGE_USAGE_COST, 0), action="listing_image")
         except QuotaError as exc:
             return _quota_json(exc)
         listing_ctx = await resolve_listing_context(
@@ -492,7 +499,7 @@ async def edit_sequential_json(
 
         use_env_image = bool(env_default_s3_key)
         use_person_image = bool(model_default_s3_key)
-        garment_type = await classify_garment_type(source.png_bytes, garment_type_override)
+        garment_type = await resolve_garment_type(source, garment_type_override)
 
         if prompt_override_step1 and prompt_override_step1.strip():
             step1_prompt = prompt_override_step1.strip()
@@ -634,8 +641,7 @@ async def edit_sequential_json(
                 update_listing_settings=False,
                 garment_type=garment_type,
                 garment_type_override=garment_type_override,
-                usage_user_id=x_user_id,
-                usage_amount=max(IMAGE_USAGE_COST, 0),
+                reservation=reservation,
             )
         except QuotaError as exc:
             LOGGER.warning("quota exceeded after sequential edit", extra={"s3_key": key})
@@ -661,3 +667,5 @@ async def edit_sequential_json(
     except Exception as exc:
         LOGGER.exception("Unhandled error on /edit/sequential/json")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
@@ -1,36 +1,42 @@
 """Environment-related API endpoints."""
 from __future__ import annotations
 
-from io import BytesIO
-from typing import Any, Optional
+import asyncio
+from typing import Any
 
 from fastapi import APIRouter, File, Form, Header, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy import select, text
 
-from backend.config import LOGGER, MODEL
+from backend.config import ENV_POOL_SIZE, LOGGER, MODEL
 from backend.db import EnvDefaultUser, EnvSource, Generation, db_session
-from backend.services.genai import (
-    first_inline_image_bytes,
-    genai_generate_with_retries,
-    types as genai_types,
-)
+from backend.prompts import build_env_prompt
 from backend.services.editing import persist_generation_result
-from backend.services.usage import QuotaError, ensure_can_consume, get_usage_cost
+from backend.services.env_pool import claim_env_image, render_env_image
+from backend.services.env_sources import add_env_sources, clear_env_sources, sample_env_source
+from backend.services.generations import user_generations_query
+from backend.services.usage import (
+    QuotaError,
+    QuotaReservation,
+    get_usage_cost,
+    release_reservation,
+    reserve_quota,
+)
 from backend.storage import (
     delete_objects,
     generate_presigned_get_url,
-    get_object_bytes,
+    open_object_stream,
     upload_image,
     upload_source_image,
 )
+from backend.utils.pagination import InvalidCursorError, clamp_page_size, keyset_page, split_page
 
 router = APIRouter()
 
 ENVIRONMENT_USAGE_COST = get_usage_cost("studio_environment") or 0
 
 
-def _attach_usage_headers(response: StreamingResponse, usage) -> None:
+def _attach_usage_headers(response: Response, usage) -> None:
     if not usage:
         return
     response.headers["X-Usage-Allowance"] = str(usage.allowance)
@@ -42,74 +48,22 @@ def _attach_usage_headers(response: StreamingResponse, usage) -> None:
         response.headers["X-Usage-Plan-Name"] = usage.plan_name  # type: ignore[attr-defined]
 
 
-def build_env_prompt(user_prompt: Optional[str] = None) -> str:
-    """Build the Studio Environment generation instruction."""
-
-    def q(text: Optional[str]) -> str:
-        return (text or "").strip()
-
-    lines: list[str] = []
-    lines.append("TASK")
-    lines.append(
-        "Generate a new photorealistic mirror environment image for future garment try-ons. "
-        "Use the attached environment image as the reference: keep the MIRROR and its placement consistent, "
-        "but redesign the surrounding scene with tasteful variation."
-    )
-    lines.append("")
-    lines.append("HARD CONSTRAINTS")
-    lines.append("- Keep mirror frame, size, and placement consistent; do not remove it.")
-    lines.append("- Preserve basic room geometry (walls, floor) and perspective from the source image.")
-    lines.append("- Lighting must remain plausible and consistent with reflections.")
-    lines.append("- Avoid people, animals, or text overlays.")
-    lines.append("- Maintain PG-13 content.")
-    lines.append("")
-    lines.append("STYLE & CAMERA")
-    lines.append("- Mirror selfie aesthetic; natural smartphone camera vibe.")
-    lines.append("- Keep camera angle close to the source reference; minor tweaks allowed but no drastic angle changes.")
-    lines.append("- Lighting should feel realistic; soft bokeh acceptable.")
-    lines.append("")
-    lines.append("VARIATIONS")
-    lines.append(
-        "- Refresh decor, wall colors, props, and ambiance; keep mirror region recognizable."
-    )
-    lines.append("- Ensure the mirror reflection still shows a plausible empty room ready for try-ons.")
-    if q(user_prompt):
-        lines.append("")
-        lines.append("USER WISHES")
-        lines.append(f"\"{q(user_prompt)}\"")
-        lines.append("Apply only if consistent with realism and constraints above.")
-    lines.append("")
-    lines.append("NEGATIVE GUIDANCE")
-    lines.append("AI artifacts, warped mirrors, text overlays, people, over-saturated neon lighting, cluttered mess")
-    return "\n".join(lines)
-
-
 async def _generate_env_with_random_source(
     prompt_text: str,
     *,
     options: dict[str, Any],
     user_id: str,
-    usage_cost: int,
+    reservation: QuotaReservation,
 ):
-    async with db_session() as session:
-        stmt = text("SELECT s3_key FROM env_sources ORDER BY RANDOM() LIMIT 1")
-        res = await session.execute(stmt)
-        row = res.first()
-    if not row:
+    source_key = await sample_env_source(user_id)
+    if not source_key:
         return JSONResponse({"error": "no sources uploaded"}, status_code=400)
 
-    source_key = row[0]
-    src_bytes, mime = get_object_bytes(source_key)
-    parts = [
-        genai_types.Part.from_text(text=prompt_text),
-        genai_types.Part.from_bytes(data=src_bytes, mime_type=mime),
-    ]
-    resp = await genai_generate_with_retries(parts, attempts=2)
-    png_bytes = first_inline_image_bytes(resp)
+    png_bytes = await render_env_image(prompt_text, source_key)
     if not png_bytes:
         return JSONResponse({"error": "no image from model"}, status_code=502)
 
-    _, key = upload_image(png_bytes, pose="env")
+    _, key = await asyncio.to_thread(upload_image, png_bytes, pose="env")
     payload = dict(options)
     payload["source_s3_key"] = source_key
 
@@ -120,14 +74,13 @@ async def _generate_env_with_random_source(
             prompt=prompt_text,
             options=payload,
             model_name=MODEL,
-            usage_user_id=user_id,
-            usage_amount=max(usage_cost, 0),
+            reservation=reservation,
         )
     except QuotaError as exc:
         LOGGER.warning("quota exceeded after env generation", extra={"user_id": user_id})
         return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
 
-    response = StreamingResponse(BytesIO(png_bytes), media_type="image/png")
+    response = Response(content=png_bytes, media_type="image/png")
     _attach_usage_headers(response, usage)
     return response
 
@@ -142,6 +95,7 @@ async def upload_env_sources(files: list[UploadFile] = File(...)):
             async with db_session() as session:
                 session.add(EnvSource(s3_key=key))
             stored.append({"s3_key": key})
+        await add_env_sources(item["s3_key"] for item in stored)
         return {"ok": True, "count": len(stored), "items": stored}
     except Exception as exc:  # pragma: no cover - defensive logging
         LOGGER.exception("Failed to upload env sources")
@@ -149,13 +103,23 @@ async def upload_env_sources(files: list[UploadFile] = File(...)):
 
 
 @router.get("/env/sources")
-async def list_env_sources():
+async def list_env_sources(cursor: str | None = None, limit: int | None = None):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
-            stmt = select(EnvSource.s3_key).order_by(EnvSource.created_at.desc())
+            stmt = keyset_page(
+                select(EnvSource.s3_key, EnvSource.created_at, EnvSource.id),
+                EnvSource.created_at,
+                EnvSource.id,
+                cursor=cursor,
+                limit=page_size,
+            )
             res = await session.execute(stmt)
-            items = [row[0] for row in res.all()]
-        return {"ok": True, "count": len(items), "items": items}
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[1], row[2]))
+            items = [row[0] for row in rows]
+        return {"ok": True, "count": len(items), "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list env sources")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -171,6 +135,7 @@ async def delete_env_sources():
         delete_objects(keys)
         async with db_session() as session:
             await session.execute(text("DELETE FROM env_sources"))
+        await clear_env_sources()
         return {"ok": True, "deleted": len(keys)}
     except Exception as exc:
         LOGGER.exception("Failed to delete env sources")
@@ -179,32 +144,48 @@ async def delete_env_sources():
 
 @router.post("/env/random")
 async def generate_env_random(x_user_id: str | None = Header(default=None, alias="X-User-Id")):
+    reservation: QuotaReservation | None = None
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(ENVIRONMENT_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(ENVIRONMENT_USAGE_COST, 0), action="studio_environment")
         except QuotaError as exc:
             return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
+        if ENV_POOL_SIZE > 0:
+            try:
+                claimed = await claim_env_image(
+                    x_user_id, usage_amount=max(ENVIRONMENT_USAGE_COST, 0), usage_action="studio_environment"
+                )
+            except QuotaError as exc:
+                return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
+            if claimed is not None:
+                response = Response(content=claimed.png_bytes, media_type="image/png")
+                _attach_usage_headers(response, claimed.usage)
+                response.headers["X-Env-Pool"] = "hit"
+                return response
         instruction = build_env_prompt()
         return await _generate_env_with_random_source(
             instruction,
             options={"mode": "random", "user_id": x_user_id},
             user_id=x_user_id,
-            usage_cost=ENVIRONMENT_USAGE_COST,
+            reservation=reservation,
         )
     except Exception as exc:
         LOGGER.exception("env random failed")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
 
 
 @router.post("/env/generate")
 async def generate_env(prompt: str = Form(""), x_user_id: str | None = Header(default=None, alias="X-User-Id")):
+    reservation: QuotaReservation | None = None
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(ENVIRONMENT_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(ENVIRONMENT_USAGE_COST, 0), action="studio_environment")
         except QuotaError as exc:
             return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
         full = build_env_prompt(prompt)
@@ -217,31 +198,40 @@ async def generate_env(prompt: str = Form(""), x_user_id: str | None = Header(de
                 "user_id": x_user_id,
             },
             user_id=x_user_id,
-            usage_cost=ENVIRONMENT_USAGE_COST,
+            reservation=reservation,
         )
     except Exception as exc:
         LOGGER.exception("env generate failed")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
 
 
 @router.get("/env/generated")
-async def list_generated(x_user_id: str | None = Header(default=None, alias="X-User-Id")):
+async def list_generated(
+    cursor: str | None = None,
+    limit: int | None = None,
+    x_user_id: str | None = Header(default=None, alias="X-User-Id"),
+):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
             if x_user_id:
-                stmt = (
-                    select(Generation.s3_key, Generation.created_at)
-                    .where(Generation.pose == "env")
-                    .where(text("(options_json->>'user_id') = :uid")).params(uid=x_user_id)
-                    .order_by(Generation.created_at.desc())
-                    .limit(200)
+                stmt = keyset_page(
+                    user_generations_query(
+                        x_user_id, ["env"], Generation.s3_key, Generation.created_at, Generation.id
+                    ),
+                    Generation.created_at,
+                    Generation.id,
+                    cursor=cursor,
+                    limit=page_size,
                 )
             else:
-                stmt = select(Generation.s3_key, Generation.created_at).where(text("1=0"))
+                stmt = select(Generation.s3_key, Generation.created_at, Generation.id).where(text("1=0"))
             res = await session.execute(stmt)
-            rows = res.all()
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[1], row[2]))
             items = []
-            for key, created in rows:
+            for key, created, _ in rows:
                 try:
                     url = generate_presigned_get_url(key)
                 except Exception:
@@ -251,7 +241,9 @@ async def list_generated(x_user_id: str | None = Header(default=None, alias="X-U
                     "created_at": created.isoformat(),
                     "url": url,
                 })
-        return {"ok": True, "count": len(items), "items": items}
+        return {"ok": True, "count": len(items), "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list generated images")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -260,8 +252,8 @@ async def list_generated(x_user_id: str | None = Header(default=None, alias="X-U
 @router.get("/env/image")
 async def get_generated_image(s3_key: str):
     try:
-        data, content_type = get_object_bytes(s3_key)
-        return StreamingResponse(BytesIO(data), media_type=content_type)
+        chunks, content_type = open_object_stream(s3_key)
+        return StreamingResponse(chunks, media_type=content_type)
     except Exception as exc:
         LOGGER.exception("Failed to fetch generated image")
         return JSONResponse({"error": str(exc)}, status_code=404)
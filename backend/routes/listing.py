@@ -2,15 +2,23 @@
 from __future__ import annotations
 
 import uuid
-from io import BytesIO
 
 from fastapi import APIRouter, File, Form, Header, UploadFile
 from fastapi.responses import JSONResponse
-from PIL import Image
-from sqlalchemy import text
+from sqlalchemy import func, select, text
 
 from backend.config import LOGGER
 from backend.db import Listing, ListingImage, db_session
+from backend.services.garment import normalize_garment_type
+from backend.services.garment_profile import DescriptionFields
+from backend.services.imaging import (
+    ImageDecodeError,
+    ImageLimitError,
+    SOURCE_IMAGE_MAX_PX,
+    normalize_image_to_png_async,
+    probe_upload,
+)
+from backend.services.listing_garment import schedule_listing_classification
 from backend.services.usage import (
     QuotaError,
     consume_quota_with_session,
@@ -18,6 +26,7 @@ from backend.services.usage import (
     get_usage_cost,
 )
 from backend.storage import generate_presigned_get_url, upload_product_source_image
+from backend.utils.pagination import InvalidCursorError, clamp_page_size, keyset_page, split_page
 
 router = APIRouter()
 
@@ -25,20 +34,6 @@ LISTING_CREATE_COST = get_usage_cost("listing_create") or 0
 LISTING_IMAGE_COST = get_usage_cost("listing_image") or 0
 
 
-def _normalize_to_png(raw_bytes: bytes) -> bytes:
-    src = Image.open(BytesIO(raw_bytes))
-    buf = BytesIO()
-    try:
-        src.convert("RGBA").save(buf, format="PNG")
-    finally:
-        try:
-            src.close()
-        except Exception:
-            pass
-    buf.seek(0)
-    return buf.getvalue()
-
-
 @router.post("/listing")
 async def create_listing(
     image: UploadFile = File(...),
@@ -52,6 +47,11 @@ async def create_listing(
     prompt_override: str | None = Form(None),
     title: str | None = Form(None),
     garment_type_override: str | None = Form(None),
+    describe: str | None = Form(None),
+    brand: str | None = Form(None),
+    model_name: str | None = Form(None),
+    size: str | None = Form(None),
+    condition: str | None = Form(None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
     try:
@@ -65,11 +65,16 @@ async def create_listing(
             )
         if not image or not image.filename:
             return JSONResponse({"error": "image file required"}, status_code=400)
-        raw_bytes = await image.read()
-        if len(raw_bytes) > 10 * 1024 * 1024:
-            return JSONResponse({"error": "image too large (max ~10MB)"}, status_code=413)
         try:
-            src_png = _normalize_to_png(raw_bytes)
+            await probe_upload(image, max_bytes=10 * 1024 * 1024)
+        except ImageLimitError as exc:
+            return JSONResponse({"error": str(exc)}, status_code=413)
+        except ImageDecodeError:
+            return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
+        try:
+            src_png = await normalize_image_to_png_async(image.file, max_px=SOURCE_IMAGE_MAX_PX)
+        except ImageLimitError as exc:
+            return JSONResponse({"error": str(exc)}, status_code=413)
         except Exception:
             return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
 
@@ -90,6 +95,9 @@ async def create_listing(
             "title": (title or "").strip() or None,
             "garment_type_override": (garment_type_override or None),
         }
+        override_type = normalize_garment_type(garment_type_override or "")
+        if override_type:
+            settings.update({"garment_type": override_type, "garment_type_origin": "user"})
 
         lid = uuid.uuid4().hex
         usage = None
@@ -109,6 +117,7 @@ async def create_listing(
                     session,
                     x_user_id,
                     max(LISTING_CREATE_COST, 0),
+                    action="listing_create",
                 )
         except QuotaError as exc:
             LOGGER.warning("quota exceeded after listing creation", extra={"listing_id": lid})
@@ -116,6 +125,16 @@ async def create_listing(
                 {"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402
             )
 
+        # Classify (and describe, when asked) now so later calls read the results from the listing row.
+        fields = None
+        if str(describe or "").lower() == "true":
+            fields = DescriptionFields.from_form(
+                gender=gender, brand=brand, model_name=model_name, size=size, condition=condition
+            )
+        schedule_listing_classification(
+            lid, src_png, classify=not override_type, fields=fields, user_id=x_user_id
+        )
+
         try:
             src_url = generate_presigned_get_url(src_key)
         except Exception:
@@ -135,28 +154,35 @@ async def create_listing(
 
 
 @router.get("/listings")
-async def list_listings(x_user_id: str | None = Header(default=None, alias="X-User-Id")):
+async def list_listings(
+    cursor: str | None = None,
+    limit: int | None = None,
+    x_user_id: str | None = Header(default=None, alias="X-User-Id"),
+):
     try:
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
             lres = await session.execute(
-                text(
-                    "SELECT id, created_at, cover_s3_key, settings_json FROM listings "
-                    "WHERE user_id = :uid ORDER BY created_at DESC LIMIT 200"
-                ),
-                {"uid": x_user_id},
+                keyset_page(
+                    select(Listing.id, Listing.created_at, Listing.cover_s3_key, Listing.settings_json).where(
+                        Listing.user_id == x_user_id
+                    ),
+                    Listing.created_at,
+                    Listing.id,
+                    cursor=cursor,
+                    limit=page_size,
+                )
             )
-            rows = lres.all()
+            rows, next_cursor = split_page(lres.all(), page_size, key=lambda row: (row[1], row[0]))
             ids = [r[0] for r in rows]
             counts: dict[str, int] = {}
             if ids:
                 cres = await session.execute(
-                    text(
-                        "SELECT listing_id, COUNT(*) FROM listing_images "
-                        "WHERE listing_id = ANY(:ids) GROUP BY listing_id"
-                    ),
-                    {"ids": ids},
+                    select(ListingImage.listing_id, func.count())
+                    .where(ListingImage.listing_id.in_(ids))
+                    .group_by(ListingImage.listing_id)
                 )
                 for lid_value, cnt in cres.all():
                     counts[str(lid_value)] = int(cnt)
@@ -176,7 +202,9 @@ async def list_listings(x_user_id: str | None = Header(default=None, alias="X-Us
                     "settings": settings_json or {},
                 }
             )
-        return {"ok": True, "items": items}
+        return {"ok": True, "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("failed to list listings")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -189,21 +217,23 @@ async def get_listing(lid: str, x_user_id: str | None = Header(default=None, ali
             return JSONResponse({"error": "missing user id"}, status_code=400)
         async with db_session() as session:
             lres = await session.execute(
-                text(
-                    "SELECT id, user_id, source_s3_key, settings_json, description_text, cover_s3_key, created_at "
-                    "FROM listings WHERE id = :id"
-                ),
-                {"id": lid},
+                select(
+                    Listing.id,
+                    Listing.user_id,
+                    Listing.source_s3_key,
+                    Listing.settings_json,
+                    Listing.description_text,
+                    Listing.cover_s3_key,
+                    Listing.created_at,
+                ).where(Listing.id == lid)
             )
             lrow = lres.first()
             if not lrow or lrow[1] != x_user_id:
                 return JSONResponse({"error": "not found"}, status_code=404)
             ires = await session.execute(
-                text(
-                    "SELECT s3_key, pose, prompt, created_at FROM listing_images "
-                    "WHERE listing_id = :id ORDER BY created_at DESC"
-                ),
-                {"id": lid},
+                select(ListingImage.s3_key, ListingImage.pose, ListingImage.prompt, ListingImage.created_at)
+                .where(ListingImage.listing_id == lid)
+                .order_by(ListingImage.created_at.desc())
             )
             irows = ires.all()
         try:
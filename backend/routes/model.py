@@ -2,12 +2,10 @@
 from __future__ import annotations
 
 import asyncio
-from io import BytesIO
 from typing import Optional
 
 from fastapi import APIRouter, File, Form, Header, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
-from PIL import Image
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy import select, text
 
 from backend.config import LOGGER, MODEL
@@ -20,12 +18,27 @@ from backend.db import (
 )
 from backend.services.genai import (
     first_inline_image_bytes,
+    first_text,
     genai_generate_with_retries,
     get_client,
     types as genai_types,
 )
 from backend.services.editing import persist_generation_result
-from backend.services.usage import QuotaError, ensure_can_consume, get_usage_cost
+from backend.services.generations import user_generations_query
+from backend.services.imaging import (
+    ImageDecodeError,
+    ImageLimitError,
+    SOURCE_IMAGE_MAX_PX,
+    normalize_image_to_png_async,
+    probe_upload,
+)
+from backend.services.usage import (
+    QuotaError,
+    QuotaReservation,
+    get_usage_cost,
+    release_reservation,
+    reserve_quota,
+)
 from backend.storage import (
     delete_objects,
     generate_presigned_get_url,
@@ -34,13 +47,14 @@ from backend.storage import (
     upload_model_source_image,
 )
 from backend.utils.normalization import normalize_gender
+from backend.utils.pagination import InvalidCursorError, clamp_page_size, keyset_page, split_page
 
 router = APIRouter()
 
 MODEL_USAGE_COST = get_usage_cost("studio_model") or 0
 
 
-def _attach_usage_headers(response: StreamingResponse, usage) -> None:
+def _attach_usage_headers(response: Response, usage) -> None:
     if not usage:
         return
     response.headers["X-Usage-Allowance"] = str(usage.allowance)
@@ -103,6 +117,7 @@ async def model_generate(
     prompt: str = Form(""),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
 ):
+    reservation: QuotaReservation | None = None
     try:
         gender = normalize_gender(gender)
         user_prompt = (prompt or "").strip()
@@ -110,7 +125,7 @@ async def model_generate(
         if not x_user_id:
             return JSONResponse({"error": "missing user id"}, status_code=400)
         try:
-            await ensure_can_consume(x_user_id, amount=max(MODEL_USAGE_COST, 0))
+            reservation = await reserve_quota(x_user_id, amount=max(MODEL_USAGE_COST, 0), action="studio_model")
         except QuotaError as exc:
             return JSONResponse({"error": "quota exceeded", "usage": exc.summary.to_dict()}, status_code=402)
 
@@ -119,14 +134,18 @@ async def model_generate(
 
         src_png_bytes: Optional[bytes] = None
         if image and getattr(image, "filename", None):
-            raw_bytes = await image.read()
-            if len(raw_bytes) > 10 * 1024 * 1024:
-                return JSONResponse({"error": "image too large (max ~10MB)"}, status_code=413)
-            src = Image.open(BytesIO(raw_bytes))
-            buf = BytesIO()
-            src.convert("RGBA").save(buf, format="PNG")
-            buf.seek(0)
-            src_png_bytes = buf.getvalue()
+            try:
+                await probe_upload(image, max_bytes=10 * 1024 * 1024)
+            except ImageLimitError as exc:
+                return JSONResponse({"error": str(exc)}, status_code=413)
+            except ImageDecodeError:
+                return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
+            try:
+                src_png_bytes = await normalize_image_to_png_async(image.file, max_px=SOURCE_IMAGE_MAX_PX)
+            except ImageLimitError as exc:
+                return JSONResponse({"error": str(exc)}, status_code=413)
+            except ImageDecodeError:
+                return JSONResponse({"error": "invalid or unsupported image format"}, status_code=400)
             try:
                 _, src_key = upload_model_source_image(src_png_bytes, gender=gender, mime="image/png")
                 async with db_session() as session:
@@ -167,8 +186,7 @@ async def model_generate(
                         "user_id": x_user_id,
                     },
                     model_name=MODEL,
-                    usage_user_id=x_user_id,
-                    usage_amount=max(MODEL_USAGE_COST, 0),
+                    reservation=reservation,
                 )
             except QuotaError as exc:
                 LOGGER.warning("quota exceeded after model generation", extra={"user_id": x_user_id})
@@ -193,58 +211,64 @@ async def model_generate(
                     model=MODEL,
                     contents=genai_types.Content(role="user", parts=desc_parts),
                 )
-                description_text = None
-                for candidate in getattr(desc_resp, "candidates", []) or []:
-                    content = getattr(candidate, "content", None)
-                    parts_iter = getattr(content, "parts", None) if content is not None else None
-                    if parts_iter:
-                        for part in parts_iter:
-                            if getattr(part, "text", None):
-                                description_text = part.text
-                                break
-                    if description_text:
-                        break
+                description_text = first_text(desc_resp)
                 if description_text:
                     async with db_session() as session:
                         session.add(ModelDescription(s3_key=key, description=description_text))
             except Exception:
                 pass
-            response = StreamingResponse(BytesIO(png_bytes), media_type="image/png")
+            response = Response(content=png_bytes, media_type="image/png")
             _attach_usage_headers(response, usage)
             return response
         return JSONResponse({"error": "no image from model"}, status_code=502)
     except Exception as exc:
         LOGGER.exception("model generate failed")
         return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        await release_reservation(reservation)
 
 
 @router.get("/model/generated")
-async def list_model_generated(x_user_id: str | None = Header(default=None, alias="X-User-Id")):
+async def list_model_generated(
+    cursor: str | None = None,
+    limit: int | None = None,
+    x_user_id: str | None = Header(default=None, alias="X-User-Id"),
+):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
             if x_user_id:
-                stmt = (
-                    select(Generation.s3_key, Generation.created_at, Generation.options_json)
-                    .where(Generation.pose.in_(["model-man", "model-woman"]))
-                    .where(text("(options_json->>'user_id') = :uid")).params(uid=x_user_id)
-                    .order_by(Generation.created_at.desc())
-                    .limit(200)
+                # Descriptions are joined in so the page costs one query regardless of size.
+                stmt = keyset_page(
+                    user_generations_query(
+                        x_user_id,
+                        ["model-man", "model-woman"],
+                        Generation.s3_key,
+                        Generation.created_at,
+                        Generation.options_json,
+                        Generation.id,
+                        ModelDescription.description,
+                    )
+                    .select_from(Generation)
+                    .outerjoin(ModelDescription, ModelDescription.s3_key == Generation.s3_key),
+                    Generation.created_at,
+                    Generation.id,
+                    cursor=cursor,
+                    limit=page_size,
                 )
             else:
-                stmt = select(Generation.s3_key, Generation.created_at, Generation.options_json).where(text("1=0"))
+                stmt = select(
+                    Generation.s3_key,
+                    Generation.created_at,
+                    Generation.options_json,
+                    Generation.id,
+                    ModelDescription.description,
+                ).where(text("1=0"))
             res = await session.execute(stmt)
-            rows = res.all()
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[1], row[3]))
             items = []
-            for key, created, options in rows:
+            for key, created, options, _, desc_text in rows:
                 gender = (options or {}).get("gender")
-                desc_text = None
-                try:
-                    dres = await session.execute(text("SELECT description FROM model_descriptions WHERE s3_key = :k"), {"k": key})
-                    drow = dres.first()
-                    if drow:
-                        desc_text = drow[0]
-                except Exception:
-                    pass
                 try:
                     url = generate_presigned_get_url(key)
                 except Exception:
@@ -256,7 +280,9 @@ async def list_model_generated(x_user_id: str | None = Header(default=None, alia
                     "url": url,
                     "description": desc_text,
                 })
-        return {"ok": True, "items": items}
+        return {"ok": True, "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list model generated images")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -358,22 +384,26 @@ async def upload_model_sources(gender: str = Form(...), files: list[UploadFile]
 
 
 @router.get("/model/sources")
-async def list_model_sources(gender: str | None = None):
+async def list_model_sources(gender: str | None = None, cursor: str | None = None, limit: int | None = None):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
-            stmt = select(ModelSource.gender, ModelSource.s3_key).order_by(ModelSource.created_at.desc())
+            stmt = select(ModelSource.gender, ModelSource.s3_key, ModelSource.created_at, ModelSource.id)
             if gender:
                 stmt = stmt.where(ModelSource.gender == normalize_gender(gender))
+            stmt = keyset_page(stmt, ModelSource.created_at, ModelSource.id, cursor=cursor, limit=page_size)
             res = await session.execute(stmt)
-            rows = res.all()
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[2], row[3]))
             items = []
-            for gender_value, key in rows:
+            for gender_value, key, _, _ in rows:
                 try:
                     url = generate_presigned_get_url(key)
                 except Exception:
                     url = None
                 items.append({"gender": gender_value, "s3_key": key, "url": url})
-        return {"ok": True, "items": items}
+        return {"ok": True, "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list model sources")
         return JSONResponse({"error": str(exc)}, status_code=500)
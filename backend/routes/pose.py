@@ -1,14 +1,17 @@
 """Pose source and description endpoints."""
 from __future__ import annotations
 
+import random
+
 from fastapi import APIRouter, File, UploadFile
 from fastapi.responses import JSONResponse
 from sqlalchemy import select, text
 
 from backend.config import LOGGER
 from backend.db import PoseDescription, PoseSource, db_session
+from backend.services.pose_jobs import get_pose_job, start_pose_job
 from backend.storage import delete_objects, upload_pose_source_image
-from backend.tasks import enqueue_pose_descriptions
+from backend.utils.pagination import InvalidCursorError, clamp_page_size, keyset_page, split_page
 
 router = APIRouter()
 
@@ -30,13 +33,23 @@ async def upload_pose_sources(files: list[UploadFile] = File(...)):
 
 
 @router.get("/pose/sources")
-async def list_pose_sources():
+async def list_pose_sources(cursor: str | None = None, limit: int | None = None):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
-            stmt = select(PoseSource.s3_key).order_by(PoseSource.created_at.desc())
+            stmt = keyset_page(
+                select(PoseSource.s3_key, PoseSource.created_at, PoseSource.id),
+                PoseSource.created_at,
+                PoseSource.id,
+                cursor=cursor,
+                limit=page_size,
+            )
             res = await session.execute(stmt)
-            items = [row[0] for row in res.all()]
-        return {"ok": True, "items": items}
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[1], row[2]))
+            items = [row[0] for row in rows]
+        return {"ok": True, "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list pose sources")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -52,6 +65,7 @@ async def delete_pose_sources():
         async with db_session() as session:
             await session.execute(text("DELETE FROM pose_sources"))
             await session.execute(text("DELETE FROM pose_descriptions"))
+            await session.execute(text("DELETE FROM pose_description_jobs"))
         return {"ok": True, "deleted": len(keys)}
     except Exception as exc:
         LOGGER.exception("Failed to delete pose sources")
@@ -60,49 +74,103 @@ async def delete_pose_sources():
 
 @router.post("/pose/describe")
 async def generate_pose_descriptions():
+    """Queue descriptions for undescribed pose sources; poll ``GET /pose/describe/{job_id}``."""
+
     try:
         async with db_session() as session:
             src_rows = await session.execute(select(PoseSource.s3_key).order_by(PoseSource.created_at.desc()))
             src_keys = [row[0] for row in src_rows.all()]
             if not src_keys:
-                return {"ok": True, "generated": 0}
+                return {"ok": True, "job_id": None, "queued": 0}
             have_rows = await session.execute(select(PoseDescription.s3_key))
             have = {row[0] for row in have_rows.all()}
         todo = [key for key in src_keys if key not in have]
         if not todo:
-            return {"ok": True, "generated": 0}
-
-        outcome = enqueue_pose_descriptions(todo, wait=True)
-        results = outcome.get("results", [])
-        generated = sum(1 for item in results if isinstance(item, dict) and item.get("ok"))
-        payload = {"ok": True, "generated": generated, "queued": len(todo)}
-        if outcome.get("job_id"):
-            payload["job_id"] = outcome["job_id"]
-        if outcome.get("inline"):
+            return {"ok": True, "job_id": None, "queued": 0}
+
+        status, created = await start_pose_job(todo)
+        payload = {"ok": True, "job_id": status.job_id, "queued": len(status.items)}
+        if status.inline:
             payload["inline"] = True
-        if outcome.get("fallback"):
-            payload["fallback"] = True
+        if not created:
+            payload["existing"] = True
         return payload
     except Exception as exc:
         LOGGER.exception("Failed to generate pose descriptions")
         return JSONResponse({"error": str(exc)}, status_code=500)
 
 
+@router.get("/pose/describe/{job_id}")
+async def get_pose_description_job(job_id: str):
+    try:
+        status = await get_pose_job(job_id)
+        if status is None:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        return {"ok": True, **status.to_dict()}
+    except Exception as exc:
+        LOGGER.exception("Failed to read pose description job")
+        return JSONResponse({"error": str(exc)}, status_code=500)
+
+
+_RANDOM_PICK_MAX = 16
+
+
+@router.get("/pose/descriptions/random")
+async def random_pose_descriptions(n: int = 1):
+    """Up to ``n`` distinct descriptions drawn uniformly from the whole library.
+
+    Only ids are read for the draw; the texts are loaded for the chosen rows alone.
+    """
+
+    try:
+        count = min(max(n, 1), _RANDOM_PICK_MAX)
+        async with db_session() as session:
+            ids = (await session.execute(select(PoseDescription.id))).scalars().all()
+            chosen = random.sample(list(ids), min(count, len(ids)))
+            if not chosen:
+                return {"ok": True, "items": []}
+            res = await session.execute(
+                select(PoseDescription.s3_key, PoseDescription.description, PoseDescription.created_at).where(
+                    PoseDescription.id.in_(chosen)
+                )
+            )
+            items = [
+                {"s3_key": key, "description": desc, "created_at": created.isoformat()}
+                for key, desc, created in res.all()
+            ]
+        random.shuffle(items)
+        return {"ok": True, "items": items}
+    except Exception as exc:
+        LOGGER.exception("Failed to pick random pose descriptions")
+        return JSONResponse({"error": str(exc)}, status_code=500)
+
+
 @router.get("/pose/descriptions")
-async def list_pose_descriptions():
+async def list_pose_descriptions(cursor: str | None = None, limit: int | None = None):
     try:
+        page_size = clamp_page_size(limit)
         async with db_session() as session:
-            stmt = select(
-                PoseDescription.s3_key,
-                PoseDescription.description,
+            stmt = keyset_page(
+                select(
+                    PoseDescription.s3_key,
+                    PoseDescription.description,
+                    PoseDescription.created_at,
+                    PoseDescription.id,
+                ),
                 PoseDescription.created_at,
-            ).order_by(PoseDescription.created_at.desc())
+                PoseDescription.id,
+                cursor=cursor,
+                limit=page_size,
+            )
             res = await session.execute(stmt)
+            rows, next_cursor = split_page(res.all(), page_size, key=lambda row: (row[2], row[3]))
             items = [
                 {"s3_key": key, "description": desc, "created_at": created.isoformat()}
-                for key, desc, created in res.all()
+                for key, desc, created, _ in rows
             ]
-        return {"ok": True, "items": items}
+        return {"ok": True, "items": items, "next_cursor": next_cursor}
+    except InvalidCursorError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
     except Exception as exc:
         LOGGER.exception("Failed to list pose descriptions")
         return JSONResponse({"error": str(exc)}, status_code=500)
@@ -2,19 +2,27 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from io import BytesIO
 from typing import Iterable, Sequence
 
 from fastapi import UploadFile
-from PIL import Image
 from sqlalchemy import text
 
 from backend.db import Generation, ListingImage, db_session
+from backend.services.imaging import (
+    ImageDecodeError,
+    ImageLimitError,
+    ImageSource,
+    normalize_image_to_png,
+    normalize_image_to_png_async,
+    probe_upload,
+)
 from backend.services.usage import (
     QuotaError,
+    QuotaReservation,
     UsageSummary,
-    consume_quota_with_session,
+    commit_reservation,
     get_usage_cost,
+    release_reservation,
 )
 from backend.storage import get_object_bytes
 from backend.utils.normalization import normalize_choice
@@ -47,6 +55,8 @@ class ListingContext:
     id: str
     user_id: str
     source_s3_key: str
+    # ``settings_json["garment_type"]``, once an eager or earlier classification stored it.
+    garment_type: str | None = None
 
 
 @dataclass(slots=True)
@@ -58,29 +68,37 @@ class SourceImage:
     listing: ListingContext | None
 
 
-def normalize_to_png_limited(raw_bytes: bytes, *, max_px: int = 2048) -> bytes:
+def _image_error(exc: ImageDecodeError) -> EditingError:
+    if isinstance(exc, ImageLimitError):
+        return EditingError(str(exc), status_code=413)
+    return EditingError("invalid or unsupported image format", status_code=400)
+
+
+def normalize_to_png_limited(source: ImageSource, *, max_px: int = 2048) -> bytes:
     """Normalize arbitrary image bytes to PNG with an optional max dimension."""
 
     try:
-        src = Image.open(BytesIO(raw_bytes))
-    except Exception as exc:  # pragma: no cover - Pillow provides detailed errors
-        raise EditingError("invalid or unsupported image format", status_code=400) from exc
+        return normalize_image_to_png(source, max_px=max_px)
+    except ImageDecodeError as exc:
+        raise _image_error(exc) from exc
+
+
+async def normalize_to_png_limited_async(source: ImageSource, *, max_px: int = 2048) -> bytes:
+    """Async variant of :func:`normalize_to_png_limited` backed by the image pool."""
+
     try:
-        src = src.convert("RGBA")
-        width, height = src.size
-        if max(width, height) > max_px:
-            scale = max_px / float(max(width, height))
-            new_size = (int(width * scale), int(height * scale))
-            src = src.resize(new_size, Image.LANCZOS)
-        out = BytesIO()
-        src.save(out, format="PNG")
-        out.seek(0)
-        return out.getvalue()
-    finally:
-        try:
-            src.close()
-        except Exception:  # pragma: no cover - defensive cleanup
-            pass
+        return await normalize_image_to_png_async(source, max_px=max_px)
+    except ImageDecodeError as exc:
+        raise _image_error(exc) from exc
+
+
+async def probe_image_upload(image: UploadFile, *, max_upload_bytes: int) -> None:
+    """Reject oversized or malformed uploads from their header before reading the body."""
+
+    try:
+        await probe_upload(image, max_bytes=max_upload_bytes)
+    except ImageDecodeError as exc:
+        raise _image_error(exc) from exc
 
 
 def normalize_edit_inputs(
@@ -155,7 +173,7 @@ async def resolve_listing_context(
 
     async with db_session() as session:
         result = await session.execute(
-            text("SELECT user_id, source_s3_key FROM listings WHERE id = :id"),
+            text("SELECT user_id, source_s3_key, settings_json FROM listings WHERE id = :id"),
             {"id": listing_id},
         )
         row = result.first()
@@ -165,7 +183,13 @@ async def resolve_listing_context(
             raise EditingError("not found", status_code=404)
         return None
 
-    return ListingContext(id=listing_id, user_id=row[0], source_s3_key=row[1])
+    settings = row[2] if isinstance(row[2], dict) else {}
+    return ListingContext(
+        id=listing_id,
+        user_id=row[0],
+        source_s3_key=row[1],
+        garment_type=settings.get("garment_type") or None,
+    )
 
 
 async def load_garment_source(
@@ -178,13 +202,9 @@ async def load_garment_source(
     """Load garment source data from an upload or listing."""
 
     if image and image.filename:
-        raw_bytes = await image.read()
-        if len(raw_bytes) > max_upload_bytes:
-            raise EditingError("image too large (max ~20MB)", status_code=413)
-        try:
-            png_bytes = normalize_to_png_limited(raw_bytes, max_px=max_px)
-        except EditingError:
-            raise
+        await probe_image_upload(image, max_upload_bytes=max_upload_bytes)
+        # Decode straight from the upload spool instead of reading it into memory first.
+        png_bytes = await normalize_to_png_limited_async(image.file, max_px=max_px)
         return SourceImage(png_bytes=png_bytes, origin="upload", listing=listing)
 
     if not listing:
@@ -192,7 +212,7 @@ async def load_garment_source(
 
     try:
         listing_bytes, _ = get_object_bytes(listing.source_s3_key)
-        png_bytes = normalize_to_png_limited(listing_bytes, max_px=max_px)
+        png_bytes = await normalize_to_png_limited_async(listing_bytes, max_px=max_px)
     except EditingError as exc:
         raise EditingError(
             f"failed to load source image from listing: {exc.message}", status_code=500
@@ -216,27 +236,26 @@ async def persist_generation_result(
     update_listing_settings: bool = False,
     garment_type: str | None = None,
     garment_type_override: str | None = None,
-    usage_user_id: str | None = None,
-    usage_amount: int | None = None,
+    reservation: QuotaReservation | None = None,
 ) -> UsageSummary | None:
     """Persist generation metadata and optional listing attachments.
 
-    When ``usage_user_id`` and a positive ``usage_amount`` are provided, this function
-    also consumes the user's quota within the same transaction and returns the
-    resulting :class:`UsageSummary`.
+    When a ``reservation`` is provided, its units are charged within the same
+    transaction, the hold is released once that commits, and the resulting
+    :class:`UsageSummary` is returned.
     """
 
     usage_summary: UsageSummary | None = None
     async with db_session() as session:
-        session.add(
-            Generation(
-                s3_key=s3_key,
-                pose=pose,
-                prompt=prompt,
-                options_json=options,
-                model=model_name,
-            )
+        generation = Generation(
+            s3_key=s3_key,
+            pose=pose,
+            prompt=prompt,
+            options_json=options,
+            user_id=options.get("user_id"),
+            model=model_name,
         )
+        session.add(generation)
 
         if listing:
             session.add(
@@ -278,11 +297,10 @@ async def persist_generation_result(
                 except Exception:  # pragma: no cover - best-effort update
                     pass
 
-        if usage_user_id and (usage_amount or 0) > 0:
-            usage_summary = await consume_quota_with_session(
-                session,
-                usage_user_id,
-                usage_amount or 0,
-            )
+        if reservation is not None and reservation.amount > 0:
+            # Flush so the ledger entry can reference the generation row.
+            await session.flush()
+            usage_summary = await commit_reservation(session, reservation, generation_id=generation.id)
 
+    await release_reservation(reservation)
     return usage_summary
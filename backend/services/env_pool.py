@@ -0,0 +1,336 @@
+"""Pool of pre-generated environment images served by ``/env/random``.
+
+A background filler keeps ``ENV_POOL_SIZE`` unclaimed images per style, built
+with :func:`backend.prompts.build_env_prompt` from a random environment source.
+A request claims the oldest ready image with ``UPDATE ... RETURNING`` over a
+``FOR UPDATE SKIP LOCKED`` subquery and commits at once, so concurrent claimers
+never get the same row and no lock is held while the image is read from S3 on a
+thread. The user's ``generations`` row and the quota charge follow in a second
+transaction. If the read or the charge fails, the image is returned to the
+pool, so users pay only for images they receive. When a claim leaves the
+pool at or below ``ENV_POOL_LOW_WATERMARK``, the filler is woken early.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+
+from backend.config import (
+    ENV_POOL_LOW_WATERMARK,
+    ENV_POOL_REFILL_INTERVAL_SECONDS,
+    ENV_POOL_SIZE,
+    LOGGER,
+    MODEL,
+)
+from backend.db import ENV_POOL_FILL_LOCK_ID, EnvPoolImage, Generation, db_session, try_advisory_lock
+from backend.prompts import build_env_prompt
+from backend.services.env_sources import sample_env_source
+from backend.services.genai import first_inline_image_bytes, genai_generate_with_retries, types as genai_types
+from backend.services.usage import DEFAULT_USAGE_ACTION, UsageSummary, consume_quota_with_session
+from backend.storage import get_object_bytes, upload_image
+
+# Only the prompt-less random style is pooled; prompted generations stay live.
+ENV_POOL_DEFAULT_STYLE = "random"
+
+_MAX_CONSECUTIVE_FAILURES = 3
+
+
+@dataclass(slots=True)
+class EnvPoolMetrics:
+    generated: int = 0
+    generation_failures: int = 0
+    claims: int = 0
+    misses: int = 0
+    refill_triggers: int = 0
+    claim_latencies: deque[float] = field(default_factory=lambda: deque(maxlen=512))
+
+    def to_dict(self) -> dict[str, object]:
+        samples = sorted(self.claim_latencies)
+        latency: dict[str, float] | None = None
+        if samples:
+            latency = {
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return {
+            "generated": self.generated,
+            "generation_failures": self.generation_failures,
+            "claims": self.claims,
+            "misses": self.misses,
+            "refill_triggers": self.refill_triggers,
+            "claim_latency": latency,
+        }
+
+
+@dataclass(slots=True)
+class ClaimedEnvImage:
+    s3_key: str
+    png_bytes: bytes
+    prompt: str
+    source_s3_key: str
+    usage: UsageSummary | None
+
+
+_metrics = EnvPoolMetrics()
+_fill_guard = asyncio.Lock()
+_refill_event: asyncio.Event | None = None
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def render_env_image(prompt_text: str, source_key: str) -> bytes | None:
+    """Generate an environment image from ``source_key``; ``None`` when the model returns no image."""
+
+    src_bytes, mime = await asyncio.to_thread(get_object_bytes, source_key)
+    parts = [
+        genai_types.Part.from_text(text=prompt_text),
+        genai_types.Part.from_bytes(data=src_bytes, mime_type=mime),
+    ]
+    resp = await genai_generate_with_retries(parts, attempts=2)
+    return first_inline_image_bytes(resp)
+
+
+async def _count_available(session, style: str) -> int:
+    res = await session.execute(
+        select(func.count())
+        .select_from(EnvPoolImage)
+        .where(EnvPoolImage.style == style, EnvPoolImage.claimed_at.is_(None))
+    )
+    return int(res.scalar() or 0)
+
+
+def request_refill() -> None:
+    """Wake the background filler ahead of its next scheduled pass."""
+
+    _metrics.refill_triggers += 1
+    if _refill_event is not None:
+        _refill_event.set()
+
+
+async def _record_claim(
+    user_id: str,
+    *,
+    s3_key: str,
+    prompt_text: str,
+    source_key: str,
+    model_name: str,
+    usage_amount: int,
+    usage_action: str,
+) -> UsageSummary | None:
+    """Add the user's ``generations`` row for a claimed image and charge its quota in one transaction."""
+
+    async with db_session() as session:
+        generation = Generation(
+            s3_key=s3_key,
+            pose="env",
+            prompt=prompt_text,
+            options_json={
+                "mode": "random",
+                "user_id": user_id,
+                "source_s3_key": source_key,
+                "pool": True,
+            },
+            user_id=user_id,
+            model=model_name,
+        )
+        session.add(generation)
+        if usage_amount <= 0:
+            return None
+        await session.flush()
+        return await consume_quota_with_session(
+            session, user_id, usage_amount, action=usage_action, generation_id=generation.id
+        )
+
+
+async def _release_claim(pool_id: int) -> None:
+    """Put a claimed image back in the pool after its fetch or charge failed."""
+
+    try:
+        async with db_session() as session:
+            await session.execute(
+                update(EnvPoolImage)
+                .where(EnvPoolImage.id == pool_id)
+                .values(claimed_by=None, claimed_at=None)
+                .execution_options(synchronize_session=False)
+            )
+    except Exception:
+        LOGGER.exception("Failed to return env pool image %s to the pool", pool_id)
+
+
+async def claim_env_image(
+    user_id: str,
+    *,
+    usage_amount: int,
+    usage_action: str = DEFAULT_USAGE_ACTION,
+    style: str = ENV_POOL_DEFAULT_STYLE,
+) -> ClaimedEnvImage | None:
+    """Hand the oldest ready image to ``user_id`` and charge its quota.
+
+    Returns ``None`` when the pool is empty. Raises :class:`QuotaError` when the
+    user cannot afford ``usage_amount``; that, or a failed fetch, puts the image
+    back in the pool.
+    """
+
+    started = time.perf_counter()
+    async with db_session() as session:
+        next_id = (
+            select(EnvPoolImage.id)
+            .where(EnvPoolImage.style == style, EnvPoolImage.claimed_at.is_(None))
+            .order_by(EnvPoolImage.created_at, EnvPoolImage.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        res = await session.execute(
+            update(EnvPoolImage)
+            .where(EnvPoolImage.id == next_id)
+            .values(claimed_by=user_id, claimed_at=_now_utc())
+            .returning(
+                EnvPoolImage.id,
+                EnvPoolImage.s3_key,
+                EnvPoolImage.prompt,
+                EnvPoolImage.source_s3_key,
+                EnvPoolImage.model,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        row = res.first()
+        remaining = await _count_available(session, style)
+
+    claimed: ClaimedEnvImage | None = None
+    if row is not None:
+        pool_id, s3_key, prompt_text, source_key, model_name = row
+        try:
+            png_bytes, _ = await asyncio.to_thread(get_object_bytes, s3_key)
+            usage = await _record_claim(
+                user_id,
+                s3_key=s3_key,
+                prompt_text=prompt_text,
+                source_key=source_key,
+                model_name=model_name,
+                usage_amount=usage_amount,
+                usage_action=usage_action,
+            )
+        except Exception:
+            await _release_claim(pool_id)
+            raise
+        claimed = ClaimedEnvImage(
+            s3_key=s3_key,
+            png_bytes=png_bytes,
+            prompt=prompt_text,
+            source_s3_key=source_key,
+            usage=usage,
+        )
+
+    if claimed is not None:
+        _metrics.claims += 1
+        _metrics.claim_latencies.append(time.perf_counter() - started)
+    else:
+        _metrics.misses += 1
+    if remaining <= ENV_POOL_LOW_WATERMARK:
+        request_refill()
+    return claimed
+
+
+async def fill_env_pool(*, style: str = ENV_POOL_DEFAULT_STYLE, target: int = ENV_POOL_SIZE) -> int:
+    """Generate images until ``style`` has ``target`` unclaimed ones; returns how many were added.
+
+    Skips immediately when another task or worker is already filling. Stops after
+    a few consecutive generation failures so a GenAI outage does not spin.
+    """
+
+    if target <= 0 or _fill_guard.locked():
+        return 0
+    async with _fill_guard, try_advisory_lock(ENV_POOL_FILL_LOCK_ID) as acquired:
+        if not acquired:
+            return 0
+        async with db_session() as session:
+            depth = await _count_available(session, style)
+
+        added = 0
+        failures = 0
+        while depth + added < target and failures < _MAX_CONSECUTIVE_FAILURES:
+            source_key = await sample_env_source()
+            if not source_key:
+                LOGGER.warning("env pool refill skipped: no environment sources uploaded")
+                break
+            prompt_text = build_env_prompt()
+            try:
+                png_bytes = await render_env_image(prompt_text, source_key)
+                if not png_bytes:
+                    raise RuntimeError("no image from model")
+                _, key = await asyncio.to_thread(upload_image, png_bytes, pose="env")
+                async with db_session() as session:
+                    session.add(
+                        EnvPoolImage(
+                            style=style,
+                            s3_key=key,
+                            source_s3_key=source_key,
+                            prompt=prompt_text,
+                            model=MODEL,
+                        )
+                    )
+            except Exception:
+                failures += 1
+                _metrics.generation_failures += 1
+                LOGGER.exception("env pool image generation failed")
+                continue
+            failures = 0
+            added += 1
+            _metrics.generated += 1
+        if added:
+            LOGGER.info("env pool refilled", extra={"style": style, "added": added, "depth": depth + added})
+        return added
+
+
+async def run_env_pool_filler(*, interval: float = ENV_POOL_REFILL_INTERVAL_SECONDS) -> None:
+    """Refill the pool every ``interval`` seconds or as soon as a claim requests it."""
+
+    global _refill_event
+    _refill_event = asyncio.Event()
+    while True:
+        try:
+            await fill_env_pool()
+        except Exception:
+            LOGGER.exception("env pool refill pass failed")
+        try:
+            await asyncio.wait_for(_refill_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _refill_event.clear()
+
+
+async def get_env_pool_status(style: str = ENV_POOL_DEFAULT_STYLE) -> dict[str, object]:
+    """Pool depth plus this worker's fill and claim counters."""
+
+    async with db_session() as session:
+        depth = await _count_available(session, style)
+    return {
+        "style": style,
+        "depth": depth,
+        "target": ENV_POOL_SIZE,
+        "low_watermark": ENV_POOL_LOW_WATERMARK,
+        "metrics": _metrics.to_dict(),
+    }
+
+
+__all__ = [
+    "ClaimedEnvImage",
+    "ENV_POOL_DEFAULT_STYLE",
+    "EnvPoolMetrics",
+    "claim_env_image",
+    "fill_env_pool",
+    "get_env_pool_status",
+    "render_env_image",
+    "request_refill",
+    "run_env_pool_filler",
+]
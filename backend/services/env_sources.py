@@ -0,0 +1,261 @@
+"""Constant-time random sampling of environment source images.
+
+The set of uploaded ``env_sources`` keys is mirrored into Redis (``SRANDMEMBER``)
+or, without Redis, into an in-process array with an index map so picks never
+sort or scan the table. Upload and delete endpoints keep the mirror current; the
+local copy is also reloaded from Postgres every ``ENV_SOURCE_CACHE_TTL_SECONDS``
+so workers converge when another process changed the sources.
+
+The Redis set is only ever added to, except by :func:`clear_env_sources`.
+Uploads always ``SADD``, and the loader merges the Postgres keys in rather than
+replacing the set, so an upload that lands while another worker is loading is
+never dropped. The loaded marker expires after ``ENV_SOURCE_CACHE_TTL_SECONDS``,
+which re-merges the table periodically in case an upload's ``SADD`` failed.
+
+The set and marker keys carry an epoch that :func:`clear_env_sources` bumps. A
+loader writes only under the epoch it started with and deletes what it wrote if
+a clear happened meanwhile, so deleted keys never come back. Workers compare the
+epoch on every Redis pick and drop their local copy when it moved, so a clear on
+one worker also reaches the others' fallback copies. Without Redis there is no
+shared epoch and other workers still converge on the TTL.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Iterable
+
+from sqlalchemy import select
+
+from backend.config import ENV_SOURCE_CACHE_TTL_SECONDS, ENV_SOURCE_NO_REPEAT
+from backend.core.redis import get_redis_client, record_redis_failure, redis_execute
+from backend.db import EnvSource, db_session
+from backend.utils.lru import BoundedLRU
+
+_REDIS_EPOCH_KEY = "env_sources:epoch"
+_REDIS_SET_PREFIX = "env_sources:keys"
+# Redis drops empty sets, so a separate marker tells "loaded but empty" from "never loaded".
+_REDIS_LOADED_PREFIX = "env_sources:loaded"
+_REDIS_RECENT_PREFIX = "env_sources:recent"
+_RECENT_TTL_SECONDS = 24 * 3600
+_MAX_RECENT_USERS = 10_000
+
+
+class _KeySet:
+    """Array plus index map: O(1) add, remove and uniform random pick."""
+
+    def __init__(self) -> None:
+        self._keys: list[str] = []
+        self._index: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def replace(self, keys: Iterable[str]) -> None:
+        self._keys = list(dict.fromkeys(keys))
+        self._index = {key: idx for idx, key in enumerate(self._keys)}
+
+    def add(self, key: str) -> None:
+        if key not in self._index:
+            self._index[key] = len(self._keys)
+            self._keys.append(key)
+
+    def discard(self, key: str) -> None:
+        idx = self._index.pop(key, None)
+        if idx is None:
+            return
+        last = self._keys.pop()
+        if idx < len(self._keys):
+            self._keys[idx] = last
+            self._index[last] = idx
+
+    def sample(self, count: int) -> list[str]:
+        return random.sample(self._keys, min(count, len(self._keys)))
+
+
+_local_keys = _KeySet()
+_local_loaded_at: float | None = None
+# Last Redis epoch this worker saw; a change means another worker cleared the sources.
+_local_epoch: int | None = None
+_local_load_lock = asyncio.Lock()
+_local_recent: BoundedLRU[str, deque[str]] = BoundedLRU(_MAX_RECENT_USERS)
+
+
+async def _load_keys_from_db() -> list[str]:
+    async with db_session() as session:
+        res = await session.execute(select(EnvSource.s3_key))
+        return [row[0] for row in res.all()]
+
+
+async def _ensure_local_loaded() -> None:
+    global _local_loaded_at
+    if _local_loaded_at is not None and time.monotonic() - _local_loaded_at < ENV_SOURCE_CACHE_TTL_SECONDS:
+        return
+    async with _local_load_lock:
+        if _local_loaded_at is not None and time.monotonic() - _local_loaded_at < ENV_SOURCE_CACHE_TTL_SECONDS:
+            return
+        _local_keys.replace(await _load_keys_from_db())
+        _local_loaded_at = time.monotonic()
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _redis_set_key(epoch: int) -> str:
+    return f"{_REDIS_SET_PREFIX}:{epoch}"
+
+
+def _redis_loaded_key(epoch: int) -> str:
+    return f"{_REDIS_LOADED_PREFIX}:{epoch}"
+
+
+async def _redis_epoch(redis_client: Any) -> int:
+    raw = await redis_execute(lambda: redis_client.get(_REDIS_EPOCH_KEY))
+    return int(_decode(raw)) if raw is not None else 0
+
+
+def _observe_epoch(epoch: int) -> None:
+    global _local_epoch, _local_loaded_at
+    if _local_epoch is not None and _local_epoch != epoch:
+        _local_keys.replace(())
+        _local_loaded_at = None
+        _local_recent.clear()
+    _local_epoch = epoch
+
+
+async def _ensure_redis_loaded(redis_client: Any) -> str:
+    """Make sure the current epoch's set is loaded and return its key."""
+
+    epoch = await _redis_epoch(redis_client)
+    _observe_epoch(epoch)
+    set_key, loaded_key = _redis_set_key(epoch), _redis_loaded_key(epoch)
+    if await redis_execute(lambda: redis_client.exists(loaded_key)):
+        return set_key
+    keys = await _load_keys_from_db()
+
+    async def _load() -> None:
+        pipe = redis_client.pipeline(transaction=True)
+        if keys:
+            pipe.sadd(set_key, *keys)
+        pipe.set(loaded_key, "1", ex=max(ENV_SOURCE_CACHE_TTL_SECONDS, 1))
+        await pipe.execute()
+
+    await redis_execute(_load)
+    if await _redis_epoch(redis_client) != epoch:
+        # Cleared while this load read the table: drop what was written and use the new epoch.
+        await redis_execute(lambda: redis_client.delete(set_key, loaded_key))
+        return await _ensure_redis_loaded(redis_client)
+    return set_key
+
+
+def _pick(candidates: list[str], recent: Iterable[str]) -> str:
+    seen = set(recent)
+    for key in candidates:
+        if key not in seen:
+            return key
+    return candidates[0]
+
+
+def _remember_local(user_id: str, key: str) -> None:
+    recent = _local_recent.get(user_id)
+    if recent is None:
+        recent = deque(maxlen=ENV_SOURCE_NO_REPEAT)
+        _local_recent[user_id] = recent
+    recent.append(key)
+
+
+async def _sample_redis(redis_client: Any, user_id: str | None) -> str | None:
+    set_key = await _ensure_redis_loaded(redis_client)
+    no_repeat = ENV_SOURCE_NO_REPEAT if user_id else 0
+    # SRANDMEMBER with a positive count returns distinct members; one more than
+    # the no-repeat window guarantees at least one fresh candidate.
+    raw = await redis_execute(lambda: redis_client.srandmember(set_key, no_repeat + 1))
+    candidates = [_decode(item) for item in raw or []]
+    if not candidates:
+        return None
+    if not no_repeat:
+        return candidates[0]
+
+    recent_key = f"{_REDIS_RECENT_PREFIX}:{user_id}"
+    recent = [_decode(item) for item in await redis_execute(lambda: redis_client.lrange(recent_key, 0, -1)) or []]
+    choice = _pick(candidates, recent)
+
+    async def _remember() -> None:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.lpush(recent_key, choice)
+        pipe.ltrim(recent_key, 0, no_repeat - 1)
+        pipe.expire(recent_key, _RECENT_TTL_SECONDS)
+        await pipe.execute()
+
+    await redis_execute(_remember)
+    return choice
+
+
+async def sample_env_source(user_id: str | None = None) -> str | None:
+    """Return a random environment source key, or ``None`` when none are uploaded.
+
+    When ``user_id`` is given, the user's last ``ENV_SOURCE_NO_REPEAT`` picks are
+    avoided whenever enough other sources exist.
+    """
+
+    redis_client = await get_redis_client()
+    if redis_client is not None:
+        try:
+            return await _sample_redis(redis_client, user_id)
+        except Exception as exc:
+            await record_redis_failure(exc)
+
+    await _ensure_local_loaded()
+    no_repeat = ENV_SOURCE_NO_REPEAT if user_id else 0
+    candidates = _local_keys.sample(no_repeat + 1)
+    if not candidates:
+        return None
+    if not no_repeat:
+        return candidates[0]
+    choice = _pick(candidates, _local_recent.get(user_id, ()))
+    _remember_local(user_id, choice)
+    return choice
+
+
+async def add_env_sources(keys: Iterable[str]) -> None:
+    """Register newly uploaded source keys with the sampler."""
+
+    keys = list(keys)
+    if not keys:
+        return
+    for key in keys:
+        _local_keys.add(key)
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return
+    try:
+        set_key = _redis_set_key(await _redis_epoch(redis_client))
+        # Always add: a loader running right now may have read the table before this upload.
+        await redis_execute(lambda: redis_client.sadd(set_key, *keys))
+    except Exception as exc:
+        await record_redis_failure(exc)
+
+
+async def clear_env_sources() -> None:
+    """Forget every source key after the table has been emptied."""
+
+    global _local_epoch, _local_loaded_at
+    _local_keys.replace(())
+    _local_loaded_at = time.monotonic()
+    _local_recent.clear()
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return
+    try:
+        epoch = int(await redis_execute(lambda: redis_client.incr(_REDIS_EPOCH_KEY)))
+        _local_epoch = epoch
+        previous = epoch - 1
+        await redis_execute(lambda: redis_client.delete(_redis_set_key(previous), _redis_loaded_key(previous)))
+    except Exception as exc:
+        await record_redis_failure(exc)
+
+
+__all__ = ["add_env_sources", "clear_env_sources", "sample_env_source"]
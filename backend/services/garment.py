@@ -6,27 +6,136 @@ import hashlib
 import json
 import time
 import uuid
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 from google.genai import types
 
 from backend.config import (
+    GARMENT_PHASH_MAX_DISTANCE,
+    GARMENT_TYPE_CACHE_MAX_ENTRIES,
     GARMENT_TYPE_CACHE_PREFIX,
     GARMENT_TYPE_CACHE_VERSION,
     GARMENT_TYPE_CLASSIFY,
     GARMENT_TYPE_LOCK_TTL_SECONDS,
     GARMENT_TYPE_LOCK_WAIT_SECONDS,
+    GARMENT_TYPE_THUMBNAIL_PX,
+    GARMENT_TYPE_THUMBNAIL_QUALITY,
     GARMENT_TYPE_TTL_SECONDS,
+    LOGGER,
     MODEL,
-    REDIS_OP_TIMEOUT_SECONDS,
-    REDIS_OPERATION_RETRIES,
 )
-from backend.core.redis import get_redis_client, record_redis_failure
-from backend.services.genai import genai_generate_with_retries
+from backend.core.redis import get_redis_client, record_redis_failure, redis_execute
+from backend.services.garment_precheck import PRECLASSIFIER_MODEL_ID, preclassify_garment_type
+from backend.services.genai import first_text, genai_generate_with_retries
+from backend.services.imaging import ImageDecodeError, make_jpeg_thumbnail_async, run_in_image_pool
+from backend.services.perceptual import ImageSignature, PerceptualIndex, image_signature
+from backend.utils.lru import BoundedLRU
+
+
+@dataclass(slots=True)
+class GarmentCacheMetrics:
+    hits: int = 0
+    misses: int = 0
+    redis_hits: int = 0
+    # Misses answered by a cached near-identical image (re-encoded, resized, EXIF-stripped).
+    perceptual_hits: int = 0
+    classifications: int = 0
+    preclassified: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    pubsub_wakeups: int = 0
+    # Image bytes sent to GenAI, to compare thumbnails against full-size uploads.
+    genai_upload_bytes: int = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "redis_hits": self.redis_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "classifications": self.classifications,
+            "preclassified": self.preclassified,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "pubsub_wakeups": self.pubsub_wakeups,
+            "genai_upload_bytes": self.genai_upload_bytes,
+        }
+
+
+class _GarmentTypeCache:
+    """Per-worker LRU of classifier payloads keyed by image hash, with per-entry expiry.
+
+    Entries stored with an image signature are also findable by near-identical
+    images through a :class:`PerceptualIndex` that follows evictions and expiry.
+    """
+
+    def __init__(self, max_entries: int, max_distance: int = GARMENT_PHASH_MAX_DISTANCE) -> None:
+        self.max_entries = max_entries
+        self._entries: BoundedLRU[str, tuple[float, dict[str, Any]]] = BoundedLRU(max_entries, on_evict=self._evicted)
+        self.similar = PerceptualIndex(max_distance) if max_distance >= 0 else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, image_hash: str) -> None:
+        if self.similar is not None:
+            self.similar.discard(image_hash)
+
+    def _evicted(self, image_hash: str) -> None:
+        self._drop(image_hash)
+        _metrics.evictions += 1
+
+    def get(self, image_hash: str, now: float) -> dict[str, Any] | None:
+        entry = self._entries.get(image_hash)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[image_hash]
+            self._drop(image_hash)
+            _metrics.expirations += 1
+            return None
+        return entry[1]
 
-_garment_type_cache: dict[str, tuple[float, dict[str, Any]]] = {}
-_local_singleflight_locks: dict[str, asyncio.Lock] = {}
-_local_singleflight_guard = asyncio.Lock()
+    def get_similar(self, signature: ImageSignature, now: float) -> dict[str, Any] | None:
+        if self.similar is None:
+            return None
+        match = self.similar.nearest(signature)
+        return self.get(match[0], now) if match else None
+
+    def put(
+        self,
+        image_hash: str,
+        payload: dict[str, Any],
+        expires_at: float,
+        signature: ImageSignature | None = None,
+    ) -> None:
+        if signature is not None and self.similar is not None:
+            self.similar.add(image_hash, signature)
+        self._entries[image_hash] = (expires_at, payload)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self.similar is not None:
+            self.similar.clear()
+
+
+@dataclass(slots=True)
+class _SingleflightLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Tasks holding or waiting on ``lock``; the entry is dropped when this reaches zero.
+    refs: int = 0
+
+
+_metrics = GarmentCacheMetrics()
+_garment_type_cache = _GarmentTypeCache(GARMENT_TYPE_CACHE_MAX_ENTRIES)
+_local_singleflight_locks: dict[str, _SingleflightLock] = {}
+# Futures of tasks waiting for another worker's result, keyed by image hash.
+_result_waiters: dict[str, set[asyncio.Future]] = {}
+_listener_task: asyncio.Task | None = None
+_listener_ready = asyncio.Event()
+_LISTENER_READY_TIMEOUT = 0.5
+_FALLBACK_POLL_SECONDS = 1.0
 
 
 def _hash_bytes(data: bytes) -> str:
@@ -43,38 +152,71 @@ def _lock_key(image_hash: str) -> str:
     return f"{GARMENT_TYPE_CACHE_PREFIX}:lock:{GARMENT_TYPE_CACHE_VERSION}:{image_hash}"
 
 
-def _build_cache_payload(garment_type: str, *, origin: str, ts: float) -> dict[str, Any]:
+def _build_cache_payload(garment_type: str, *, origin: str, ts: float, model_id: str = MODEL) -> dict[str, Any]:
     return {
         "type": garment_type,
         "origin": origin,
         "ts": ts,
-        "model_id": MODEL,
+        "model_id": model_id,
     }
 
 
-async def _get_local_singleflight_lock(image_hash: str) -> asyncio.Lock:
-    async with _local_singleflight_guard:
-        lock = _local_singleflight_locks.get(image_hash)
-        if lock is None:
-            lock = asyncio.Lock()
-            _local_singleflight_locks[image_hash] = lock
-        return lock
+def _drop_local_lock(image_hash: str, entry: _SingleflightLock) -> None:
+    entry.refs -= 1
+    if entry.refs == 0 and _local_singleflight_locks.get(image_hash) is entry:
+        del _local_singleflight_locks[image_hash]
 
 
-async def _redis_execute(fn):
-    attempts = max(1, REDIS_OPERATION_RETRIES + 1)
-    last_exc: Exception | None = None
-    for attempt in range(attempts):
-        try:
-            return await asyncio.wait_for(fn(), timeout=REDIS_OP_TIMEOUT_SECONDS)
-        except (asyncio.TimeoutError, Exception) as exc:
-            last_exc = exc
-            if attempt >= attempts - 1:
-                raise
-            await asyncio.sleep(min(0.2, 0.05 * (attempt + 1)))
-    if last_exc is not None:
-        raise last_exc
-    return None
+async def _acquire_local_lock(image_hash: str) -> _SingleflightLock:
+    entry = _local_singleflight_locks.get(image_hash)
+    if entry is None:
+        entry = _local_singleflight_locks[image_hash] = _SingleflightLock()
+    entry.refs += 1
+    try:
+        await entry.lock.acquire()
+    except BaseException:
+        _drop_local_lock(image_hash, entry)
+        raise
+    return entry
+
+
+def _release_local_lock(image_hash: str, entry: _SingleflightLock) -> None:
+    entry.lock.release()
+    _drop_local_lock(image_hash, entry)
+
+
+def _remember(
+    image_hash: str, payload: dict[str, Any], now: float, signature: ImageSignature | None = None
+) -> None:
+    if GARMENT_TYPE_TTL_SECONDS > 0:
+        _garment_type_cache.put(image_hash, payload, now + GARMENT_TYPE_TTL_SECONDS, signature)
+
+
+async def _signature(image_bytes: bytes) -> ImageSignature | None:
+    if _garment_type_cache.similar is None:
+        return None
+    try:
+        return await run_in_image_pool(image_signature, image_bytes)
+    except Exception:  # pragma: no cover - executor shutdown
+        return None
+
+
+def get_garment_cache_stats() -> dict[str, object]:
+    """This worker's garment-type cache size, limit, counters and exact/perceptual hit rates."""
+
+    lookups = _metrics.hits + _metrics.misses
+    similar = _garment_type_cache.similar
+    return {
+        "entries": len(_garment_type_cache),
+        "max_entries": _garment_type_cache.max_entries,
+        "perceptual_entries": len(similar) if similar is not None else None,
+        "singleflight_locks": len(_local_singleflight_locks),
+        "metrics": _metrics.to_dict(),
+        "hit_rates": {
+            "exact": round((_metrics.hits + _metrics.redis_hits) / lookups, 4) if lookups else None,
+            "perceptual": round(_metrics.perceptual_hits / lookups, 4) if lookups else None,
+        },
+    }
 
 
 def _decode_cache_payload(raw: Any) -> dict[str, Any] | None:
@@ -93,7 +235,7 @@ def _decode_cache_payload(raw: Any) -> dict[str, Any] | None:
     garment_type = payload.get("type")
     if not isinstance(garment_type, str):
         return None
-    normalized = _normalize_garment_type(garment_type)
+    normalized = normalize_garment_type(garment_type)
     if not normalized:
         return None
     payload["type"] = normalized
@@ -101,17 +243,17 @@ def _decode_cache_payload(raw: Any) -> dict[str, Any] | None:
 
 
 async def _redis_get_payload(redis_client: Any, redis_key: str) -> dict[str, Any] | None:
-    raw = await _redis_execute(lambda: redis_client.get(redis_key))
+    raw = await redis_execute(lambda: redis_client.get(redis_key))
     return _decode_cache_payload(raw)
 
 
 async def _redis_set_payload(redis_client: Any, redis_key: str, payload: dict[str, Any]) -> None:
     data = json.dumps(payload, ensure_ascii=True, separators=(",", ":"))
-    await _redis_execute(lambda: redis_client.set(redis_key, data, ex=GARMENT_TYPE_TTL_SECONDS))
+    await redis_execute(lambda: redis_client.set(redis_key, data, ex=GARMENT_TYPE_TTL_SECONDS))
 
 
 async def _acquire_redis_lock(redis_client: Any, lock_key: str, token: str) -> bool:
-    result = await _redis_execute(
+    result = await redis_execute(
         lambda: redis_client.set(lock_key, token, nx=True, ex=GARMENT_TYPE_LOCK_TTL_SECONDS)
     )
     return bool(result)
@@ -120,40 +262,142 @@ async def _acquire_redis_lock(redis_client: Any, lock_key: str, token: str) -> b
 async def _release_redis_lock(redis_client: Any, lock_key: str, token: str) -> None:
     script = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
     try:
-        await _redis_execute(lambda: redis_client.eval(script, 1, lock_key, token))
+        await redis_execute(lambda: redis_client.eval(script, 1, lock_key, token))
     except Exception:
         pass
 
 
+def _result_channel(image_hash: str) -> str:
+    return f"{GARMENT_TYPE_CACHE_PREFIX}:done:{GARMENT_TYPE_CACHE_VERSION}:{image_hash}"
+
+
+async def _publish_result(redis_client: Any, image_hash: str, payload: dict[str, Any]) -> None:
+    data = json.dumps(payload, ensure_ascii=True, separators=(",", ":"))
+    await redis_execute(lambda: redis_client.publish(_result_channel(image_hash), data))
+
+
+def _dispatch_result(channel: Any, data: Any) -> None:
+    if isinstance(channel, (bytes, bytearray)):
+        channel = channel.decode("utf-8", "ignore")
+    image_hash = str(channel).rsplit(":", 1)[-1]
+    waiters = _result_waiters.get(image_hash)
+    payload = _decode_cache_payload(data)
+    if not waiters or payload is None:
+        return
+    for future in waiters:
+        if not future.done():
+            future.set_result(payload)
+
+
+async def _listen_for_results(redis_client: Any, ready: asyncio.Event) -> None:
+    """Feed published classifier results to this worker's waiters over one pattern subscription."""
+
+    global _listener_task
+    pubsub = redis_client.pubsub()
+    try:
+        await redis_execute(lambda: pubsub.psubscribe(_result_channel("*")))
+        ready.set()
+        async for message in pubsub.listen():
+            if message.get("type") == "pmessage":
+                _dispatch_result(message.get("channel"), message.get("data"))
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        await record_redis_failure(exc)
+    finally:
+        if _listener_task is asyncio.current_task():
+            _listener_task = None
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+
+
+async def _ensure_result_listener(redis_client: Any) -> bool:
+    """Start the result listener if needed; ``False`` when it is not subscribed yet."""
+
+    global _listener_task, _listener_ready
+    if _listener_task is None or _listener_task.done():
+        _listener_ready = asyncio.Event()
+        _listener_task = asyncio.create_task(_listen_for_results(redis_client, _listener_ready))
+    try:
+        await asyncio.wait_for(_listener_ready.wait(), timeout=_LISTENER_READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def stop_result_listener() -> None:
+    """Cancel the result listener; it is restarted by the next waiter."""
+
+    global _listener_task
+    task, _listener_task = _listener_task, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
 async def _wait_for_redis_payload(
-    redis_client: Any, redis_key: str, lock_key: str, *, deadline: float
+    redis_client: Any, image_hash: str, redis_key: str, lock_key: str, *, deadline: float
 ) -> dict[str, Any] | None:
+    """Wait for the lock holder's result until ``deadline``.
+
+    The holder publishes the result on a per-hash channel, so waiters normally
+    wake as soon as it is stored. ``GET``/``EXISTS`` polling remains as a fallback:
+    every ``_FALLBACK_POLL_SECONDS`` while subscribed, or every 100 ms when the
+    subscription could not be set up. It also detects a holder that died (the
+    lock is gone and no result was stored).
+    """
+
     loop = asyncio.get_running_loop()
-    while loop.time() < deadline:
-        try:
-            payload = await _redis_get_payload(redis_client, redis_key)
-        except Exception as exc:
-            await record_redis_failure(exc)
-            return None
-        if payload:
-            return payload
-        try:
-            lock_exists = await _redis_execute(lambda: redis_client.exists(lock_key))
-        except Exception as exc:
-            await record_redis_failure(exc)
-            return None
-        if not lock_exists:
+    try:
+        subscribed = await _ensure_result_listener(redis_client)
+    except Exception as exc:
+        await record_redis_failure(exc)
+        subscribed = False
+    poll_interval = _FALLBACK_POLL_SECONDS if subscribed else 0.1
+    future: asyncio.Future = loop.create_future()
+    waiters = _result_waiters.setdefault(image_hash, set())
+    waiters.add(future)
+    try:
+        while loop.time() < deadline:
+            # Registered before this check, so a result published after it still wakes us.
             try:
                 payload = await _redis_get_payload(redis_client, redis_key)
             except Exception as exc:
                 await record_redis_failure(exc)
                 return None
+            if payload:
+                return payload
+            try:
+                lock_exists = await redis_execute(lambda: redis_client.exists(lock_key))
+            except Exception as exc:
+                await record_redis_failure(exc)
+                return None
+            if not lock_exists:
+                try:
+                    payload = await _redis_get_payload(redis_client, redis_key)
+                except Exception as exc:
+                    await record_redis_failure(exc)
+                    return None
+                return payload
+            timeout = max(min(poll_interval, deadline - loop.time()), 0)
+            try:
+                payload = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                continue
+            _metrics.pubsub_wakeups += 1
             return payload
-        await asyncio.sleep(0.1)
-    return None
+        return None
+    finally:
+        waiters.discard(future)
+        if not waiters and _result_waiters.get(image_hash) is waiters:
+            del _result_waiters[image_hash]
+
 
+def normalize_garment_type(label: str) -> Optional[str]:
+    """Map a label or free-text answer to top|bottom|full, or ``None`` if unrecognised."""
 
-def _normalize_garment_type(label: str) -> Optional[str]:
     s = (label or "").strip().lower()
     if s in ("top", "bottom", "full"):
         return s
@@ -197,10 +441,44 @@ def _normalize_garment_type(label: str) -> Optional[str]:
     return None
 
 
+async def _classifier_input(image_png: bytes) -> tuple[bytes, str]:
+    """Small JPEG derivative of ``image_png`` for classification, or the PNG itself."""
+
+    if GARMENT_TYPE_THUMBNAIL_PX <= 0:
+        return image_png, "image/png"
+    try:
+        thumbnail = await make_jpeg_thumbnail_async(
+            image_png, max_px=GARMENT_TYPE_THUMBNAIL_PX, quality=GARMENT_TYPE_THUMBNAIL_QUALITY
+        )
+    except ImageDecodeError:
+        LOGGER.warning("garment thumbnail failed; classifying the source image")
+        return image_png, "image/png"
+    return thumbnail, "image/jpeg"
+
+
+async def _classify_with_genai(image_bytes: bytes, mime_type: str) -> str:
+    instruction = (
+        "From the attached garment image, classify coverage for try-on. "
+        "Return ONLY one word: top (upper body), bottom (lower body), or full (one piece covering upper+lower like dress/jumpsuit/romper/overalls). "
+        "Output: top|bottom|full."
+    )
+    parts = [
+        types.Part.from_text(text=instruction),
+        types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+    ]
+    _metrics.genai_upload_bytes += len(image_bytes)
+    try:
+        resp = await genai_generate_with_retries(parts, attempts=2)
+        t = normalize_garment_type(first_text(resp) or "")
+        return t or "full"
+    except Exception:
+        return "full"
+
+
 async def classify_garment_type(image_png: bytes, override: Optional[str] = None) -> str:
     """Classify garment coverage. Returns one of: top|bottom|full."""
 
-    normalized_override = _normalize_garment_type(override or "") if override else None
+    normalized_override = normalize_garment_type(override or "") if override else None
     if normalized_override:
         return normalized_override
     if not GARMENT_TYPE_CLASSIFY:
@@ -208,10 +486,11 @@ async def classify_garment_type(image_png: bytes, override: Optional[str] = None
 
     loop = asyncio.get_running_loop()
     image_hash = _hash_bytes(image_png)
-    now = loop.time()
-    cached_entry = _garment_type_cache.get(image_hash)
-    if cached_entry and cached_entry[0] > now:
-        return cached_entry[1]["type"]
+    cached = _garment_type_cache.get(image_hash, loop.time())
+    if cached:
+        _metrics.hits += 1
+        return cached["type"]
+    _metrics.misses += 1
 
     redis_client = await get_redis_client()
     redis_key = _cache_key(image_hash)
@@ -224,17 +503,14 @@ async def classify_garment_type(image_png: bytes, override: Optional[str] = None
             redis_client = None
         else:
             if payload:
-                _garment_type_cache[image_hash] = (
-                    loop.time() + GARMENT_TYPE_TTL_SECONDS,
-                    payload,
-                )
+                _metrics.redis_hits += 1
+                _remember(image_hash, payload, loop.time())
                 return payload["type"]
 
     lock_token = uuid.uuid4().hex
     redis_lock_acquired = False
     lock_client: Any | None = None
-    local_lock: asyncio.Lock | None = None
-    local_lock_acquired = False
+    local_lock: _SingleflightLock | None = None
     try:
         if redis_client:
             try:
@@ -245,25 +521,21 @@ async def classify_garment_type(image_png: bytes, override: Optional[str] = None
             else:
                 if not redis_lock_acquired:
                     deadline = loop.time() + GARMENT_TYPE_LOCK_WAIT_SECONDS
-                    payload = await _wait_for_redis_payload(redis_client, redis_key, lock_key, deadline=deadline)
+                    payload = await _wait_for_redis_payload(
+                        redis_client, image_hash, redis_key, lock_key, deadline=deadline
+                    )
                     if payload:
-                        if GARMENT_TYPE_TTL_SECONDS > 0:
-                            _garment_type_cache[image_hash] = (
-                                loop.time() + GARMENT_TYPE_TTL_SECONDS,
-                                payload,
-                            )
+                        _metrics.redis_hits += 1
+                        _remember(image_hash, payload, loop.time())
                         return payload["type"]
                 else:
                     lock_client = redis_client
         if not redis_lock_acquired:
-            local_lock = await _get_local_singleflight_lock(image_hash)
-            await local_lock.acquire()
-            local_lock_acquired = True
+            local_lock = await _acquire_local_lock(image_hash)
 
-        now = loop.time()
-        cached_entry = _garment_type_cache.get(image_hash)
-        if cached_entry and cached_entry[0] > now:
-            return cached_entry[1]["type"]
+        cached = _garment_type_cache.get(image_hash, loop.time())
+        if cached:
+            return cached["type"]
 
         if redis_client:
             try:
@@ -273,55 +545,42 @@ async def classify_garment_type(image_png: bytes, override: Optional[str] = None
                 redis_client = None
             else:
                 if payload:
-                    if GARMENT_TYPE_TTL_SECONDS > 0:
-                        _garment_type_cache[image_hash] = (
-                            loop.time() + GARMENT_TYPE_TTL_SECONDS,
-                            payload,
-                        )
+                    _metrics.redis_hits += 1
+                    _remember(image_hash, payload, loop.time())
                     return payload["type"]
 
-        instruction = (
-            "From the attached garment image, classify coverage for try-on. "
-            "Return ONLY one word: top (upper body), bottom (lower body), or full (one piece covering upper+lower like dress/jumpsuit/romper/overalls). "
-            "Output: top|bottom|full."
-        )
-        parts = [
-            types.Part.from_text(text=instruction),
-            types.Part.from_bytes(data=image_png, mime_type="image/png"),
-        ]
-        try:
-            resp = await genai_generate_with_retries(parts, attempts=2)
-            label_text: Optional[str] = None
-            for candidate in getattr(resp, "candidates", []) or []:
-                content = getattr(candidate, "content", None)
-                prts = getattr(content, "parts", None) if content is not None else None
-                if not prts:
-                    continue
-                for part in prts:
-                    if getattr(part, "text", None):
-                        label_text = part.text
-                        break
-                if label_text:
-                    break
-            t = _normalize_garment_type(label_text or "")
-            garment_type = t or "full"
-        except Exception:
-            garment_type = "full"
-        payload = _build_cache_payload(garment_type, origin="classifier", ts=time.time())
-        if GARMENT_TYPE_TTL_SECONDS > 0:
-            _garment_type_cache[image_hash] = (
-                loop.time() + GARMENT_TYPE_TTL_SECONDS,
-                payload,
+        # The cache key stays the hash of ``image_png``; only the classifiers see the thumbnail.
+        classify_bytes, mime_type = await _classifier_input(image_png)
+        signature = await _signature(classify_bytes)
+        if signature is not None:
+            payload = _garment_type_cache.get_similar(signature, loop.time())
+            if payload:
+                _metrics.perceptual_hits += 1
+                _remember(image_hash, payload, loop.time(), signature)
+                return payload["type"]
+
+        garment_type = await preclassify_garment_type(classify_bytes)
+        if garment_type is not None:
+            _metrics.preclassified += 1
+            payload = _build_cache_payload(
+                garment_type, origin="preclassifier", ts=time.time(), model_id=PRECLASSIFIER_MODEL_ID
             )
-        if redis_client and GARMENT_TYPE_TTL_SECONDS > 0:
+        else:
+            _metrics.classifications += 1
+            garment_type = await _classify_with_genai(classify_bytes, mime_type)
+            payload = _build_cache_payload(garment_type, origin="classifier", ts=time.time())
+        _remember(image_hash, payload, loop.time(), signature)
+        if redis_client:
             try:
-                await _redis_set_payload(redis_client, redis_key, payload)
+                if GARMENT_TYPE_TTL_SECONDS > 0:
+                    await _redis_set_payload(redis_client, redis_key, payload)
+                await _publish_result(redis_client, image_hash, payload)
             except Exception as exc:  # pragma: no cover - network errors
                 await record_redis_failure(exc)
         return garment_type
     finally:
-        if local_lock_acquired and local_lock is not None and local_lock.locked():
-            local_lock.release()
+        if local_lock is not None:
+            _release_local_lock(image_hash, local_lock)
         if lock_client is not None and redis_lock_acquired:
             try:
                 await _release_redis_lock(lock_client, lock_key, lock_token)
@@ -329,4 +588,29 @@ async def classify_garment_type(image_png: bytes, override: Optional[str] = None
                 pass
 
 
-__all__ = ["classify_garment_type"]
+async def remember_garment_type(image_png: bytes, garment_type: str, *, origin: str, model_id: str = MODEL) -> None:
+    """Seed the cache for ``image_png`` with a type learned elsewhere, such as a combined listing call."""
+
+    normalized = normalize_garment_type(garment_type)
+    if not normalized or not GARMENT_TYPE_CLASSIFY:
+        return
+    image_hash = _hash_bytes(image_png)
+    payload = _build_cache_payload(normalized, origin=origin, ts=time.time(), model_id=model_id)
+    _remember(image_hash, payload, asyncio.get_running_loop().time(), await _signature(image_png))
+    redis_client = await get_redis_client()
+    if redis_client and GARMENT_TYPE_TTL_SECONDS > 0:
+        try:
+            await _redis_set_payload(redis_client, _cache_key(image_hash), payload)
+            await _publish_result(redis_client, image_hash, payload)
+        except Exception as exc:  # pragma: no cover - network errors
+            await record_redis_failure(exc)
+
+
+__all__ = [
+    "GarmentCacheMetrics",
+    "classify_garment_type",
+    "get_garment_cache_stats",
+    "normalize_garment_type",
+    "remember_garment_type",
+    "stop_result_listener",
+]
@@ -0,0 +1,276 @@
+"""CPU garment-type pre-classifier consulted before the GenAI classifier.
+
+Features come from the garment silhouette. The image is shrunk to 96 px and the
+background colour is estimated from the border (or the alpha channel is used).
+The foreground mask then gives the bounding-box aspect, fill ratio, width per
+horizontal band, the share of lower rows split into two legs, and the vertical
+centroid. A multinomial logistic regression turns these into top/bottom/full
+probabilities. Its weights are stored as JSON next to this module and trained
+with ``python -m backend.benchmarks.garment_preclassifier``. Busy backgrounds,
+tiny foregrounds and low-confidence predictions return ``None``, so the caller
+falls back to GenAI.
+"""
+from __future__ import annotations
+
+import json
+import math
+import statistics
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Sequence
+
+from PIL import Image
+
+from backend.config import (
+    GARMENT_PRECLASSIFY,
+    GARMENT_PRECLASSIFY_MODEL,
+    GARMENT_PRECLASSIFY_THRESHOLD,
+    LOGGER,
+)
+from backend.services.imaging import run_in_image_pool
+
+LABELS = ("top", "bottom", "full")
+FEATURE_NAMES = (
+    "log_aspect",
+    "fill",
+    "band_1",
+    "band_2",
+    "band_3",
+    "band_4",
+    "band_5",
+    "band_6",
+    "leg_split",
+    "centroid_y",
+)
+DEFAULT_MODEL_PATH = Path(__file__).with_name("garment_precheck_model.json")
+# Recorded as ``model_id`` in garment cache entries answered locally.
+PRECLASSIFIER_MODEL_ID = "garment-precheck-logreg-v1"
+
+_SIZE = 96
+# Max per-channel difference from the background colour still counted as background.
+_FOREGROUND_DELTA = 40
+# Mean border deviation above which the background is too busy to segment.
+_BUSY_BORDER = 18.0
+_MIN_FOREGROUND = 0.03
+_BANDS = 6
+
+
+@dataclass(slots=True)
+class PreclassifierModel:
+    """Standardisation constants plus one weight row and bias per label."""
+
+    means: list[float]
+    scales: list[float]
+    weights: list[list[float]]
+    biases: list[float]
+    labels: tuple[str, ...] = LABELS
+
+    def probabilities(self, features: Sequence[float]) -> list[float]:
+        z = [(value - mean) / scale for value, mean, scale in zip(features, self.means, self.scales)]
+        logits = [sum(w * x for w, x in zip(row, z)) + bias for row, bias in zip(self.weights, self.biases)]
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict(self, features: Sequence[float]) -> tuple[str, float]:
+        probs = self.probabilities(features)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    def to_json(self) -> str:
+        payload = asdict(self)
+        payload["labels"] = list(self.labels)
+        payload["features"] = list(FEATURE_NAMES)
+        return json.dumps(payload, indent=2)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "PreclassifierModel":
+        payload = json.loads(raw)
+        if payload.get("features") != list(FEATURE_NAMES):
+            raise ValueError("pre-classifier model was trained on a different feature set")
+        return cls(
+            means=payload["means"],
+            scales=payload["scales"],
+            weights=payload["weights"],
+            biases=payload["biases"],
+            labels=tuple(payload["labels"]),
+        )
+
+
+def _foreground_mask(img: Image.Image) -> tuple[list[bool], int, int] | None:
+    w, h = img.size
+    border_idx = (
+        list(range(w))
+        + list(range((h - 1) * w, h * w))
+        + [row * w for row in range(1, h - 1)]
+        + [row * w + w - 1 for row in range(1, h - 1)]
+    )
+    if "A" in img.getbands():
+        alpha = list(img.getchannel("A").getdata())
+        if max(alpha[i] for i in border_idx) < 16:
+            return [value >= 128 for value in alpha], w, h
+    pixels = list(img.convert("RGB").getdata())
+    border = [pixels[i] for i in border_idx]
+    background = tuple(statistics.median(p[c] for p in border) for c in range(3))
+
+    def delta(pixel: tuple[int, int, int]) -> float:
+        return max(abs(pixel[0] - background[0]), abs(pixel[1] - background[1]), abs(pixel[2] - background[2]))
+
+    if statistics.fmean(delta(p) for p in border) > _BUSY_BORDER:
+        return None
+    return [delta(p) > _FOREGROUND_DELTA for p in pixels], w, h
+
+
+def _runs(row: Sequence[bool]) -> list[tuple[int, int]]:
+    runs: list[tuple[int, int]] = []
+    start = None
+    for idx, filled in enumerate(row):
+        if filled and start is None:
+            start = idx
+        elif not filled and start is not None:
+            runs.append((start, idx))
+            start = None
+    if start is not None:
+        runs.append((start, len(row)))
+    return runs
+
+
+def extract_features(image_bytes: bytes) -> list[float] | None:
+    """Silhouette features in ``FEATURE_NAMES`` order; ``None`` when the garment cannot be segmented."""
+
+    with Image.open(BytesIO(image_bytes)) as img:
+        img.draft("RGB", (_SIZE * 2, _SIZE * 2))
+        small = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        small.thumbnail((_SIZE, _SIZE))
+    segmented = _foreground_mask(small)
+    if segmented is None:
+        return None
+    mask, w, h = segmented
+    rows = [[mask[r * w + c] for c in range(w)] for r in range(h)]
+    filled_rows = [r for r in range(h) if any(rows[r])]
+    filled_cols = [c for c in range(w) if any(rows[r][c] for r in range(h))]
+    if not filled_rows or not filled_cols:
+        return None
+    top, bottom = filled_rows[0], filled_rows[-1] + 1
+    left, right = filled_cols[0], filled_cols[-1] + 1
+    bw, bh = right - left, bottom - top
+    count = sum(mask)
+    if count < _MIN_FOREGROUND * w * h or bw < 4 or bh < 4:
+        return None
+    box = [row[left:right] for row in rows[top:bottom]]
+
+    spans = []
+    for row in box:
+        runs = _runs(row)
+        spans.append((runs[-1][1] - runs[0][0]) / bw if runs else 0.0)
+    bands = []
+    for band in range(_BANDS):
+        lo, hi = band * bh // _BANDS, max((band + 1) * bh // _BANDS, band * bh // _BANDS + 1)
+        bands.append(statistics.fmean(spans[lo:hi]))
+
+    lower = box[int(bh * 0.65) :]
+    split = sum(1 for row in lower if len([run for run in _runs(row) if run[1] - run[0] >= 2]) >= 2)
+    centroid = sum(r * sum(row) for r, row in enumerate(box)) / (count * bh)
+
+    return [
+        math.log(bh / bw),
+        count / (bw * bh),
+        *bands,
+        split / max(len(lower), 1),
+        centroid,
+    ]
+
+
+def train_model(
+    samples: Sequence[tuple[Sequence[float], str]],
+    *,
+    epochs: int = 400,
+    learning_rate: float = 0.5,
+    l2: float = 1e-3,
+) -> PreclassifierModel:
+    """Fit a softmax regression on ``(features, label)`` pairs with full-batch gradient descent."""
+
+    n_features = len(FEATURE_NAMES)
+    columns = [[features[j] for features, _ in samples] for j in range(n_features)]
+    means = [statistics.fmean(col) for col in columns]
+    scales = [statistics.pstdev(col) or 1.0 for col in columns]
+    xs = [[(f[j] - means[j]) / scales[j] for j in range(n_features)] for f, _ in samples]
+    ys = [LABELS.index(label) for _, label in samples]
+    model = PreclassifierModel(
+        means=means,
+        scales=scales,
+        weights=[[0.0] * n_features for _ in LABELS],
+        biases=[0.0] * len(LABELS),
+    )
+    n = len(samples)
+    for _ in range(epochs):
+        grad_w = [[0.0] * n_features for _ in LABELS]
+        grad_b = [0.0] * len(LABELS)
+        for x, y in zip(xs, ys):
+            logits = [sum(w * v for w, v in zip(row, x)) + b for row, b in zip(model.weights, model.biases)]
+            top = max(logits)
+            exps = [math.exp(logit - top) for logit in logits]
+            total = sum(exps)
+            for k in range(len(LABELS)):
+                err = exps[k] / total - (1.0 if k == y else 0.0)
+                grad_b[k] += err
+                row = grad_w[k]
+                for j in range(n_features):
+                    row[j] += err * x[j]
+        for k in range(len(LABELS)):
+            model.biases[k] -= learning_rate * grad_b[k] / n
+            for j in range(n_features):
+                model.weights[k][j] -= learning_rate * (grad_w[k][j] / n + l2 * model.weights[k][j])
+    return model
+
+
+@lru_cache(maxsize=1)
+def load_model(path: str | None = None) -> PreclassifierModel | None:
+    model_path = Path(path or GARMENT_PRECLASSIFY_MODEL or DEFAULT_MODEL_PATH)
+    try:
+        return PreclassifierModel.from_json(model_path.read_text())
+    except (OSError, ValueError, KeyError) as exc:
+        LOGGER.warning("Garment pre-classifier model unavailable: %s", exc)
+        return None
+
+
+def preclassify(image_bytes: bytes, *, threshold: float = GARMENT_PRECLASSIFY_THRESHOLD) -> tuple[str, float] | None:
+    """Return ``(label, confidence)`` when the local model is at least ``threshold`` sure, else ``None``."""
+
+    model = load_model()
+    if model is None:
+        return None
+    features = extract_features(image_bytes)
+    if features is None:
+        return None
+    label, confidence = model.predict(features)
+    return (label, confidence) if confidence >= threshold else None
+
+
+async def preclassify_garment_type(image_bytes: bytes) -> str | None:
+    """Confident local label for ``image_bytes``, or ``None`` to ask GenAI; off unless ``GARMENT_PRECLASSIFY`` is set."""
+
+    if not GARMENT_PRECLASSIFY:
+        return None
+    try:
+        result = await run_in_image_pool(preclassify, image_bytes)
+    except Exception:
+        LOGGER.exception("Garment pre-classifier failed")
+        return None
+    return result[0] if result else None
+
+
+__all__ = [
+    "FEATURE_NAMES",
+    "LABELS",
+    "PRECLASSIFIER_MODEL_ID",
+    "PreclassifierModel",
+    "extract_features",
+    "load_model",
+    "preclassify",
+    "preclassify_garment_type",
+    "train_model",
+]
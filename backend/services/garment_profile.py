@@ -0,0 +1,245 @@
+"""One structured GenAI call for a garment's coverage, description and attributes.
+
+Listings used to cost two text calls on the same photo: the coverage classifier
+in :mod:`backend.services.garment` and the description prompt in
+``routes/description.py``. :func:`generate_garment_profile` asks the text model
+for both at once, plus category, colours and visible brand, using a JSON
+response schema. The coverage answer is written to the garment-type cache under
+the image's hash, so a later ``classify_garment_type`` on the same bytes costs
+nothing. Callers fall back to the plain description prompt when this returns
+``None``.
+
+:func:`find_similar_description` lets a seller's re-upload of the same photo
+(recompressed, resized or with new EXIF) reuse an earlier description written
+for the same seller fields. Its signature must be within
+``DESCRIPTION_REUSE_MAX_DISTANCE`` bits, far tighter than the coverage cache's
+``GARMENT_PHASH_MAX_DISTANCE``, since a description names details that a
+look-alike garment may not share.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import select
+
+from backend.config import DESCRIPTION_REUSE_MAX_DISTANCE, GENAI_TEXT_MODEL, LOGGER
+from backend.db import ProductDescription, db_session
+from backend.prompts import build_listing_profile_prompt
+from backend.services.garment import normalize_garment_type, remember_garment_type
+from backend.services.genai import first_text, genai_generate_with_retries, types
+from backend.services.imaging import run_in_image_pool
+from backend.services.perceptual import ImageSignature, image_signature
+from backend.utils.normalization import normalize_gender
+
+_RESPONSE_SCHEMA = types.Schema(
+    type="OBJECT",
+    properties={
+        "coverage": types.Schema(type="STRING", enum=["top", "bottom", "full"]),
+        "category": types.Schema(type="STRING"),
+        "colors": types.Schema(type="ARRAY", items=types.Schema(type="STRING")),
+        "brand": types.Schema(type="STRING"),
+        "description": types.Schema(type="STRING"),
+    },
+    required=["coverage", "description"],
+)
+_MAX_COLORS = 5
+# Most recent descriptions per user compared against a new upload's signature.
+_REUSE_SCAN_LIMIT = 200
+
+
+@dataclass(slots=True)
+class DescriptionFields:
+    """Seller-provided facts the description must respect."""
+
+    gender: str = ""
+    brand: str = ""
+    model_name: str = ""
+    size: str = ""
+    condition: str = ""
+
+    @classmethod
+    def from_form(cls, **values: str | None) -> "DescriptionFields":
+        return cls(**{name: (value or "").strip() for name, value in values.items()})
+
+    def meta_lines(self) -> list[str]:
+        lines = []
+        if self.brand:
+            lines.append(f"Brand: {self.brand}")
+        if self.model_name:
+            lines.append(f"Model: {self.model_name}")
+        if self.size:
+            lines.append(f"Size: {self.size}")
+        if self.condition:
+            lines.append(f"Condition: {self.condition}")
+        if self.gender:
+            lines.append(f"Gender: {self.gender}")
+        return lines
+
+    def record_values(self) -> dict[str, str | None]:
+        """Column values for a ``ProductDescription`` row."""
+
+        return {
+            "gender": normalize_gender(self.gender) if self.gender else None,
+            "brand": self.brand or None,
+            "model": self.model_name or None,
+            "size": self.size or None,
+            "condition": self.condition or None,
+        }
+
+
+@dataclass(slots=True)
+class GarmentProfile:
+    garment_type: str
+    description: str
+    category: str | None = None
+    colors: list[str] = field(default_factory=list)
+    brand: str | None = None
+
+    def attributes(self) -> dict[str, Any]:
+        return {"category": self.category, "colors": self.colors, "brand": self.brand}
+
+
+@dataclass(slots=True)
+class DescriptionReuseMetrics:
+    lookups: int = 0
+    # Same signature as a stored description's source, typically the same file.
+    exact_hits: int = 0
+    # Signature within DESCRIPTION_REUSE_MAX_DISTANCE but not identical.
+    perceptual_hits: int = 0
+
+    def to_dict(self) -> dict[str, object]:
+        lookups = self.lookups
+        return {
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "hit_rates": {
+                "exact": round(self.exact_hits / lookups, 4) if lookups else None,
+                "perceptual": round(self.perceptual_hits / lookups, 4) if lookups else None,
+            },
+        }
+
+
+_reuse_metrics = DescriptionReuseMetrics()
+
+
+def get_description_reuse_stats() -> dict[str, object]:
+    return _reuse_metrics.to_dict()
+
+
+async def description_signature(image_bytes: bytes) -> ImageSignature | None:
+    """Signature stored with a description, or ``None`` when perceptual reuse is off."""
+
+    if DESCRIPTION_REUSE_MAX_DISTANCE < 0:
+        return None
+    return await run_in_image_pool(image_signature, image_bytes)
+
+
+async def find_similar_description(
+    user_id: str, signature: ImageSignature, fields: DescriptionFields
+) -> str | None:
+    """The closest recent description ``user_id`` got for a near-identical image and the same fields."""
+
+    conditions = [
+        ProductDescription.user_id == user_id,
+        ProductDescription.image_signature.is_not(None),
+    ]
+    for name, value in fields.record_values().items():
+        column = getattr(ProductDescription, name)
+        conditions.append(column.is_(None) if value is None else column == value)
+    async with db_session() as session:
+        res = await session.execute(
+            select(ProductDescription.image_signature, ProductDescription.description)
+            .where(*conditions)
+            .order_by(ProductDescription.created_at.desc(), ProductDescription.id.desc())
+            .limit(_REUSE_SCAN_LIMIT)
+        )
+        rows = res.all()
+    _reuse_metrics.lookups += 1
+    best: tuple[int, str, str] | None = None
+    for stored_hex, description in rows:
+        stored = ImageSignature.from_hex(stored_hex)
+        distance = signature.matches(stored, DESCRIPTION_REUSE_MAX_DISTANCE) if stored else None
+        if distance is not None and (best is None or distance < best[0]):
+            best = (distance, stored_hex, description)
+    if best is None:
+        return None
+    if best[1] == signature.to_hex():
+        _reuse_metrics.exact_hits += 1
+    else:
+        _reuse_metrics.perceptual_hits += 1
+    return best[2]
+
+
+def parse_profile(raw: str | None) -> GarmentProfile | None:
+    """Build a profile from the model's JSON, or ``None`` if coverage or description is unusable."""
+
+    if not raw:
+        return None
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    garment_type = normalize_garment_type(str(data.get("coverage") or ""))
+    description = str(data.get("description") or "").strip()
+    if not garment_type or not description:
+        return None
+    colors = data.get("colors")
+    if not isinstance(colors, list):
+        colors = []
+    return GarmentProfile(
+        garment_type=garment_type,
+        description=description,
+        category=str(data.get("category") or "").strip() or None,
+        colors=[str(c).strip().lower() for c in colors if str(c).strip()][:_MAX_COLORS],
+        brand=str(data.get("brand") or "").strip() or None,
+    )
+
+
+async def generate_garment_profile(
+    image_bytes: bytes,
+    fields: DescriptionFields,
+    *,
+    mime_type: str = "image/png",
+) -> GarmentProfile | None:
+    """Coverage, description and attributes for ``image_bytes`` from one GenAI call.
+
+    Returns ``None`` when the call fails or the answer does not parse; the
+    coverage label is cached under the hash of ``image_bytes`` on success.
+    """
+
+    parts = [
+        types.Part.from_text(text=build_listing_profile_prompt(fields.meta_lines())),
+        types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+    ]
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=_RESPONSE_SCHEMA)
+    try:
+        resp = await genai_generate_with_retries(parts, attempts=2, model=GENAI_TEXT_MODEL, config=config)
+    except Exception:
+        LOGGER.exception("garment profile call failed")
+        return None
+    profile = parse_profile(first_text(resp))
+    if profile is None:
+        LOGGER.warning("garment profile response was not usable JSON")
+        return None
+    await remember_garment_type(image_bytes, profile.garment_type, origin="profile", model_id=GENAI_TEXT_MODEL)
+    return profile
+
+
+__all__ = [
+    "DescriptionFields",
+    "DescriptionReuseMetrics",
+    "GarmentProfile",
+    "description_signature",
+    "find_similar_description",
+    "generate_garment_profile",
+    "get_description_reuse_stats",
+    "parse_profile",
+]
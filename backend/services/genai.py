@@ -38,16 +38,40 @@ def first_inline_image_bytes(response: Any) -> bytes | None:
     return None
 
 
-async def genai_generate_with_retries(parts: list[types.Part], *, attempts: int = 2):
-    """Call GenAI with short retries for transient 5xx/429 errors."""
+def first_text(response: Any) -> str | None:
+    """Return the first non-empty text part from a Gemini response."""
+
+    for candidate in getattr(response, "candidates", []) or []:
+        content = getattr(candidate, "content", None)
+        parts = getattr(content, "parts", None) if content is not None else None
+        for part in parts or []:
+            text = getattr(part, "text", None)
+            if text:
+                return text
+    return None
+
+
+async def genai_generate_with_retries(
+    parts: list[types.Part],
+    *,
+    attempts: int = 2,
+    model: str | None = None,
+    config: types.GenerateContentConfig | None = None,
+):
+    """Call GenAI with short retries for transient 5xx/429 errors.
+
+    ``model`` defaults to the image model; ``config`` carries options such as a
+    structured-output schema.
+    """
 
     last_exc: Exception | None = None
     for i in range(max(1, attempts)):
         try:
             return await asyncio.to_thread(
                 get_client().models.generate_content,
-                model=MODEL,
+                model=model or MODEL,
                 contents=types.Content(role="user", parts=parts),
+                config=config,
             )
         except genai_errors.APIError as exc:
             last_exc = exc
@@ -63,6 +87,7 @@ async def genai_generate_with_retries(parts: list[types.Part], *, attempts: int
 
 __all__ = [
     "first_inline_image_bytes",
+    "first_text",
     "genai_generate_with_retries",
     "get_client",
     "types",
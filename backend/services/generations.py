@@ -0,0 +1,66 @@
+"""Queries and maintenance helpers for the generations table."""
+from __future__ import annotations
+
+import logging
+from typing import Any, Sequence
+
+from sqlalchemy import Select, func, select, text
+
+from backend.db import BACKFILL_LOCK_ID, Generation, db_session, get_engine, try_advisory_lock
+
+LOGGER = logging.getLogger(__name__)
+
+
+def user_generations_query(user_id: str, poses: Sequence[str], *columns: Any) -> Select:
+    """Select a user's generations for the given poses, newest first.
+
+    Served by ``ix_generations_user_pose_created_id`` rather than a JSON filter.
+    """
+
+    stmt = select(*columns).where(Generation.user_id == user_id)
+    if len(poses) == 1:
+        stmt = stmt.where(Generation.pose == poses[0])
+    else:
+        stmt = stmt.where(Generation.pose.in_(list(poses)))
+    return stmt.order_by(Generation.created_at.desc())
+
+
+async def backfill_generation_user_ids(*, chunk_size: int = 1000) -> int:
+    """Copy ``options_json->>'user_id'`` into ``generations.user_id`` for older rows.
+
+    Walks the primary key in fixed-size ranges so each UPDATE touches at most
+    ``chunk_size`` rows and commits on its own, keeping locks short while the API
+    keeps serving traffic. Returns the number of rows updated. Safe to re-run.
+    """
+
+    if get_engine().dialect.name != "postgresql":
+        return 0
+
+    async with try_advisory_lock(BACKFILL_LOCK_ID) as acquired:
+        if not acquired:
+            LOGGER.info("generations user_id backfill already running elsewhere")
+            return 0
+        async with db_session() as session:
+            max_id = (await session.execute(select(func.max(Generation.id)))).scalar() or 0
+
+        updated = 0
+        start = 0
+        while start < max_id:
+            end = start + chunk_size
+            async with db_session() as session:
+                result = await session.execute(
+                    text(
+                        "UPDATE generations SET user_id = options_json->>'user_id' "
+                        "WHERE id > :start AND id <= :end AND user_id IS NULL "
+                        "AND options_json->>'user_id' IS NOT NULL"
+                    ),
+                    {"start": start, "end": end},
+                )
+                updated += result.rowcount or 0
+            start = end
+        if updated:
+            LOGGER.info("backfilled generations.user_id", extra={"rows": updated})
+        return updated
+
+
+__all__ = ["backfill_generation_user_ids", "user_generations_query"]
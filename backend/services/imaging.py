@@ -0,0 +1,318 @@
+"""Image decoding helpers shared by upload and generation endpoints."""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, BinaryIO, Callable, TypeVar, Union
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from backend.config import (
+    IMAGE_MAX_ASPECT_RATIO,
+    IMAGE_MAX_FRAMES,
+    IMAGE_MAX_PIXELS,
+    IMAGE_NORMALIZE_WORKERS,
+    LOGGER,
+)
+
+try:  # optional dependency
+    import pillow_heif  # type: ignore[import-untyped]
+except Exception:  # pragma: no cover - optional dependency guard
+    pillow_heif = None  # type: ignore[assignment]
+
+if pillow_heif is not None:
+    pillow_heif.register_heif_opener()
+    HEIF_SUPPORTED = True
+else:  # pragma: no cover - optional dependency guard
+    HEIF_SUPPORTED = False
+    LOGGER.warning("pillow-heif not installed; HEIC/HEIF uploads will be rejected")
+
+# Backstop for any decode path that skips probing: Pillow raises
+# DecompressionBombError once an image exceeds twice this many pixels.
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+# Longest side kept for stored source images. Browsers upload HEIC/HEIF as-is,
+# so this is the only cap between a 12 MP phone photo and S3 and GenAI.
+SOURCE_IMAGE_MAX_PX = 2048
+
+T = TypeVar("T")
+
+# Raw encoded bytes, or a seekable file object such as an UploadFile spool.
+ImageSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+# Pillow releases the GIL while decoding, resampling and encoding, so a small
+# thread pool keeps CPU-heavy normalization off the event loop.
+_executor: ThreadPoolExecutor | None = None
+
+
+class ImageDecodeError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image."""
+
+
+class ImageLimitError(ImageDecodeError):
+    """Raised when an image header exceeds the configured size limits."""
+
+
+@dataclass(slots=True)
+class ImageProbe:
+    """Header-level metadata read without decoding pixel data."""
+
+    format: str | None
+    width: int
+    height: int
+    mode: str
+    frames: int
+    orientation: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def display_size(self) -> tuple[int, int]:
+        """Width and height after applying the EXIF orientation."""
+
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=IMAGE_NORMALIZE_WORKERS,
+            thread_name_prefix="image-normalize",
+        )
+    return _executor
+
+
+def _read_probe(img: Image.Image) -> ImageProbe:
+    orientation = 1
+    try:
+        orientation = int(img.getexif().get(_EXIF_ORIENTATION_TAG, 1) or 1)
+    except Exception:
+        orientation = 1
+    width, height = img.size
+    return ImageProbe(
+        format=img.format,
+        width=width,
+        height=height,
+        mode=img.mode,
+        frames=max(1, int(getattr(img, "n_frames", 1) or 1)),
+        orientation=orientation,
+    )
+
+
+def enforce_image_limits(probe: ImageProbe) -> None:
+    """Reject images whose header declares oversized or degenerate geometry."""
+
+    if probe.width <= 0 or probe.height <= 0:
+        raise ImageDecodeError("invalid or unsupported image format")
+    if probe.pixels > IMAGE_MAX_PIXELS:
+        raise ImageLimitError(
+            f"image dimensions too large ({probe.width}x{probe.height}, max {IMAGE_MAX_PIXELS} pixels)"
+        )
+    aspect = max(probe.width, probe.height) / float(min(probe.width, probe.height))
+    if aspect > IMAGE_MAX_ASPECT_RATIO:
+        raise ImageLimitError(f"image aspect ratio too extreme (max {IMAGE_MAX_ASPECT_RATIO:g}:1)")
+    if probe.frames > IMAGE_MAX_FRAMES:
+        raise ImageLimitError(f"image has too many frames (max {IMAGE_MAX_FRAMES})")
+
+
+def probe_image_file(fileobj: BinaryIO) -> ImageProbe:
+    """Read dimensions, mode, frame count and orientation from an image header.
+
+    Only the header is parsed; pixel data is never decoded. The stream position is
+    restored afterwards so the caller can still read the full body.
+    """
+
+    position = fileobj.tell()
+    try:
+        try:
+            img = Image.open(fileobj)
+        except Image.DecompressionBombError as exc:
+            raise ImageLimitError("image dimensions too large") from exc
+        except Exception as exc:
+            raise ImageDecodeError("invalid or unsupported image format") from exc
+        # Do not close ``img``: that would close the caller's file object too.
+        return _read_probe(img)
+    finally:
+        fileobj.seek(position)
+
+
+def _stream_size(fileobj: BinaryIO) -> int:
+    position = fileobj.tell()
+    try:
+        fileobj.seek(0, 2)
+        return fileobj.tell()
+    finally:
+        fileobj.seek(position)
+
+
+async def probe_upload(upload: UploadFile, *, max_bytes: int | None = None) -> ImageProbe:
+    """Validate an upload from its spooled file before the body is read.
+
+    Checks the spooled byte size (when known) and the header geometry against the
+    configured limits, raising :class:`ImageLimitError` or :class:`ImageDecodeError`.
+    """
+
+    loop = asyncio.get_running_loop()
+    if max_bytes is not None:
+        size = upload.size
+        if size is None:
+            size = await loop.run_in_executor(_get_executor(), _stream_size, upload.file)
+        if size > max_bytes:
+            raise ImageLimitError(f"image too large (max ~{max_bytes // (1024 * 1024)}MB)")
+    probe = await loop.run_in_executor(_get_executor(), probe_image_file, upload.file)
+    enforce_image_limits(probe)
+    return probe
+
+
+def _open_for_decode(source: ImageSource, max_px: int | None) -> Image.Image:
+    # BytesIO shares the buffer of an immutable bytes object, so this does not copy.
+    fp = BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    try:
+        src = Image.open(fp)
+    except Image.DecompressionBombError as exc:
+        raise ImageLimitError("image dimensions too large") from exc
+    except Exception as exc:
+        raise ImageDecodeError("invalid or unsupported image format") from exc
+    try:
+        enforce_image_limits(_read_probe(src))
+    except ImageDecodeError:
+        src.close()
+        raise
+    if max_px and src.format == "JPEG":
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the target is small enough.
+        src.draft("RGB", (max_px, max_px))
+    return src
+
+
+def normalize_image_to_png(source: ImageSource, *, max_px: int | None = 2048) -> bytes:
+    """Decode JPEG/PNG/WebP/HEIC data and re-encode it as RGBA PNG.
+
+    ``source`` may be encoded bytes or a seekable file object positioned at the start
+    of the image; file objects are read incrementally (never buffered whole) and stay
+    open, so the caller (e.g. ``UploadFile``) closes them.
+
+    Header limits are enforced before any pixels are decoded and EXIF orientation is
+    applied. When ``max_px`` is set the longest side is capped at that size. JPEG
+    sources are downscaled during decode; other formats are reduced with a box
+    pre-filter before the final Lanczos pass.
+    """
+
+    src = _open_for_decode(source, max_px)
+    try:
+        try:
+            ImageOps.exif_transpose(src, in_place=True)
+            img = src.convert("RGBA")
+        except Image.DecompressionBombError as exc:
+            raise ImageLimitError("image dimensions too large") from exc
+        except Exception as exc:
+            raise ImageDecodeError("invalid or unsupported image format") from exc
+        width, height = img.size
+        if max_px and max(width, height) > max_px:
+            scale = max_px / float(max(width, height))
+            new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            img = img.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+        out = BytesIO()
+        img.save(out, format="PNG")
+        # getvalue() hands back the internal buffer without copying once writes stop.
+        return out.getvalue()
+    finally:
+        try:
+            src.close()
+        except Exception:  # pragma: no cover - defensive cleanup
+            pass
+
+
+async def normalize_image_to_png_async(source: ImageSource, *, max_px: int | None = 2048) -> bytes:
+    """Run :func:`normalize_image_to_png` on the shared normalization pool."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        lambda: normalize_image_to_png(source, max_px=max_px),
+    )
+
+
+def make_jpeg_thumbnail(source: ImageSource, *, max_px: int = 384, quality: int = 85) -> bytes:
+    """Decode ``source`` and re-encode a small RGB JPEG derivative for classifiers.
+
+    Transparent pixels are flattened onto white, since JPEG has no alpha. The
+    longest side is capped at ``max_px``, and JPEG sources are downscaled during
+    decode. Limits and EXIF orientation are handled as in :func:`normalize_image_to_png`.
+    """
+
+    src = _open_for_decode(source, max_px)
+    try:
+        try:
+            ImageOps.exif_transpose(src, in_place=True)
+            src.thumbnail((max_px, max_px), Image.LANCZOS, reducing_gap=3.0)
+            img = src.convert("RGBA")
+        except Image.DecompressionBombError as exc:
+            raise ImageLimitError("image dimensions too large") from exc
+        except Exception as exc:
+            raise ImageDecodeError("invalid or unsupported image format") from exc
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+        out = BytesIO()
+        flat.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+    finally:
+        try:
+            src.close()
+        except Exception:  # pragma: no cover - defensive cleanup
+            pass
+
+
+async def make_jpeg_thumbnail_async(source: ImageSource, *, max_px: int = 384, quality: int = 85) -> bytes:
+    """Run :func:`make_jpeg_thumbnail` on the shared normalization pool."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        lambda: make_jpeg_thumbnail(source, max_px=max_px, quality=quality),
+    )
+
+
+async def run_in_image_pool(fn: Callable[..., T], *args: Any) -> T:
+    """Run other CPU-bound Pillow work on the shared normalization pool."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+def shutdown_image_pool() -> None:
+    """Stop the normalization pool, waiting for in-flight work."""
+
+    global _executor
+    executor = _executor
+    _executor = None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+__all__ = [
+    "HEIF_SUPPORTED",
+    "ImageDecodeError",
+    "ImageLimitError",
+    "ImageProbe",
+    "ImageSource",
+    "SOURCE_IMAGE_MAX_PX",
+    "enforce_image_limits",
+    "make_jpeg_thumbnail",
+    "make_jpeg_thumbnail_async",
+    "normalize_image_to_png",
+    "normalize_image_to_png_async",
+    "probe_image_file",
+    "probe_upload",
+    "run_in_image_pool",
+    "shutdown_image_pool",
+]
@@ -0,0 +1,190 @@
+"""Eager garment classification for new listings.
+
+``create_listing`` schedules :func:`classify_listing` right after the listing row
+commits, so the garment type is usually in ``settings_json`` before the first
+``/edit/json`` call arrives. When the seller asked for a description, the same
+task makes one combined GenAI call (:mod:`backend.services.garment_profile`)
+for coverage, description and attributes, which ``/describe`` then reuses.
+Edit routes go through :func:`resolve_garment_type`, which prefers an explicit
+override, then the value stored on the listing, then an eager task still
+running on this worker, and only then classifies inline.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+from sqlalchemy import select
+
+from backend.config import GARMENT_TYPE_CLASSIFY, LISTING_EAGER_CLASSIFY, LOGGER
+from backend.db import Listing, ProductDescription, db_session
+from backend.services.editing import SourceImage
+from backend.services.garment import classify_garment_type
+from backend.services.garment_profile import (
+    DescriptionFields,
+    GarmentProfile,
+    description_signature,
+    find_similar_description,
+    generate_garment_profile,
+)
+
+# Eager classifications still running on this worker, keyed by listing id.
+_pending: dict[str, asyncio.Task[Optional[str]]] = {}
+
+
+def store_description(listing: Listing, description: str, meta_lines: list[str] | None) -> None:
+    """Set ``listing``'s description and remember which seller fields it was written for.
+
+    ``meta_lines`` is ``None`` for custom prompts, which ``/describe`` never reuses.
+    """
+
+    settings = dict(listing.settings_json or {})
+    if meta_lines is None:
+        settings.pop("description_meta", None)
+    else:
+        settings["description_meta"] = meta_lines
+    listing.settings_json = settings
+    listing.description_text = description
+
+
+def apply_profile(listing: Listing, profile: GarmentProfile, fields: DescriptionFields) -> None:
+    """Store a profile's description and attributes on ``listing``, and its type unless one is set."""
+
+    store_description(listing, profile.description, fields.meta_lines())
+    settings = dict(listing.settings_json)
+    if not settings.get("garment_type"):
+        settings.update({"garment_type": profile.garment_type, "garment_type_origin": "model"})
+    settings["attributes"] = profile.attributes()
+    listing.settings_json = settings
+
+
+async def classify_listing(
+    listing_id: str,
+    png_bytes: bytes,
+    *,
+    classify: bool = True,
+    fields: DescriptionFields | None = None,
+    user_id: str | None = None,
+) -> str | None:
+    """Classify a listing's source image and store the result in ``settings_json``.
+
+    With ``fields`` the description and attributes come from the same combined
+    call; if that call fails, only the garment type is classified. When
+    ``user_id`` already has a description for a near-identical image and the
+    same fields, that text is reused and only the (usually cached) garment type
+    is looked up. A garment type already on the row (set by the user or by an
+    earlier edit) is kept and returned instead. Returns ``None`` if the listing
+    is gone or nothing ran.
+    """
+
+    signature = await description_signature(png_bytes) if fields is not None else None
+    reused = None
+    if signature is not None and user_id:
+        reused = await find_similar_description(user_id, signature, fields)
+    profile = None
+    if fields is not None and reused is None:
+        profile = await generate_garment_profile(png_bytes, fields)
+    garment_type = profile.garment_type if profile else None
+    if garment_type is None and classify:
+        garment_type = await classify_garment_type(png_bytes)
+    async with db_session() as session:
+        res = await session.execute(select(Listing).where(Listing.id == listing_id).with_for_update())
+        listing = res.scalars().first()
+        if listing is None:
+            return None
+        if profile is not None:
+            apply_profile(listing, profile, fields)
+        elif reused is not None:
+            store_description(listing, reused, fields.meta_lines())
+        description = profile.description if profile is not None else reused
+        if description is not None:
+            session.add(
+                ProductDescription(
+                    user_id=listing.user_id,
+                    s3_key=listing.source_s3_key,
+                    description=description,
+                    image_signature=signature.to_hex() if signature else None,
+                    **fields.record_values(),
+                )
+            )
+        settings = dict(listing.settings_json or {})
+        if profile is None and garment_type and not settings.get("garment_type"):
+            settings.update({"garment_type": garment_type, "garment_type_origin": "model"})
+            listing.settings_json = settings
+        return settings.get("garment_type") or garment_type
+
+
+async def _classify_listing_logged(
+    listing_id: str,
+    png_bytes: bytes,
+    classify: bool,
+    fields: DescriptionFields | None,
+    user_id: str | None,
+) -> str | None:
+    try:
+        return await classify_listing(listing_id, png_bytes, classify=classify, fields=fields, user_id=user_id)
+    except Exception:
+        LOGGER.exception("eager garment classification failed", extra={"listing_id": listing_id})
+        return None
+
+
+def schedule_listing_classification(
+    listing_id: str,
+    png_bytes: bytes,
+    *,
+    classify: bool = True,
+    fields: DescriptionFields | None = None,
+    user_id: str | None = None,
+) -> bool:
+    """Start :func:`classify_listing` in the background; returns whether a task was started."""
+
+    classify = classify and LISTING_EAGER_CLASSIFY and GARMENT_TYPE_CLASSIFY
+    if not classify and fields is None:
+        return False
+    task = asyncio.create_task(_classify_listing_logged(listing_id, png_bytes, classify, fields, user_id))
+    _pending[listing_id] = task
+
+    def _forget(done: asyncio.Task) -> None:
+        if _pending.get(listing_id) is done:
+            del _pending[listing_id]
+
+    task.add_done_callback(_forget)
+    return True
+
+
+async def wait_for_listing(listing_id: str) -> None:
+    """Wait for this worker's eager task on ``listing_id``, if one is still running."""
+
+    task = _pending.get(listing_id)
+    if task is not None:
+        await asyncio.shield(task)
+
+
+async def resolve_garment_type(source: SourceImage, override: str | None = None) -> str:
+    """Garment type for an edit: override, listing row, in-flight eager task, then inline classification."""
+
+    if override and override.strip():
+        return await classify_garment_type(source.png_bytes, override)
+    listing = source.listing
+    # The studio re-uploads the listing's own file with ``listing_id`` set, so uploads count too.
+    if listing is not None:
+        if listing.garment_type:
+            # Passed as the override so a stale or malformed stored value is still normalized.
+            return await classify_garment_type(source.png_bytes, listing.garment_type)
+        task = _pending.get(listing.id)
+        if task is not None:
+            # Shielded so a cancelled request does not abort the listing's classification.
+            garment_type = await asyncio.shield(task)
+            if garment_type:
+                return garment_type
+    return await classify_garment_type(source.png_bytes)
+
+
+__all__ = [
+    "apply_profile",
+    "classify_listing",
+    "resolve_garment_type",
+    "schedule_listing_classification",
+    "store_description",
+    "wait_for_listing",
+]
@@ -0,0 +1,256 @@
+"""Cached Polar customer meter snapshots for quota checks.
+
+Quota checks read Polar balances from here instead of calling
+``list_customer_meters`` per request. Snapshots are kept per customer in memory
+and in Redis. A snapshot younger than
+``POLAR_METER_CACHE_TTL_SECONDS`` is served as is. An older one, up to
+``POLAR_METER_STALE_SECONDS``, is served while a single background task refreshes
+it. A miss returns ``None`` straight away (callers fall back to local counters)
+and schedules the first fetch, so the request path never waits on Polar.
+Subscription webhooks invalidate a customer's snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from backend.config import LOGGER, POLAR_METER_CACHE_TTL_SECONDS, POLAR_METER_STALE_SECONDS, POLAR_USAGE_METER_ID
+from backend.core.redis import get_redis_client, record_redis_failure, redis_execute
+from backend.services.polar import PolarConfigurationError, list_customer_meters
+from backend.utils.lru import BoundedLRU
+
+_REDIS_PREFIX = "polar_meter"
+_REFRESH_LOCK_SECONDS = 15
+_MAX_LOCAL_ENTRIES = 10_000
+# Caps concurrent Polar calls when many customers go stale at once (e.g. the admin overview).
+_REFRESH_CONCURRENCY = 8
+_MGET_CHUNK = 500
+
+
+@dataclass(slots=True)
+class MeterSnapshot:
+    """Units reported by Polar for one customer; all ``None`` when no meter exists."""
+
+    consumed: int | None
+    credited: int | None
+    balance: int | None
+    fetched_at: float
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+_local: BoundedLRU[str, MeterSnapshot] = BoundedLRU(_MAX_LOCAL_ENTRIES)
+_refresh_tasks: dict[str, asyncio.Task] = {}
+# Monotonic time of the last failed fetch per customer; retried after the fresh TTL.
+_failed_at: BoundedLRU[str, float] = BoundedLRU(_MAX_LOCAL_ENTRIES)
+_refresh_slots = asyncio.Semaphore(_REFRESH_CONCURRENCY)
+
+
+def _sanitize_units(value: Any) -> int | None:
+    try:
+        number = int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+    return max(number, 0)
+
+
+def _select_meter_record(meters: list[dict[str, Any]]) -> dict[str, Any] | None:
+    if not meters:
+        return None
+    if POLAR_USAGE_METER_ID:
+        for meter in meters:
+            if meter.get("meter_id") == POLAR_USAGE_METER_ID:
+                return meter
+            inner = meter.get("meter")
+            if isinstance(inner, dict) and inner.get("id") == POLAR_USAGE_METER_ID:
+                return meter
+    return meters[0]
+
+
+def _redis_key(user_id: str) -> str:
+    return f"{_REDIS_PREFIX}:{user_id}"
+
+
+async def _store(user_id: str, snapshot: MeterSnapshot) -> None:
+    _local[user_id] = snapshot
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return
+    try:
+        payload = json.dumps(asdict(snapshot))
+        await redis_execute(lambda: redis_client.set(_redis_key(user_id), payload, ex=POLAR_METER_STALE_SECONDS))
+    except Exception as exc:
+        await record_redis_failure(exc)
+
+
+def _decode_snapshot(raw: Any) -> MeterSnapshot | None:
+    if not raw:
+        return None
+    try:
+        return MeterSnapshot(**json.loads(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _load_shared(user_ids: list[str]) -> dict[str, MeterSnapshot]:
+    redis_client = await get_redis_client()
+    if redis_client is None or not user_ids:
+        return {}
+    found: dict[str, MeterSnapshot] = {}
+    try:
+        for start in range(0, len(user_ids), _MGET_CHUNK):
+            chunk = user_ids[start : start + _MGET_CHUNK]
+            values = await redis_execute(lambda: redis_client.mget([_redis_key(user_id) for user_id in chunk]))
+            for user_id, raw in zip(chunk, values or []):
+                snapshot = _decode_snapshot(raw)
+                if snapshot is not None:
+                    found[user_id] = snapshot
+    except Exception as exc:
+        await record_redis_failure(exc)
+    return found
+
+
+async def _claim_refresh(user_id: str) -> bool:
+    """Let one worker refresh a customer at a time; always ``True`` without Redis."""
+
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return True
+    try:
+        return bool(
+            await redis_execute(
+                lambda: redis_client.set(f"{_REDIS_PREFIX}:refresh:{user_id}", "1", nx=True, ex=_REFRESH_LOCK_SECONDS)
+            )
+        )
+    except Exception as exc:
+        await record_redis_failure(exc)
+        return True
+
+
+async def fetch_meter_snapshot(user_id: str) -> MeterSnapshot | None:
+    """Load the customer's meter from Polar and cache it.
+
+    Without Polar credentials an empty snapshot is cached, so callers keep using
+    local counters without rescheduling a fetch on every request.
+    """
+
+    try:
+        meters = await list_customer_meters(external_customer_id=user_id, meter_id=POLAR_USAGE_METER_ID or None)
+    except PolarConfigurationError:
+        meters = []
+    meter = _select_meter_record(meters) or {}
+    snapshot = MeterSnapshot(
+        consumed=_sanitize_units(meter.get("consumed_units")),
+        credited=_sanitize_units(meter.get("credited_units")),
+        balance=_sanitize_units(meter.get("balance")),
+        fetched_at=time.time(),
+    )
+    await _store(user_id, snapshot)
+    return snapshot
+
+
+async def _refresh(user_id: str) -> None:
+    try:
+        async with _refresh_slots:
+            if await _claim_refresh(user_id):
+                await fetch_meter_snapshot(user_id)
+        _failed_at.pop(user_id, None)
+    except Exception:
+        _failed_at[user_id] = time.monotonic()
+        LOGGER.exception("Failed to refresh Polar customer meter", extra={"user_id": user_id})
+    finally:
+        if _refresh_tasks.get(user_id) is asyncio.current_task():
+            del _refresh_tasks[user_id]
+
+
+def _schedule_refresh(user_id: str) -> None:
+    if user_id in _refresh_tasks:
+        return
+    failed_at = _failed_at.get(user_id)
+    if failed_at is not None and time.monotonic() - failed_at < POLAR_METER_CACHE_TTL_SECONDS:
+        return
+    _refresh_tasks[user_id] = asyncio.create_task(_refresh(user_id))
+
+
+async def get_meter_snapshots(user_ids: list[str]) -> dict[str, MeterSnapshot]:
+    """Return cached snapshots for ``user_ids`` without waiting on Polar.
+
+    Customers whose local copy is stale are looked up in Redis with batched
+    ``MGET`` calls. Missing or stale ones are refreshed in the background, at most
+    ``_REFRESH_CONCURRENCY`` at a time.
+    """
+
+    snapshots: dict[str, MeterSnapshot] = {}
+    lookup: list[str] = []
+    for user_id in user_ids:
+        snapshot = _local.get(user_id)
+        if snapshot is not None:
+            snapshots[user_id] = snapshot
+        if snapshot is None or snapshot.age() >= POLAR_METER_CACHE_TTL_SECONDS:
+            lookup.append(user_id)
+    for user_id, shared in (await _load_shared(lookup)).items():
+        current = snapshots.get(user_id)
+        if current is None or shared.fetched_at > current.fetched_at:
+            snapshots[user_id] = shared
+            _local[user_id] = shared
+    for user_id in lookup:
+        snapshot = snapshots.get(user_id)
+        if snapshot is not None and snapshot.age() >= POLAR_METER_STALE_SECONDS:
+            del snapshots[user_id]
+            snapshot = None
+        if snapshot is None or snapshot.age() >= POLAR_METER_CACHE_TTL_SECONDS:
+            _schedule_refresh(user_id)
+    return snapshots
+
+
+async def get_meter_snapshot(user_id: str) -> MeterSnapshot | None:
+    """Return the cached snapshot without waiting on Polar, refreshing it in the background when due."""
+
+    return (await get_meter_snapshots([user_id])).get(user_id)
+
+
+async def record_meter_usage(user_id: str, amount: int) -> None:
+    """Apply a local charge to the cached snapshot until Polar reports it."""
+
+    snapshot = _local.get(user_id)
+    if snapshot is None or amount <= 0:
+        return
+    if snapshot.consumed is not None:
+        snapshot.consumed += amount
+    if snapshot.balance is not None:
+        snapshot.balance = max(snapshot.balance - amount, 0)
+    await _store(user_id, snapshot)
+
+
+async def invalidate_meter_snapshot(user_id: str) -> None:
+    """Drop the customer's snapshot everywhere and fetch a new one in the background."""
+
+    _local.pop(user_id, None)
+    _failed_at.pop(user_id, None)
+    # A fetch already in flight may have read the pre-webhook state.
+    pending = _refresh_tasks.pop(user_id, None)
+    if pending is not None:
+        pending.cancel()
+    redis_client = await get_redis_client()
+    if redis_client is not None:
+        try:
+            await redis_execute(
+                lambda: redis_client.delete(_redis_key(user_id), f"{_REDIS_PREFIX}:refresh:{user_id}")
+            )
+        except Exception as exc:
+            await record_redis_failure(exc)
+    _schedule_refresh(user_id)
+
+
+__all__ = [
+    "MeterSnapshot",
+    "fetch_meter_snapshot",
+    "get_meter_snapshot",
+    "get_meter_snapshots",
+    "invalidate_meter_snapshot",
+    "record_meter_usage",
+]
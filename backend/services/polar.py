@@ -1,8 +1,19 @@
-"""Helpers for interacting with the Polar API."""
+"""Helpers for interacting with the Polar API.
+
+The subscription plan catalog is shared through Redis: ``polar_plans:catalog``
+holds one JSON entry per plan and ``polar_plans:meta`` a version stamp plus the
+time of the last Polar fetch. Each worker keeps a local copy and compares the
+version at most every ``_PLAN_VERSION_CHECK_SECONDS``. Reads never wait on Polar.
+Once the catalog is older than ``POLAR_PLAN_CACHE_TTL_SECONDS``, it is served
+stale while one worker, holding ``polar_plans:refresh``, fetches and publishes a
+new version. Webhooks merge single plans in through ``upsert_plan_from_payload``.
+"""
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
+import json
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from typing import Any, Dict, Iterable, Optional
 
@@ -11,7 +22,8 @@ from polar_sdk import Polar, models as polar_models
 from polar_sdk.sdkconfiguration import SERVER_PRODUCTION, SERVER_SANDBOX, SERVERS
 from sqlalchemy import select
 
-from backend.config import LOGGER, POLAR_API_BASE, POLAR_OAT, POLAR_ORG_ID
+from backend.config import LOGGER, POLAR_API_BASE, POLAR_OAT, POLAR_ORG_ID, POLAR_PLAN_CACHE_TTL_SECONDS
+from backend.core.redis import get_redis_client, record_redis_failure, redis_execute
 from backend.db import SubscriptionPlan, db_session
 
 
@@ -37,12 +49,33 @@ class PolarPlan:
     is_active: bool
 
 
+@dataclass(slots=True)
+class _PlanCatalog:
+    """This worker's copy of the plan catalog."""
+
+    plans: dict[str, PolarPlan]
+    # Redis version stamp the copy matches; 0 when it was not loaded from Redis.
+    version: int
+    # Wall time of the Polar fetch behind it; 0.0 when seeded from the database.
+    fetched_at: float
+    # Monotonic time of the last version check against Redis.
+    checked_at: float
+
+
 _sdk: Polar | None = None
 _sdk_lock = asyncio.Lock()
-_plan_cache: dict[str, PolarPlan] = {}
-_plan_cache_expiry: float = 0.0
+
+_PLAN_REDIS_CATALOG = "polar_plans:catalog"
+_PLAN_REDIS_META = "polar_plans:meta"
+_PLAN_REDIS_LOCK = "polar_plans:refresh"
+_PLAN_VERSION_CHECK_SECONDS = 5.0
+_PLAN_REFRESH_LOCK_SECONDS = 60
+_PLAN_REFRESH_RETRY_SECONDS = 30.0
+
+_catalog: _PlanCatalog | None = None
 _plan_cache_lock = asyncio.Lock()
-_PLAN_CACHE_TTL_SECONDS = 300.0
+_plan_refresh_task: asyncio.Task | None = None
+_plan_refresh_failed_at: float | None = None
 
 
 def _resolve_server() -> tuple[Optional[str], Optional[str]]:
@@ -207,15 +240,8 @@ async def _persist_plans(plans: Iterable[PolarPlan]) -> None:
                 )
 
 
-async def refresh_plan_cache(force: bool = False) -> dict[str, PolarPlan]:
-    """Fetch subscription plans from Polar and refresh cache/DB."""
-
-    global _plan_cache_expiry
-
-    now = asyncio.get_running_loop().time()
-    async with _plan_cache_lock:
-        if not force and _plan_cache and now < _plan_cache_expiry:
-            return dict(_plan_cache)
+async def _fetch_plans() -> list[PolarPlan]:
+    """Page through the recurring, non-archived Polar products."""
 
     client = await _get_client()
     request_kwargs: dict[str, Any] = {
@@ -253,58 +279,266 @@ async def refresh_plan_cache(force: bool = False) -> dict[str, PolarPlan]:
         else:
             break
 
-    plans = [_plan_from_product(item) for item in products if item.get("id")]
+    return [_plan_from_product(item) for item in products if item.get("id")]
+
+
+def _plan_from_record(record: SubscriptionPlan) -> PolarPlan:
+    return PolarPlan(
+        id=record.id,
+        name=record.name,
+        allowance=record.allowance,
+        interval=record.interval,
+        currency=record.currency,
+        default_price_id=record.default_price_id,
+        metadata=record.metadata_json or {},
+        is_active=record.is_active,
+    )
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _decode_plan(raw: Any) -> PolarPlan | None:
+    try:
+        return PolarPlan(**json.loads(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _load_shared_catalog(redis_client: Any, known_version: int | None) -> _PlanCatalog | None:
+    """Read the catalog from Redis unless its version stamp matches ``known_version``."""
+
+    raw_version = await redis_execute(lambda: redis_client.hget(_PLAN_REDIS_META, "version"))
+    if raw_version is None or int(raw_version) == known_version:
+        return None
+
+    async def read() -> list[Any]:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(_PLAN_REDIS_META)
+            pipe.hgetall(_PLAN_REDIS_CATALOG)
+            return await pipe.execute()
+
+    meta, raw_plans = await redis_execute(read)
+    meta = {_text(key): _text(value) for key, value in (meta or {}).items()}
+    plans = {}
+    for raw in (raw_plans or {}).values():
+        plan = _decode_plan(raw)
+        if plan is not None:
+            plans[plan.id] = plan
+    return _PlanCatalog(
+        plans=plans,
+        version=int(meta.get("version", 0)),
+        fetched_at=float(meta.get("fetched_at", 0.0)),
+        checked_at=time.monotonic(),
+    )
+
+
+async def _publish_plans(plans: list[PolarPlan], *, fetched_at: float | None) -> int | None:
+    """Write plans to Redis and bump the version stamp.
+
+    With ``fetched_at`` the list replaces the whole catalog; without it the plans
+    are merged in (webhook updates). Returns the new version, or ``None`` without Redis.
+    """
+
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return None
+
+    async def write() -> int:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if fetched_at is not None:
+                pipe.delete(_PLAN_REDIS_CATALOG)
+                pipe.hset(_PLAN_REDIS_META, "fetched_at", repr(fetched_at))
+            if plans:
+                pipe.hset(_PLAN_REDIS_CATALOG, mapping={plan.id: json.dumps(asdict(plan)) for plan in plans})
+            pipe.hincrby(_PLAN_REDIS_META, "version", 1)
+            results = await pipe.execute()
+        return int(results[-1])
+
+    try:
+        return await redis_execute(write)
+    except Exception as exc:
+        await record_redis_failure(exc)
+        return None
+
+
+async def _load_db_catalog() -> _PlanCatalog | None:
+    async with db_session() as session:
+        result = await session.execute(select(SubscriptionPlan))
+        plans = {record.id: _plan_from_record(record) for record in result.scalars()}
+    if not plans:
+        return None
+    # fetched_at=0 marks the rows as due for a refresh from Polar.
+    return _PlanCatalog(plans=plans, version=0, fetched_at=0.0, checked_at=time.monotonic())
+
+
+async def _sync_catalog() -> _PlanCatalog | None:
+    """Adopt a newer shared catalog, or seed from the database on a cold start."""
 
-    await _persist_plans(plans)
+    global _catalog
 
     async with _plan_cache_lock:
-        _plan_cache.clear()
-        _plan_cache.update({plan.id: plan for plan in plans})
-        _plan_cache_expiry = asyncio.get_running_loop().time() + _PLAN_CACHE_TTL_SECONDS
-        return dict(_plan_cache)
+        catalog = _catalog
+        if catalog is not None and time.monotonic() - catalog.checked_at < _PLAN_VERSION_CHECK_SECONDS:
+            return catalog
+        redis_client = await get_redis_client()
+        if redis_client is not None:
+            try:
+                shared = await _load_shared_catalog(redis_client, catalog.version if catalog else None)
+                if shared is not None:
+                    catalog = shared
+            except Exception as exc:
+                await record_redis_failure(exc)
+        if catalog is None:
+            catalog = await _load_db_catalog()
+        if catalog is not None:
+            catalog.checked_at = time.monotonic()
+        _catalog = catalog
+        return catalog
+
+
+async def _refresh_plans(*, force: bool) -> dict[str, PolarPlan] | None:
+    """Fetch plans from Polar, persist them and publish a new catalog version.
+
+    Unless ``force`` is set, only the worker holding the Redis refresh lock fetches;
+    the others pick the result up at their next version check.
+    """
+
+    global _catalog, _plan_refresh_failed_at
+
+    try:
+        if not force and not await _claim_plan_refresh():
+            return None
+        plans = await _fetch_plans()
+        await _persist_plans(plans)
+        fetched_at = time.time()
+        version = await _publish_plans(plans, fetched_at=fetched_at)
+        _catalog = _PlanCatalog(
+            plans={plan.id: plan for plan in plans},
+            version=version or 0,
+            fetched_at=fetched_at,
+            checked_at=time.monotonic(),
+        )
+        _plan_refresh_failed_at = None
+        return dict(_catalog.plans)
+    except Exception:
+        _plan_refresh_failed_at = time.monotonic()
+        if force:
+            raise
+        LOGGER.exception("Background Polar plan refresh failed")
+        return None
+
+
+async def _claim_plan_refresh() -> bool:
+    redis_client = await get_redis_client()
+    if redis_client is None:
+        return True
+    try:
+        return bool(
+            await redis_execute(lambda: redis_client.set(_PLAN_REDIS_LOCK, "1", nx=True, ex=_PLAN_REFRESH_LOCK_SECONDS))
+        )
+    except Exception as exc:
+        await record_redis_failure(exc)
+        return True
+
+
+def _start_plan_refresh(*, force: bool) -> asyncio.Task:
+    global _plan_refresh_task
+
+    async def run() -> dict[str, PolarPlan] | None:
+        global _plan_refresh_task
+        try:
+            return await _refresh_plans(force=force)
+        finally:
+            if _plan_refresh_task is asyncio.current_task():
+                _plan_refresh_task = None
+
+    _plan_refresh_task = asyncio.create_task(run())
+    return _plan_refresh_task
+
+
+def _schedule_plan_refresh() -> None:
+    if _plan_refresh_task is not None:
+        return
+    if _plan_refresh_failed_at is not None and time.monotonic() - _plan_refresh_failed_at < _PLAN_REFRESH_RETRY_SECONDS:
+        return
+    _start_plan_refresh(force=False)
+
+
+async def _current_catalog() -> _PlanCatalog | None:
+    catalog = _catalog
+    if catalog is None or time.monotonic() - catalog.checked_at >= _PLAN_VERSION_CHECK_SECONDS:
+        catalog = await _sync_catalog()
+    if catalog is None or time.time() - catalog.fetched_at >= POLAR_PLAN_CACHE_TTL_SECONDS:
+        _schedule_plan_refresh()
+    return catalog
+
+
+async def refresh_plan_cache(force: bool = False) -> dict[str, PolarPlan]:
+    """Return the plan catalog.
+
+    Without ``force`` this never waits on Polar: the cached catalog is returned
+    (possibly stale or empty) and a background refresh is started when due. With
+    ``force`` the caller waits for a fetch, joining the one already in flight.
+    """
+
+    if not force:
+        catalog = await _current_catalog()
+        return dict(catalog.plans) if catalog else {}
+
+    task = _plan_refresh_task
+    if task is not None:
+        plans = await asyncio.shield(task)
+        if plans is not None:
+            return plans
+    task = _plan_refresh_task or _start_plan_refresh(force=True)
+    plans = await asyncio.shield(task)
+    if plans is None:
+        catalog = _catalog
+        return dict(catalog.plans) if catalog else {}
+    return plans
 
 
 async def list_cached_plans() -> list[PolarPlan]:
-    """Return cached plans, refreshing if necessary."""
+    """Return cached plans without waiting on Polar; empty until the first fetch lands."""
 
     plans = await refresh_plan_cache(force=False)
     return list(plans.values())
 
 
 async def get_plan(plan_id: str, *, refresh: bool = True) -> PolarPlan | None:
+    """Look up a plan in the cached catalog, falling back to its database row.
+
+    An unknown ``plan_id`` starts a background refresh when ``refresh`` is set and
+    the catalog was not fetched within the last ``_PLAN_REFRESH_RETRY_SECONDS``.
+    """
+
     if not plan_id:
         return None
-    async with _plan_cache_lock:
-        plan = _plan_cache.get(plan_id)
-    if plan and not refresh:
+    catalog = await _current_catalog()
+    plan = catalog.plans.get(plan_id) if catalog else None
+    if plan is not None:
         return plan
 
-    if refresh or plan is None:
-        plans = await refresh_plan_cache(force=plan is None)
-        plan = plans.get(plan_id)
-
-    if plan is None:
-        # Last attempt: try loading from DB without hitting the API again.
-        async with db_session() as session:
-            record = await session.get(SubscriptionPlan, plan_id)
-            if record:
-                plan = PolarPlan(
-                    id=record.id,
-                    name=record.name,
-                    allowance=record.allowance,
-                    interval=record.interval,
-                    currency=record.currency,
-                    default_price_id=record.default_price_id,
-                    metadata=record.metadata_json or {},
-                    is_active=record.is_active,
-                )
-                async with _plan_cache_lock:
-                    _plan_cache[plan.id] = plan
+    async with db_session() as session:
+        record = await session.get(SubscriptionPlan, plan_id)
+        if record:
+            plan = _plan_from_record(record)
+    if plan is not None:
+        if catalog is not None:
+            catalog.plans[plan.id] = plan
+    elif refresh and (catalog is None or time.time() - catalog.fetched_at >= _PLAN_REFRESH_RETRY_SECONDS):
+        _schedule_plan_refresh()
     return plan
 
 
 async def upsert_plan_from_payload(product: dict[str, Any] | None) -> PolarPlan | None:
-    """Update plan cache/DB using a product payload embedded in a webhook."""
+    """Apply a product payload embedded in a webhook to the DB and the shared catalog.
+
+    The plan is merged into the Redis catalog under a new version stamp, so every
+    worker picks it up at its next version check without refetching from Polar.
+    """
 
     product_data = _coerce_dict(product)
     if not product_data or not product_data.get("id"):
@@ -312,9 +546,14 @@ async def upsert_plan_from_payload(product: dict[str, Any] | None) -> PolarPlan
 
     plan = _plan_from_product(product_data)
     await _persist_plans([plan])
-    async with _plan_cache_lock:
-        _plan_cache[plan.id] = plan
-        return plan
+    version = await _publish_plans([plan], fetched_at=None)
+    catalog = _catalog
+    if catalog is not None:
+        catalog.plans[plan.id] = plan
+        # Skip ahead only if no other update landed in between; otherwise reload at the next check.
+        if version is not None and version == catalog.version + 1:
+            catalog.version = version
+    return plan
 
 
 async def create_checkout_session(
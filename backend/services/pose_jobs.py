@@ -0,0 +1,174 @@
+"""Background pose-description jobs behind ``POST /pose/describe``.
+
+:func:`start_pose_job` records the batch in ``pose_description_jobs`` and
+returns at once. Publishing the Celery group talks to the broker, so it runs on
+a thread. When tasks run in-process (eager mode, ``CELERY_FORCE_INLINE`` or an
+unreachable broker) the batch becomes an asyncio task on this worker instead.
+
+:func:`get_pose_job` reports per-key progress. A key with a
+``pose_descriptions`` row is done. Other keys take their Celery task state,
+read from the result backend on a thread, or the inline task's result. Each
+key is allowed ``POSE_DESCRIPTION_BATCH_TIMEOUT``, so a job whose keys run one
+after another still finishes in time; keys unfinished once the job's share has
+passed count as failed.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import select
+
+from backend.config import LOGGER
+from backend.db import PoseDescription, PoseDescriptionJob, db_session
+from backend.tasks import (
+    POSE_BATCH_TIMEOUT,
+    enqueue_pose_descriptions,
+    generate_pose_description,
+    inline_execution,
+    pose_task_states,
+)
+
+_TERMINAL = frozenset({"done", "failed"})
+
+# Results of inline jobs running on this worker: job id -> S3 key -> progress.
+_inline_progress: dict[str, dict[str, dict[str, Any]]] = {}
+_inline_tasks: set[asyncio.Task] = set()
+
+
+def _now_utc() -> datetime:
+    return datetime.utcnow()
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    # psycopg returns timezone-aware values for DateTime(timezone=True); SQLite returns naive ones.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _deadline(job: PoseDescriptionJob) -> datetime:
+    # Workers (and the inline runner) may describe the keys one at a time.
+    return _as_naive_utc(job.created_at) + timedelta(seconds=POSE_BATCH_TIMEOUT * max(len(job.s3_keys), 1))
+
+
+@dataclass(slots=True)
+class PoseJobStatus:
+    job_id: str
+    items: list[dict[str, Any]]
+    inline: bool
+
+    @property
+    def state(self) -> str:
+        return "done" if all(item["state"] in _TERMINAL for item in self.items) else "running"
+
+    def to_dict(self) -> dict[str, Any]:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for item in self.items:
+            counts[item["state"]] += 1
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "total": len(self.items),
+            **counts,
+            "inline": self.inline,
+            "items": self.items,
+        }
+
+
+async def _run_inline(job_id: str, keys: list[str]) -> None:
+    progress = _inline_progress.setdefault(job_id, {})
+    for key in keys:
+        progress[key] = {"state": "running"}
+        try:
+            result = await generate_pose_description(key)
+        except Exception as exc:
+            LOGGER.exception("Inline pose description failed for %s", key)
+            progress[key] = {"state": "failed", "error": str(exc)}
+        else:
+            progress[key] = {"state": "done"} if result.get("ok") else {"state": "failed", "error": result.get("error")}
+    # Other workers and later polls fall back to pose_descriptions once this is dropped.
+    asyncio.get_running_loop().call_later(POSE_BATCH_TIMEOUT, _inline_progress.pop, job_id, None)
+
+
+def _start_inline(job_id: str, keys: list[str]) -> None:
+    _inline_progress[job_id] = {key: {"state": "queued"} for key in keys}
+    task = asyncio.create_task(_run_inline(job_id, keys))
+    _inline_tasks.add(task)
+    task.add_done_callback(_inline_tasks.discard)
+
+
+async def _job_status(job: PoseDescriptionJob) -> PoseJobStatus:
+    keys = list(job.s3_keys)
+    async with db_session() as session:
+        res = await session.execute(select(PoseDescription.s3_key).where(PoseDescription.s3_key.in_(keys)))
+        described = {row[0] for row in res.all()}
+    pending = [key for key in keys if key not in described]
+    if job.task_ids is not None:
+        task_ids = {key: job.task_ids[key] for key in pending if key in job.task_ids}
+        states = await asyncio.to_thread(pose_task_states, task_ids) if task_ids else {}
+    else:
+        states = _inline_progress.get(job.id, {})
+    expired = _deadline(job) < _now_utc()
+    items = []
+    for key in keys:
+        item = {"s3_key": key, "state": "done"} if key in described else {"s3_key": key, **states.get(key, {"state": "queued"})}
+        if expired and item["state"] not in _TERMINAL:
+            item = {"s3_key": key, "state": "failed", "error": "timed out"}
+        items.append(item)
+    return PoseJobStatus(job_id=job.id, items=items, inline=job.task_ids is None)
+
+
+async def get_pose_job(job_id: str) -> PoseJobStatus | None:
+    async with db_session() as session:
+        job = await session.get(PoseDescriptionJob, job_id)
+    if job is None:
+        return None
+    return await _job_status(job)
+
+
+async def _running_job_covering(keys: list[str]) -> PoseJobStatus | None:
+    """The latest job, if it is still running and already covers ``keys``."""
+
+    async with db_session() as session:
+        res = await session.execute(select(PoseDescriptionJob).order_by(PoseDescriptionJob.created_at.desc()).limit(1))
+        job = res.scalars().first()
+    if job is None or not set(keys) <= set(job.s3_keys):
+        return None
+    status = await _job_status(job)
+    return status if status.state == "running" else None
+
+
+async def start_pose_job(keys: list[str]) -> tuple[PoseJobStatus, bool]:
+    """Queue descriptions for ``keys`` without waiting on Celery.
+
+    Returns the job's initial status and whether a new job was created; a
+    repeated request while an earlier job still covers every key gets that job.
+    """
+
+    existing = await _running_job_covering(keys)
+    if existing is not None:
+        return existing, False
+
+    task_ids: dict[str, str] | None = None
+    job_id = uuid.uuid4().hex
+    if not inline_execution():
+        try:
+            outcome = await asyncio.to_thread(enqueue_pose_descriptions, keys, wait=False)
+        except Exception:
+            LOGGER.exception("Failed to publish pose description tasks; running inline")
+        else:
+            job_id, task_ids = outcome["job_id"], outcome["task_ids"]
+
+    async with db_session() as session:
+        session.add(PoseDescriptionJob(id=job_id, s3_keys=keys, task_ids=task_ids))
+    if task_ids is None:
+        _start_inline(job_id, keys)
+    items = [{"s3_key": key, "state": "queued"} for key in keys]
+    return PoseJobStatus(job_id=job_id, items=items, inline=task_ids is None), True
+
+
+__all__ = ["PoseJobStatus", "get_pose_job", "start_pose_job"]
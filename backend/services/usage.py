@@ -1,119 +1,97 @@
 """Subscription usage helpers and quota enforcement."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import uuid
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, Iterable
 
-from sqlalchemy import Select, select
+from sqlalchemy import DateTime, Integer, Select, String, and_, delete, event, func, insert, literal, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.config import POLAR_USAGE_EVENT_NAME, POLAR_USAGE_METER_ID
-from backend.db import Subscription, SubscriptionPlan, UsageCounter, db_session
-from backend.services.polar import (
-    PolarAPIError,
-    PolarConfigurationError,
-    PolarPlan,
-    get_plan,
-    ingest_events,
-    list_customer_meters,
+from backend.config import POLAR_USAGE_EVENT_NAME, POLAR_USAGE_METER_ID, QUOTA_RESERVATION_TTL_SECONDS
+from backend.core.redis import get_redis_client, record_redis_failure, redis_execute
+from backend.db import (
+    USAGE_LOCK_CLASS,
+    Subscription,
+    SubscriptionPlan,
+    UsageCounter,
+    UsageEvent,
+    UsageReservation,
+    db_session,
 )
+from backend.services.meter_cache import MeterSnapshot, get_meter_snapshot, get_meter_snapshots, record_meter_usage
+from backend.services.polar import PolarPlan, get_plan
+from backend.services.usage_outbox import enqueue_usage_event
 
 _ACTIVE_STATUSES = {"active", "trialing", "past_due"}
+# Ledger action for charges made without naming one; routes pass their usage cost key.
+DEFAULT_USAGE_ACTION = "usage"
 
 LOGGER = logging.getLogger(__name__)
 
+_meter_charge_tasks: set[asyncio.Task] = set()
+
 
 def _now_utc() -> datetime:
     return datetime.utcnow()
 
 
-def _sanitize_units(value: Any) -> int | None:
-    try:
-        number = int(round(float(value)))
-    except (TypeError, ValueError):
-        return None
-    return max(number, 0)
+def _as_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
-def _select_meter_record(meters: list[dict[str, Any]]) -> dict[str, Any] | None:
-    if not meters:
-        return None
-    if POLAR_USAGE_METER_ID:
-        for meter in meters:
-            if meter.get("meter_id") == POLAR_USAGE_METER_ID:
-                return meter
-            inner = meter.get("meter")
-            if isinstance(inner, dict) and inner.get("id") == POLAR_USAGE_METER_ID:
-                return meter
-    return meters[0]
-
-
-async def _enrich_summary_with_polar_meter(summary: "UsageSummary") -> "UsageSummary":
-    if not (POLAR_USAGE_METER_ID or POLAR_USAGE_EVENT_NAME):
-        return summary
-
-    try:
-        meters = await list_customer_meters(
-            external_customer_id=summary.user_id,
-            meter_id=POLAR_USAGE_METER_ID or None,
-        )
-    except PolarConfigurationError:
-        return summary
-    except PolarAPIError:
-        LOGGER.exception("Failed to load Polar customer meters", extra={"user_id": summary.user_id})
-        return summary
-    except Exception:  # pragma: no cover - defensive
-        LOGGER.exception("Unexpected error while loading Polar customer meters", extra={"user_id": summary.user_id})
-        return summary
+def _meter_enrichment_enabled() -> bool:
+    return bool(POLAR_USAGE_METER_ID or POLAR_USAGE_EVENT_NAME)
 
-    meter = _select_meter_record(meters)
-    if not meter:
-        return summary
 
-    consumed = _sanitize_units(meter.get("consumed_units"))
-    credited = _sanitize_units(meter.get("credited_units"))
-    balance = _sanitize_units(meter.get("balance"))
-
-    if credited is not None:
-        summary.allowance = max(credited, summary.allowance)
-    if consumed is not None:
-        summary.used = max(consumed, 0)
-    if balance is not None:
-        summary.remaining = max(balance, 0)
-    else:
+def _apply_meter_snapshot(summary: "UsageSummary", snapshot: MeterSnapshot) -> "UsageSummary":
+    if snapshot.credited is not None:
+        summary.allowance = max(snapshot.credited, summary.allowance)
+    if snapshot.consumed is not None:
+        summary.used = max(snapshot.consumed, 0)
+    if snapshot.balance is not None:
+        summary.remaining = max(snapshot.balance, 0)
+    elif snapshot.consumed is not None or snapshot.credited is not None:
         summary.remaining = max(summary.allowance - summary.used, 0)
     return summary
 
 
-async def _ingest_usage_event(user_id: str, amount: int, metadata: dict[str, Any] | None = None) -> None:
-    if amount <= 0 or not POLAR_USAGE_EVENT_NAME:
-        return
+async def _enrich_summary_with_polar_meter(summary: "UsageSummary", *, pending: int = 0) -> "UsageSummary":
+    """Overlay the cached Polar meter; ``pending`` units charged in an open transaction count as used."""
 
-    payload_metadata: dict[str, Any] = {"amount": int(amount)}
-    if POLAR_USAGE_METER_ID:
-        payload_metadata["meter_id"] = POLAR_USAGE_METER_ID
-    if metadata:
-        payload_metadata.update(metadata)
+    if not _meter_enrichment_enabled():
+        return summary
 
-    event = {
-        "name": POLAR_USAGE_EVENT_NAME,
-        "external_customer_id": user_id,
-        "metadata": payload_metadata,
-    }
+    snapshot = await get_meter_snapshot(summary.user_id)
+    if snapshot is None:
+        return summary
+    if pending > 0:
+        snapshot = MeterSnapshot(
+            consumed=None if snapshot.consumed is None else snapshot.consumed + pending,
+            credited=snapshot.credited,
+            balance=None if snapshot.balance is None else max(snapshot.balance - pending, 0),
+            fetched_at=snapshot.fetched_at,
+        )
+    return _apply_meter_snapshot(summary, snapshot)
 
-    try:
-        await ingest_events([event])
-    except PolarConfigurationError:
-        LOGGER.debug("Polar not configured for usage ingestion")
-    except PolarAPIError:
-        LOGGER.exception("Failed to ingest Polar usage event", extra={"user_id": user_id, "amount": amount})
-    except Exception:  # pragma: no cover - defensive
-        LOGGER.exception("Unexpected error during Polar usage ingestion", extra={"user_id": user_id, "amount": amount})
+
+def _record_meter_usage_after_commit(session: AsyncSession, user_id: str, amount: int) -> None:
+    """Charge the shared meter snapshot once ``session`` commits; a rollback leaves it untouched."""
+
+    def on_commit(_session) -> None:
+        task = asyncio.get_running_loop().create_task(record_meter_usage(user_id, amount))
+        _meter_charge_tasks.add(task)
+        task.add_done_callback(_meter_charge_tasks.discard)
+
+    event.listen(session.sync_session, "after_commit", on_commit, once=True)
 
 
 @dataclass(slots=True)
@@ -132,6 +110,7 @@ class UsageSummary:
     remaining: int
     period_start: datetime | None
     period_end: datetime | None
+    reserved: int = 0
 
     def to_dict(self) -> dict[str, Any]:
         period_start = self.period_start.isoformat() if self.period_start else None
@@ -148,6 +127,7 @@ class UsageSummary:
             "allowance": self.allowance,
             "used": self.used,
             "remaining": self.remaining,
+            "reserved": self.reserved,
             "current_period_start": period_start,
             "current_period_end": period_end,
             "period": {
@@ -256,7 +236,7 @@ def _build_summary(
     user_id: str,
     subscription: Subscription | None,
     plan: SubscriptionPlan | None,
-    usage: UsageCounter | None,
+    used: int,
 ) -> UsageSummary:
     plan_id = subscription.plan_id if subscription else None
     plan_name = plan.name if plan else None
@@ -265,7 +245,6 @@ def _build_summary(
     status = subscription.status if subscription else None
     cancel_at_period_end = bool(subscription.cancel_at_period_end) if subscription else False
     allowance = max(plan.allowance, 0) if plan else 0
-    used = usage.used if usage else 0
     period_start = subscription.current_period_start if subscription else None
     period_end = subscription.current_period_end if subscription else None
 
@@ -290,7 +269,7 @@ def _build_summary(
     )
 
 
-async def get_usage_summary(user_id: str) -> UsageSummary:
+async def _load_usage_summary(user_id: str) -> UsageSummary:
     subscription: Subscription | None = None
     plan: SubscriptionPlan | None = None
     usage: UsageCounter | None = None
@@ -301,7 +280,7 @@ async def get_usage_summary(user_id: str) -> UsageSummary:
             plan = await session.get(SubscriptionPlan, subscription.plan_id)
         usage = await _ensure_usage_record(session, user_id, subscription)
 
-    summary = _build_summary(user_id, subscription, plan, usage)
+    summary = _build_summary(user_id, subscription, plan, usage.used if usage else 0)
     if subscription and subscription.plan_id and plan is None:
         polar_plan = await get_plan(subscription.plan_id, refresh=False)
         if polar_plan:
@@ -310,6 +289,19 @@ async def get_usage_summary(user_id: str) -> UsageSummary:
     return summary
 
 
+def _apply_reserved(summary: UsageSummary, reserved: int) -> UsageSummary:
+    summary.reserved = reserved
+    summary.remaining = max(summary.remaining - reserved, 0)
+    return summary
+
+
+async def get_usage_summary(user_id: str) -> UsageSummary:
+    """Current period usage; ``remaining`` excludes units held by open reservations."""
+
+    summary = await _load_usage_summary(user_id)
+    return _apply_reserved(summary, await _reserved_units(user_id))
+
+
 async def ensure_can_consume(user_id: str, amount: int = 1) -> UsageSummary:
     summary = await get_usage_summary(user_id)
     if amount > 0 and summary.remaining < amount:
@@ -317,49 +309,385 @@ async def ensure_can_consume(user_id: str, amount: int = 1) -> UsageSummary:
     return summary
 
 
+@dataclass(slots=True)
+class QuotaReservation:
+    """Units held for an in-flight generation until charged, released or expired."""
+
+    id: str
+    user_id: str
+    amount: int
+    expires_at: datetime
+    action: str = DEFAULT_USAGE_ACTION
+    # "redis" or "db"; ``None`` when nothing is held (zero-cost actions).
+    store: str | None = None
+    released: bool = False
+
+
+_RESERVATION_KEY_PREFIX = "quota:reservations"
+
+# Per-user sorted set: member "<id>:<amount>", score = expiry in ms. Expired holds
+# are dropped, the rest summed, and the new hold added only if it still fits, all
+# atomically. Returns {accepted, units held before this reservation}.
+_RESERVE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local held = 0
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+  held = held + tonumber(string.match(member, ':(%d+)$'))
+end
+if held + tonumber(ARGV[4]) > tonumber(ARGV[5]) then
+  return {0, held}
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[6])
+return {1, held}
+"""
+
+
+def _reservation_key(user_id: str) -> str:
+    return f"{_RESERVATION_KEY_PREFIX}:{user_id}"
+
+
+def _reservation_member(reservation: QuotaReservation) -> str:
+    return f"{reservation.id}:{reservation.amount}"
+
+
+def _epoch_ms(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+async def _reserved_units_redis(redis_client: Any, user_id: str) -> int:
+    members = await redis_execute(
+        lambda: redis_client.zrangebyscore(_reservation_key(user_id), _epoch_ms(_now_utc()), "+inf")
+    )
+    held = 0
+    for member in members or []:
+        raw = member.decode() if isinstance(member, bytes) else str(member)
+        held += int(raw.rsplit(":", 1)[-1])
+    return held
+
+
+async def _reserved_units_db(user_id: str) -> int:
+    async with db_session() as session:
+        res = await session.execute(
+            select(func.coalesce(func.sum(UsageReservation.amount), 0)).where(
+                UsageReservation.user_id == user_id,
+                UsageReservation.expires_at > _now_utc(),
+            )
+        )
+        return int(res.scalar() or 0)
+
+
+async def _reserved_units(user_id: str) -> int:
+    redis_client = await get_redis_client()
+    if redis_client is not None:
+        try:
+            return await _reserved_units_redis(redis_client, user_id)
+        except Exception as exc:
+            await record_redis_failure(exc)
+    return await _reserved_units_db(user_id)
+
+
+async def _hold_in_redis(redis_client: Any, reservation: QuotaReservation, limit: int, ttl_seconds: int) -> tuple[bool, int]:
+    accepted, held = await redis_execute(
+        lambda: redis_client.eval(
+            _RESERVE_SCRIPT,
+            1,
+            _reservation_key(reservation.user_id),
+            _epoch_ms(_now_utc()),
+            _epoch_ms(reservation.expires_at),
+            _reservation_member(reservation),
+            reservation.amount,
+            limit,
+            ttl_seconds * 1000,
+        )
+    )
+    return bool(int(accepted)), int(held)
+
+
+async def _hold_in_db(reservation: QuotaReservation, limit: int) -> tuple[bool, int]:
+    now = _now_utc()
+    user_id = reservation.user_id
+    async with db_session() as session:
+        if session.bind.dialect.name == "postgresql":
+            # Serialise holds per user for the rest of this transaction; the check
+            # below would otherwise read a snapshot that misses concurrent inserts.
+            await session.execute(text("SELECT pg_advisory_xact_lock(:cls, hashtext(:uid))"), {"cls": USAGE_LOCK_CLASS, "uid": user_id})
+        await session.execute(
+            delete(UsageReservation).where(UsageReservation.user_id == user_id, UsageReservation.expires_at <= now)
+        )
+        held = (
+            select(func.coalesce(func.sum(UsageReservation.amount), 0))
+            .where(UsageReservation.user_id == user_id)
+            .scalar_subquery()
+        )
+        stmt = insert(UsageReservation).from_select(
+            ["id", "user_id", "amount", "expires_at", "created_at"],
+            select(
+                literal(reservation.id, String),
+                literal(user_id, String),
+                literal(reservation.amount, Integer),
+                literal(reservation.expires_at, DateTime(timezone=True)),
+                literal(now, DateTime(timezone=True)),
+            ).where(held + reservation.amount <= limit),
+        )
+        if (await session.execute(stmt)).rowcount:
+            return True, 0
+        return False, int((await session.execute(select(held))).scalar() or 0)
+
+
+async def reserve_quota(
+    user_id: str,
+    amount: int = 1,
+    *,
+    action: str = DEFAULT_USAGE_ACTION,
+    ttl_seconds: int = QUOTA_RESERVATION_TTL_SECONDS,
+) -> QuotaReservation:
+    """Hold ``amount`` units for an in-flight generation, or raise :class:`QuotaError`.
+
+    Holds live in a per-user Redis sorted set, or in ``usage_reservations`` when
+    Redis is unavailable, and count against ``remaining`` until the generation is
+    charged with :func:`commit_reservation` or the hold is dropped with
+    :func:`release_reservation`. A hold that is never released expires after
+    ``ttl_seconds``. The charge itself is still enforced by the conditional upsert
+    in :func:`consume_quota_with_session`.
+    """
+
+    reservation = QuotaReservation(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        amount=max(int(amount), 0),
+        expires_at=_now_utc() + timedelta(seconds=ttl_seconds),
+        action=action,
+    )
+    if reservation.amount == 0:
+        return reservation
+
+    summary = await _load_usage_summary(user_id)
+    store = "db"
+    redis_client = await get_redis_client()
+    if redis_client is not None:
+        try:
+            accepted, held = await _hold_in_redis(redis_client, reservation, summary.remaining, ttl_seconds)
+            store = "redis"
+        except Exception as exc:
+            await record_redis_failure(exc)
+    if store == "db":
+        accepted, held = await _hold_in_db(reservation, summary.remaining)
+    if not accepted:
+        raise QuotaError(_apply_reserved(summary, held))
+    reservation.store = store
+    return reservation
+
+
+async def commit_reservation(
+    session: AsyncSession,
+    reservation: QuotaReservation,
+    *,
+    generation_id: int | None = None,
+) -> UsageSummary:
+    """Charge the reserved units inside the caller's transaction.
+
+    Call :func:`release_reservation` once that transaction has committed so the
+    units are not counted twice.
+    """
+
+    return await consume_quota_with_session(
+        session,
+        reservation.user_id,
+        reservation.amount,
+        action=reservation.action,
+        generation_id=generation_id,
+    )
+
+
+async def release_reservation(reservation: QuotaReservation | None) -> None:
+    """Drop the hold; safe to call more than once. Failures leave it to expire."""
+
+    if reservation is None or reservation.released or reservation.store is None:
+        return
+    reservation.released = True
+    try:
+        if reservation.store == "redis":
+            redis_client = await get_redis_client()
+            if redis_client is None:
+                return
+            await redis_execute(
+                lambda: redis_client.zrem(_reservation_key(reservation.user_id), _reservation_member(reservation))
+            )
+        else:
+            async with db_session() as session:
+                await session.execute(delete(UsageReservation).where(UsageReservation.id == reservation.id))
+    except Exception:
+        LOGGER.warning(
+            "failed to release quota reservation; it will expire",
+            extra={"user_id": reservation.user_id, "reservation_id": reservation.id},
+        )
+
+
+async def _select_subscription_with_plan(
+    session,
+    user_id: str,
+) -> tuple[Subscription | None, SubscriptionPlan | None]:
+    stmt = (
+        select(Subscription, SubscriptionPlan)
+        .outerjoin(SubscriptionPlan, SubscriptionPlan.id == Subscription.plan_id)
+        .where(Subscription.user_id == user_id)
+        .order_by(Subscription.current_period_end.desc().nullslast(), Subscription.created_at.desc())
+        .limit(1)
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+
+def _dialect_insert(session):
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - only Postgres and SQLite are deployed or tested
+        raise RuntimeError(f"atomic quota consumption not supported on {dialect}")
+    return insert
+
+
+async def _current_used(session, user_id: str, period_start: datetime | None) -> int:
+    if period_start is None:
+        return 0
+    res = await session.execute(
+        select(UsageCounter.used).where(UsageCounter.user_id == user_id, UsageCounter.period_start == period_start)
+    )
+    return int(res.scalar() or 0)
+
+
+async def append_usage_events(session: AsyncSession, events: list[dict[str, Any]]) -> None:
+    """Append ledger rows (``user_id``, ``action``, ``amount``, ...) with one multi-row insert."""
+
+    if events:
+        await session.execute(insert(UsageEvent), events)
+
+
 async def consume_quota_with_session(
     session: AsyncSession,
     user_id: str,
     amount: int = 1,
+    *,
+    action: str = DEFAULT_USAGE_ACTION,
+    generation_id: int | None = None,
 ) -> UsageSummary:
-    subscription = await _select_subscription(session, user_id)
-    plan = await session.get(SubscriptionPlan, subscription.plan_id) if subscription and subscription.plan_id else None
-    usage = await _ensure_usage_record(session, user_id, subscription)
+    """Charge ``amount`` units to the user's current period, or raise :class:`QuotaError`.
+
+    The charge is one ``INSERT ... ON CONFLICT DO UPDATE ... WHERE used + n <= allowance
+    RETURNING used`` statement, so concurrent consumers can never push ``used`` past the
+    allowance and no row is read and written back from Python. That counter is the
+    per-period aggregate summaries read; the same transaction appends the charge to
+    the ``usage_events`` ledger.
+    """
 
-    summary = _build_summary(user_id, subscription, plan, usage)
-    if amount > 0 and summary.remaining < amount:
-        raise QuotaError(summary)
     if amount <= 0:
+        subscription = await _select_subscription(session, user_id)
+        plan = await session.get(SubscriptionPlan, subscription.plan_id) if subscription and subscription.plan_id else None
+        usage = await _ensure_usage_record(session, user_id, subscription)
+        summary = _build_summary(user_id, subscription, plan, usage.used if usage else 0)
         if subscription and subscription.plan_id and plan is None:
             polar_plan = await get_plan(subscription.plan_id, refresh=False)
             if polar_plan:
                 summary.apply_plan(polar_plan)
         return await _enrich_summary_with_polar_meter(summary)
 
-    if not subscription or usage is None:
-        raise QuotaError(summary)
-
-    usage.used += amount
-    usage.updated_at = _now_utc()
-    summary = _build_summary(user_id, subscription, plan, usage)
-
+    subscription, plan = await _select_subscription_with_plan(session, user_id)
+    polar_plan: PolarPlan | None = None
     if subscription and subscription.plan_id and plan is None:
         polar_plan = await get_plan(subscription.plan_id, refresh=False)
+
+    def summarize(used: int) -> UsageSummary:
+        summary = _build_summary(user_id, subscription, plan, used)
         if polar_plan:
             summary.apply_plan(polar_plan)
+        return summary
+
+    period_start = subscription.current_period_start if subscription else None
+    allowance = summarize(0).allowance
+    if period_start is None or amount > allowance:
+        raise QuotaError(summarize(await _current_used(session, user_id, period_start)))
 
-    metadata: dict[str, Any] = {}
-    if subscription and subscription.plan_id:
+    period_end = subscription.current_period_end
+    now = _now_utc()
+    # A period that already ended (renewal webhook not yet received) starts from zero,
+    # matching the reset applied by _ensure_usage_record.
+    expired = bool(period_end and _as_naive_utc(period_end) <= now)
+
+    dialect_insert = _dialect_insert(session)
+    stmt = dialect_insert(UsageCounter).values(
+        user_id=user_id,
+        period_start=period_start,
+        period_end=period_end,
+        used=amount,
+        created_at=now,
+        updated_at=now,
+    )
+    new_used = stmt.excluded.used if expired else UsageCounter.used + stmt.excluded.used
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UsageCounter.user_id, UsageCounter.period_start],
+        set_={"used": new_used, "period_end": stmt.excluded.period_end, "updated_at": stmt.excluded.updated_at},
+        where=new_used <= allowance,
+    ).returning(UsageCounter.used)
+    used = (await session.execute(stmt)).scalar()
+    if used is None:
+        raise QuotaError(summarize(await _current_used(session, user_id, period_start)))
+
+    summary = summarize(int(used))
+    await append_usage_events(
+        session,
+        [
+            {
+                "user_id": user_id,
+                "action": action,
+                "amount": amount,
+                "generation_id": generation_id,
+                "period_start": period_start,
+                "created_at": now,
+            }
+        ],
+    )
+    metadata: dict[str, Any] = {"action": action}
+    if subscription.plan_id:
         metadata["plan_id"] = subscription.plan_id
-    await _ingest_usage_event(user_id, amount, metadata or None)
+    enqueue_usage_event(session, user_id, amount, metadata)
+    _record_meter_usage_after_commit(session, user_id, amount)
 
-    summary = await _enrich_summary_with_polar_meter(summary)
-    return summary
+    return await _enrich_summary_with_polar_meter(summary, pending=amount)
+
+
+async def consume_quota(user_id: str, amount: int = 1, *, action: str = DEFAULT_USAGE_ACTION) -> UsageSummary:
+    async with db_session() as session:
+        return await consume_quota_with_session(session, user_id, amount, action=action)
 
 
-async def consume_quota(user_id: str, amount: int = 1) -> UsageSummary:
+async def get_usage_report(since: datetime, until: datetime | None = None) -> list[dict[str, Any]]:
+    """Units charged per action between ``since`` and ``until``, read from the ledger."""
+
+    stmt = (
+        select(
+            UsageEvent.action,
+            func.count(),
+            func.sum(UsageEvent.amount),
+            func.count(func.distinct(UsageEvent.user_id)),
+        )
+        .where(UsageEvent.created_at >= since)
+        .group_by(UsageEvent.action)
+        .order_by(func.sum(UsageEvent.amount).desc(), UsageEvent.action)
+    )
+    if until is not None:
+        stmt = stmt.where(UsageEvent.created_at < until)
     async with db_session() as session:
-        return await consume_quota_with_session(session, user_id, amount)
+        res = await session.execute(stmt)
+        rows = res.all()
+    return [
+        {"action": action, "events": int(events), "units": int(units or 0), "users": int(users)}
+        for action, events, units, users in rows
+    ]
 
 
 @lru_cache(maxsize=1)
@@ -421,29 +749,75 @@ def set_usage_costs(new_costs: dict[str, Any]) -> dict[str, int]:
     return get_usage_costs_mapping()
 
 
+_SUMMARY_CHUNK = 1000
+
+
+def _bulk_summary_stmt(user_ids: list[str]):
+    # Latest subscription per user, ordered like _select_subscription.
+    ranked = (
+        select(
+            Subscription.id.label("subscription_id"),
+            func.row_number()
+            .over(
+                partition_by=Subscription.user_id,
+                order_by=(Subscription.current_period_end.desc().nullslast(), Subscription.created_at.desc()),
+            )
+            .label("position"),
+        )
+        .where(Subscription.user_id.in_(user_ids))
+        .subquery()
+    )
+    return (
+        select(Subscription, SubscriptionPlan, UsageCounter.used)
+        .join(ranked, and_(ranked.c.subscription_id == Subscription.id, ranked.c.position == 1))
+        .outerjoin(SubscriptionPlan, SubscriptionPlan.id == Subscription.plan_id)
+        .outerjoin(
+            UsageCounter,
+            and_(
+                UsageCounter.user_id == Subscription.user_id,
+                UsageCounter.period_start == Subscription.current_period_start,
+            ),
+        )
+    )
+
+
 async def get_usage_summaries(user_ids: Iterable[str]) -> list[UsageSummary]:
-    unique: list[str] = []
-    seen: set[str] = set()
-    for uid in user_ids:
-        if not uid:
-            continue
-        if uid not in seen:
-            unique.append(uid)
-            seen.add(uid)
+    """Summaries for many users with one query per 1000 users.
+
+    Read-only: a counter from a period that has already ended counts as zero,
+    as :func:`_ensure_usage_record` would reset it, but nothing is written. Polar
+    meters come from the snapshot cache and are never fetched inline.
+    """
+
+    unique = list(dict.fromkeys(uid for uid in user_ids if uid))
     if not unique:
         return []
 
-    summaries: list[UsageSummary] = []
+    rows: dict[str, tuple[Subscription, SubscriptionPlan | None, int | None]] = {}
     async with db_session() as session:
-        for user_id in unique:
-            subscription = await _select_subscription(session, user_id)
-            plan = await session.get(SubscriptionPlan, subscription.plan_id) if subscription and subscription.plan_id else None
-            usage = await _ensure_usage_record(session, user_id, subscription)
-            summary = _build_summary(user_id, subscription, plan, usage)
-            if subscription and subscription.plan_id and plan is None:
-                polar_plan = await get_plan(subscription.plan_id, refresh=False)
-                if polar_plan:
-                    summary.apply_plan(polar_plan)
-            summary = await _enrich_summary_with_polar_meter(summary)
-            summaries.append(summary)
+        for start in range(0, len(unique), _SUMMARY_CHUNK):
+            res = await session.execute(_bulk_summary_stmt(unique[start : start + _SUMMARY_CHUNK]))
+            for subscription, plan, used in res.all():
+                rows[subscription.user_id] = (subscription, plan, used)
+
+    now = _now_utc()
+    polar_plans: dict[str, PolarPlan | None] = {}
+    snapshots = await get_meter_snapshots(unique) if _meter_enrichment_enabled() else {}
+    summaries: list[UsageSummary] = []
+    for user_id in unique:
+        subscription, plan, used = rows.get(user_id, (None, None, None))
+        period_end = subscription.current_period_end if subscription else None
+        if period_end and _as_naive_utc(period_end) <= now:
+            used = 0
+        summary = _build_summary(user_id, subscription, plan, used or 0)
+        if subscription and subscription.plan_id and plan is None:
+            if subscription.plan_id not in polar_plans:
+                polar_plans[subscription.plan_id] = await get_plan(subscription.plan_id, refresh=False)
+            polar_plan = polar_plans[subscription.plan_id]
+            if polar_plan:
+                summary.apply_plan(polar_plan)
+        snapshot = snapshots.get(user_id)
+        if snapshot is not None:
+            _apply_meter_snapshot(summary, snapshot)
+        summaries.append(summary)
     return summaries
@@ -0,0 +1,203 @@
+"""Transactional outbox for Polar usage events.
+
+``enqueue_usage_event`` adds the event to ``usage_event_outbox`` in the caller's
+session, so it commits or rolls back with the quota charge. The background
+flusher claims pending rows in batches with ``UPDATE ... RETURNING`` over a
+``FOR UPDATE SKIP LOCKED`` subquery, and sends each batch with one
+``ingest_events`` call. Sent rows are marked with ``sent_at``. A failed batch
+is retried with exponential backoff, so nothing is dropped while Polar is down.
+A claim pushes ``next_attempt_at`` forward as a lease, so a worker that dies
+mid-send only delays its batch. Every event carries its ``event_id`` in the
+metadata, so a batch that is redelivered after such a crash can be deduplicated.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import (
+    LOGGER,
+    POLAR_OAT,
+    POLAR_USAGE_EVENT_NAME,
+    POLAR_USAGE_METER_ID,
+    USAGE_OUTBOX_BATCH_SIZE,
+    USAGE_OUTBOX_FLUSH_INTERVAL_SECONDS,
+)
+from backend.db import UsageEventOutbox, db_session
+from backend.services.polar import ingest_events
+
+_LEASE = timedelta(seconds=60)
+_MAX_BACKOFF = timedelta(minutes=15)
+_SENT_RETENTION = timedelta(days=7)
+
+
+def _now_utc() -> datetime:
+    return datetime.utcnow()
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(timedelta(seconds=5 * 2 ** max(attempts - 1, 0)), _MAX_BACKOFF)
+
+
+def enqueue_usage_event(
+    session: AsyncSession,
+    user_id: str,
+    amount: int,
+    metadata: dict[str, Any] | None = None,
+) -> UsageEventOutbox | None:
+    """Add a usage event to the outbox in ``session``; ``None`` when Polar ingestion is disabled."""
+
+    if amount <= 0 or not POLAR_USAGE_EVENT_NAME or not POLAR_OAT:
+        return None
+
+    now = _now_utc()
+    event_id = uuid.uuid4().hex
+    payload_metadata: dict[str, Any] = {"amount": int(amount), "event_id": event_id}
+    if POLAR_USAGE_METER_ID:
+        payload_metadata["meter_id"] = POLAR_USAGE_METER_ID
+    if metadata:
+        payload_metadata.update(metadata)
+
+    row = UsageEventOutbox(
+        event_id=event_id,
+        user_id=user_id,
+        payload_json={
+            "name": POLAR_USAGE_EVENT_NAME,
+            "external_customer_id": user_id,
+            # Polar records when the usage happened, not when the batch was flushed.
+            "timestamp": now.isoformat() + "Z",
+            "metadata": payload_metadata,
+        },
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    session.add(row)
+    return row
+
+
+async def _claim_batch(limit: int) -> list[tuple[int, dict[str, Any]]]:
+    now = _now_utc()
+    async with db_session() as session:
+        pending = (
+            select(UsageEventOutbox.id)
+            .where(UsageEventOutbox.sent_at.is_(None), UsageEventOutbox.next_attempt_at <= now)
+            .order_by(UsageEventOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(UsageEventOutbox)
+            .where(UsageEventOutbox.id.in_(pending.scalar_subquery()))
+            .values(next_attempt_at=now + _LEASE, attempts=UsageEventOutbox.attempts + 1)
+            .returning(UsageEventOutbox.id, UsageEventOutbox.payload_json)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(((row[0], row[1]) for row in res.all()), key=lambda row: row[0])
+
+
+async def _mark_sent(ids: list[int]) -> None:
+    async with db_session() as session:
+        await session.execute(
+            update(UsageEventOutbox)
+            .where(UsageEventOutbox.id.in_(ids))
+            .values(sent_at=_now_utc(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _mark_failed(ids: list[int], error: str) -> None:
+    now = _now_utc()
+    # One CASE arm per attempt count below the cap, so the whole batch is one UPDATE.
+    retry_at: dict[int, datetime] = {}
+    attempts = 0
+    while _backoff(attempts) < _MAX_BACKOFF:
+        retry_at[attempts] = now + _backoff(attempts)
+        attempts += 1
+    async with db_session() as session:
+        await session.execute(
+            update(UsageEventOutbox)
+            .where(UsageEventOutbox.id.in_(ids))
+            .values(
+                next_attempt_at=case(retry_at, value=UsageEventOutbox.attempts, else_=now + _MAX_BACKOFF),
+                last_error=error[:1000],
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def flush_usage_outbox(*, batch_size: int = USAGE_OUTBOX_BATCH_SIZE) -> int:
+    """Send due events to Polar batch by batch; returns how many were delivered.
+
+    Stops at the first failed batch, which is left for a later pass.
+    """
+
+    sent = 0
+    while True:
+        batch = await _claim_batch(batch_size)
+        if not batch:
+            return sent
+        ids = [row_id for row_id, _ in batch]
+        try:
+            await ingest_events([payload for _, payload in batch])
+        except Exception as exc:
+            # Transport errors (timeouts, resets) must back off like API errors, not keep the lease.
+            await _mark_failed(ids, str(exc) or type(exc).__name__)
+            LOGGER.warning("usage outbox flush failed; will retry", extra={"count": len(ids)})
+            return sent
+        await _mark_sent(ids)
+        sent += len(ids)
+        if len(batch) < batch_size:
+            return sent
+
+
+async def _purge_sent() -> None:
+    async with db_session() as session:
+        await session.execute(
+            delete(UsageEventOutbox).where(
+                UsageEventOutbox.sent_at.is_not(None),
+                UsageEventOutbox.sent_at < _now_utc() - _SENT_RETENTION,
+            )
+        )
+
+
+async def run_usage_outbox_flusher(*, interval: float = USAGE_OUTBOX_FLUSH_INTERVAL_SECONDS) -> None:
+    """Flush the outbox every ``interval`` seconds until cancelled."""
+
+    while True:
+        try:
+            await flush_usage_outbox()
+            await _purge_sent()
+        except Exception:
+            LOGGER.exception("usage outbox flush pass failed")
+        await asyncio.sleep(interval)
+
+
+async def get_usage_outbox_status() -> dict[str, object]:
+    """Backlog size and age of the oldest unsent event."""
+
+    async with db_session() as session:
+        res = await session.execute(
+            select(func.count(), func.min(UsageEventOutbox.created_at), func.max(UsageEventOutbox.attempts)).where(
+                UsageEventOutbox.sent_at.is_(None)
+            )
+        )
+        pending, oldest, max_attempts = res.one()
+    return {
+        "pending": int(pending or 0),
+        "oldest_pending_at": oldest.isoformat() if oldest else None,
+        "max_attempts": int(max_attempts or 0),
+    }
+
+
+__all__ = [
+    "enqueue_usage_event",
+    "flush_usage_outbox",
+    "get_usage_outbox_status",
+    "run_usage_outbox_flusher",
+]
@@ -0,0 +1,324 @@
+"""Inbox for verified Polar webhooks.
+
+``/billing/webhook`` only verifies the signature and calls ``enqueue_webhook``,
+which stores the event keyed by its ``webhook-id`` header. Redeliveries hit the
+unique constraint and are dropped. A background consumer claims due rows in
+batches and applies them. Only the oldest unprocessed event of each subscription
+can be claimed, so events for one subscription are applied in arrival order even
+when one of them is being retried. Handlers are idempotent (upserts, plus a
+``modified_at`` guard on subscriptions), so a row that is applied but not yet
+marked processed when a worker dies is simply applied again.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from backend.config import LOGGER, WEBHOOK_INBOX_BATCH_SIZE, WEBHOOK_INBOX_POLL_INTERVAL_SECONDS
+from backend.db import Subscription, WebhookInbox, db_session
+from backend.services.meter_cache import invalidate_meter_snapshot
+from backend.services.polar import upsert_plan_from_payload
+
+_LEASE = timedelta(seconds=60)
+_MAX_BACKOFF = timedelta(minutes=15)
+_PROCESSED_RETENTION = timedelta(days=7)
+_THROUGHPUT_WINDOW = timedelta(minutes=5)
+
+
+@dataclass(slots=True)
+class WebhookInboxMetrics:
+    received: int = 0
+    duplicates: int = 0
+    processed: int = 0
+    failures: int = 0
+    # Seconds from receipt to processing for recently applied events.
+    lags: deque[float] = field(default_factory=lambda: deque(maxlen=512))
+
+    def to_dict(self) -> dict[str, object]:
+        samples = sorted(self.lags)
+        lag: dict[str, float] | None = None
+        if samples:
+            lag = {
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "failures": self.failures,
+            "lag": lag,
+        }
+
+
+_metrics = WebhookInboxMetrics()
+_wake_event: asyncio.Event | None = None
+
+
+def _now_utc() -> datetime:
+    return datetime.utcnow()
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(timedelta(seconds=2 * 2 ** max(attempts - 1, 0)), _MAX_BACKOFF)
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+async def enqueue_webhook(webhook_id: str, payload: dict[str, Any]) -> bool:
+    """Store a verified webhook for the consumer; ``False`` when ``webhook_id`` was already received."""
+
+    event_type = str(payload.get("type") or "")
+    data = payload.get("data") or {}
+    subscription_id = data.get("id") if event_type.startswith("subscription.") else None
+    now = _now_utc()
+    try:
+        async with db_session() as session:
+            session.add(
+                WebhookInbox(
+                    webhook_id=webhook_id,
+                    event_type=event_type[:64],
+                    subscription_id=subscription_id,
+                    payload_json=payload,
+                    attempts=0,
+                    next_attempt_at=now,
+                    received_at=now,
+                )
+            )
+    except IntegrityError:
+        _metrics.duplicates += 1
+        return False
+    _metrics.received += 1
+    if _wake_event is not None:
+        _wake_event.set()
+    return True
+
+
+async def apply_subscription_event(data: dict[str, Any]) -> None:
+    """Upsert the subscription (and its embedded plan) described by a ``subscription.*`` payload."""
+
+    subscription_id = data.get("id")
+    if not subscription_id:
+        LOGGER.warning("Subscription event missing id: %s", data)
+        return
+
+    customer = data.get("customer") or {}
+    user_id = customer.get("external_id") or (data.get("metadata") or {}).get("user_id")
+    if not user_id:
+        LOGGER.warning("Subscription event missing external user id", extra={"id": subscription_id})
+        return
+
+    plan = data.get("product") or {}
+    await upsert_plan_from_payload(plan)
+
+    plan_id = data.get("product_id") or plan.get("id")
+    prices = data.get("prices") or []
+    price_id = prices[0].get("id") if prices else None
+
+    async with db_session() as session:
+        record = await session.get(Subscription, subscription_id)
+        if record is not None:
+            applied = _parse_datetime((record.raw_subscription_json or {}).get("modified_at"))
+            incoming = _parse_datetime(data.get("modified_at"))
+            if applied and incoming and incoming < applied:
+                # A delayed redelivery of an older state; the newer one is already applied.
+                LOGGER.info("Skipping stale subscription event", extra={"id": subscription_id})
+                return
+        fields = {
+            "user_id": user_id,
+            "status": data.get("status") or "unknown",
+            "plan_id": plan_id,
+            "product_id": plan_id,
+            "price_id": price_id,
+            "cancel_at_period_end": bool(data.get("cancel_at_period_end")),
+            "current_period_start": _parse_datetime(data.get("current_period_start")),
+            "current_period_end": _parse_datetime(data.get("current_period_end")),
+            "customer_id": data.get("customer_id") or customer.get("id"),
+            "customer_external_id": user_id,
+            "raw_product_json": plan,
+            "raw_subscription_json": data,
+        }
+        if record is None:
+            record = Subscription(id=subscription_id, **fields)
+            session.add(record)
+        else:
+            for key, value in fields.items():
+                setattr(record, key, value)
+
+    # Plan or period changes move the customer's credited units and balance.
+    await invalidate_meter_snapshot(user_id)
+
+
+async def _claim_batch(limit: int) -> list[tuple[int, str, dict[str, Any], datetime, int]]:
+    now = _now_utc()
+    candidate = aliased(WebhookInbox, name="candidate")
+    earlier = aliased(WebhookInbox, name="earlier")
+    blocked = (
+        select(earlier.id)
+        .where(
+            earlier.subscription_id == candidate.subscription_id,
+            earlier.processed_at.is_(None),
+            earlier.id < candidate.id,
+        )
+        .exists()
+    )
+    due = (
+        select(candidate.id)
+        .where(candidate.processed_at.is_(None), candidate.next_attempt_at <= now, ~blocked)
+        .order_by(candidate.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    async with db_session() as session:
+        res = await session.execute(
+            update(WebhookInbox)
+            .where(WebhookInbox.id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=now + _LEASE, attempts=WebhookInbox.attempts + 1)
+            .returning(
+                WebhookInbox.id,
+                WebhookInbox.event_type,
+                WebhookInbox.payload_json,
+                WebhookInbox.received_at,
+                WebhookInbox.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(res.all(), key=lambda row: row[0])
+
+
+async def _apply(event_type: str, payload: dict[str, Any]) -> None:
+    if event_type.startswith("subscription."):
+        await apply_subscription_event(payload.get("data") or {})
+
+
+async def _mark_processed(row_id: int) -> None:
+    async with db_session() as session:
+        await session.execute(
+            update(WebhookInbox)
+            .where(WebhookInbox.id == row_id)
+            .values(processed_at=_now_utc(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _mark_failed(row_id: int, attempts: int, error: str) -> None:
+    async with db_session() as session:
+        await session.execute(
+            update(WebhookInbox)
+            .where(WebhookInbox.id == row_id)
+            .values(next_attempt_at=_now_utc() + _backoff(attempts), last_error=error[:1000])
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def process_webhook_inbox(*, batch_size: int = WEBHOOK_INBOX_BATCH_SIZE) -> int:
+    """Apply due webhooks until none can be claimed; returns how many were applied.
+
+    A failed event is retried with exponential backoff and holds back later
+    events of the same subscription until it succeeds.
+    """
+
+    processed = 0
+    while True:
+        batch = await _claim_batch(batch_size)
+        if not batch:
+            return processed
+        for row_id, event_type, payload, received_at, attempts in batch:
+            try:
+                await _apply(event_type, payload)
+            except Exception as exc:
+                _metrics.failures += 1
+                LOGGER.exception("Failed to process Polar webhook", extra={"event_type": event_type, "id": row_id})
+                await _mark_failed(row_id, attempts, str(exc))
+                continue
+            await _mark_processed(row_id)
+            processed += 1
+            _metrics.processed += 1
+            _metrics.lags.append(max((_now_utc() - received_at.replace(tzinfo=None)).total_seconds(), 0.0))
+
+
+async def _purge_processed() -> None:
+    async with db_session() as session:
+        await session.execute(
+            delete(WebhookInbox).where(
+                WebhookInbox.processed_at.is_not(None),
+                WebhookInbox.processed_at < _now_utc() - _PROCESSED_RETENTION,
+            )
+        )
+
+
+async def run_webhook_consumer(*, interval: float = WEBHOOK_INBOX_POLL_INTERVAL_SECONDS) -> None:
+    """Process the inbox as soon as this worker enqueues a webhook, or every ``interval`` seconds."""
+
+    global _wake_event
+    _wake_event = asyncio.Event()
+    last_purge = 0.0
+    while True:
+        try:
+            await process_webhook_inbox()
+            if time.monotonic() - last_purge > 3600:
+                await _purge_processed()
+                last_purge = time.monotonic()
+        except Exception:
+            LOGGER.exception("webhook inbox pass failed")
+        try:
+            await asyncio.wait_for(_wake_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _wake_event.clear()
+
+
+async def get_webhook_inbox_status() -> dict[str, object]:
+    """Backlog, lag and throughput from the inbox, plus this worker's counters."""
+
+    now = _now_utc()
+    async with db_session() as session:
+        res = await session.execute(
+            select(
+                func.count(),
+                func.min(WebhookInbox.received_at),
+                func.count().filter(WebhookInbox.attempts > 0),
+            ).where(WebhookInbox.processed_at.is_(None))
+        )
+        pending, oldest, retrying = res.one()
+        res = await session.execute(
+            select(func.count()).where(WebhookInbox.processed_at >= now - _THROUGHPUT_WINDOW)
+        )
+        recent = res.scalar()
+    return {
+        "pending": int(pending or 0),
+        "retrying": int(retrying or 0),
+        "oldest_pending_at": oldest.isoformat() if oldest else None,
+        "lag_seconds": round((now - oldest.replace(tzinfo=None)).total_seconds(), 3) if oldest else 0.0,
+        "processed_per_minute": round((recent or 0) / (_THROUGHPUT_WINDOW.total_seconds() / 60), 2),
+        "metrics": _metrics.to_dict(),
+    }
+
+
+__all__ = [
+    "WebhookInboxMetrics",
+    "apply_subscription_event",
+    "enqueue_webhook",
+    "get_webhook_inbox_status",
+    "process_webhook_inbox",
+    "run_webhook_consumer",
+]
@@ -1,7 +1,7 @@
 import os
 import uuid
 from datetime import datetime
-from typing import Tuple, Optional, List
+from typing import Iterator, Tuple, Optional, List
 
 import boto3
 
@@ -90,6 +90,15 @@ def get_object_bytes(key: str) -> Tuple[bytes, str]:
     return data, content_type
 
 
+def open_object_stream(key: str, chunk_size: int = 64 * 1024) -> Tuple[Iterator[bytes], str]:
+    """Open an S3 object and return (chunk iterator, content type) without buffering the body."""
+    if not AWS_S3_BUCKET:
+        raise RuntimeError("AWS_S3_BUCKET not configured")
+    resp = get_s3().get_object(Bucket=AWS_S3_BUCKET, Key=key)
+    content_type = resp.get("ContentType", "application/octet-stream")
+    return resp["Body"].iter_chunks(chunk_size=chunk_size), content_type
+
+
 def upload_product_source_image(bytes_data: bytes, mime: Optional[str] = None) -> Tuple[str, str]:
     """Uploads a garment/product source image to S3 under product_sources/ and returns (bucket, key)."""
     return _upload_bytes("product_sources", bytes_data, mime)
@@ -8,13 +8,15 @@ from typing import Any, Iterable
 
 from celery import group
 from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 from google import genai
 from google.genai import types
 from sqlalchemy import select
 
 from .celery_app import celery_app
-from .db import db_session, PoseDescription
-from .storage import get_object_bytes
+from .db import db_session, PoseDescription, reset_engine
+from .storage import get_object_bytes, get_s3
+from .worker_runtime import run_task, runtime
 
 logger = logging.getLogger("backend.tasks")
 
@@ -45,17 +47,22 @@ def _get_client() -> genai.Client:
     return _client
 
 
-def _env_inline_execution() -> bool:
+def inline_execution() -> bool:
+    """Whether pose tasks run in-process instead of on a Celery worker."""
     if celery_app.conf.task_always_eager:
         return True
     raw = os.getenv("CELERY_FORCE_INLINE")
     return bool(raw and raw.strip().lower() in {"1", "true", "yes", "on"})
 
 
-async def _generate_pose_description_async(s3_key: str) -> dict[str, Any]:
-    """Generate and persist a pose description for the given S3 key."""
+async def generate_pose_description(s3_key: str) -> dict[str, Any]:
+    """Generate and persist a pose description for the given S3 key.
+
+    The S3 download runs on a thread and GenAI goes through the async client,
+    so this is also safe to run on an API worker's event loop.
+    """
     try:
-        image_bytes, mime = get_object_bytes(s3_key)
+        image_bytes, mime = await asyncio.to_thread(get_object_bytes, s3_key)
     except Exception as exc:
         raise RuntimeError(f"failed to download pose source: {exc}") from exc
 
@@ -65,7 +72,7 @@ async def _generate_pose_description_async(s3_key: str) -> dict[str, Any]:
         types.Part.from_bytes(data=image_bytes, mime_type=mime or "image/png"),
     ]
     try:
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=GENAI_MODEL,
             contents=types.Content(role="user", parts=parts),
         )
@@ -99,11 +106,27 @@ async def _generate_pose_description_async(s3_key: str) -> dict[str, Any]:
     return {"s3_key": s3_key, "ok": True, "skipped": False}
 
 
+@worker_process_init.connect
+def _init_worker_process(**_: Any) -> None:
+    """Give each prefork child its own loop, DB pool, S3 client and GenAI client up front."""
+    reset_engine()
+    runtime.start()
+    get_s3()
+    if GOOGLE_API_KEY:
+        _get_client()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _shutdown_worker_runtime(**_: Any) -> None:
+    runtime.stop()
+
+
 @celery_app.task(name="backend.pose.describe")
 def describe_pose_task(s3_key: str) -> dict[str, Any]:
     """Celery task entrypoint for generating a pose description."""
     try:
-        return asyncio.run(_generate_pose_description_async(s3_key))
+        return run_task(generate_pose_description(s3_key), timeout=POSE_TASK_TIMEOUT)
     except Exception as exc:  # pragma: no cover - defensive
         logger.exception("Pose description task failed for %s", s3_key)
         return {"s3_key": s3_key, "ok": False, "error": str(exc)}
@@ -127,19 +150,22 @@ def enqueue_pose_descriptions(
 
     Returns a dictionary with the Celery job id and any collected results. If no
     worker is available the work is executed inline so the caller still receives
-    deterministic behaviour.
+    deterministic behaviour. With ``wait=False`` it returns after publishing,
+    with each key's Celery task id under ``task_ids``. Publishing talks to the
+    broker, so async callers should run this on a thread.
     """
     if not keys:
         return {"job_id": None, "results": []}
 
-    if _env_inline_execution():
+    if inline_execution():
         return {"job_id": None, "results": _run_inline(keys), "inline": True}
 
     task_group = group(describe_pose_task.s(key) for key in keys)
     async_result = task_group.apply_async()
 
     if not wait:
-        return {"job_id": async_result.id, "results": []}
+        task_ids = {key: child.id for key, child in zip(keys, async_result.results or [])}
+        return {"job_id": async_result.id, "task_ids": task_ids, "results": []}
 
     effective_timeout = timeout if timeout is not None else POSE_BATCH_TIMEOUT
     try:
@@ -161,4 +187,36 @@ def enqueue_pose_descriptions(
         return {"job_id": async_result.id, "results": inline_results, "inline": True, "fallback": True}
 
 
-__all__ = ["describe_pose_task", "enqueue_pose_descriptions"]
+def pose_task_states(task_ids: dict[str, str]) -> dict[str, dict[str, Any]]:
+    """Progress of each key's Celery task as ``{"state": ..., "error": ...}``.
+
+    States are ``queued``, ``running``, ``done`` and ``failed``. This reads the
+    result backend synchronously; async callers should run it on a thread.
+    """
+    states: dict[str, dict[str, Any]] = {}
+    for key, task_id in task_ids.items():
+        result = celery_app.AsyncResult(task_id)
+        state = result.state
+        if state == "SUCCESS":
+            value = result.result
+            if isinstance(value, dict) and not value.get("ok", True):
+                states[key] = {"state": "failed", "error": value.get("error")}
+            else:
+                states[key] = {"state": "done"}
+        elif state in {"FAILURE", "REVOKED"}:
+            states[key] = {"state": "failed", "error": str(result.result)}
+        elif state in {"STARTED", "RETRY"}:
+            states[key] = {"state": "running"}
+        else:
+            states[key] = {"state": "queued"}
+    return states
+
+
+__all__ = [
+    "POSE_BATCH_TIMEOUT",
+    "describe_pose_task",
+    "enqueue_pose_descriptions",
+    "generate_pose_description",
+    "inline_execution",
+    "pose_task_states",
+]
@@ -0,0 +1,88 @@
+"""Shared test data: stub GenAI responses, garment photos, subscriptions and usage summaries."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from PIL import Image, ImageDraw
+
+from backend.db import Subscription, SubscriptionPlan
+from backend.services import usage
+from backend.services.usage import UsageSummary
+
+_SUMMARY_PERIOD_START = datetime(2024, 1, 1)
+
+
+def genai_response(text: str) -> SimpleNamespace:
+    """A Gemini response whose only candidate has a single ``text`` part."""
+
+    part = SimpleNamespace(text=text)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def usage_summary() -> UsageSummary:
+    """An active summary for ``u1`` with 9 of 10 units left."""
+
+    return UsageSummary(
+        user_id="u1",
+        plan_id=None,
+        plan_name=None,
+        plan_interval=None,
+        currency=None,
+        status="active",
+        cancel_at_period_end=False,
+        allowance=10,
+        used=1,
+        remaining=9,
+        period_start=_SUMMARY_PERIOD_START,
+        period_end=_SUMMARY_PERIOD_START + timedelta(days=30),
+    )
+
+
+def active_subscription(
+    *user_ids: str, allowance: int = 10, period_start: datetime | None = None
+) -> list[SubscriptionPlan | Subscription]:
+    """A ``plan-pro`` plan with ``allowance`` units and an active ``sub-N`` for each user.
+
+    The period starts at ``period_start`` (a day ago by default) and runs for thirty days.
+    """
+
+    if period_start is None:
+        period_start = datetime.utcnow() - timedelta(days=1)
+    subscriptions = [
+        Subscription(
+            id=f"sub-{idx}",
+            user_id=user_id,
+            status="active",
+            plan_id="plan-pro",
+            current_period_start=period_start,
+            current_period_end=period_start + timedelta(days=30),
+        )
+        for idx, user_id in enumerate(user_ids or ("u1",), start=1)
+    ]
+    return [SubscriptionPlan(id="plan-pro", name="Pro", allowance=allowance), *subscriptions]
+
+
+def without_meter_enrichment():
+    """Patch out the Polar meter lookup so summaries come straight from the database."""
+
+    return patch.object(usage, "_enrich_summary_with_polar_meter", AsyncMock(side_effect=lambda summary, **_: summary))
+
+
+def garment_photo(color: str = "navy", *, size: tuple[int, int] = (600, 800), fmt: str = "PNG", **save) -> bytes:
+    """A shirt-like silhouette on a shaded backdrop, encoded as ``fmt``."""
+
+    img = Image.new("RGB", (600, 800))
+    draw = ImageDraw.Draw(img)
+    for y in range(800):
+        shade = 235 - y // 20
+        draw.line([(0, y), (600, y)], fill=(shade, shade, shade - 10))
+    draw.polygon([(150, 120), (450, 120), (560, 300), (470, 340), (450, 700), (150, 700), (130, 340), (40, 300)], fill=color)
+    draw.ellipse((250, 90, 350, 170), fill=(235, 232, 225))
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format=fmt, **save)
+    return buf.getvalue()
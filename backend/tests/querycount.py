@@ -0,0 +1,119 @@
+"""Query-count harness for list endpoints.
+
+Route handlers talk to the database through ``db_session()``. The harness swaps
+that for a session bound to an in-memory SQLite engine and records every
+statement sent to the driver, so tests can assert that an endpoint issues the
+same number of queries whether it returns one row or many.
+"""
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from typing import Any, Iterator
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.db import Base
+
+
+class _AsyncSessionAdapter:
+    """Expose the subset of ``AsyncSession`` used by route handlers over a sync session."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+        self.sync_session = session
+        self.bind = session.bind
+        self.wrote = False
+
+    def _track_writes(self, fn, *args):
+        dbapi = self._session.connection().connection.dbapi_connection
+        before = dbapi.total_changes
+        try:
+            return fn(*args)
+        finally:
+            self.wrote = self.wrote or dbapi.total_changes != before
+
+    def add(self, instance: Any) -> None:
+        self._session.add(instance)
+
+    async def execute(self, statement: Any, params: Any = None) -> Any:
+        # Yield first so concurrent handlers interleave at each round trip, as with a real driver.
+        await asyncio.sleep(0)
+        return self._track_writes(self._session.execute, statement, params)
+
+    async def get(self, entity: Any, ident: Any) -> Any:
+        return self._session.get(entity, ident)
+
+    async def flush(self) -> None:
+        self._track_writes(self._session.flush)
+
+
+class QueryRecorder:
+    def __init__(self) -> None:
+        self.engine: Engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.statements: list[str] = []
+        self._recording = False
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self._recording:
+            self.statements.append(statement)
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+
+    def seed(self, *instances: Any) -> None:
+        with Session(self.engine) as session:
+            session.add_all(instances)
+            session.commit()
+
+    @asynccontextmanager
+    async def db_session(self):
+        # Matches the production sessionmaker: objects stay readable after commit.
+        with Session(self.engine, expire_on_commit=False) as session:
+            adapter = _AsyncSessionAdapter(session)
+            try:
+                yield adapter
+            except BaseException:
+                # Every session shares the in-memory database's single connection, so a
+                # rollback would also discard other open sessions' work. A transaction
+                # that changed nothing has nothing to undo; end it without one.
+                if not adapter.wrote and not session.new and not session.dirty:
+                    session.commit()
+                raise
+            await asyncio.sleep(0)
+            session.commit()
+
+    @staticmethod
+    @asynccontextmanager
+    async def try_advisory_lock(lock_id: int):
+        # SQLite has no advisory locks; mirror the non-Postgres branch of the real helper.
+        yield True
+
+    @contextmanager
+    def patched(self, *modules: Any) -> Iterator[None]:
+        """Route ``db_session`` in ``modules`` to this engine; stub advisory locks and presigned URLs."""
+
+        with ExitStack() as stack:
+            for module in modules:
+                stack.enter_context(patch.object(module, "db_session", self.db_session))
+                if hasattr(module, "try_advisory_lock"):
+                    stack.enter_context(patch.object(module, "try_advisory_lock", self.try_advisory_lock))
+                if hasattr(module, "generate_presigned_get_url"):
+                    stack.enter_context(
+                        patch.object(module, "generate_presigned_get_url", lambda key: f"https://s3/{key}")
+                    )
+            yield
+
+    @contextmanager
+    def recording(self) -> Iterator[list[str]]:
+        self.statements = []
+        self._recording = True
+        try:
+            yield self.statements
+        finally:
+            self._recording = False
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from io import BytesIO
+import tracemalloc
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import UploadFile
+from fastapi.responses import Response
+from PIL import Image
+
+from backend.routes import edit as edit_routes
+from backend.services.editing import load_garment_source
+
+# Python-level allocations only: Pillow's pixel buffers live outside tracemalloc,
+# so the peak measures how many byte copies of the image a request holds.
+_SLACK_BYTES = 512 * 1024
+
+
+def _jpeg_bytes(size: tuple[int, int] = (1200, 900)) -> bytes:
+    buf = BytesIO()
+    Image.effect_noise(size, 60).convert("RGB").save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def _png_len(jpeg: bytes) -> int:
+    buf = BytesIO()
+    Image.open(BytesIO(jpeg)).convert("RGBA").save(buf, format="PNG")
+    return buf.tell()
+
+
+def _measure(coro_factory):
+    async def run():
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            result = await coro_factory()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, peak
+
+    return run()
+
+
+class EditMemoryTests(unittest.IsolatedAsyncioTestCase):
+    async def test_load_garment_source_does_not_buffer_upload(self):
+        jpeg = _jpeg_bytes()
+        png_len = _png_len(jpeg)
+        upload = UploadFile(filename="src.jpg", file=BytesIO(jpeg), size=len(jpeg))
+
+        source, peak = await _measure(lambda: load_garment_source(upload, None))
+
+        self.assertEqual(len(source.png_bytes), png_len)
+        # One PNG plus BytesIO growth headroom; no copy of the uploaded bytes.
+        self.assertLess(peak, int(png_len * 1.25) + _SLACK_BYTES)
+
+    async def test_edit_request_peak_allocations(self):
+        jpeg = _jpeg_bytes()
+        png_len = _png_len(jpeg)
+        model_png = b"\x89PNG" + bytes(png_len)
+        fake_resp = SimpleNamespace(
+            candidates=[
+                SimpleNamespace(
+                    content=SimpleNamespace(
+                        parts=[SimpleNamespace(inline_data=SimpleNamespace(data=model_png))]
+                    )
+                )
+            ]
+        )
+        upload = UploadFile(filename="src.jpg", file=BytesIO(jpeg), size=len(jpeg))
+
+        with patch.object(edit_routes, "reserve_quota", AsyncMock(return_value=None)), patch.object(
+            edit_routes, "classify_garment_type", AsyncMock(return_value="top")
+        ), patch.object(
+            edit_routes, "genai_generate_with_retries", AsyncMock(return_value=fake_resp)
+        ), patch.object(
+            edit_routes, "upload_image", return_value=("bucket", "generated/key.png")
+        ), patch.object(
+            edit_routes, "persist_generation_result", AsyncMock(return_value=None)
+        ):
+            response, peak = await _measure(
+                lambda: edit_routes.edit(
+                    image=upload,
+                    gender="woman",
+                    environment="studio",
+                    poses=["standing"],
+                    extra="",
+                    env_default_s3_key=None,
+                    model_default_s3_key=None,
+                    model_description_text=None,
+                    prompt_override="prompt",
+                    garment_type_override=None,
+                    x_user_id="user-1",
+                )
+            )
+
+        self.assertIsInstance(response, Response)
+        # The model output is handed to the response without another copy.
+        self.assertIs(response.body, model_png)
+        self.assertLess(peak, int(png_len * 1.25) + _SLACK_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
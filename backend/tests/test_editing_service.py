@@ -103,7 +103,7 @@ class EditingServiceTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(ctx.exception.status_code, 400)
 
     async def test_resolve_listing_context_success(self):
-        fake_session = FakeSession(rows=[("user-1", "s3-key")])
+        fake_session = FakeSession(rows=[("user-1", "s3-key", {"garment_type": "bottom"})])
 
         @asynccontextmanager
         async def fake_db_session():
@@ -113,6 +113,7 @@ class EditingServiceTests(unittest.IsolatedAsyncioTestCase):
             ctx = await resolve_listing_context("listing-1", "user-1", required=True)
         self.assertIsNotNone(ctx)
         self.assertEqual(ctx.source_s3_key, "s3-key")
+        self.assertEqual(ctx.garment_type, "bottom")
 
     async def test_resolve_listing_context_optional(self):
         fake_session = FakeSession(rows=[])
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import itertools
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.db import EnvPoolImage, Generation
+from backend.services import env_pool
+from backend.services.usage import QuotaError
+from backend.tests.fixtures import usage_summary
+from backend.tests.querycount import QueryRecorder
+
+_BASE = datetime(2024, 1, 1)
+
+
+class EnvPoolTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        env_pool._metrics = env_pool.EnvPoolMetrics()
+        self.recorder = QueryRecorder()
+        self.recorder.seed(
+            *(
+                EnvPoolImage(
+                    style=env_pool.ENV_POOL_DEFAULT_STYLE,
+                    s3_key=f"generated/pool-{idx}.png",
+                    source_s3_key="env_sources/a.png",
+                    prompt="prompt",
+                    model="m",
+                    created_at=_BASE + timedelta(minutes=idx),
+                )
+                for idx in range(3)
+            )
+        )
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(env_pool))
+        stack.enter_context(
+            patch.object(env_pool, "get_object_bytes", lambda key: (f"png:{key}".encode(), "image/png"))
+        )
+        stack.enter_context(patch.object(env_pool, "consume_quota_with_session", AsyncMock(return_value=usage_summary())))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _rows(self) -> list[EnvPoolImage]:
+        with Session(self.recorder.engine) as session:
+            return list(session.scalars(select(EnvPoolImage).order_by(EnvPoolImage.id)))
+
+    async def test_claims_oldest_image_and_records_generation(self) -> None:
+        claimed = await env_pool.claim_env_image("u1", usage_amount=1)
+        self.assertIsNotNone(claimed)
+        self.assertEqual(claimed.s3_key, "generated/pool-0.png")
+        self.assertEqual(claimed.png_bytes, b"png:generated/pool-0.png")
+        self.assertEqual(claimed.usage.remaining, 9)
+
+        rows = self._rows()
+        self.assertEqual(rows[0].claimed_by, "u1")
+        self.assertIsNone(rows[1].claimed_at)
+        with Session(self.recorder.engine) as session:
+            generation = session.scalars(select(Generation)).one()
+        self.assertEqual((generation.s3_key, generation.user_id, generation.pose), ("generated/pool-0.png", "u1", "env"))
+        self.assertTrue(generation.options_json["pool"])
+
+        second = await env_pool.claim_env_image("u2", usage_amount=1)
+        self.assertEqual(second.s3_key, "generated/pool-1.png")
+
+    async def test_empty_pool_misses_and_requests_refill(self) -> None:
+        with patch.object(env_pool, "request_refill") as refill:
+            for _ in range(3):
+                self.assertIsNotNone(await env_pool.claim_env_image("u1", usage_amount=0))
+            self.assertIsNone(await env_pool.claim_env_image("u1", usage_amount=0))
+        self.assertTrue(refill.called)
+        metrics = env_pool._metrics.to_dict()
+        self.assertEqual((metrics["claims"], metrics["misses"]), (3, 1))
+        self.assertIsNotNone(metrics["claim_latency"])
+
+    async def test_quota_error_releases_the_claim(self) -> None:
+        summary = usage_summary()
+        with patch.object(env_pool, "consume_quota_with_session", AsyncMock(side_effect=QuotaError(summary))):
+            with self.assertRaises(QuotaError):
+                await env_pool.claim_env_image("u1", usage_amount=1)
+        self.assertTrue(all(row.claimed_at is None for row in self._rows()))
+        with Session(self.recorder.engine) as session:
+            self.assertEqual(session.scalars(select(Generation)).all(), [])
+
+    async def test_fetch_runs_off_the_loop(self) -> None:
+        threads = []
+
+        def fetch(key):
+            threads.append(threading.current_thread())
+            return b"png", "image/png"
+
+        with patch.object(env_pool, "get_object_bytes", fetch):
+            await env_pool.claim_env_image("u1", usage_amount=1)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_render_and_upload_run_off_the_loop(self) -> None:
+        threads = []
+
+        def fetch(key):
+            threads.append(threading.current_thread())
+            return b"src", "image/png"
+
+        def upload(data, pose):
+            threads.append(threading.current_thread())
+            return "bucket", "generated/new.png"
+
+        with (
+            patch.object(env_pool, "sample_env_source", AsyncMock(return_value="env_sources/a.png")),
+            patch.object(env_pool, "get_object_bytes", fetch),
+            patch.object(env_pool, "genai_generate_with_retries", AsyncMock(return_value=object())),
+            patch.object(env_pool, "first_inline_image_bytes", lambda resp: b"png"),
+            patch.object(env_pool, "upload_image", upload),
+        ):
+            self.assertEqual(await env_pool.fill_env_pool(target=4), 1)
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(t is not threading.main_thread() for t in threads))
+
+    async def test_fetch_failure_returns_the_image_to_the_pool(self) -> None:
+        def fetch(key):
+            raise RuntimeError("s3 down")
+
+        with patch.object(env_pool, "get_object_bytes", fetch), patch.object(
+            env_pool, "consume_quota_with_session", AsyncMock(return_value=usage_summary())
+        ) as consume:
+            with self.assertRaises(RuntimeError):
+                await env_pool.claim_env_image("u1", usage_amount=1)
+        consume.assert_not_awaited()
+        self.assertTrue(all(row.claimed_at is None for row in self._rows()))
+        with Session(self.recorder.engine) as session:
+            self.assertEqual(session.scalars(select(Generation)).all(), [])
+
+    async def test_fill_tops_up_to_target(self) -> None:
+        counter = itertools.count()
+        with (
+            patch.object(env_pool, "sample_env_source", AsyncMock(return_value="env_sources/a.png")),
+            patch.object(env_pool, "render_env_image", AsyncMock(return_value=b"png")),
+            patch.object(env_pool, "upload_image", lambda data, pose: ("bucket", f"generated/new-{next(counter)}.png")),
+        ):
+            added = await env_pool.fill_env_pool(target=5)
+            self.assertEqual(added, 2)
+            self.assertEqual(await env_pool.fill_env_pool(target=5), 0)
+        self.assertEqual(len(self._rows()), 5)
+
+    async def test_fill_stops_after_repeated_failures(self) -> None:
+        render = AsyncMock(return_value=None)
+        with (
+            patch.object(env_pool, "sample_env_source", AsyncMock(return_value="env_sources/a.png")),
+            patch.object(env_pool, "render_env_image", render),
+        ):
+            self.assertEqual(await env_pool.fill_env_pool(target=10), 0)
+        self.assertEqual(render.await_count, env_pool._MAX_CONSECUTIVE_FAILURES)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from collections import Counter
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from backend.db import EnvSource
+from backend.services import env_sources
+from backend.tests.querycount import QueryRecorder
+
+
+class _FakePipeline:
+    def __init__(self, server: "_FakeRedis") -> None:
+        self.server = server
+        self.ops: list[tuple] = []
+
+    def sadd(self, key: str, *members: str) -> None:
+        self.ops.append(("sadd", key, members))
+
+    def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.ops.append(("set", key, value, ex))
+
+    async def execute(self) -> None:
+        for op in self.ops:
+            if op[0] == "sadd":
+                await self.server.sadd(op[1], *op[2])
+            else:
+                await self.server.set(op[1], op[2], ex=op[3])
+
+
+class _FakeRedis:
+    """The set and marker commands the env source sampler uses, kept in memory."""
+
+    def __init__(self) -> None:
+        self.sets: dict[str, set[str]] = {}
+        self.values: dict[str, tuple[str, int | None]] = {}
+
+    def pipeline(self, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.values or bool(self.sets.get(key)))
+
+    async def sadd(self, key: str, *members: str) -> int:
+        self.sets.setdefault(key, set()).update(members)
+        return len(members)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> bool:
+        self.values[key] = (value, ex)
+        return True
+
+    async def get(self, key: str) -> str | None:
+        entry = self.values.get(key)
+        return entry[0] if entry else None
+
+    async def incr(self, key: str) -> int:
+        value = int(self.values.get(key, ("0", None))[0]) + 1
+        self.values[key] = (str(value), None)
+        return value
+
+    async def srandmember(self, key: str, count: int) -> list[bytes]:
+        return [member.encode() for member in list(self.sets.get(key, ()))[:count]]
+
+    async def delete(self, *keys: str) -> int:
+        for key in keys:
+            self.sets.pop(key, None)
+            self.values.pop(key, None)
+        return len(keys)
+
+
+class EnvSourceSamplerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        env_sources._local_keys.replace(())
+        env_sources._local_loaded_at = None
+        env_sources._local_recent.clear()
+        env_sources._local_epoch = None
+        self.recorder = QueryRecorder()
+        self.recorder.seed(*(EnvSource(s3_key=f"env_sources/{idx}.png") for idx in range(8)))
+
+    def tearDown(self) -> None:
+        self.recorder.dispose()
+
+    async def test_loads_once_then_samples_without_queries(self) -> None:
+        with self.recorder.patched(env_sources), self.recorder.recording() as statements:
+            picks = [await env_sources.sample_env_source() for _ in range(200)]
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn("RANDOM", statements[0].upper())
+        self.assertEqual(set(picks), {f"env_sources/{idx}.png" for idx in range(8)})
+
+    async def test_no_repeat_window_per_user(self) -> None:
+        with self.recorder.patched(env_sources), patch.object(env_sources, "ENV_SOURCE_NO_REPEAT", 3):
+            picks = [await env_sources.sample_env_source("u1") for _ in range(100)]
+        for idx in range(3, len(picks)):
+            self.assertNotIn(picks[idx], picks[idx - 3 : idx])
+        # Every source is still reachable.
+        self.assertEqual(len(Counter(picks)), 8)
+
+    async def test_no_repeat_falls_back_when_too_few_sources(self) -> None:
+        env_sources._local_keys.replace(["only.png"])
+        env_sources._local_loaded_at = float("inf")
+        picks = [await env_sources.sample_env_source("u1") for _ in range(3)]
+        self.assertEqual(picks, ["only.png"] * 3)
+
+    async def test_upload_and_clear_update_the_sampler(self) -> None:
+        with self.recorder.patched(env_sources):
+            await env_sources.sample_env_source()
+            await env_sources.add_env_sources(["env_sources/new.png"])
+            self.assertEqual(len(env_sources._local_keys), 9)
+            await env_sources.clear_env_sources()
+            self.assertIsNone(await env_sources.sample_env_source())
+
+    async def test_upload_during_a_redis_load_is_kept(self) -> None:
+        redis = _FakeRedis()
+        load_keys = env_sources._load_keys_from_db
+
+        async def snapshot_then_upload() -> list[str]:
+            keys = await load_keys()
+            # Another worker uploads after this loader read the table.
+            await env_sources.add_env_sources(["env_sources/new.png"])
+            return keys
+
+        with self.recorder.patched(env_sources), patch.object(
+            env_sources, "get_redis_client", AsyncMock(return_value=redis)
+        ), patch.object(env_sources, "_load_keys_from_db", snapshot_then_upload):
+            await env_sources.sample_env_source()
+
+        self.assertIn("env_sources/new.png", redis.sets[env_sources._redis_set_key(0)])
+        self.assertEqual(len(redis.sets[env_sources._redis_set_key(0)]), 9)
+        self.assertEqual(redis.values[env_sources._redis_loaded_key(0)][1], env_sources.ENV_SOURCE_CACHE_TTL_SECONDS)
+
+    async def test_clear_during_a_redis_load_is_not_undone(self) -> None:
+        redis = _FakeRedis()
+        load_keys = env_sources._load_keys_from_db
+        cleared = False
+
+        async def snapshot_then_clear() -> list[str]:
+            nonlocal cleared
+            keys = await load_keys()
+            if not cleared:
+                # Another worker empties the table after this loader read it.
+                cleared = True
+                await env_sources.clear_env_sources()
+                return keys
+            return []
+
+        with self.recorder.patched(env_sources), patch.object(
+            env_sources, "get_redis_client", AsyncMock(return_value=redis)
+        ), patch.object(env_sources, "_load_keys_from_db", snapshot_then_clear):
+            self.assertIsNone(await env_sources.sample_env_source())
+
+        self.assertNotIn(env_sources._redis_set_key(0), redis.sets)
+        self.assertNotIn(env_sources._redis_loaded_key(0), redis.values)
+        self.assertIn(env_sources._redis_loaded_key(1), redis.values)
+
+    async def test_clear_on_another_worker_drops_the_local_copy(self) -> None:
+        redis = _FakeRedis()
+        with self.recorder.patched(env_sources):
+            await env_sources.sample_env_source()
+        self.assertEqual(len(env_sources._local_keys), 8)
+        with patch.object(env_sources, "get_redis_client", AsyncMock(return_value=redis)), self.recorder.patched(
+            env_sources
+        ):
+            await env_sources.sample_env_source()
+            await redis.incr(env_sources._REDIS_EPOCH_KEY)
+            await env_sources.sample_env_source()
+        self.assertEqual(len(env_sources._local_keys), 0)
+        self.assertIsNone(env_sources._local_loaded_at)
+
+    def test_key_set_swap_remove(self) -> None:
+        keys = env_sources._KeySet()
+        keys.replace(["a", "b", "c"])
+        keys.discard("a")
+        keys.discard("missing")
+        keys.add("d")
+        keys.add("d")
+        self.assertEqual(sorted(keys.sample(10)), ["b", "c", "d"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
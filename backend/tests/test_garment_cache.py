@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+import gc
+from io import BytesIO
+import tracemalloc
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from PIL import Image
+
+from backend.services import garment
+from backend.tests.fixtures import garment_photo, genai_response
+
+
+class GarmentCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.genai = AsyncMock(return_value=genai_response("top"))
+        stack = ExitStack()
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_CLASSIFY", True))
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_THUMBNAIL_PX", 0))
+        stack.enter_context(patch.object(garment, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(patch.object(garment, "genai_generate_with_retries", self.genai))
+        stack.enter_context(patch.object(garment, "_garment_type_cache", garment._GarmentTypeCache(100)))
+        stack.enter_context(patch.object(garment, "_metrics", garment.GarmentCacheMetrics()))
+        self.addCleanup(stack.close)
+
+    async def test_concurrent_misses_classify_once_and_drop_the_lock(self) -> None:
+        labels = await asyncio.gather(*(garment.classify_garment_type(b"same-image") for _ in range(10)))
+        self.assertEqual(set(labels), {"top"})
+        self.assertEqual(self.genai.await_count, 1)
+        self.assertEqual(garment._local_singleflight_locks, {})
+        stats = garment.get_garment_cache_stats()
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["metrics"]["classifications"], 1)
+
+    async def test_least_recently_used_entry_is_evicted(self) -> None:
+        for idx in range(100):
+            await garment.classify_garment_type(f"img-{idx}".encode())
+        await garment.classify_garment_type(b"img-0")
+        await garment.classify_garment_type(b"img-new")
+        self.assertEqual(len(garment._garment_type_cache), 100)
+
+        await garment.classify_garment_type(b"img-0")
+        self.assertEqual(self.genai.await_count, 101)
+        await garment.classify_garment_type(b"img-1")
+        self.assertEqual(self.genai.await_count, 102)
+        metrics = garment.get_garment_cache_stats()["metrics"]
+        self.assertEqual((metrics["hits"], metrics["evictions"]), (2, 2))
+
+    async def test_expired_entry_is_reclassified(self) -> None:
+        await garment.classify_garment_type(b"img")
+        image_hash = garment._hash_bytes(b"img")
+        _, payload = garment._garment_type_cache._entries[image_hash]
+        garment._garment_type_cache._entries[image_hash] = (0.0, payload)
+        await garment.classify_garment_type(b"img")
+        self.assertEqual(self.genai.await_count, 2)
+        self.assertEqual(garment.get_garment_cache_stats()["metrics"]["expirations"], 1)
+
+    async def test_cancelled_waiter_releases_its_lock_reference(self) -> None:
+        release = asyncio.Event()
+
+        async def slow(parts, attempts):
+            await release.wait()
+            return genai_response("bottom")
+
+        self.genai.side_effect = slow
+        leader = asyncio.create_task(garment.classify_garment_type(b"img"))
+        waiter = asyncio.create_task(garment.classify_garment_type(b"img"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        self.assertEqual(garment._local_singleflight_locks[garment._hash_bytes(b"img")].refs, 1)
+        release.set()
+        self.assertEqual(await leader, "bottom")
+        self.assertEqual(garment._local_singleflight_locks, {})
+
+    async def test_genai_sees_a_thumbnail_but_the_key_is_the_source_hash(self) -> None:
+        buf = BytesIO()
+        Image.new("RGB", (2048, 1536), "navy").save(buf, format="PNG")
+        source = buf.getvalue()
+        with patch.object(garment, "GARMENT_TYPE_THUMBNAIL_PX", 384):
+            self.assertEqual(await garment.classify_garment_type(source), "top")
+            self.assertEqual(await garment.classify_garment_type(source), "top")
+
+        self.assertEqual(self.genai.await_count, 1)
+        image_part = self.genai.await_args.args[0][1]
+        self.assertEqual(image_part.inline_data.mime_type, "image/jpeg")
+        with Image.open(BytesIO(image_part.inline_data.data)) as sent:
+            self.assertEqual(sent.size, (384, 288))
+        self.assertIn(garment._hash_bytes(source), garment._garment_type_cache._entries)
+        metrics = garment.get_garment_cache_stats()["metrics"]
+        self.assertLess(metrics["genai_upload_bytes"], len(source))
+
+    async def test_recompressed_copy_is_a_perceptual_hit(self) -> None:
+        original = garment_photo()
+        copy = garment_photo(size=(450, 600), fmt="JPEG", quality=75)
+        self.assertEqual(await garment.classify_garment_type(original), "top")
+        self.assertEqual(await garment.classify_garment_type(copy), "top")
+        self.assertEqual(await garment.classify_garment_type(copy), "top")
+        self.assertEqual(await garment.classify_garment_type(garment_photo("firebrick")), "top")
+
+        self.assertEqual(self.genai.await_count, 2)
+        stats = garment.get_garment_cache_stats()
+        self.assertEqual((stats["metrics"]["hits"], stats["metrics"]["perceptual_hits"]), (1, 1))
+        self.assertEqual(stats["hit_rates"], {"exact": 0.25, "perceptual": 0.25})
+        self.assertEqual(stats["perceptual_entries"], 3)
+
+        garment._garment_type_cache.clear()
+        self.assertEqual(len(garment._garment_type_cache.similar), 0)
+
+    async def test_soak_memory_stays_flat(self) -> None:
+        async def classify(parts, attempts):
+            return genai_response("full")
+
+        async def no_redis():
+            return None
+
+        # AsyncMock keeps every call's arguments and debug mode logs slow steps under
+        # tracemalloc; either would dominate the measurement.
+        garment.genai_generate_with_retries = classify
+        garment.get_redis_client = no_redis
+        asyncio.get_running_loop().set_debug(False)
+
+        async def run(start: int, count: int) -> None:
+            for offset in range(start, start + count, 50):
+                await asyncio.gather(
+                    *(garment.classify_garment_type(f"soak-{idx}".encode()) for idx in range(offset, offset + 50))
+                )
+
+        await run(0, 1_000)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            await run(1_000, 5_000)
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        stats = garment.get_garment_cache_stats()
+        self.assertEqual(stats["entries"], 100)
+        self.assertEqual(stats["singleflight_locks"], 0)
+        self.assertEqual(stats["metrics"]["evictions"], 6_000 - 100)
+        # 5,000 new images through a 100-entry cache; unbounded, each one would add roughly 550 bytes.
+        self.assertLess(after - before, 100_000)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from io import BytesIO
+import random
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from PIL import Image
+
+from backend.benchmarks.synthetic_garments import synthetic_fixtures, synthetic_garment
+from backend.services import garment, garment_precheck
+from backend.tests.fixtures import genai_response
+
+
+def _png(img: Image.Image) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FeatureTests(unittest.TestCase):
+    def test_blank_image_has_no_features(self) -> None:
+        self.assertIsNone(garment_precheck.extract_features(_png(Image.new("RGB", (200, 300), "white"))))
+
+    def test_busy_background_has_no_features(self) -> None:
+        rng = random.Random(3)
+        img = Image.new("RGB", (96, 96))
+        img.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(96 * 96)])
+        self.assertIsNone(garment_precheck.extract_features(_png(img)))
+
+    def test_silhouette_yields_every_feature(self) -> None:
+        features = garment_precheck.extract_features(synthetic_garment("bottom", random.Random(1)))
+        self.assertIsNotNone(features)
+        self.assertEqual(len(features), len(garment_precheck.FEATURE_NAMES))
+
+
+class ModelTests(unittest.TestCase):
+    def test_trained_model_labels_held_out_silhouettes(self) -> None:
+        samples = []
+        for image_bytes, label in synthetic_fixtures(12, seed=11):
+            features = garment_precheck.extract_features(image_bytes)
+            if features is not None:
+                samples.append((features, label))
+        model = garment_precheck.train_model(samples, epochs=200)
+        restored = garment_precheck.PreclassifierModel.from_json(model.to_json())
+
+        scored = []
+        for image_bytes, label in synthetic_fixtures(10, seed=97):
+            features = garment_precheck.extract_features(image_bytes)
+            if features is not None:
+                scored.append(restored.predict(features)[0] == label)
+        self.assertGreaterEqual(len(scored), 20)
+        self.assertGreaterEqual(sum(scored) / len(scored), 0.75)
+
+    def test_shipped_model_loads(self) -> None:
+        model = garment_precheck.load_model()
+        self.assertIsNotNone(model)
+        self.assertEqual(tuple(model.labels), garment_precheck.LABELS)
+
+
+class ClassifierFallbackTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.genai = AsyncMock(return_value=genai_response("full"))
+        stack = ExitStack()
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_CLASSIFY", True))
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_THUMBNAIL_PX", 0))
+        stack.enter_context(patch.object(garment, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(patch.object(garment, "genai_generate_with_retries", self.genai))
+        stack.enter_context(patch.object(garment, "_garment_type_cache", garment._GarmentTypeCache(100)))
+        stack.enter_context(patch.object(garment, "_metrics", garment.GarmentCacheMetrics()))
+        self.addCleanup(stack.close)
+
+    async def test_confident_local_label_skips_genai(self) -> None:
+        with patch.object(garment, "preclassify_garment_type", AsyncMock(return_value="bottom")):
+            self.assertEqual(await garment.classify_garment_type(b"jeans"), "bottom")
+            self.assertEqual(await garment.classify_garment_type(b"jeans"), "bottom")
+        self.genai.assert_not_awaited()
+        _, payload = garment._garment_type_cache._entries[garment._hash_bytes(b"jeans")]
+        self.assertEqual(payload["origin"], "preclassifier")
+        metrics = garment.get_garment_cache_stats()["metrics"]
+        self.assertEqual((metrics["preclassified"], metrics["classifications"], metrics["hits"]), (1, 0, 1))
+
+    async def test_unsure_local_label_falls_back_to_genai(self) -> None:
+        with patch.object(garment, "preclassify_garment_type", AsyncMock(return_value=None)):
+            self.assertEqual(await garment.classify_garment_type(b"dress"), "full")
+        self.assertEqual(self.genai.await_count, 1)
+        self.assertEqual(garment.get_garment_cache_stats()["metrics"]["classifications"], 1)
+
+    async def test_precheck_is_off_by_default(self) -> None:
+        with patch.object(garment_precheck, "GARMENT_PRECLASSIFY", False):
+            self.assertIsNone(await garment_precheck.preclassify_garment_type(synthetic_garment("top", random.Random(2))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from io import BytesIO
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from fastapi import UploadFile
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.config import GENAI_TEXT_MODEL
+from backend.db import Listing, ProductDescription
+from backend.routes import description
+from backend.services import garment, garment_profile, listing_garment
+from backend.services.garment_profile import DescriptionFields, GarmentProfile
+from backend.services.imaging import SOURCE_IMAGE_MAX_PX
+from backend.services.perceptual import ImageSignature, image_signature
+from backend.tests.fixtures import garment_photo, genai_response
+from backend.tests.querycount import QueryRecorder
+
+_PROFILE_JSON = json.dumps(
+    {
+        "coverage": "bottom",
+        "category": "jeans",
+        "colors": ["Blue", "white", "", "black", "grey", "red", "green"],
+        "brand": "Levi's",
+        "description": "Title: Levi's 501 jeans\n\nDescription:\n- Straight fit.",
+    }
+)
+
+
+async def _describe(image: bytes | None = None, listing_id: str | None = "l1", **form: str) -> object:
+    values = {"gender": "", "brand": "", "model_name": "", "size": "", "condition": "", "force": None, **form}
+    return await description.generate_product_description(
+        image=_upload(image), prompt_override=None, listing_id=listing_id, x_user_id="u1", **values
+    )
+
+
+def _upload(data: bytes | None = None) -> UploadFile:
+    if data is None:
+        buf = BytesIO()
+        Image.new("RGB", (32, 48), "blue").save(buf, format="PNG")
+        data = buf.getvalue()
+    return UploadFile(file=BytesIO(data), filename="jeans.png")
+
+
+class ParseProfileTests(unittest.TestCase):
+    def test_fenced_json_is_parsed_and_colors_are_capped(self) -> None:
+        profile = garment_profile.parse_profile(f"```json\n{_PROFILE_JSON}\n```")
+        self.assertEqual(profile.garment_type, "bottom")
+        self.assertEqual(profile.colors, ["blue", "white", "black", "grey", "red"])
+        self.assertEqual(profile.attributes(), {"category": "jeans", "colors": profile.colors, "brand": "Levi's"})
+
+    def test_unusable_answers_are_rejected(self) -> None:
+        for raw in (None, "Title: not json", "[]", json.dumps({"coverage": "hat", "description": "x"})):
+            self.assertIsNone(garment_profile.parse_profile(raw))
+        self.assertIsNone(garment_profile.parse_profile(json.dumps({"coverage": "top", "description": " "})))
+
+
+class GarmentProfileTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.genai = AsyncMock(return_value=genai_response(_PROFILE_JSON))
+        stack = ExitStack()
+        stack.enter_context(patch.object(garment_profile, "genai_generate_with_retries", self.genai))
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_CLASSIFY", True))
+        stack.enter_context(patch.object(garment, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(patch.object(garment, "_garment_type_cache", garment._GarmentTypeCache(100)))
+        stack.enter_context(patch.object(garment, "_metrics", garment.GarmentCacheMetrics()))
+        self.addCleanup(stack.close)
+
+    async def test_one_call_fills_the_garment_cache(self) -> None:
+        fields = DescriptionFields.from_form(brand=" Levi's ", size="W32", gender="man")
+        profile = await garment_profile.generate_garment_profile(b"jeans-png", fields)
+
+        self.assertEqual((profile.garment_type, profile.category), ("bottom", "jeans"))
+        self.assertEqual(self.genai.await_count, 1)
+        kwargs = self.genai.await_args.kwargs
+        self.assertEqual(kwargs["model"], GENAI_TEXT_MODEL)
+        self.assertEqual(kwargs["config"].response_mime_type, "application/json")
+        prompt = self.genai.await_args.args[0][0].text
+        self.assertIn("Brand: Levi's\nSize: W32\nGender: man", prompt)
+
+        classifier = AsyncMock()
+        with patch.object(garment, "genai_generate_with_retries", classifier):
+            self.assertEqual(await garment.classify_garment_type(b"jeans-png"), "bottom")
+        classifier.assert_not_awaited()
+
+    async def test_failed_call_returns_none(self) -> None:
+        self.genai.side_effect = RuntimeError("boom")
+        self.assertIsNone(await garment_profile.generate_garment_profile(b"png", DescriptionFields()))
+
+
+class ListingProfileTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        self.recorder.seed(
+            Listing(id="l1", user_id="u1", source_s3_key="src.png", settings_json={"gender": "man"})
+        )
+        self.fields = DescriptionFields.from_form(gender="man", brand="Levi's")
+        self.profile = GarmentProfile(
+            garment_type="bottom",
+            description="Levi's jeans",
+            category="jeans",
+            colors=["blue"],
+            brand="Levi's",
+        )
+        self.generate = AsyncMock(return_value=self.profile)
+        self.classify = AsyncMock(return_value="full")
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(listing_garment, description, garment_profile))
+        stack.enter_context(patch.object(listing_garment, "generate_garment_profile", self.generate))
+        stack.enter_context(patch.object(listing_garment, "classify_garment_type", self.classify))
+        stack.enter_context(patch.object(description, "generate_garment_profile", self.generate))
+        stack.enter_context(patch.object(description, "upload_product_source_image", lambda data, mime: (None, "copy.png")))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _listing(self) -> Listing:
+        with Session(self.recorder.engine) as session:
+            return session.get(Listing, "l1")
+
+    def _descriptions(self) -> list[ProductDescription]:
+        with Session(self.recorder.engine) as session:
+            return list(session.execute(select(ProductDescription)).scalars())
+
+    async def test_eager_task_stores_type_description_and_attributes(self) -> None:
+        self.assertEqual(await listing_garment.classify_listing("l1", b"png", fields=self.fields), "bottom")
+        self.classify.assert_not_awaited()
+        listing = self._listing()
+        self.assertEqual(listing.description_text, "Levi's jeans")
+        self.assertEqual(listing.settings_json["garment_type"], "bottom")
+        self.assertEqual(listing.settings_json["attributes"]["category"], "jeans")
+        self.assertEqual(listing.settings_json["description_meta"], ["Brand: Levi's", "Gender: man"])
+        [record] = self._descriptions()
+        self.assertEqual((record.s3_key, record.brand, record.gender), ("src.png", "Levi's", "man"))
+
+    async def test_failed_profile_still_classifies(self) -> None:
+        self.generate.return_value = None
+        self.assertEqual(await listing_garment.classify_listing("l1", b"png", fields=self.fields), "full")
+        self.assertIsNone(self._listing().description_text)
+
+    async def test_describe_reuses_the_eager_description(self) -> None:
+        await listing_garment.classify_listing("l1", b"png", fields=self.fields)
+        self.generate.reset_mock()
+
+        result = await _describe(gender="man", brand="Levi's")
+        self.assertEqual(result, {"ok": True, "description": "Levi's jeans", "reused": True})
+        self.generate.assert_not_awaited()
+
+    async def test_large_upload_is_stored_downscaled(self) -> None:
+        buf = BytesIO()
+        Image.new("RGB", (4032, 3024), "navy").save(buf, format="JPEG", quality=90)
+        stored = []
+        with patch.object(description, "upload_product_source_image", lambda data, mime: stored.append(data) or (None, "k")):
+            await _describe(buf.getvalue(), listing_id=None)
+        with Image.open(BytesIO(stored[0])) as img:
+            self.assertEqual(img.size, (SOURCE_IMAGE_MAX_PX, 1536))
+        self.assertEqual(self.generate.await_args.args[0], stored[0])
+
+    async def test_forced_describe_regenerates(self) -> None:
+        await listing_garment.classify_listing("l1", b"png", fields=self.fields)
+        self.profile.description = "Levi's 501 jeans"
+
+        result = await _describe(gender="man", brand="Levi's", force="true")
+        self.assertEqual(result, {"ok": True, "description": "Levi's 501 jeans"})
+        self.assertEqual(self.generate.await_count, 2)
+        self.assertEqual(self._listing().description_text, "Levi's 501 jeans")
+
+    async def test_look_alike_image_does_not_reuse_the_description(self) -> None:
+        signature = image_signature(garment_photo())
+        with Session(self.recorder.engine) as session:
+            for flipped, text in ((0b111, "look-alike"), (0b1, "same photo")):
+                stored = ImageSignature(dhash=signature.dhash ^ flipped, colors=signature.colors)
+                session.add(ProductDescription(user_id="u1", s3_key="", description=text, image_signature=stored.to_hex()))
+            session.commit()
+
+        # Three differing bits is within the coverage cache's distance but too far for a description.
+        self.assertEqual(await garment_profile.find_similar_description("u1", signature, DescriptionFields()), "same photo")
+        with Session(self.recorder.engine) as session:
+            session.query(ProductDescription).filter_by(description="same photo").delete()
+            session.commit()
+        self.assertIsNone(await garment_profile.find_similar_description("u1", signature, DescriptionFields()))
+
+    async def test_describe_with_new_fields_regenerates_through_the_profile(self) -> None:
+        await listing_garment.classify_listing("l1", b"png", fields=self.fields)
+        self.profile.description = "Levi's jeans, size 32"
+
+        result = await _describe(gender="man", brand="Levi's", size="32")
+        self.assertEqual(result, {"ok": True, "description": "Levi's jeans, size 32"})
+        self.assertEqual(self.generate.await_count, 2)
+        listing = self._listing()
+        self.assertEqual(listing.description_text, "Levi's jeans, size 32")
+        self.assertEqual(listing.settings_json["description_meta"], ["Brand: Levi's", "Size: 32", "Gender: man"])
+        self.assertEqual(len(self._descriptions()), 2)
+
+    async def test_recompressed_reupload_reuses_the_description(self) -> None:
+        with patch.object(garment_profile, "_reuse_metrics", garment_profile.DescriptionReuseMetrics()):
+            first = await _describe(garment_photo(), listing_id=None, brand="Levi's")
+            again = await _describe(garment_photo(size=(450, 600), fmt="JPEG", quality=75), listing_id=None, brand="Levi's")
+            other_size = await _describe(garment_photo(fmt="JPEG"), listing_id=None, brand="Levi's", size="32")
+            stats = garment_profile.get_description_reuse_stats()
+
+        self.assertEqual(first, {"ok": True, "description": "Levi's jeans"})
+        self.assertEqual(again, {"ok": True, "description": "Levi's jeans", "reused": True})
+        self.assertNotIn("reused", other_size)
+        self.assertEqual(self.generate.await_count, 2)
+        self.assertEqual((stats["lookups"], stats["exact_hits"], stats["perceptual_hits"]), (3, 0, 1))
+        self.assertTrue(all(record.image_signature for record in self._descriptions()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from contextlib import ExitStack
+from fnmatch import fnmatchcase
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from backend.services import garment
+from backend.tests.fixtures import genai_response
+
+
+class _FakePubSub:
+    def __init__(self, server: "_FakeRedis") -> None:
+        self.server = server
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.pattern = ""
+
+    async def psubscribe(self, pattern: str) -> None:
+        self.pattern = pattern
+        self.server.subscribers.append(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        if self in self.server.subscribers:
+            self.server.subscribers.remove(self)
+
+
+class _FakeRedis:
+    """The handful of commands the garment single-flight uses, kept in memory."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+        self.subscribers: list[_FakePubSub] = []
+        self.commands: Counter[str] = Counter()
+
+    async def get(self, key: str) -> bytes | None:
+        self.commands["get"] += 1
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:
+        self.commands["set"] += 1
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        return True
+
+    async def exists(self, key: str) -> int:
+        self.commands["exists"] += 1
+        return int(key in self.data)
+
+    async def eval(self, script: str, numkeys: int, key: str, token: str) -> int:
+        if self.data.get(key) == token.encode():
+            del self.data[key]
+            return 1
+        return 0
+
+    async def publish(self, channel: str, data: str) -> int:
+        self.commands["publish"] += 1
+        receivers = [sub for sub in self.subscribers if fnmatchcase(channel, sub.pattern)]
+        for sub in receivers:
+            sub.queue.put_nowait({"type": "pmessage", "channel": channel.encode(), "data": data.encode()})
+        return len(receivers)
+
+    def pubsub(self) -> _FakePubSub:
+        return _FakePubSub(self)
+
+
+class GarmentPubSubTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.redis = _FakeRedis()
+        self.genai = AsyncMock(return_value=genai_response("bottom"))
+        self.image_hash = garment._hash_bytes(b"img")
+        stack = ExitStack()
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_CLASSIFY", True))
+        stack.enter_context(patch.object(garment, "GARMENT_TYPE_THUMBNAIL_PX", 0))
+        stack.enter_context(patch.object(garment, "get_redis_client", AsyncMock(return_value=self.redis)))
+        stack.enter_context(patch.object(garment, "genai_generate_with_retries", self.genai))
+        stack.enter_context(patch.object(garment, "_garment_type_cache", garment._GarmentTypeCache(100)))
+        stack.enter_context(patch.object(garment, "_metrics", garment.GarmentCacheMetrics()))
+        self.addCleanup(stack.close)
+
+    async def asyncTearDown(self) -> None:
+        await garment.stop_result_listener()
+        self.assertEqual(garment._result_waiters, {})
+
+    async def _finish_elsewhere(self, label: str) -> None:
+        payload = garment._build_cache_payload(label, origin="classifier", ts=0.0)
+        await garment._redis_set_payload(self.redis, garment._cache_key(self.image_hash), payload)
+        await garment._publish_result(self.redis, self.image_hash, payload)
+        del self.redis.data[garment._lock_key(self.image_hash)]
+
+    async def test_waiter_wakes_on_published_result_without_polling(self) -> None:
+        self.redis.data[garment._lock_key(self.image_hash)] = b"other-worker"
+        loop = asyncio.get_running_loop()
+        waiters = [asyncio.create_task(garment.classify_garment_type(b"img")) for _ in range(5)]
+        for _ in range(100):
+            if self.redis.commands["exists"] == 5:
+                break
+            await asyncio.sleep(0.01)
+        polled = self.redis.commands["get"] + self.redis.commands["exists"]
+
+        started = loop.time()
+        await self._finish_elsewhere("top")
+        self.assertEqual(await asyncio.gather(*waiters), ["top"] * 5)
+        self.assertLess(loop.time() - started, 0.1)
+        self.assertEqual(self.redis.commands["get"] + self.redis.commands["exists"], polled)
+        self.genai.assert_not_awaited()
+        self.assertEqual(garment._metrics.pubsub_wakeups, 5)
+
+    async def test_fallback_poll_notices_a_holder_that_died(self) -> None:
+        self.redis.data[garment._lock_key(self.image_hash)] = b"other-worker"
+        with patch.object(garment, "_FALLBACK_POLL_SECONDS", 0.05):
+            waiter = asyncio.create_task(garment.classify_garment_type(b"img"))
+            await asyncio.sleep(0.02)
+            del self.redis.data[garment._lock_key(self.image_hash)]
+            self.assertEqual(await waiter, "bottom")
+        self.genai.assert_awaited_once()
+        self.assertEqual(garment._metrics.pubsub_wakeups, 0)
+
+    async def test_lock_holder_publishes_its_result(self) -> None:
+        listener = self.redis.pubsub()
+        await listener.psubscribe(garment._result_channel("*"))
+        self.assertEqual(await garment.classify_garment_type(b"img"), "bottom")
+        message = listener.queue.get_nowait()
+        self.assertEqual(message["channel"].decode(), garment._result_channel(self.image_hash))
+        self.assertEqual(garment._decode_cache_payload(message["data"])["type"], "bottom")
+        self.assertNotIn(garment._lock_key(self.image_hash), self.redis.data)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from io import BytesIO
+import struct
+import unittest
+import zlib
+
+from fastapi import UploadFile
+from PIL import Image
+
+from backend.services.imaging import (
+    HEIF_SUPPORTED,
+    ImageDecodeError,
+    ImageLimitError,
+    make_jpeg_thumbnail_async,
+    normalize_image_to_png,
+    normalize_image_to_png_async,
+    probe_image_file,
+    probe_upload,
+)
+
+
+def _encoded(fmt: str, size: tuple[int, int] = (64, 48), color: str = "blue") -> bytes:
+    buf = BytesIO()
+    Image.new("RGB", size, color=color).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _png_header_only(width: int, height: int) -> bytes:
+    """A PNG whose header declares huge dimensions but carries almost no data."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b"")
+
+
+def _png_size(data: bytes) -> tuple[int, int]:
+    with Image.open(BytesIO(data)) as img:
+        return img.size
+
+
+class ImagingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_jpeg_is_normalized_to_png(self):
+        out = normalize_image_to_png(_encoded("JPEG"), max_px=None)
+        self.assertTrue(out.startswith(b"\x89PNG"))
+        self.assertEqual(_png_size(out), (64, 48))
+
+    async def test_large_jpeg_is_downscaled_on_decode(self):
+        out = normalize_image_to_png(_encoded("JPEG", size=(4000, 3000)), max_px=1000)
+        self.assertEqual(_png_size(out), (1000, 750))
+
+    @unittest.skipUnless(HEIF_SUPPORTED, "pillow-heif not installed")
+    async def test_heic_is_decoded_and_downscaled(self):
+        out = await normalize_image_to_png_async(_encoded("HEIF", size=(1200, 800)), max_px=600)
+        self.assertTrue(out.startswith(b"\x89PNG"))
+        self.assertEqual(_png_size(out), (600, 400))
+
+    async def test_thumbnail_is_small_jpeg_with_alpha_flattened(self):
+        buf = BytesIO()
+        Image.new("RGBA", (2048, 1536), (0, 0, 0, 0)).save(buf, format="PNG")
+        out = await make_jpeg_thumbnail_async(buf.getvalue(), max_px=384)
+        with Image.open(BytesIO(out)) as img:
+            self.assertEqual((img.format, img.mode, img.size), ("JPEG", "RGB", (384, 288)))
+            self.assertGreater(min(img.getpixel((10, 10))), 245)
+
+    async def test_invalid_bytes_raise(self):
+        with self.assertRaises(ImageDecodeError):
+            await normalize_image_to_png_async(b"not an image", max_px=512)
+
+    async def test_probe_reads_header_and_restores_position(self):
+        buf = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (40, 20)).save(buf, format="JPEG", exif=exif.tobytes())
+        buf.seek(0)
+        probe = probe_image_file(buf)
+        self.assertEqual((probe.format, probe.width, probe.height), ("JPEG", 40, 20))
+        self.assertEqual(probe.orientation, 6)
+        self.assertEqual(probe.display_size, (20, 40))
+        self.assertEqual(buf.tell(), 0)
+
+    async def test_orientation_is_applied_on_normalize(self):
+        buf = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (40, 20)).save(buf, format="JPEG", exif=exif.tobytes())
+        out = normalize_image_to_png(buf.getvalue(), max_px=None)
+        self.assertEqual(_png_size(out), (20, 40))
+
+    async def test_probe_upload_rejects_pixel_bomb_before_decode(self):
+        upload = UploadFile(filename="bomb.png", file=BytesIO(_png_header_only(20000, 20000)))
+        with self.assertRaises(ImageLimitError):
+            await probe_upload(upload)
+        with self.assertRaises(ImageLimitError):
+            normalize_image_to_png(_png_header_only(20000, 20000))
+
+    async def test_probe_upload_rejects_extreme_aspect(self):
+        upload = UploadFile(filename="strip.png", file=BytesIO(_encoded("PNG", size=(2000, 10))))
+        with self.assertRaises(ImageLimitError):
+            await probe_upload(upload)
+
+    async def test_probe_upload_rejects_spooled_size(self):
+        data = _encoded("PNG")
+        upload = UploadFile(filename="a.png", file=BytesIO(data), size=len(data))
+        with self.assertRaises(ImageLimitError):
+            await probe_upload(upload, max_bytes=len(data) - 1)
+        probe = await probe_upload(upload, max_bytes=len(data))
+        self.assertEqual((probe.width, probe.height), (64, 48))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import unittest
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from backend.db import (
+    EnvDefaultUser,
+    Generation,
+    Listing,
+    ListingImage,
+    ModelDefault,
+    ModelDescription,
+    PoseDescription,
+)
+from backend.routes import environment as env_routes
+from backend.routes import listing as listing_routes
+from backend.routes import model as model_routes
+from backend.routes import pose as pose_routes
+from backend.tests.querycount import QueryRecorder
+
+_BASE = datetime(2024, 1, 1)
+_SMALL, _LARGE = 1, 12
+
+
+class ListQueryCountTests(unittest.IsolatedAsyncioTestCase):
+    async def _query_count(
+        self,
+        size: int,
+        seed: Callable[[int], list[Any]],
+        call: Callable[[], Awaitable[Any]],
+        modules: tuple[Any, ...],
+    ) -> tuple[int, Any]:
+        recorder = QueryRecorder()
+        try:
+            recorder.seed(*seed(size))
+            with recorder.patched(*modules), recorder.recording() as statements:
+                payload = await call()
+            self.assertIsInstance(payload, dict, payload)
+            return len(statements), payload
+        finally:
+            recorder.dispose()
+
+    async def _assert_constant(
+        self,
+        seed: Callable[[int], list[Any]],
+        call: Callable[[], Awaitable[Any]],
+        *modules: Any,
+        items: Callable[[dict], list] = lambda payload: payload["items"],
+        expected_sizes: tuple[int, int] = (_SMALL, _LARGE),
+    ) -> None:
+        small, small_payload = await self._query_count(expected_sizes[0], seed, call, modules)
+        large, large_payload = await self._query_count(expected_sizes[1], seed, call, modules)
+        self.assertEqual(len(items(small_payload)), expected_sizes[0])
+        self.assertEqual(len(items(large_payload)), expected_sizes[1])
+        self.assertEqual(small, large, "query count grows with the number of rows")
+
+    async def test_model_generated(self) -> None:
+        def seed(n: int) -> list[Any]:
+            rows: list[Any] = []
+            for idx in range(n):
+                key = f"generated/{idx}.png"
+                rows.append(
+                    Generation(
+                        s3_key=key,
+                        pose="model-woman",
+                        prompt="p",
+                        options_json={"gender": "woman", "user_id": "u1"},
+                        user_id="u1",
+                        model="m",
+                        created_at=_BASE + timedelta(minutes=idx),
+                    )
+                )
+                rows.append(ModelDescription(s3_key=key, description=f"person {idx}"))
+            return rows
+
+        async def call():
+            payload = await model_routes.list_model_generated(cursor=None, limit=50, x_user_id="u1")
+            self.assertTrue(all(item["description"] for item in payload["items"]))
+            return payload
+
+        await self._assert_constant(seed, call, model_routes)
+
+    async def test_env_generated(self) -> None:
+        def seed(n: int) -> list[Any]:
+            return [
+                Generation(
+                    s3_key=f"generated/{idx}.png",
+                    pose="env",
+                    prompt="p",
+                    options_json={"user_id": "u1"},
+                    user_id="u1",
+                    model="m",
+                    created_at=_BASE + timedelta(minutes=idx),
+                )
+                for idx in range(n)
+            ]
+
+        await self._assert_constant(
+            seed,
+            lambda: env_routes.list_generated(cursor=None, limit=50, x_user_id="u1"),
+            env_routes,
+        )
+
+    async def test_model_defaults(self) -> None:
+        genders = ["man", "woman"]
+
+        def seed(n: int) -> list[Any]:
+            rows: list[Any] = []
+            for gender in genders[:n]:
+                key = f"model_sources/{gender}.png"
+                rows.append(ModelDefault(gender=gender, s3_key=key, name=gender))
+                rows.append(ModelDescription(s3_key=key, description=gender))
+            return rows
+
+        await self._assert_constant(seed, model_routes.list_model_defaults, model_routes, expected_sizes=(1, 2))
+
+    async def test_env_defaults(self) -> None:
+        def seed(n: int) -> list[Any]:
+            return [
+                EnvDefaultUser(user_id="u1", s3_key=f"generated/{idx}.png", name=f"env {idx}")
+                for idx in range(n)
+            ]
+
+        await self._assert_constant(
+            seed,
+            lambda: env_routes.list_defaults(x_user_id="u1"),
+            env_routes,
+        )
+
+    async def test_listing_detail(self) -> None:
+        def seed(n: int) -> list[Any]:
+            rows: list[Any] = [Listing(id="l1", user_id="u1", source_s3_key="src.png", settings_json={})]
+            rows.extend(
+                ListingImage(listing_id="l1", s3_key=f"generated/{idx}.png", pose="standing", prompt="p")
+                for idx in range(n)
+            )
+            return rows
+
+        await self._assert_constant(
+            seed,
+            lambda: listing_routes.get_listing("l1", x_user_id="u1"),
+            listing_routes,
+            items=lambda payload: payload["images"],
+        )
+
+    async def test_listings(self) -> None:
+        def seed(n: int) -> list[Any]:
+            rows: list[Any] = []
+            for idx in range(n):
+                lid = f"l{idx}"
+                rows.append(
+                    Listing(
+                        id=lid,
+                        user_id="u1",
+                        source_s3_key="src.png",
+                        settings_json={},
+                        created_at=_BASE + timedelta(minutes=idx),
+                    )
+                )
+                rows.append(ListingImage(listing_id=lid, s3_key=f"generated/{idx}.png", pose="standing", prompt="p"))
+            return rows
+
+        await self._assert_constant(
+            seed,
+            lambda: listing_routes.list_listings(cursor=None, limit=50, x_user_id="u1"),
+            listing_routes,
+        )
+
+    async def test_pose_descriptions(self) -> None:
+        def seed(n: int) -> list[Any]:
+            return [
+                PoseDescription(s3_key=f"poses/{idx}.png", description="d", created_at=_BASE + timedelta(minutes=idx))
+                for idx in range(n)
+            ]
+
+        await self._assert_constant(
+            seed,
+            lambda: pose_routes.list_pose_descriptions(cursor=None, limit=50),
+            pose_routes,
+        )
+
+    async def test_random_pose_descriptions(self) -> None:
+        def seed(n: int) -> list[Any]:
+            return [PoseDescription(s3_key=f"poses/{idx}.png", description=f"d{idx}") for idx in range(n)]
+
+        queries, payload = await self._query_count(
+            200, seed, lambda: pose_routes.random_pose_descriptions(n=5), (pose_routes,)
+        )
+        keys = [item["s3_key"] for item in payload["items"]]
+        self.assertEqual((queries, len(set(keys))), (2, 5))
+        self.assertTrue(all(item["description"] == "d" + key[6:-4] for item, key in zip(payload["items"], keys)))
+
+        _, payload = await self._query_count(3, seed, lambda: pose_routes.random_pose_descriptions(n=5), (pose_routes,))
+        self.assertEqual(len(payload["items"]), 3)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.orm import Session
+
+from backend.db import Listing
+from backend.services import garment, listing_garment
+from backend.services.editing import ListingContext, SourceImage
+from backend.tests.querycount import QueryRecorder
+
+
+def _source(garment_type: str | None = None, *, origin: str = "listing") -> SourceImage:
+    listing = ListingContext(id="l1", user_id="u1", source_s3_key="src.png", garment_type=garment_type)
+    return SourceImage(png_bytes=b"listing-png", origin=origin, listing=listing)
+
+
+class ListingGarmentTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        self.recorder.seed(Listing(id="l1", user_id="u1", source_s3_key="src.png", settings_json={"gender": "woman"}))
+        self.classify = AsyncMock(return_value="bottom")
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(listing_garment))
+        stack.enter_context(patch.object(listing_garment, "classify_garment_type", self.classify))
+        stack.enter_context(patch.object(listing_garment, "LISTING_EAGER_CLASSIFY", True))
+        stack.enter_context(patch.object(listing_garment, "GARMENT_TYPE_CLASSIFY", True))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _settings(self) -> dict:
+        with Session(self.recorder.engine) as session:
+            return session.get(Listing, "l1").settings_json
+
+    async def test_classification_is_stored_on_the_listing(self) -> None:
+        self.assertEqual(await listing_garment.classify_listing("l1", b"listing-png"), "bottom")
+        self.assertEqual(
+            self._settings(), {"gender": "woman", "garment_type": "bottom", "garment_type_origin": "model"}
+        )
+
+    async def test_existing_garment_type_is_kept(self) -> None:
+        with Session(self.recorder.engine) as session:
+            session.get(Listing, "l1").settings_json = {"garment_type": "full", "garment_type_origin": "user"}
+            session.commit()
+        self.assertEqual(await listing_garment.classify_listing("l1", b"listing-png"), "full")
+        self.assertEqual(self._settings()["garment_type_origin"], "user")
+
+    async def test_edit_joins_the_eager_task_instead_of_classifying_again(self) -> None:
+        release = asyncio.Event()
+
+        async def slow(png_bytes, override=None):
+            await release.wait()
+            return "bottom"
+
+        self.classify.side_effect = slow
+        self.assertTrue(listing_garment.schedule_listing_classification("l1", b"listing-png"))
+        edit = asyncio.create_task(listing_garment.resolve_garment_type(_source()))
+        await asyncio.sleep(0.01)
+        self.assertFalse(edit.done())
+        release.set()
+
+        self.assertEqual(await edit, "bottom")
+        self.assertEqual(self.classify.await_count, 1)
+        self.assertEqual(self._settings()["garment_type"], "bottom")
+        self.assertEqual(listing_garment._pending, {})
+
+    async def test_edit_reads_the_stored_type_without_genai(self) -> None:
+        genai = AsyncMock()
+        with patch.object(listing_garment, "classify_garment_type", garment.classify_garment_type), patch.object(
+            garment, "genai_generate_with_retries", genai
+        ):
+            self.assertEqual(await listing_garment.resolve_garment_type(_source("bottom")), "bottom")
+            self.assertEqual(await listing_garment.resolve_garment_type(_source("bottom"), " Top "), "top")
+        genai.assert_not_awaited()
+
+    async def test_upload_attached_to_a_listing_uses_the_stored_type(self) -> None:
+        self.assertEqual(await listing_garment.resolve_garment_type(_source("bottom", origin="upload")), "bottom")
+        self.classify.assert_awaited_once_with(b"listing-png", "bottom")
+
+    async def test_source_without_listing_is_classified(self) -> None:
+        source = SourceImage(png_bytes=b"upload-png", origin="upload", listing=None)
+        self.assertEqual(await listing_garment.resolve_garment_type(source), "bottom")
+        self.classify.assert_awaited_once_with(b"upload-png")
+
+    async def test_disabled_eager_classification_schedules_nothing(self) -> None:
+        with patch.object(listing_garment, "LISTING_EAGER_CLASSIFY", False):
+            self.assertFalse(listing_garment.schedule_listing_classification("l1", b"listing-png"))
+        self.assertEqual(listing_garment._pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import unittest
+
+from backend.utils.lru import BoundedLRU
+
+
+class BoundedLRUTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self) -> None:
+        evicted: list[str] = []
+        cache: BoundedLRU[str, int] = BoundedLRU(2, on_evict=evicted.append)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        cache["c"] = 3
+        self.assertEqual(evicted, ["b"])
+        self.assertEqual(cache["a"], 1)
+        cache["d"] = 4
+        self.assertEqual(evicted, ["b", "c"])
+        self.assertEqual(list(cache), ["a", "d"])
+
+    def test_overwrite_refreshes_without_evicting(self) -> None:
+        evicted: list[str] = []
+        cache: BoundedLRU[str, int] = BoundedLRU(2, on_evict=evicted.append)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache["a"] = 3
+        self.assertEqual(evicted, [])
+        self.assertEqual(list(cache.items()), [("b", 2), ("a", 3)])
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.pop("b"), 2)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from backend.db import UsageEvent
+from backend.services import meter_cache, usage
+from backend.services.polar import PolarAPIError
+from backend.tests.fixtures import usage_summary
+from backend.tests.querycount import QueryRecorder
+
+
+def _meters(balance: int) -> list[dict[str, int]]:
+    return [{"consumed_units": 10 - balance, "credited_units": 10, "balance": balance}]
+
+
+class MeterCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        meter_cache._local.clear()
+        meter_cache._refresh_tasks.clear()
+        meter_cache._failed_at.clear()
+        self.polar = AsyncMock(return_value=_meters(7))
+        stack = ExitStack()
+        stack.enter_context(patch.object(meter_cache, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(patch.object(meter_cache, "list_customer_meters", self.polar))
+        self.addCleanup(stack.close)
+
+    async def _drain(self) -> None:
+        await asyncio.gather(*list(meter_cache._refresh_tasks.values()))
+
+    def _age(self, user_id: str, seconds: float) -> None:
+        meter_cache._local[user_id].fetched_at = time.time() - seconds
+
+    async def test_miss_returns_immediately_and_fetches_in_background(self) -> None:
+        self.assertIsNone(await meter_cache.get_meter_snapshot("u1"))
+        self.assertIsNone(await meter_cache.get_meter_snapshot("u1"))
+        await self._drain()
+        self.assertEqual(self.polar.await_count, 1)
+
+        for _ in range(20):
+            snapshot = await meter_cache.get_meter_snapshot("u1")
+        self.assertEqual((snapshot.consumed, snapshot.credited, snapshot.balance), (3, 10, 7))
+        self.assertEqual(self.polar.await_count, 1)
+        self.assertEqual(meter_cache._refresh_tasks, {})
+
+    async def test_stale_snapshot_is_served_while_one_refresh_runs(self) -> None:
+        await meter_cache.fetch_meter_snapshot("u1")
+        self._age("u1", meter_cache.POLAR_METER_CACHE_TTL_SECONDS + 1)
+        release = asyncio.Event()
+
+        async def slow_polar(**kwargs):
+            await release.wait()
+            return _meters(4)
+
+        self.polar.side_effect = slow_polar
+        stale = await asyncio.gather(*(meter_cache.get_meter_snapshot("u1") for _ in range(10)))
+        self.assertTrue(all(item.balance == 7 for item in stale))
+        release.set()
+        await self._drain()
+        self.assertEqual(self.polar.await_count, 2)
+        self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 4)
+
+    async def test_expired_snapshot_is_not_served(self) -> None:
+        await meter_cache.fetch_meter_snapshot("u1")
+        self._age("u1", meter_cache.POLAR_METER_STALE_SECONDS + 1)
+        self.assertIsNone(await meter_cache.get_meter_snapshot("u1"))
+        await self._drain()
+
+    async def test_failed_refresh_backs_off_and_keeps_the_stale_snapshot(self) -> None:
+        await meter_cache.fetch_meter_snapshot("u1")
+        self._age("u1", meter_cache.POLAR_METER_CACHE_TTL_SECONDS + 1)
+        self.polar.side_effect = PolarAPIError("down")
+        with self.assertLogs(meter_cache.LOGGER, level="ERROR"):
+            await meter_cache.get_meter_snapshot("u1")
+            await self._drain()
+        for _ in range(5):
+            self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 7)
+        self.assertEqual(self.polar.await_count, 2)
+
+    async def test_invalidate_and_local_charges(self) -> None:
+        await meter_cache.fetch_meter_snapshot("u1")
+        await meter_cache.record_meter_usage("u1", 2)
+        snapshot = await meter_cache.get_meter_snapshot("u1")
+        self.assertEqual((snapshot.consumed, snapshot.balance), (5, 5))
+
+        await meter_cache.invalidate_meter_snapshot("u1")
+        self.assertNotIn("u1", meter_cache._local)
+        await self._drain()
+        self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 7)
+
+    async def test_quota_charge_reaches_the_snapshot_only_after_commit(self) -> None:
+        await meter_cache.fetch_meter_snapshot("u1")
+        recorder = QueryRecorder()
+        self.addCleanup(recorder.dispose)
+
+        with self.assertRaises(RuntimeError):
+            async with recorder.db_session() as session:
+                session.add(UsageEvent(user_id="u1", action="usage", amount=2))
+                usage._record_meter_usage_after_commit(session, "u1", 2)
+                raise RuntimeError("rolled back")
+        await asyncio.gather(*usage._meter_charge_tasks)
+        self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 7)
+
+        async with recorder.db_session() as session:
+            usage._record_meter_usage_after_commit(session, "u1", 2)
+            self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 7)
+        await asyncio.gather(*usage._meter_charge_tasks)
+        self.assertEqual((await meter_cache.get_meter_snapshot("u1")).balance, 5)
+
+    async def test_summary_enrichment_uses_the_cache(self) -> None:
+        summary = await usage._enrich_summary_with_polar_meter(usage_summary())
+        self.assertEqual(summary.remaining, 9)  # miss: local counters
+        await self._drain()
+        summary = await usage._enrich_summary_with_polar_meter(usage_summary())
+        self.assertEqual((summary.used, summary.remaining), (3, 7))
+        self.assertEqual(self.polar.await_count, 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from backend.config import LIST_PAGE_SIZE_DEFAULT, LIST_PAGE_SIZE_MAX
+from backend.db import Base, PoseDescription
+from backend.utils.pagination import (
+    InvalidCursorError,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+    split_page,
+)
+
+
+class CursorTests(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        created = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(created, 42)), (created, 42))
+        self.assertEqual(decode_cursor(encode_cursor(created, "abc"))[1], "abc")
+
+    def test_rejects_garbage(self) -> None:
+        for cursor in ("not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1)[:-3], "W10"):
+            with self.assertRaises(InvalidCursorError):
+                decode_cursor(cursor)
+
+    def test_page_size_is_capped(self) -> None:
+        self.assertEqual(clamp_page_size(None), LIST_PAGE_SIZE_DEFAULT)
+        self.assertEqual(clamp_page_size(0), LIST_PAGE_SIZE_DEFAULT)
+        self.assertEqual(clamp_page_size(5), 5)
+        self.assertEqual(clamp_page_size(LIST_PAGE_SIZE_MAX * 10), LIST_PAGE_SIZE_MAX)
+
+
+class KeysetPageTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        base = datetime(2024, 1, 1)
+        with Session(self.engine) as session:
+            for idx in range(23):
+                # Pairs of rows share a timestamp so the id tie-breaker is exercised.
+                session.add(
+                    PoseDescription(
+                        s3_key=f"poses/{idx}.png",
+                        description="x",
+                        created_at=base + timedelta(minutes=idx // 2),
+                    )
+                )
+            session.commit()
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+
+    def _walk(self, page_size: int) -> list[list[str]]:
+        pages: list[list[str]] = []
+        cursor = None
+        with Session(self.engine) as session:
+            while True:
+                stmt = keyset_page(
+                    select(PoseDescription.s3_key, PoseDescription.created_at, PoseDescription.id),
+                    PoseDescription.created_at,
+                    PoseDescription.id,
+                    cursor=cursor,
+                    limit=page_size,
+                )
+                rows, cursor = split_page(session.execute(stmt).all(), page_size, key=lambda r: (r[1], r[2]))
+                pages.append([row[0] for row in rows])
+                if cursor is None:
+                    return pages
+
+    def test_pages_cover_every_row_once_in_order(self) -> None:
+        pages = self._walk(5)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        flat = [key for page in pages for key in page]
+        with Session(self.engine) as session:
+            expected = session.execute(
+                select(PoseDescription.s3_key).order_by(
+                    PoseDescription.created_at.desc(), PoseDescription.id.desc()
+                )
+            ).scalars().all()
+        self.assertEqual(flat, expected)
+
+    def test_exact_multiple_has_no_trailing_empty_page(self) -> None:
+        pages = self._walk(23)
+        self.assertEqual([len(page) for page in pages], [23])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
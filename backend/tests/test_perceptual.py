@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import unittest
+
+from backend.services.perceptual import ImageSignature, PerceptualIndex, hamming, image_signature
+from backend.tests.fixtures import garment_photo
+
+
+class ImageSignatureTests(unittest.TestCase):
+    def test_reencoded_copy_matches(self) -> None:
+        original = image_signature(garment_photo())
+        for copy in (
+            garment_photo(fmt="JPEG", quality=70),
+            garment_photo(size=(300, 400), fmt="JPEG", quality=85),
+            garment_photo(size=(1200, 1600), fmt="WEBP", quality=80),
+        ):
+            self.assertIsNotNone(original.matches(image_signature(copy), 10))
+
+    def test_same_cut_in_another_colour_does_not_match(self) -> None:
+        navy = image_signature(garment_photo("navy"))
+        red = image_signature(garment_photo("firebrick"))
+        self.assertLessEqual(hamming(navy.dhash, red.dhash), 10)
+        self.assertIsNone(navy.matches(red, 10))
+
+    def test_hex_round_trip_and_undecodable_input(self) -> None:
+        signature = image_signature(garment_photo())
+        self.assertEqual(ImageSignature.from_hex(signature.to_hex()), signature)
+        self.assertIsNone(ImageSignature.from_hex("not-hex"))
+        self.assertIsNone(image_signature(b"not an image"))
+
+
+class PerceptualIndexTests(unittest.TestCase):
+    def test_nearest_finds_a_neighbour_and_forgets_discarded_keys(self) -> None:
+        index = PerceptualIndex(10)
+        base = image_signature(garment_photo())
+        index.add("navy", base)
+        index.add("red", image_signature(garment_photo("firebrick")))
+        near = ImageSignature(dhash=base.dhash ^ 0b1011, colors=base.colors)
+
+        self.assertEqual(index.nearest(near), ("navy", 3))
+        index.discard("navy")
+        self.assertIsNone(index.nearest(near))
+        self.assertEqual(len(index), 1)
+
+    def test_distance_beyond_the_limit_is_not_returned(self) -> None:
+        index = PerceptualIndex(2)
+        base = image_signature(garment_photo())
+        index.add("a", base)
+        self.assertIsNone(index.nearest(ImageSignature(dhash=base.dhash ^ 0b111, colors=base.colors)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.db import SubscriptionPlan
+from backend.services import polar
+from backend.services.polar import PolarAPIError, PolarPlan
+from backend.tests.querycount import QueryRecorder
+
+
+def _plan(plan_id: str, allowance: int, name: str = "Pro") -> PolarPlan:
+    return PolarPlan(
+        id=plan_id,
+        name=name,
+        allowance=allowance,
+        interval="month",
+        currency="eur",
+        default_price_id=None,
+        metadata={},
+        is_active=True,
+    )
+
+
+class PlanCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        polar._catalog = None
+        polar._plan_refresh_task = None
+        polar._plan_refresh_failed_at = None
+        self.recorder = QueryRecorder()
+        self.recorder.seed(SubscriptionPlan(id="plan-pro", name="Pro", allowance=10))
+        self.fetch = AsyncMock(return_value=[_plan("plan-pro", 20), _plan("plan-max", 50, "Max")])
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(polar))
+        stack.enter_context(patch.object(polar, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(patch.object(polar, "_fetch_plans", self.fetch))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    async def _drain(self) -> None:
+        if polar._plan_refresh_task is not None:
+            await polar._plan_refresh_task
+
+    def _allowance_in_db(self, plan_id: str) -> int:
+        with Session(self.recorder.engine) as session:
+            return session.scalars(select(SubscriptionPlan.allowance).where(SubscriptionPlan.id == plan_id)).one()
+
+    async def test_cold_start_serves_database_rows_while_one_refresh_runs(self) -> None:
+        release = asyncio.Event()
+        plans = self.fetch.return_value
+
+        async def slow_fetch():
+            await release.wait()
+            return plans
+
+        self.fetch.side_effect = slow_fetch
+        served = await asyncio.gather(*(polar.get_plan("plan-pro") for _ in range(10)))
+        self.assertEqual({plan.allowance for plan in served}, {10})
+        release.set()
+        await self._drain()
+
+        self.assertEqual(self.fetch.await_count, 1)
+        self.assertEqual((await polar.get_plan("plan-pro")).allowance, 20)
+        self.assertEqual((await polar.get_plan("plan-max")).name, "Max")
+        self.assertEqual(self._allowance_in_db("plan-pro"), 20)
+        self.assertEqual(self.fetch.await_count, 1)
+
+    async def test_stale_catalog_is_served_while_refreshing(self) -> None:
+        await polar.refresh_plan_cache(force=True)
+        polar._catalog.fetched_at = time.time() - polar.POLAR_PLAN_CACHE_TTL_SECONDS - 1
+        self.fetch.return_value = [_plan("plan-pro", 30)]
+        self.assertEqual((await polar.get_plan("plan-pro")).allowance, 20)
+        await self._drain()
+        self.assertEqual((await polar.get_plan("plan-pro")).allowance, 30)
+        self.assertEqual(self.fetch.await_count, 2)
+
+    async def test_failed_refresh_keeps_stale_plans_and_backs_off(self) -> None:
+        await polar.refresh_plan_cache(force=True)
+        polar._catalog.fetched_at = 0.0
+        self.fetch.side_effect = PolarAPIError("down")
+        with self.assertLogs(polar.LOGGER, level="ERROR"):
+            await polar.get_plan("plan-pro")
+            await self._drain()
+        for _ in range(5):
+            self.assertEqual((await polar.get_plan("plan-pro")).allowance, 20)
+        self.assertEqual(self.fetch.await_count, 2)
+
+    async def test_unknown_plan_does_not_wait_on_polar(self) -> None:
+        await polar.refresh_plan_cache(force=True)
+        self.assertIsNone(await polar.get_plan("plan-gone"))
+        self.assertIsNone(polar._plan_refresh_task)
+        self.assertEqual(self.fetch.await_count, 1)
+
+    async def test_webhook_payload_updates_catalog_without_refetching(self) -> None:
+        await polar.refresh_plan_cache(force=True)
+        await polar.upsert_plan_from_payload(
+            {"id": "plan-pro", "name": "Pro", "metadata": {"allowance": 40}, "is_archived": True}
+        )
+        plan = await polar.get_plan("plan-pro")
+        self.assertEqual((plan.allowance, plan.is_active), (40, False))
+        self.assertEqual(self._allowance_in_db("plan-pro"), 40)
+        self.assertEqual(self.fetch.await_count, 1)
+
+    async def test_forced_refresh_joins_the_one_in_flight(self) -> None:
+        release = asyncio.Event()
+        plans = self.fetch.return_value
+
+        async def slow_fetch():
+            await release.wait()
+            return plans
+
+        self.fetch.side_effect = slow_fetch
+        waiters = [asyncio.create_task(polar.refresh_plan_cache(force=True)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        self.assertTrue(all(set(result) == {"plan-pro", "plan-max"} for result in results))
+        self.assertEqual(self.fetch.await_count, 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from sqlalchemy.orm import Session
+
+from backend.db import PoseDescription, PoseDescriptionJob, PoseSource
+from backend.routes import pose
+from backend.services import pose_jobs
+from backend.tests.querycount import QueryRecorder
+
+_KEYS = ["poses/a.png", "poses/b.png", "poses/c.png"]
+
+
+class PoseJobTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        now = datetime.utcnow()
+        self.recorder.seed(
+            *(PoseSource(s3_key=key, created_at=now - timedelta(seconds=idx)) for idx, key in enumerate(_KEYS))
+        )
+        self.release = asyncio.Event()
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(pose, pose_jobs))
+        stack.enter_context(patch.object(pose_jobs, "generate_pose_description", self._describe))
+        stack.enter_context(patch.object(pose_jobs, "inline_execution", lambda: True))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+        self.addCleanup(pose_jobs._inline_progress.clear)
+
+    async def _describe(self, s3_key: str) -> dict:
+        await self.release.wait()
+        if s3_key == "poses/b.png":
+            return {"s3_key": s3_key, "ok": False, "error": "model returned no description text"}
+        with Session(self.recorder.engine) as session:
+            session.add(PoseDescription(s3_key=s3_key, description=f"pose {s3_key}"))
+            session.commit()
+        return {"s3_key": s3_key, "ok": True}
+
+    async def _status(self, job_id: str) -> dict:
+        return await pose.get_pose_description_job(job_id)
+
+    async def test_describe_returns_a_job_before_any_pose_is_done(self) -> None:
+        started = await pose.generate_pose_descriptions()
+        self.assertEqual((started["queued"], started["inline"]), (3, True))
+
+        status = await self._status(started["job_id"])
+        self.assertEqual((status["state"], status["done"]), ("running", 0))
+
+        self.release.set()
+        await asyncio.gather(*pose_jobs._inline_tasks)
+        status = await self._status(started["job_id"])
+        self.assertEqual((status["state"], status["done"], status["failed"]), ("done", 2, 1))
+        self.assertEqual(
+            status["items"][1],
+            {"s3_key": "poses/b.png", "state": "failed", "error": "model returned no description text"},
+        )
+
+        # Another worker only sees pose_descriptions; the failed key stays unfinished until the batch times out.
+        pose_jobs._inline_progress.clear()
+        self.assertEqual((await self._status(started["job_id"]))["items"][1]["state"], "queued")
+
+    async def test_repeated_request_joins_the_running_job(self) -> None:
+        first = await pose.generate_pose_descriptions()
+        second = await pose.generate_pose_descriptions()
+        self.assertEqual((second["job_id"], second["existing"]), (first["job_id"], True))
+        self.release.set()
+        await asyncio.gather(*pose_jobs._inline_tasks)
+
+    async def test_celery_job_is_published_off_the_loop_and_tracked_per_key(self) -> None:
+        publish_threads = []
+
+        def enqueue(keys, *, wait):
+            self.assertFalse(wait)
+            publish_threads.append(threading.current_thread())
+            return {"job_id": "group-1", "task_ids": {key: f"task-{key}" for key in keys}, "results": []}
+
+        def states(task_ids):
+            return {key: {"state": "running"} for key in task_ids}
+
+        with patch.object(pose_jobs, "inline_execution", lambda: False), patch.object(
+            pose_jobs, "enqueue_pose_descriptions", enqueue
+        ), patch.object(pose_jobs, "pose_task_states", Mock(side_effect=states)) as task_states:
+            started = await pose.generate_pose_descriptions()
+            with Session(self.recorder.engine) as session:
+                session.add(PoseDescription(s3_key="poses/a.png", description="done"))
+                session.commit()
+            status = await self._status("group-1")
+
+        self.assertEqual(started, {"ok": True, "job_id": "group-1", "queued": 3})
+        self.assertNotIn(threading.main_thread(), publish_threads)
+        self.assertEqual([item["state"] for item in status["items"]], ["done", "running", "running"])
+        task_states.assert_called_once_with({"poses/b.png": "task-poses/b.png", "poses/c.png": "task-poses/c.png"})
+
+    async def test_expired_job_reports_unfinished_keys_as_failed(self) -> None:
+        self.recorder.seed(
+            PoseDescriptionJob(
+                id="old", s3_keys=_KEYS[:1], task_ids=None, created_at=datetime.utcnow() - timedelta(hours=1)
+            )
+        )
+        status = await self._status("old")
+        self.assertEqual(status["items"], [{"s3_key": "poses/a.png", "state": "failed", "error": "timed out"}])
+        self.assertEqual((await self._status("missing")).status_code, 404)
+
+    async def test_timezone_aware_created_at_is_compared_as_utc(self) -> None:
+        # SQLite drops the offset on storage, so build the row the way psycopg returns it.
+        aware = datetime.now(timezone(timedelta(hours=2)))
+        fresh = PoseDescriptionJob(id="fresh", s3_keys=_KEYS[:1], task_ids=None, created_at=aware)
+        stale = PoseDescriptionJob(id="stale", s3_keys=_KEYS[:1], task_ids=None, created_at=aware - timedelta(hours=1))
+
+        self.assertEqual((await pose_jobs._job_status(fresh)).items[0]["state"], "queued")
+        self.assertEqual((await pose_jobs._job_status(stale)).items[0]["state"], "failed")
+
+    async def test_timeout_scales_with_the_number_of_keys(self) -> None:
+        started = datetime.utcnow() - timedelta(seconds=pose_jobs.POSE_BATCH_TIMEOUT * 2)
+        single = PoseDescriptionJob(id="one", s3_keys=_KEYS[:1], task_ids=None, created_at=started)
+        batch = PoseDescriptionJob(id="three", s3_keys=_KEYS, task_ids=None, created_at=started)
+
+        self.assertEqual((await pose_jobs._job_status(single)).items[0]["state"], "failed")
+        self.assertEqual({item["state"] for item in (await pose_jobs._job_status(batch)).items}, {"queued"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.db import Generation, UsageCounter, UsageReservation
+from backend.services import editing, usage
+from backend.tests.fixtures import active_subscription, without_meter_enrichment
+from backend.tests.querycount import QueryRecorder
+
+_ALLOWANCE = 10
+
+
+class QuotaReservationTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        plan, subscription = active_subscription(allowance=_ALLOWANCE)
+        self.recorder = QueryRecorder()
+        self.recorder.seed(
+            plan,
+            subscription,
+            UsageCounter(
+                user_id="u1",
+                period_start=subscription.current_period_start,
+                period_end=subscription.current_period_end,
+                used=0,
+            ),
+        )
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(usage, editing))
+        # No REDIS_URL in tests, so holds go through the database fallback.
+        stack.enter_context(patch.object(usage, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(without_meter_enrichment())
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _open_holds(self) -> int:
+        with Session(self.recorder.engine) as session:
+            return len(session.scalars(select(UsageReservation)).all())
+
+    async def test_parallel_reservations_never_exceed_remaining(self) -> None:
+        results = await asyncio.gather(*(usage.reserve_quota("u1") for _ in range(25)), return_exceptions=True)
+        held = [item for item in results if isinstance(item, usage.QuotaReservation)]
+        rejected = [item for item in results if isinstance(item, usage.QuotaError)]
+        self.assertEqual(len(held), _ALLOWANCE)
+        self.assertEqual(len(rejected), 25 - _ALLOWANCE)
+        self.assertTrue(all(item.store == "db" for item in held))
+
+        summary = await usage.get_usage_summary("u1")
+        self.assertEqual((summary.used, summary.reserved, summary.remaining), (0, _ALLOWANCE, 0))
+        with self.assertRaises(usage.QuotaError):
+            await usage.ensure_can_consume("u1")
+
+    async def test_persist_charges_and_releases_the_hold(self) -> None:
+        reservation = await usage.reserve_quota("u1", 3)
+        summary = await editing.persist_generation_result(
+            s3_key="generated/a.png",
+            pose="standing",
+            prompt="p",
+            options={"user_id": "u1"},
+            model_name="m",
+            reservation=reservation,
+        )
+        self.assertEqual(summary.used, 3)
+        self.assertTrue(reservation.released)
+        self.assertEqual(self._open_holds(), 0)
+        after = await usage.get_usage_summary("u1")
+        self.assertEqual((after.used, after.reserved, after.remaining), (3, 0, _ALLOWANCE - 3))
+        with Session(self.recorder.engine) as session:
+            self.assertEqual(session.scalars(select(Generation.s3_key)).all(), ["generated/a.png"])
+
+    async def test_release_frees_units_and_is_idempotent(self) -> None:
+        reservation = await usage.reserve_quota("u1", _ALLOWANCE)
+        with self.assertRaises(usage.QuotaError) as ctx:
+            await usage.reserve_quota("u1")
+        self.assertEqual(ctx.exception.summary.reserved, _ALLOWANCE)
+        await usage.release_reservation(reservation)
+        await usage.release_reservation(reservation)
+        self.assertEqual(self._open_holds(), 0)
+        await usage.reserve_quota("u1")
+
+    async def test_expired_holds_do_not_count(self) -> None:
+        await usage.reserve_quota("u1", _ALLOWANCE)
+        with Session(self.recorder.engine) as session:
+            session.execute(update(UsageReservation).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            session.commit()
+        self.assertEqual((await usage.get_usage_summary("u1")).reserved, 0)
+        await usage.reserve_quota("u1", 2)
+        # The expired hold was swept when the new one was taken.
+        self.assertEqual(self._open_holds(), 1)
+
+    async def test_zero_cost_reservation_holds_nothing(self) -> None:
+        with self.recorder.recording() as statements:
+            reservation = await usage.reserve_quota("u1", 0)
+            await usage.release_reservation(reservation)
+        self.assertIsNone(reservation.store)
+        self.assertEqual(statements, [])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.db import Generation, UsageEvent
+from backend.services import editing, usage
+from backend.tests.fixtures import active_subscription, without_meter_enrichment
+from backend.tests.querycount import QueryRecorder
+
+
+class UsageLedgerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.period_start = datetime.utcnow() - timedelta(days=1)
+        self.recorder = QueryRecorder()
+        self.recorder.seed(*active_subscription("u1", "u2", period_start=self.period_start))
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(usage, editing))
+        stack.enter_context(patch.object(usage, "get_redis_client", AsyncMock(return_value=None)))
+        stack.enter_context(without_meter_enrichment())
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _events(self) -> list[UsageEvent]:
+        with Session(self.recorder.engine) as session:
+            return list(session.scalars(select(UsageEvent).order_by(UsageEvent.id)))
+
+    async def test_generation_charge_is_recorded_with_its_action_and_row(self) -> None:
+        reservation = await usage.reserve_quota("u1", 2, action="listing_image")
+        await editing.persist_generation_result(
+            s3_key="generated/a.png",
+            pose="standing",
+            prompt="p",
+            options={"user_id": "u1"},
+            model_name="m",
+            reservation=reservation,
+        )
+        (event,) = self._events()
+        with Session(self.recorder.engine) as session:
+            generation_id = session.scalars(select(Generation.id)).one()
+        self.assertEqual(
+            (event.user_id, event.action, event.amount, event.generation_id),
+            ("u1", "listing_image", 2, generation_id),
+        )
+        self.assertEqual(event.period_start, self.period_start)
+
+    async def test_rejected_charge_is_not_recorded(self) -> None:
+        async with self.recorder.db_session() as session:
+            await usage.consume_quota_with_session(session, "u1", 9, action="studio_model")
+        with self.assertRaises(usage.QuotaError):
+            async with self.recorder.db_session() as session:
+                await usage.consume_quota_with_session(session, "u1", 2, action="studio_model")
+        self.assertEqual([event.amount for event in self._events()], [9])
+
+    async def test_report_groups_units_by_action(self) -> None:
+        for user_id, action, amount in [
+            ("u1", "listing_image", 1),
+            ("u2", "listing_image", 1),
+            ("u1", "listing_image", 1),
+            ("u1", "studio_model", 3),
+        ]:
+            await usage.consume_quota(user_id, amount, action=action)
+        report = await usage.get_usage_report(datetime.utcnow() - timedelta(hours=1))
+        self.assertEqual(
+            report,
+            [
+                {"action": "listing_image", "events": 3, "units": 3, "users": 2},
+                {"action": "studio_model", "events": 1, "units": 3, "users": 1},
+            ],
+        )
+        self.assertEqual(await usage.get_usage_report(datetime.utcnow() + timedelta(hours=1)), [])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
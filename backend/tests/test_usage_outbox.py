@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.db import UsageEventOutbox
+from backend.services import usage, usage_outbox
+from backend.services.polar import PolarAPIError
+from backend.tests.fixtures import active_subscription, without_meter_enrichment
+from backend.tests.querycount import QueryRecorder
+
+
+class UsageOutboxTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        self.recorder.seed(*active_subscription(allowance=100))
+        self.ingest = AsyncMock()
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(usage, usage_outbox))
+        stack.enter_context(patch.object(usage_outbox, "POLAR_OAT", "token"))
+        stack.enter_context(patch.object(usage_outbox, "ingest_events", self.ingest))
+        stack.enter_context(without_meter_enrichment())
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _rows(self) -> list[UsageEventOutbox]:
+        with Session(self.recorder.engine) as session:
+            return list(session.scalars(select(UsageEventOutbox).order_by(UsageEventOutbox.id)))
+
+    async def _consume(self, amount: int = 1) -> None:
+        async with self.recorder.db_session() as session:
+            await usage.consume_quota_with_session(session, "u1", amount)
+
+    async def test_charge_writes_outbox_row_without_calling_polar(self) -> None:
+        await self._consume(2)
+        self.ingest.assert_not_awaited()
+        (row,) = self._rows()
+        self.assertIsNone(row.sent_at)
+        self.assertEqual(row.payload_json["external_customer_id"], "u1")
+        self.assertEqual(row.payload_json["metadata"]["amount"], 2)
+        self.assertEqual(row.payload_json["metadata"]["event_id"], row.event_id)
+
+    async def test_rejected_charge_leaves_no_event(self) -> None:
+        with self.assertRaises(usage.QuotaError):
+            await self._consume(101)
+        self.assertEqual(self._rows(), [])
+
+    async def test_flush_sends_batches_once(self) -> None:
+        for _ in range(5):
+            await self._consume()
+        self.assertEqual(await usage_outbox.flush_usage_outbox(batch_size=2), 5)
+        self.assertEqual([len(call.args[0]) for call in self.ingest.await_args_list], [2, 2, 1])
+        self.assertTrue(all(row.sent_at is not None for row in self._rows()))
+
+        self.assertEqual(await usage_outbox.flush_usage_outbox(batch_size=2), 0)
+        self.assertEqual(self.ingest.await_count, 3)
+
+    async def test_failed_batch_is_kept_and_retried_after_backoff(self) -> None:
+        await self._consume()
+        self.ingest.side_effect = PolarAPIError("polar down")
+        with self.assertLogs(usage_outbox.LOGGER, level="WARNING"):
+            self.assertEqual(await usage_outbox.flush_usage_outbox(), 0)
+        (row,) = self._rows()
+        self.assertIsNone(row.sent_at)
+        self.assertEqual((row.attempts, row.last_error), (1, "polar down"))
+        self.assertGreater(row.next_attempt_at, datetime.utcnow())
+
+        # Not due yet: nothing is claimed.
+        self.ingest.side_effect = None
+        self.assertEqual(await usage_outbox.flush_usage_outbox(), 0)
+        with Session(self.recorder.engine) as session:
+            session.execute(update(UsageEventOutbox).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+            session.commit()
+        self.assertEqual(await usage_outbox.flush_usage_outbox(), 1)
+        status = await usage_outbox.get_usage_outbox_status()
+        self.assertEqual(status["pending"], 0)
+
+    async def test_transport_error_backs_off_each_row_in_one_update(self) -> None:
+        for _ in range(3):
+            await self._consume()
+        with Session(self.recorder.engine) as session:
+            for row_id, attempts in ((1, 2), (2, 5), (3, 30)):
+                session.execute(update(UsageEventOutbox).where(UsageEventOutbox.id == row_id).values(attempts=attempts))
+            session.commit()
+        self.ingest.side_effect = ConnectionResetError()
+
+        before = datetime.utcnow()
+        with self.recorder.recording() as statements, self.assertLogs(usage_outbox.LOGGER, level="WARNING"):
+            self.assertEqual(await usage_outbox.flush_usage_outbox(), 0)
+        self.assertEqual(len(statements), 2)  # claim, then one backoff update
+        delays = [row.next_attempt_at - before for row in self._rows()]
+        for delay, attempts in zip(delays, (3, 6, 31)):
+            self.assertAlmostEqual(delay.total_seconds(), usage_outbox._backoff(attempts).total_seconds(), delta=5)
+        self.assertTrue(all(row.last_error == "ConnectionResetError" for row in self._rows()))
+
+    def test_backoff_is_capped(self) -> None:
+        self.assertEqual(usage_outbox._backoff(1), timedelta(seconds=5))
+        self.assertEqual(usage_outbox._backoff(3), timedelta(seconds=20))
+        self.assertEqual(usage_outbox._backoff(30), usage_outbox._MAX_BACKOFF)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
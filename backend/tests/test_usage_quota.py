@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack, asynccontextmanager
+import os
+import unittest
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.db import Base, Subscription, UsageCounter
+from backend.services import usage
+from backend.tests.fixtures import active_subscription, without_meter_enrichment
+from backend.tests.querycount import QueryRecorder
+
+_ALLOWANCE = 10
+_CONSUMERS = 25
+# A throwaway Postgres database (postgresql+psycopg://...); its tables are dropped and recreated.
+_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+class AtomicQuotaTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        self.recorder.seed(*active_subscription(allowance=_ALLOWANCE))
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(usage))
+        stack.enter_context(without_meter_enrichment())
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _used(self) -> int:
+        with Session(self.recorder.engine) as session:
+            return sum(session.scalars(select(UsageCounter.used)).all())
+
+    async def _consume(self, amount: int = 1) -> usage.UsageSummary:
+        async with self.recorder.db_session() as session:
+            return await usage.consume_quota_with_session(session, "u1", amount)
+
+    async def test_interleaved_consumers_never_overshoot(self) -> None:
+        # Every session shares SQLite's single connection, so the charges interleave
+        # but their transactions never overlap. This only checks sequential
+        # overspend; PostgresConcurrentQuotaTests runs them on separate connections.
+        results = await asyncio.gather(*(self._consume() for _ in range(_CONSUMERS)), return_exceptions=True)
+        succeeded = [item for item in results if isinstance(item, usage.UsageSummary)]
+        rejected = [item for item in results if isinstance(item, usage.QuotaError)]
+        self.assertEqual(len(succeeded), _ALLOWANCE)
+        self.assertEqual(len(rejected), _CONSUMERS - _ALLOWANCE)
+        self.assertEqual(self._used(), _ALLOWANCE)
+        self.assertEqual(sorted(summary.used for summary in succeeded), list(range(1, _ALLOWANCE + 1)))
+        self.assertTrue(all(error.summary.remaining == 0 for error in rejected))
+
+    async def test_consume_is_three_round_trips(self) -> None:
+        await self._consume()  # first charge inserts the period row
+        with self.recorder.recording() as statements:
+            summary = await self._consume(3)
+        self.assertEqual(summary.used, 4)
+        self.assertEqual(summary.remaining, _ALLOWANCE - 4)
+        # Subscription lookup, conditional upsert, ledger append.
+        self.assertEqual(len(statements), 3)
+        self.assertIn("ON CONFLICT", statements[1].upper())
+        self.assertIn("INSERT INTO usage_events", statements[2])
+
+    async def test_request_larger_than_remaining_is_rejected_without_charging(self) -> None:
+        await self._consume(8)
+        with self.assertRaises(usage.QuotaError) as ctx:
+            await self._consume(3)
+        self.assertEqual(ctx.exception.summary.used, 8)
+        self.assertEqual(self._used(), 8)
+        with self.assertRaises(usage.QuotaError):
+            await self._consume(_ALLOWANCE + 1)
+
+    async def test_inactive_subscription_has_no_allowance(self) -> None:
+        with Session(self.recorder.engine) as session:
+            session.get(Subscription, "sub-1").status = "canceled"
+            session.commit()
+        with self.assertRaises(usage.QuotaError) as ctx:
+            await self._consume()
+        self.assertEqual(ctx.exception.summary.allowance, 0)
+        self.assertEqual(self._used(), 0)
+
+
+@unittest.skipUnless(_POSTGRES_URL, "set TEST_POSTGRES_URL to a throwaway Postgres database")
+class PostgresConcurrentQuotaTests(unittest.IsolatedAsyncioTestCase):
+    """The conditional upsert under real concurrency: one connection per consumer."""
+
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine(_POSTGRES_URL, pool_size=_CONSUMERS, max_overflow=0)
+        self.addAsyncCleanup(self.engine.dispose)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        self.sessions = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with self.sessions() as session:
+            session.add_all(active_subscription(allowance=_ALLOWANCE))
+            await session.commit()
+        stack = ExitStack()
+        stack.enter_context(without_meter_enrichment())
+        self.addCleanup(stack.close)
+
+    async def asyncTearDown(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+    @asynccontextmanager
+    async def _db_session(self):
+        async with self.sessions() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def _consume(self, start: asyncio.Event) -> usage.UsageSummary:
+        async with self._db_session() as session:
+            # Check out the connection first so every charge runs in its own open transaction.
+            await session.connection()
+            await start.wait()
+            return await usage.consume_quota_with_session(session, "u1", 1)
+
+    async def test_concurrent_consumers_never_overshoot(self) -> None:
+        start = asyncio.Event()
+        consumers = [asyncio.create_task(self._consume(start)) for _ in range(_CONSUMERS)]
+        await asyncio.sleep(0.5)
+        start.set()
+        results = await asyncio.gather(*consumers, return_exceptions=True)
+        succeeded = [item for item in results if isinstance(item, usage.UsageSummary)]
+        rejected = [item for item in results if isinstance(item, usage.QuotaError)]
+        self.assertEqual(len(succeeded), _ALLOWANCE)
+        self.assertEqual(len(rejected), _CONSUMERS - _ALLOWANCE)
+        async with self.sessions() as session:
+            used = (await session.execute(select(func.coalesce(func.sum(UsageCounter.used), 0)))).scalar()
+        self.assertEqual(used, _ALLOWANCE)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from backend.db import Subscription, SubscriptionPlan, UsageCounter
+from backend.services import usage
+from backend.services.meter_cache import MeterSnapshot
+from backend.tests.querycount import QueryRecorder
+
+_NOW = datetime.utcnow()
+
+
+def _subscription(sub_id: str, user_id: str, *, status: str = "active", ends_in_days: int = 29, started_days_ago: int = 1):
+    return Subscription(
+        id=sub_id,
+        user_id=user_id,
+        status=status,
+        plan_id="plan-pro",
+        current_period_start=_NOW - timedelta(days=started_days_ago),
+        current_period_end=_NOW + timedelta(days=ends_in_days),
+    )
+
+
+def _counter(subscription: Subscription, used: int) -> UsageCounter:
+    return UsageCounter(
+        user_id=subscription.user_id,
+        period_start=subscription.current_period_start,
+        period_end=subscription.current_period_end,
+        used=used,
+    )
+
+
+class BulkUsageSummaryTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.recorder = QueryRecorder()
+        active = _subscription("s-active", "u-active")
+        newer = _subscription("s-new", "u-renewed")
+        expired = _subscription("s-expired", "u-expired", ends_in_days=-1, started_days_ago=31)
+        self.recorder.seed(
+            SubscriptionPlan(id="plan-pro", name="Pro", allowance=10),
+            active,
+            _counter(active, 4),
+            _subscription("s-old", "u-renewed", status="canceled", ends_in_days=-30, started_days_ago=60),
+            newer,
+            _counter(newer, 2),
+            expired,
+            _counter(expired, 5),
+            _subscription("s-nocounter", "u-nocounter"),
+            _subscription("s-canceled", "u-canceled", status="canceled"),
+        )
+        self.snapshots = AsyncMock(return_value={})
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(usage))
+        stack.enter_context(patch.object(usage, "get_meter_snapshots", self.snapshots))
+        stack.enter_context(patch.object(usage, "get_meter_snapshot", AsyncMock(return_value=None)))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    async def test_matches_per_user_summaries(self) -> None:
+        user_ids = ["u-active", "u-renewed", "u-expired", "u-nocounter", "u-canceled", "u-none", "u-active", ""]
+        bulk = await usage.get_usage_summaries(user_ids)
+        self.assertEqual([item.user_id for item in bulk], user_ids[:6])
+        for summary in bulk:
+            single = await usage._load_usage_summary(summary.user_id)
+            self.assertEqual(summary.to_dict(), single.to_dict(), summary.user_id)
+        self.assertEqual([item.used for item in bulk], [4, 2, 0, 0, 0, 0])
+        self.assertEqual([item.remaining for item in bulk], [6, 8, 10, 10, 0, 0])
+
+    async def test_query_count_is_independent_of_user_count(self) -> None:
+        extra = [_subscription(f"s-{idx}", f"u-{idx}") for idx in range(40)]
+        self.recorder.seed(*extra, *(_counter(item, idx % 10) for idx, item in enumerate(extra)))
+        counts = []
+        for user_ids in (["u-0"], [f"u-{idx}" for idx in range(40)]):
+            with self.recorder.recording() as statements:
+                summaries = await usage.get_usage_summaries(user_ids)
+            self.assertEqual(len(summaries), len(user_ids))
+            counts.append(len(statements))
+        self.assertEqual(counts, [1, 1])
+
+    async def test_meter_snapshots_come_from_one_cache_lookup(self) -> None:
+        self.snapshots.return_value = {
+            "u-active": MeterSnapshot(consumed=7, credited=10, balance=3, fetched_at=time.time())
+        }
+        active, nocounter = await usage.get_usage_summaries(["u-active", "u-nocounter"])
+        self.snapshots.assert_awaited_once_with(["u-active", "u-nocounter"])
+        self.assertEqual((active.used, active.remaining), (7, 3))
+        self.assertEqual((nocounter.used, nocounter.remaining), (0, 10))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.db import Subscription, WebhookInbox
+from backend.services import polar, webhook_inbox
+from backend.tests.querycount import QueryRecorder
+
+
+def _event(subscription_id: str, status: str, modified_at: datetime, plan_allowance: int = 10) -> dict:
+    return {
+        "type": "subscription.updated",
+        "data": {
+            "id": subscription_id,
+            "status": status,
+            "modified_at": modified_at.isoformat() + "Z",
+            "customer": {"external_id": f"user-{subscription_id}"},
+            "product": {"id": "plan-pro", "name": "Pro", "metadata": {"allowance": plan_allowance}},
+        },
+    }
+
+
+class WebhookInboxTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        polar._catalog = None
+        self.recorder = QueryRecorder()
+        self.t0 = datetime(2026, 1, 1, 12, 0)
+        stack = ExitStack()
+        stack.enter_context(self.recorder.patched(webhook_inbox, polar))
+        stack.enter_context(patch.object(polar, "get_redis_client", AsyncMock(return_value=None)))
+        self.invalidate = AsyncMock()
+        stack.enter_context(patch.object(webhook_inbox, "invalidate_meter_snapshot", self.invalidate))
+        self.addCleanup(self.recorder.dispose)
+        self.addCleanup(stack.close)
+
+    def _subscription(self, subscription_id: str) -> Subscription | None:
+        with Session(self.recorder.engine) as session:
+            return session.get(Subscription, subscription_id)
+
+    def _inbox(self) -> list[WebhookInbox]:
+        with Session(self.recorder.engine) as session:
+            return list(session.scalars(select(WebhookInbox).order_by(WebhookInbox.id)))
+
+    async def test_enqueue_does_not_apply_and_drops_redeliveries(self) -> None:
+        payload = _event("s1", "active", self.t0)
+        self.assertTrue(await webhook_inbox.enqueue_webhook("msg_1", payload))
+        self.assertFalse(await webhook_inbox.enqueue_webhook("msg_1", payload))
+        self.assertIsNone(self._subscription("s1"))
+        self.assertEqual(len(self._inbox()), 1)
+
+        self.assertEqual(await webhook_inbox.process_webhook_inbox(), 1)
+        self.assertEqual(self._subscription("s1").status, "active")
+        self.assertIsNotNone(self._inbox()[0].processed_at)
+        self.invalidate.assert_awaited_once_with("user-s1")
+
+    async def test_events_for_one_subscription_apply_in_order(self) -> None:
+        await webhook_inbox.enqueue_webhook("msg_1", _event("s1", "active", self.t0))
+        await webhook_inbox.enqueue_webhook("msg_2", _event("s2", "active", self.t0))
+        await webhook_inbox.enqueue_webhook("msg_3", _event("s1", "past_due", self.t0 + timedelta(minutes=1)))
+        await webhook_inbox.enqueue_webhook("msg_4", _event("s1", "canceled", self.t0 + timedelta(minutes=2)))
+
+        claimed = await webhook_inbox._claim_batch(10)
+        self.assertEqual([row[0] for row in claimed], [1, 2])
+
+        with self.recorder.engine.begin() as conn:
+            conn.execute(update(WebhookInbox).values(next_attempt_at=self.t0))
+        self.assertEqual(await webhook_inbox.process_webhook_inbox(), 4)
+        self.assertEqual(self._subscription("s1").status, "canceled")
+
+    async def test_failed_event_is_retried_and_holds_back_later_ones(self) -> None:
+        await webhook_inbox.enqueue_webhook("msg_1", _event("s1", "active", self.t0))
+        await webhook_inbox.enqueue_webhook("msg_2", _event("s1", "canceled", self.t0 + timedelta(minutes=1)))
+        await webhook_inbox.enqueue_webhook("msg_3", _event("s2", "active", self.t0))
+
+        with patch.object(webhook_inbox, "upsert_plan_from_payload", AsyncMock(side_effect=[RuntimeError("db"), None])):
+            with self.assertLogs(webhook_inbox.LOGGER, level="ERROR"):
+                self.assertEqual(await webhook_inbox.process_webhook_inbox(), 1)
+        self.assertIsNone(self._subscription("s1"))
+        self.assertEqual(self._subscription("s2").status, "active")
+        first = self._inbox()[0]
+        self.assertEqual((first.attempts, first.last_error), (1, "db"))
+
+        status = await webhook_inbox.get_webhook_inbox_status()
+        self.assertEqual((status["pending"], status["retrying"]), (2, 1))
+
+        with self.recorder.engine.begin() as conn:
+            conn.execute(update(WebhookInbox).values(next_attempt_at=self.t0))
+        self.assertEqual(await webhook_inbox.process_webhook_inbox(), 2)
+        self.assertEqual(self._subscription("s1").status, "canceled")
+        self.assertEqual((await webhook_inbox.get_webhook_inbox_status())["pending"], 0)
+
+    async def test_older_state_does_not_overwrite_newer_one(self) -> None:
+        await webhook_inbox.enqueue_webhook("msg_2", _event("s1", "canceled", self.t0 + timedelta(minutes=1)))
+        await webhook_inbox.enqueue_webhook("msg_1", _event("s1", "active", self.t0))
+        self.assertEqual(await webhook_inbox.process_webhook_inbox(), 2)
+        self.assertEqual(self._subscription("s1").status, "canceled")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
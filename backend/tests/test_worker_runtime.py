@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+from unittest.mock import patch
+
+from backend import tasks
+from backend.worker_runtime import WorkerRuntime
+
+
+async def _current_loop() -> asyncio.AbstractEventLoop:
+    await asyncio.sleep(0)
+    return asyncio.get_running_loop()
+
+
+class WorkerRuntimeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.runtime = WorkerRuntime()
+        self.addCleanup(self.runtime.stop)
+
+    def test_tasks_share_one_loop_across_calls_and_threads(self) -> None:
+        first = self.runtime.run(_current_loop())
+        with ThreadPoolExecutor(4) as pool:
+            loops = set(pool.map(lambda _: self.runtime.run(_current_loop()), range(8)))
+        self.assertEqual(loops, {first})
+        self.assertFalse(first.is_closed())
+
+    def test_errors_and_timeouts_reach_the_caller(self) -> None:
+        async def boom() -> None:
+            raise ValueError("boom")
+
+        with self.assertRaisesRegex(ValueError, "boom"):
+            self.runtime.run(boom())
+        with self.assertRaises(TimeoutError):
+            self.runtime.run(asyncio.sleep(5), timeout=0.05)
+
+    def test_forked_child_starts_a_fresh_loop_and_drops_the_engine(self) -> None:
+        parent = self.runtime.run(_current_loop())
+        self.runtime._pid = -1  # as seen from a child after fork
+        with patch("backend.worker_runtime.reset_engine") as reset:
+            child = self.runtime.run(_current_loop())
+        reset.assert_called_once_with()
+        self.assertIsNot(child, parent)
+        parent.call_soon_threadsafe(parent.stop)
+
+    def test_stop_closes_the_loop_and_the_next_run_restarts_it(self) -> None:
+        loop = self.runtime.run(_current_loop())
+        with patch("backend.worker_runtime.dispose_engine") as dispose:
+            self.runtime.stop()
+        dispose.assert_awaited_once_with()
+        self.assertTrue(loop.is_closed())
+        self.assertIsNot(self.runtime.run(_current_loop()), loop)
+
+
+class DescribePoseTaskTests(unittest.TestCase):
+    def test_task_runs_on_the_worker_loop(self) -> None:
+        runtime = WorkerRuntime()
+        self.addCleanup(runtime.stop)
+        loops = []
+
+        async def describe(s3_key: str) -> dict:
+            loops.append(asyncio.get_running_loop())
+            return {"s3_key": s3_key, "ok": True, "skipped": False}
+
+        with patch.object(tasks, "generate_pose_description", describe), patch("backend.worker_runtime.runtime", runtime):
+            results = [tasks.describe_pose_task(key) for key in ("a.png", "b.png")]
+
+        self.assertEqual([r["ok"] for r in results], [True, True])
+        self.assertEqual(set(loops), {runtime.loop})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""A small bounded LRU mapping for per-worker caches."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BoundedLRU(OrderedDict[K, V]):
+    """``OrderedDict`` holding at most ``max_entries`` keys, evicting the least recently used.
+
+    Reads through ``[]`` or :meth:`get` and every write mark a key as recently used.
+    ``on_evict`` is called with each key pushed out by a write.
+    """
+
+    def __init__(self, max_entries: int, on_evict: Callable[[K], None] | None = None) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self._on_evict = on_evict
+
+    def __getitem__(self, key: K) -> V:
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        if key not in self:
+            return default
+        return self[key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            evicted, _ = self.popitem(last=False)
+            if self._on_evict is not None:
+                self._on_evict(evicted)
+
+
+__all__ = ["BoundedLRU"]
@@ -0,0 +1,82 @@
+"""Keyset pagination helpers shared by list endpoints.
+
+Pages are ordered newest first on ``(created_at, id)``. The cursor is an opaque,
+URL-safe token holding the last row's key, so every page costs one index range
+scan no matter how deep the client pages.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence, TypeVar
+
+from sqlalchemy import Select, tuple_
+
+from backend.config import LIST_PAGE_SIZE_DEFAULT, LIST_PAGE_SIZE_MAX
+
+RowT = TypeVar("RowT")
+CursorKey = tuple[datetime, Any]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded."""
+
+
+def clamp_page_size(limit: int | None) -> int:
+    if limit is None or limit <= 0:
+        return LIST_PAGE_SIZE_DEFAULT
+    return min(limit, LIST_PAGE_SIZE_MAX)
+
+
+def encode_cursor(created_at: datetime, row_id: Any) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> CursorKey:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_raw, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(created_raw)
+    except Exception as exc:
+        raise InvalidCursorError("invalid cursor") from exc
+    if not isinstance(row_id, (int, str)) or isinstance(row_id, bool):
+        raise InvalidCursorError("invalid cursor")
+    return created_at, row_id
+
+
+def keyset_page(stmt: Select, created_col: Any, id_col: Any, *, cursor: str | None, limit: int) -> Select:
+    """Restrict ``stmt`` to the page after ``cursor``, newest first.
+
+    Any existing ORDER BY on ``stmt`` is replaced. One extra row is fetched so
+    :func:`split_page` can tell whether another page exists without a COUNT query.
+    """
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+    return stmt.order_by(None).order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(
+    rows: Sequence[RowT],
+    limit: int,
+    key: Callable[[RowT], CursorKey],
+) -> tuple[list[RowT], str | None]:
+    """Trim the look-ahead row and return ``(page_rows, next_cursor)``."""
+
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(*key(page[-1]))
+
+
+__all__ = [
+    "InvalidCursorError",
+    "clamp_page_size",
+    "decode_cursor",
+    "encode_cursor",
+    "keyset_page",
+    "split_page",
+]
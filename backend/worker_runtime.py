@@ -0,0 +1,103 @@
+"""Long-lived asyncio runtime for Celery worker processes.
+
+Celery calls task functions synchronously. Wrapping each call in
+``asyncio.run`` created and closed an event loop per task, while the pooled
+connections of the module-global async engine in :mod:`backend.db` stayed bound
+to whichever loop opened them. The next task then reused connections from a
+closed loop.
+
+:class:`WorkerRuntime` keeps one event loop per process, running on a daemon
+thread. :meth:`WorkerRuntime.run` submits a coroutine to it and waits for the
+result, so the DB pool, the S3 client and the GenAI client are created once and
+reused by every task. With a thread pool (``celery worker -P threads``),
+concurrent tasks share that loop. A forked child starts its own loop and drops
+the engine it inherited.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Coroutine, TypeVar
+
+from backend.db import dispose_engine, reset_engine
+
+logger = logging.getLogger("backend.worker_runtime")
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        return self._loop
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start this process's loop if it is not running yet."""
+
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+            if self._pid is not None:
+                # Forked from a process that already had a runtime: its loop thread
+                # did not survive the fork and its connections belong to the parent.
+                reset_engine()
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="worker-runtime", daemon=True)
+            thread.start()
+            self._loop, self._thread, self._pid = loop, thread, os.getpid()
+            return loop
+
+    def run(self, coro: Coroutine[Any, Any, T], *, timeout: float | None = None) -> T:
+        """Run ``coro`` on the process loop and return its result.
+
+        Must not be called from the loop's own thread. On timeout the coroutine
+        is cancelled and :class:`TimeoutError` is raised.
+        """
+
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"task did not finish within {timeout}s") from None
+
+    def stop(self) -> None:
+        """Close pooled DB connections on the loop, then stop and close it."""
+
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                if loop is not None:
+                    reset_engine()
+                self._loop = self._thread = self._pid = None
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(dispose_engine(), loop).result(10)
+            except Exception:
+                logger.exception("Failed to close worker DB connections")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(10)
+            loop.close()
+            self._loop = self._thread = self._pid = None
+
+
+runtime = WorkerRuntime()
+
+
+def run_task(coro: Coroutine[Any, Any, T], *, timeout: float | None = None) -> T:
+    """Run a Celery task's coroutine on this process's :data:`runtime`."""
+
+    return runtime.run(coro, timeout=timeout)
+
+
+__all__ = ["WorkerRuntime", "run_task", "runtime"]